@@ -98,7 +98,9 @@ def use_inference_server(cfg, model, trainer):
                 target=web_ui, daemon=True, args=(cfg.share, cfg.username, cfg.password, cfg.port, cfg.web_port, loop),
             )
             thread.start()
-        server = MegatronServer(model.cuda())
+        server = MegatronServer(
+            model.cuda(), max_batch_size=cfg.get('max_batch_size', 128), batch_timeout=cfg.get('batch_timeout', 0.0),
+        )
         server.run("0.0.0.0", port=cfg.port)
 
     while True:
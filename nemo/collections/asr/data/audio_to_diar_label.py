@@ -15,7 +15,7 @@
 import os
 from collections import OrderedDict
 from statistics import mode
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 import torch
 
@@ -503,6 +503,7 @@ class _AudioMSDDInferDataset(Dataset):
         self.max_spks = 2
         self.use_single_scale_clus = use_single_scale_clus
         self.seq_eval_mode = seq_eval_mode
+        self._session_feats = None
 
     def __len__(self):
         return len(self.collection)
@@ -572,14 +573,41 @@ class _AudioMSDDInferDataset(Dataset):
             seg_target = torch.stack(seg_target_list)
             return seg_target
 
+    def get_session_feats(self, uniq_id: str) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Stack the cluster-average embeddings and the multiscale embedding sequence of a session. All speaker pairs of
+        a session are consecutive samples in pairwise inference, so the tensors of the last session are kept and
+        shared by its speaker pairs instead of being stacked again for each pair.
+
+        Args:
+            uniq_id (str):
+                Unique session ID.
+
+        Returns:
+            avg_embs (torch.tensor):
+                Cluster-average embeddings of all speakers with shape (scale_n, emb_dim, num_spks).
+            feats_out (torch.tensor):
+                Multiscale embedding sequence with shape (length, scale_n, emb_dim).
+        """
+        if self._session_feats is not None and self._session_feats[0] == uniq_id:
+            return self._session_feats[1:]
+        scale_n = len(self.emb_dict.keys())
+        avg_embs = torch.stack([self.emb_dict[scale_index][uniq_id]['avg_embs'] for scale_index in range(scale_n)])
+        feats = []
+        for scale_index in range(scale_n):
+            repeat_mat = self.emb_seq["session_scale_mapping"][uniq_id][scale_index]
+            feats.append(self.emb_seq[scale_index][uniq_id][repeat_mat, :])
+        feats_out = torch.stack(feats).permute(1, 0, 2)
+        self._session_feats = (uniq_id, avg_embs, feats_out)
+        return avg_embs, feats_out
+
     def __getitem__(self, index):
         sample = self.collection[index]
         if sample.offset is None:
             sample.offset = 0
 
         uniq_id = os.path.splitext(os.path.basename(sample.audio_file))[0]
-        scale_n = len(self.emb_dict.keys())
-        _avg_embs = torch.stack([self.emb_dict[scale_index][uniq_id]['avg_embs'] for scale_index in range(scale_n)])
+        _avg_embs, feats_out = self.get_session_feats(uniq_id)
 
         if self.pairwise_infer:
             avg_embs = _avg_embs[:, :, self.collection[index].target_spks]
@@ -591,11 +619,6 @@ class _AudioMSDDInferDataset(Dataset):
                 f" avg_embs.shape[2] {avg_embs.shape[2]} should be less than or equal to self.max_num_speakers {self.max_spks}"
             )
 
-        feats = []
-        for scale_index in range(scale_n):
-            repeat_mat = self.emb_seq["session_scale_mapping"][uniq_id][scale_index]
-            feats.append(self.emb_seq[scale_index][uniq_id][repeat_mat, :])
-        feats_out = torch.stack(feats).permute(1, 0, 2)
         feats_len = feats_out.shape[0]
 
         if self.seq_eval_mode:
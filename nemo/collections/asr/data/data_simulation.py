@@ -38,9 +38,13 @@ from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
 from nemo.collections.asr.parts.utils.audio_utils import db2mag, generate_approximate_noise_field, mag2db, pow2db, rms
 from nemo.collections.asr.parts.utils.data_simulation_utils import (
     DataAnnotator,
+    RIRBank,
+    SessionAudioWriter,
+    SourceAudioCache,
     SpeechSampler,
     build_speaker_samples_map,
     get_background_noise,
+    get_background_noise_segments,
     get_cleaned_base_path,
     get_random_offset_index,
     get_speaker_ids,
@@ -48,6 +52,7 @@ from nemo.collections.asr.parts.utils.data_simulation_utils import (
     get_split_points_in_alignments,
     load_speaker_sample,
     normalize_audio,
+    overlap_add_convolve,
     per_speaker_normalize,
     perturb_audio,
     read_audio_from_buffer,
@@ -95,6 +100,11 @@ class MultiSpeakerSimulator(object):
         - Re-organized MultiSpeakerSimulator class and moved util functions to util files.
         v1.1.1 March 2023
             - Changed `silence_mean` to use exactly the same sampling equation as `overlap_mean`.
+        v1.1.2 June 2023
+            - Worker processes hold the simulator once instead of receiving it with every session
+            - Shared read-only cache of decoded source audio files
+            - Optional chunk-by-chunk writing of session audio, RTTM and JSON files
+            - Memory-mapped RIR bank and batched overlap-add FFT convolution for RIR augmentation
 
 
     Args:
@@ -104,6 +114,8 @@ class MultiSpeakerSimulator(object):
       manifest_filepath (str): Manifest file with paths to single speaker audio files
       sr (int): Sampling rate of the input audio files from the manifest
       random_seed (int): Seed to random number generator
+      source_audio_cache_dir (str): Directory for a cache of decoded source audio files shared by all worker 
+                                    processes, set `null` to decode source audio files on every read
 
     session_config:
       num_speakers (int): Number of unique speakers per multispeaker audio session
@@ -159,6 +171,9 @@ class MultiSpeakerSimulator(object):
       output_filename (str): Output filename for the wav and RTTM files
       overwrite_output (bool): If true, delete the output directory if it exists
       output_precision (int): Number of decimal places in output files
+      stream_chunk_sec (float): Write session audio, RTTM and JSON files in chunks of this duration (seconds) instead 
+                                of holding whole sessions in memory, set `null` to disable. Not used with session 
+                                augmentation, which needs whole sessions.
     
     background_noise: 
       add_bg (bool): Add ambient background noise if true
@@ -246,6 +261,15 @@ class MultiSpeakerSimulator(object):
         else:
             self.session_augmentor = None
 
+        stream_chunk_sec = self._params.data_simulator.outputs.get("stream_chunk_sec", None)
+        if stream_chunk_sec is not None and self.session_augmentor is not None:
+            logging.warning("Session augmentation is applied to whole sessions, `stream_chunk_sec` is ignored.")
+            stream_chunk_sec = None
+        self._stream_chunk_samples = (
+            int(stream_chunk_sec * self._params.data_simulator.sr) if stream_chunk_sec is not None else None
+        )
+        self._audio_cache = None
+
         # Error check the input arguments for simulation
         self._check_args()
 
@@ -829,6 +853,7 @@ class MultiSpeakerSimulator(object):
                 max_audio_read_sec=self._max_audio_read_sec,
                 min_alignment_count=self._min_alignment_count,
                 read_subset=True,
+                audio_cache=self._audio_cache,
             )
 
             # Step 6-2: Add optional perturbations to the specific audio segment (i.e. to `self._sentnece`)
@@ -927,19 +952,19 @@ class MultiSpeakerSimulator(object):
                 new_start = start + silence_amount
         return new_start
 
-    def _get_session_meta_data(self, array: np.ndarray, snr: float) -> dict:
+    def _get_session_meta_data(self, num_samples: int, snr: float) -> dict:
         """
         Get meta data for the current session.
 
         Args:
-            array (np.ndarray): audio array
+            num_samples (int): length of the session audio in samples
             snr (float): signal-to-noise ratio
 
         Returns:
             dict: meta data 
         """
         meta_data = {
-            "duration": array.shape[0] / self._params.data_simulator.sr,
+            "duration": num_samples / self._params.data_simulator.sr,
             "silence_mean": self.sampler.sess_silence_mean,
             "overlap_mean": self.sampler.sess_overlap_mean,
             "bg_snr": snr,
@@ -976,30 +1001,6 @@ class MultiSpeakerSimulator(object):
         sess_silence_len = int(total_silence_in_secs * self._params.data_simulator.sr)
         return sess_speech_len, sess_silence_len
 
-    def _add_sentence_to_array(
-        self, start: int, length: int, array: torch.Tensor, is_speech: torch.Tensor
-    ) -> Tuple[torch.Tensor, torch.Tensor, int]:
-        """
-        Add a sentence to the session array containing time-series signal.
-
-        Args:
-            start (int): Starting position in the session
-            length (int): Length of the sentence
-            array (torch.Tensor): Session array
-            is_speech (torch.Tensor): Session array containing speech/non-speech labels
-
-        Returns:
-            array (torch.Tensor): Session array in torch.Tensor format
-            is_speech (torch.Tensor): Session array containing speech/non-speech labels in torch.Tensor format
-        """
-        end = start + length
-        if end > len(array):  # only occurs in enforce mode
-            array = torch.nn.functional.pad(array, (0, end - len(array)))
-            is_speech = torch.nn.functional.pad(is_speech, (0, end - len(is_speech)))
-        array[start:end] += self._sentence
-        is_speech[start:end] = 1
-        return array, is_speech, end
-
     def _generate_session(
         self,
         idx: int,
@@ -1027,6 +1028,8 @@ class MultiSpeakerSimulator(object):
         """
         random_seed = self._params.data_simulator.random_seed
         np.random.seed(random_seed + idx)
+        random.seed(random_seed + idx)
+        torch.manual_seed(random_seed + idx)
 
         self._device = device
         speaker_dominance = self._get_speaker_dominance()  # randomly determine speaker dominance
@@ -1050,8 +1053,15 @@ class MultiSpeakerSimulator(object):
         session_len_samples = int(
             (self._params.data_simulator.session_config.session_length * self._params.data_simulator.sr)
         )
-        array = torch.zeros(session_len_samples).to(self._device)
-        is_speech = torch.zeros(session_len_samples).to(self._device)
+        session_writer = SessionAudioWriter(
+            filepath=os.path.join(basepath, filename + '.wav'),
+            sr=self._params.data_simulator.sr,
+            min_length=session_len_samples,
+            chunk_samples=self._stream_chunk_samples,
+            device=self._device,
+        )
+        if self._stream_chunk_samples is not None:
+            self.annotator.open_annotation_files(basepath=basepath, filename=filename)
 
         self.sampler.get_session_silence_mean()
         self.sampler.get_session_overlap_mean()
@@ -1092,9 +1102,7 @@ class MultiSpeakerSimulator(object):
                 enforce=enforce,
             )
             # step 5: add sentence to array
-            array, is_speech, end = self._add_sentence_to_array(
-                start=start, length=length, array=array, is_speech=is_speech,
-            )
+            end = session_writer.add(start=start, signal=self._sentence)
 
             # Step 6: Build entries for output files
             new_rttm_entries = self.annotator.create_new_rttm_entry(
@@ -1105,8 +1113,6 @@ class MultiSpeakerSimulator(object):
                 speaker_id=speaker_ids[speaker_turn],
             )
 
-            self.annotator.annote_lists['rttm'].extend(new_rttm_entries)
-
             new_json_entry = self.annotator.create_new_json_entry(
                 text=self._text,
                 wav_filename=os.path.join(basepath, filename + '.wav'),
@@ -1116,8 +1122,6 @@ class MultiSpeakerSimulator(object):
                 rttm_filepath=os.path.join(basepath, filename + '.rttm'),
                 ctm_filepath=os.path.join(basepath, filename + '.ctm'),
             )
-            self.annotator.annote_lists['json'].append(new_json_entry)
-
             new_ctm_entries = self.annotator.create_new_ctm_entry(
                 words=self._words,
                 alignments=self._alignments,
@@ -1126,7 +1130,9 @@ class MultiSpeakerSimulator(object):
                 start=int(start / self._params.data_simulator.sr),
             )
 
-            self.annotator.annote_lists['ctm'].extend(new_ctm_entries)
+            self.annotator.add_annotation_entries(
+                rttm_entries=new_rttm_entries, json_entry=new_json_entry, ctm_entries=new_ctm_entries
+            )
 
             running_len_samples = np.maximum(running_len_samples, end)
             (
@@ -1140,6 +1146,21 @@ class MultiSpeakerSimulator(object):
             prev_speaker = speaker_turn
             prev_len_samples = length
 
+            # new sentences never start before the furthest sample of their speaker
+            session_writer.flush(min(self._furthest_sample))
+
+        if session_writer.is_written:
+            snr = self._write_session_audio(session_writer=session_writer, seed=random_seed + idx)
+            self.annotator.write_annotation_files(
+                basepath=basepath,
+                filename=filename,
+                meta_data=self._get_session_meta_data(num_samples=session_writer.length, snr=snr),
+            )
+            self.clean_up()
+            return basepath, filename
+
+        array, is_speech = session_writer.get_session()
+
         # Step 7-1: Add optional perturbations to the whole session, such as white noise.
         if self._params.data_simulator.session_augmentor.add_sess_aug:
             # NOTE: This perturbation is not reflected in the session SNR in meta dictionary.
@@ -1174,7 +1195,9 @@ class MultiSpeakerSimulator(object):
         sf.write(os.path.join(basepath, filename + '.wav'), array, self._params.data_simulator.sr)
 
         self.annotator.write_annotation_files(
-            basepath=basepath, filename=filename, meta_data=self._get_session_meta_data(array=array, snr=snr),
+            basepath=basepath,
+            filename=filename,
+            meta_data=self._get_session_meta_data(num_samples=len(array), snr=snr),
         )
 
         # Step 8: Clean up memory
@@ -1182,10 +1205,75 @@ class MultiSpeakerSimulator(object):
         self.clean_up()
         return basepath, filename
 
+    def _write_session_audio(self, session_writer: SessionAudioWriter, seed: int) -> Union[float, str]:
+        """
+        Add background noise to a session written to disk by `session_writer` and write the normalized session
+        to the wav file chunk by chunk.
+
+        Args:
+            session_writer (SessionAudioWriter): Writer holding the last part of the current session.
+            seed (int): Seed for sampling background noise.
+
+        Returns:
+            snr (float or str): signal-to-noise ratio of the background noise, "N/A" if no noise is added
+        """
+        avg_power_array = session_writer.finish()
+        noise_segments, snr = None, "N/A"
+        if self._params.data_simulator.background_noise.add_bg:
+            if len(self._noise_samples) == 0:
+                raise ValueError('No background noise samples found in self._noise_samples.')
+            noise_segments, snr = get_background_noise_segments(
+                len_array=session_writer.length,
+                power_array=avg_power_array,
+                noise_samples=self._noise_samples,
+                audio_read_buffer_dict=self._audio_read_buffer_dict,
+                snr_min=self._params.data_simulator.background_noise.snr_min,
+                snr_max=self._params.data_simulator.background_noise.snr_max,
+                background_noise_snr=self._params.data_simulator.background_noise.snr,
+                seed=seed,
+                device=self._device,
+            )
+        session_writer.write_wav(noise_segments=noise_segments)
+        return snr
+
+    def _generate_session_from_queue(
+        self,
+        idx: int,
+        basepath: str,
+        filename: str,
+        speaker_ids: List[str],
+        noise_samples: list,
+        device: torch.device,
+    ) -> Tuple[str, str]:
+        """
+        Generate a session from the lightweight arguments queued by `generate_sessions`. The samples of
+        the session speakers are looked up in the speaker samples map held by the simulator, so that they are
+        not sent to worker processes with every session.
+
+        Args:
+            idx (int): Index for current session (out of total number of sessions).
+            basepath (str): Path to output directory.
+            filename (str): Filename for output files.
+            speaker_ids (list): List of speaker IDs that will be used in this session.
+            noise_samples (list): List of randomly sampled noise source files that will be used for generating this session.
+            device (torch.device): Device to use for generating this session.
+
+        Returns:
+            basepath (str): Path to output directory.
+            filename (str): Filename for output files.
+        """
+        speaker_wav_align_map = get_speaker_samples(speaker_ids=speaker_ids, speaker_samples=self._speaker_samples)
+        return self._generate_session(
+            idx, basepath, filename, speaker_ids, speaker_wav_align_map, noise_samples, device,
+        )
+
     def generate_sessions(self, random_seed: int = None):
         """
         Generate several multispeaker audio sessions and corresponding list files.
 
+        Sessions are seeded with `random_seed + session index`, so the output does not depend on the number of
+        worker processes. Each worker process receives the simulator once when it starts.
+
         Args:
             random_seed (int): random seed for reproducibility
         """
@@ -1201,8 +1289,13 @@ class MultiSpeakerSimulator(object):
         )
         OmegaConf.save(self._params, os.path.join(output_dir, "params.yaml"))
 
-        tp = concurrent.futures.ProcessPoolExecutor(max_workers=self.num_workers)
-        futures = []
+        source_audio_cache_dir = self._params.data_simulator.get("source_audio_cache_dir", None)
+        if source_audio_cache_dir is not None and self._manifest is not None:
+            self._audio_cache = SourceAudioCache.build(
+                audio_filepaths=[sample['audio_filepath'] for sample in self._manifest],
+                cache_dir=source_audio_cache_dir,
+                num_workers=self.num_workers,
+            )
 
         num_sessions = self._params.data_simulator.session_config.num_sessions
         source_noise_manifest = read_noise_manifest(
@@ -1219,40 +1312,38 @@ class MultiSpeakerSimulator(object):
                 speaker_samples=self._speaker_samples,
                 permutated_speaker_inds=self._permutated_speaker_inds,
             )
-            speaker_wav_align_map = get_speaker_samples(speaker_ids=speaker_ids, speaker_samples=self._speaker_samples)
             noise_samples = self.sampler.sample_noise_manifest(noise_manifest=source_noise_manifest)
 
             if torch.cuda.is_available():
                 device = torch.device(f"cuda:{sess_idx % torch.cuda.device_count()}")
             else:
                 device = self._device
-            queue.append((sess_idx, basepath, filename, speaker_ids, speaker_wav_align_map, noise_samples, device))
+            queue.append((sess_idx, basepath, filename, speaker_ids, noise_samples, device))
 
-        # for multiprocessing speed, we avoid loading potentially huge manifest list and speaker sample files into each process.
+        # for multiprocessing speed, we avoid loading the potentially huge manifest list into each process.
         if self.num_workers > 1:
             self._manifest = None
-            self._speaker_samples = None
+            tp = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.num_workers, initializer=_init_session_worker, initargs=(self,)
+            )
 
         # Chunk the sessions into smaller chunks for very large number of sessions (10K+ sessions)
         for chunk_idx in range(self.chunk_count):
-            futures = []
             stt_idx, end_idx = (
                 chunk_idx * self.multiprocessing_chunksize,
                 min((chunk_idx + 1) * self.multiprocessing_chunksize, num_sessions),
             )
-            for sess_idx in range(stt_idx, end_idx):
-                self._furthest_sample = [0 for n in range(self._params.data_simulator.session_config.num_speakers)]
-                self._audio_read_buffer_dict = {}
-                if self.num_workers > 1:
-                    futures.append(tp.submit(self._generate_session, *queue[sess_idx]))
-                else:
-                    futures.append(queue[sess_idx])
-
             if self.num_workers > 1:
+                futures = {
+                    tp.submit(_generate_session_in_worker, queue[sess_idx]): sess_idx
+                    for sess_idx in range(stt_idx, end_idx)
+                }
                 generator = concurrent.futures.as_completed(futures)
             else:
+                futures = {sess_idx: sess_idx for sess_idx in range(stt_idx, end_idx)}
                 generator = futures
 
+            results = {}
             for future in tqdm(
                 generator,
                 desc=f"[{chunk_idx+1}/{self.chunk_count}] Waiting jobs from {stt_idx+1: 2} to {end_idx: 2}",
@@ -1260,21 +1351,43 @@ class MultiSpeakerSimulator(object):
                 total=len(futures),
             ):
                 if self.num_workers > 1:
-                    basepath, filename = future.result()
+                    results[futures[future]] = future.result()
                 else:
-                    self._noise_samples = self.sampler.sample_noise_manifest(noise_manifest=source_noise_manifest,)
-                    basepath, filename = self._generate_session(*future)
-
-                self.annotator.add_to_filename_lists(basepath=basepath, filename=filename)
+                    results[future] = self._generate_session_from_queue(*queue[future])
 
                 # throw warning if number of speakers is less than requested
                 self._check_missing_speakers()
 
-        tp.shutdown()
+            # keep file lists in session order regardless of the completion order of the jobs
+            for sess_idx in range(stt_idx, end_idx):
+                basepath, filename = results[sess_idx]
+                self.annotator.add_to_filename_lists(basepath=basepath, filename=filename)
+
+        if self.num_workers > 1:
+            tp.shutdown()
         self.annotator.write_filelist_files(basepath=basepath)
         logging.info(f"Data simulation has been completed, results saved at: {basepath}")
 
 
+# simulator held by each session generation worker process, see `MultiSpeakerSimulator.generate_sessions`
+_WORKER_SIMULATOR = None
+
+
+def _init_session_worker(simulator: MultiSpeakerSimulator):
+    """
+    Store the simulator in a worker process, so that it is not sent with every session.
+    """
+    global _WORKER_SIMULATOR
+    _WORKER_SIMULATOR = simulator
+
+
+def _generate_session_in_worker(args: tuple) -> Tuple[str, str]:
+    """
+    Generate a session with the simulator of the worker process.
+    """
+    return _WORKER_SIMULATOR._generate_session_from_queue(*args)
+
+
 class RIRMultiSpeakerSimulator(MultiSpeakerSimulator):
     """
     RIR Augmented Multispeaker Audio Session Simulator - simulates multispeaker audio sessions using single-speaker 
@@ -1287,6 +1400,9 @@ class RIRMultiSpeakerSimulator(MultiSpeakerSimulator):
     rir_generation:
       use_rir (bool): Whether to generate synthetic RIR
       toolkit (str): Which toolkit to use ("pyroomacoustics", "gpuRIR")
+      rir_bank_dir (str or null): If set, `num_rirs_in_bank` RIRs are generated once and saved in this directory,
+                                  and each session uses a RIR drawn from the bank instead of simulating the room
+      num_rirs_in_bank (int): Number of RIRs in the RIR bank
       room_config:
         room_sz (list): Size of the shoebox room environment (1d array for specific, 2d array for random range to be 
                         sampled from)
@@ -1311,6 +1427,7 @@ class RIRMultiSpeakerSimulator(MultiSpeakerSimulator):
     def __init__(self, cfg):
         super().__init__(cfg)
         self._check_args_rir()
+        self._rir_bank = None
 
     def _check_args_rir(self):
         """
@@ -1484,29 +1601,68 @@ class RIRMultiSpeakerSimulator(MultiSpeakerSimulator):
                     rir_pad = pos.shape[0] - 1
         return room.rir, rir_pad
 
-    def _convolve_rir(self, input, speaker_turn: int, RIR: torch.Tensor) -> Tuple[list, int]:
+    def _generate_rir(self) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Augment one sentence (or background noise segment) using a synthetic RIR.
+        Create simulated RIR with the configured toolkit, as a zero-padded array.
 
-        Args:
-            input (torch.tensor): Input audio.
-            speaker_turn (int): Current speaker turn.
-            RIR (torch.tensor): Room Impulse Response.
         Returns:
-            output_sound (list): List of tensors containing augmented audio
-            length (int): Length of output audio channels (or of the longest if they have different lengths)
-        """
-        output_sound = []
-        length = 0
-        for channel in range(self._params.data_simulator.rir_generation.mic_config.num_channels):
-            if self._params.data_simulator.rir_generation.toolkit == 'gpuRIR':
-                out_channel = convolve(input, RIR[speaker_turn, channel, : len(input)]).tolist()
-            elif self._params.data_simulator.rir_generation.toolkit == 'pyroomacoustics':
-                out_channel = convolve(input, RIR[channel][speaker_turn][: len(input)]).tolist()
-            if len(out_channel) > length:
-                length = len(out_channel)
-            output_sound.append(torch.tensor(out_channel))
-        return output_sound, length
+            RIR (np.ndarray): Generated RIR with shape (num_sources, num_channels, rir_len)
+            RIR_lengths (np.ndarray): Length of each RIR before zero-padding, with shape (num_sources, num_channels)
+        """
+        if self._params.data_simulator.rir_generation.toolkit == 'gpuRIR':
+            RIR, _ = self._generate_rir_gpuRIR()
+            RIR = np.asarray(RIR, dtype=np.float32)
+            RIR_lengths = np.full(RIR.shape[:2], RIR.shape[2], dtype=np.int64)
+        elif self._params.data_simulator.rir_generation.toolkit == 'pyroomacoustics':
+            room_rir, _ = self._generate_rir_pyroomacoustics()
+            # pyroomacoustics RIRs are indexed by channel and then by source
+            RIR_lengths = np.array(
+                [[len(channel[source]) for channel in room_rir] for source in range(len(room_rir[0]))]
+            )
+            RIR = np.zeros((*RIR_lengths.shape, RIR_lengths.max()), dtype=np.float32)
+            for channel, channel_rir in enumerate(room_rir):
+                for source, source_rir in enumerate(channel_rir):
+                    RIR[source, channel, : len(source_rir)] = source_rir
+        else:
+            raise Exception("Toolkit must be pyroomacoustics or gpuRIR")
+        return RIR, RIR_lengths
+
+    def _get_rir(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draw a RIR from the RIR bank, or simulate a new one if the bank is not used.
+
+        Returns:
+            RIR (np.ndarray): RIR with shape (num_sources, num_channels, rir_len)
+            RIR_lengths (np.ndarray): Length of each RIR before zero-padding, with shape (num_sources, num_channels)
+        """
+        if self._rir_bank is not None:
+            return self._rir_bank[np.random.randint(len(self._rir_bank))]
+        return self._generate_rir()
+
+    def generate_sessions(self, random_seed: int = None):
+        """
+        Generate several multispeaker audio sessions and corresponding list files, building the RIR bank first
+        if `rir_generation.rir_bank_dir` is set.
+
+        Args:
+            random_seed (int): random seed for reproducibility
+        """
+        rir_bank_dir = self._params.data_simulator.rir_generation.get("rir_bank_dir", None)
+        if rir_bank_dir is not None:
+            rir_config = OmegaConf.to_container(self._params.data_simulator.rir_generation, resolve=True)
+            rir_config.pop("use_rir", None)
+            rir_config.pop("rir_bank_dir", None)
+            rir_config.update(
+                sr=self._params.data_simulator.sr, add_bg=self._params.data_simulator.background_noise.add_bg
+            )
+            self._rir_bank = RIRBank.build(
+                generate_rir=self._generate_rir,
+                config=rir_config,
+                bank_dir=rir_bank_dir,
+                num_rirs=self._params.data_simulator.rir_generation.get("num_rirs_in_bank", 100),
+                random_seed=self._params.data_simulator.random_seed if random_seed is None else random_seed,
+            )
+        super().generate_sessions(random_seed=random_seed)
 
     def _generate_session(
         self,
@@ -1534,6 +1690,8 @@ class RIRMultiSpeakerSimulator(MultiSpeakerSimulator):
         """
         random_seed = self._params.data_simulator.random_seed
         np.random.seed(random_seed + idx)
+        random.seed(random_seed + idx)
+        torch.manual_seed(random_seed + idx)
 
         self._device = device
         speaker_dominance = self._get_speaker_dominance()  # randomly determine speaker dominance
@@ -1545,14 +1703,15 @@ class RIRMultiSpeakerSimulator(MultiSpeakerSimulator):
         self.annotator.init_annotation_lists()
         self._noise_samples = noise_samples
         self._furthest_sample = [0 for n in range(self._params.data_simulator.session_config.num_speakers)]
+        self._missing_silence = 0
+        self.sampler.get_session_silence_mean()
+        self.sampler.get_session_overlap_mean()
 
-        # Room Impulse Response Generation (performed once per batch of sessions)
-        if self._params.data_simulator.rir_generation.toolkit == 'gpuRIR':
-            RIR, RIR_pad = self._generate_rir_gpuRIR()
-        elif self._params.data_simulator.rir_generation.toolkit == 'pyroomacoustics':
-            RIR, RIR_pad = self._generate_rir_pyroomacoustics()
-        else:
-            raise Exception("Toolkit must be pyroomacoustics or gpuRIR")
+        # Room Impulse Response Generation (or drawn from the RIR bank)
+        RIR, RIR_lengths = self._get_rir()
+        RIR_pad = int(RIR_lengths.max()) - 1
+        # sentences are convolved together after the session is laid out
+        sentences, sentence_starts, sentence_speakers = [], [], []
 
         # hold enforce until all speakers have spoken
         enforce_time = np.random.uniform(
@@ -1592,7 +1751,9 @@ class RIRMultiSpeakerSimulator(MultiSpeakerSimulator):
 
             # Step 3: Generate a sentence
             self._build_sentence(speaker_turn, speaker_ids, speaker_wav_align_map, max_samples_in_sentence)
-            augmented_sentence, length = self._convolve_rir(self._sentence, speaker_turn, RIR)
+            # augmented sentence is longer by the length of the RIR (truncated to the sentence length) minus one
+            sentence_len = len(self._sentence)
+            length = sentence_len + int(np.minimum(sentence_len, RIR_lengths[speaker_turn]).max()) - 1
 
             # Step 4: Generate a time-stamp for either silence or overlap
             start = self._add_silence_or_overlap(
@@ -1610,71 +1771,79 @@ class RIRMultiSpeakerSimulator(MultiSpeakerSimulator):
                 array = torch.nn.functional.pad(array, (0, 0, 0, end - len(array)))
                 is_speech = torch.nn.functional.pad(is_speech, (0, end - len(is_speech)))
             is_speech[start:end] = 1
-
-            for channel in range(self._params.data_simulator.rir_generation.mic_config.num_channels):
-                len_ch = len(augmented_sentence[channel])  # accounts for how channels are slightly different lengths
-                array[start : start + len_ch, channel] += augmented_sentence[channel]
+            sentences.append(self._sentence)
+            sentence_starts.append(start)
+            sentence_speakers.append(speaker_turn)
 
             # Step 6: Build entries for output files
             new_rttm_entries = self.annotator.create_new_rttm_entry(
-                self._words,
-                self._alignments,
-                start / self._params.data_simulator.sr,
-                end / self._params.data_simulator.sr,
-                speaker_ids[speaker_turn],
+                words=self._words,
+                alignments=self._alignments,
+                start=start / self._params.data_simulator.sr,
+                end=end / self._params.data_simulator.sr,
+                speaker_id=speaker_ids[speaker_turn],
             )
 
-            self.annotator.annote_lists['rttm'].extend(new_rttm_entries)
-
             new_json_entry = self.annotator.create_new_json_entry(
-                self._text,
-                os.path.join(basepath, filename + '.wav'),
-                start / self._params.data_simulator.sr,
-                length / self._params.data_simulator.sr,
-                speaker_ids[speaker_turn],
-                os.path.join(basepath, filename + '.rttm'),
-                os.path.join(basepath, filename + '.ctm'),
+                text=self._text,
+                wav_filename=os.path.join(basepath, filename + '.wav'),
+                start=start / self._params.data_simulator.sr,
+                length=length / self._params.data_simulator.sr,
+                speaker_id=speaker_ids[speaker_turn],
+                rttm_filepath=os.path.join(basepath, filename + '.rttm'),
+                ctm_filepath=os.path.join(basepath, filename + '.ctm'),
             )
-            self.annotator.annote_lists['json'].append(new_json_entry)
-
             new_ctm_entries = self.annotator.create_new_ctm_entry(
-                filename, speaker_ids[speaker_turn], start / self._params.data_simulator.sr
+                words=self._words,
+                alignments=self._alignments,
+                session_name=filename,
+                speaker_id=speaker_ids[speaker_turn],
+                start=int(start / self._params.data_simulator.sr),
+            )
+
+            self.annotator.add_annotation_entries(
+                rttm_entries=new_rttm_entries, json_entry=new_json_entry, ctm_entries=new_ctm_entries
             )
-            self.annotator.annote_lists['ctm'].extend(new_ctm_entries)
 
             running_len_samples = np.maximum(running_len_samples, end)
+            (
+                self.sampler.running_speech_len_samples,
+                self.sampler.running_silence_len_samples,
+            ) = self._get_session_silence_from_rttm(
+                rttm_list=self.annotator.annote_lists['rttm'], running_len_samples=running_len_samples
+            )
+
             self._furthest_sample[speaker_turn] = running_len_samples
             prev_speaker = speaker_turn
             prev_len_samples = length
 
+        # Step 5-1: Convolve all sentences with the RIRs of their speakers and add them to array
+        overlap_add_convolve(array, sentences, sentence_starts, sentence_speakers, RIR, RIR_lengths)
+        del sentences
+
         # Step 7-1: Add optional perturbations to the whole session, such as white noise.
         if self._params.data_simulator.session_augmentor.add_sess_aug:
             # NOTE: This perturbation is not reflected in the session SNR in meta dictionary.
             array = perturb_audio(array, self._params.data_simulator.sr, self.session_augmentor)
 
-        # Step 7-2: Additive background noise from noise manifest files
+        # Step 7-2: Additive background noise from noise manifest files, convolved with the RIR of the noise source
+        snr = "N/A"
         if self._params.data_simulator.background_noise.add_bg:
-            if len(self._noise_samples) > 0:
-                avg_power_array = torch.mean(array[is_speech == 1] ** 2)
-                bg, snr = get_background_noise(
-                    len_array=len(array),
-                    power_array=avg_power_array,
-                    noise_samples=self._noise_samples,
-                    audio_read_buffer_dict=self._audio_read_buffer_dict,
-                    snr_min=self._params.data_simulator.background_noise.snr_min,
-                    snr_max=self._params.data_simulator.background_noise.snr_max,
-                    background_noise_snr=self._params.data_simulator.background_noise.snr,
-                    seed=(random_seed + idx),
-                    device=self._device,
-                )
-                array += bg
-            length = array.shape[0]
-            bg, snr = self._get_background(length, avg_power_array)
-            augmented_bg, _ = self._convolve_rir(bg, -1, RIR)
-            for channel in range(self._params.data_simulator.rir_generation.mic_config.num_channels):
-                array[:, channel] += augmented_bg[channel][:length]
-        else:
-            snr = "N/A"
+            if len(self._noise_samples) == 0:
+                raise ValueError('No background noise samples found in self._noise_samples.')
+            avg_power_array = torch.mean(array[is_speech == 1] ** 2)
+            bg, snr = get_background_noise(
+                len_array=len(array),
+                power_array=avg_power_array,
+                noise_samples=self._noise_samples,
+                audio_read_buffer_dict=self._audio_read_buffer_dict,
+                snr_min=self._params.data_simulator.background_noise.snr_min,
+                snr_max=self._params.data_simulator.background_noise.snr_max,
+                background_noise_snr=self._params.data_simulator.background_noise.snr,
+                seed=(random_seed + idx),
+                device=self._device,
+            )
+            overlap_add_convolve(array, [bg], [0], [len(RIR) - 1], RIR, RIR_lengths)
 
         # Step 7: Normalize and write to disk
         array = normalize_audio(array)
@@ -1684,7 +1853,9 @@ class RIRMultiSpeakerSimulator(MultiSpeakerSimulator):
         sf.write(os.path.join(basepath, filename + '.wav'), array, self._params.data_simulator.sr)
 
         self.annotator.write_annotation_files(
-            basepath=basepath, filename=filename, meta_data=self._get_session_meta_data(array=array, snr=snr),
+            basepath=basepath,
+            filename=filename,
+            meta_data=self._get_session_meta_data(num_samples=len(array), snr=snr),
         )
 
         del array
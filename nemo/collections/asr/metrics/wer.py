@@ -18,7 +18,6 @@ from dataclasses import dataclass, field, is_dataclass
 from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import editdistance
-import jiwer
 import numpy as np
 import torch
 from omegaconf import DictConfig, OmegaConf
@@ -26,6 +25,11 @@ from torchmetrics import Metric
 
 from nemo.collections.asr.parts.submodules import ctc_beam_decoding, ctc_greedy_decoding
 from nemo.collections.asr.parts.utils.asr_confidence_utils import ConfidenceConfig, ConfidenceMixin
+from nemo.collections.asr.parts.utils.edit_distance_utils import (
+    edit_operations_batch,
+    levenshtein_distance_batch,
+    split_texts,
+)
 from nemo.collections.asr.parts.utils.rnnt_utils import Hypothesis, NBestHypotheses
 from nemo.utils import logging, logging_mode
 
@@ -94,10 +98,6 @@ def word_error_rate_detail(
         del_rate (float): average deletion error rate
         sub_rate (float): average substitution error rate
     """
-    scores = 0
-    words = 0
-    ops_count = {'substitutions': 0, 'insertions': 0, 'deletions': 0}
-
     if len(hypotheses) != len(references):
         raise ValueError(
             "In word error rate calculation, hypotheses and reference"
@@ -105,34 +105,17 @@ def word_error_rate_detail(
             "{0} and {1} correspondingly".format(len(hypotheses), len(references))
         )
 
-    for h, r in zip(hypotheses, references):
-        if use_cer:
-            h_list = list(h)
-            r_list = list(r)
-        else:
-            h_list = h.split()
-            r_list = r.split()
-
-        # To get rid of the issue that jiwer does not allow empty string
-        if len(r_list) == 0:
-            if len(h_list) != 0:
-                errors = len(h_list)
-                ops_count['insertions'] += errors
-            else:
-                errors = 0
-        else:
-            if use_cer:
-                measures = jiwer.cer(r, h, return_dict=True)
-            else:
-                measures = jiwer.compute_measures(r, h)
-
-            errors = measures['insertions'] + measures['deletions'] + measures['substitutions']
-            ops_count['insertions'] += measures['insertions']
-            ops_count['deletions'] += measures['deletions']
-            ops_count['substitutions'] += measures['substitutions']
-
-        scores += errors
-        words += len(r_list)
+    h_lists = split_texts(hypotheses, use_cer=use_cer)
+    r_lists = split_texts(references, use_cer=use_cer)
+    # substitutions, insertions and deletions per utterance
+    ops = edit_operations_batch(h_lists, r_lists)
+    ops_count = {
+        'substitutions': int(ops[:, 0].sum()),
+        'insertions': int(ops[:, 1].sum()),
+        'deletions': int(ops[:, 2].sum()),
+    }
+    scores = sum(ops_count.values())
+    words = sum(len(r_list) for r_list in r_lists)
 
     if words != 0:
         wer = 1.0 * scores / words
@@ -161,10 +144,6 @@ def word_error_rate_per_utt(hypotheses: List[str], references: List[str], use_ce
         wer_per_utt (List[float]): word error rate per utterance
         avg_wer (float): average word error rate
     """
-    scores = 0
-    words = 0
-    wer_per_utt = []
-
     if len(hypotheses) != len(references):
         raise ValueError(
             "In word error rate calculation, hypotheses and reference"
@@ -172,32 +151,19 @@ def word_error_rate_per_utt(hypotheses: List[str], references: List[str], use_ce
             "{0} and {1} correspondingly".format(len(hypotheses), len(references))
         )
 
-    for h, r in zip(hypotheses, references):
-        if use_cer:
-            h_list = list(h)
-            r_list = list(r)
-        else:
-            h_list = h.split()
-            r_list = r.split()
-
-        # To get rid of the issue that jiwer does not allow empty string
-        if len(r_list) == 0:
-            if len(h_list) != 0:
-                errors = len(h_list)
-                wer_per_utt.append(float('inf'))
-        else:
-            if use_cer:
-                measures = jiwer.cer(r, h, return_dict=True)
-                er = measures['cer']
-            else:
-                measures = jiwer.compute_measures(r, h)
-                er = measures['wer']
-
-            errors = measures['insertions'] + measures['deletions'] + measures['substitutions']
-            wer_per_utt.append(er)
+    h_lists = split_texts(hypotheses, use_cer=use_cer)
+    r_lists = split_texts(references, use_cer=use_cer)
+    errors_per_utt = levenshtein_distance_batch(h_lists, r_lists)
 
-        scores += errors
-        words += len(r_list)
+    wer_per_utt = []
+    for h_list, r_list, errors in zip(h_lists, r_lists, errors_per_utt):
+        if len(r_list) != 0:
+            wer_per_utt.append(float(errors) / len(r_list))
+        elif len(h_list) != 0:
+            wer_per_utt.append(float('inf'))
+
+    scores = int(errors_per_utt.sum())
+    words = sum(len(r_list) for r_list in r_lists)
 
     if words != 0:
         avg_wer = 1.0 * scores / words
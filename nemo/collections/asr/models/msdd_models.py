@@ -52,6 +52,8 @@ from nemo.collections.asr.parts.utils.speaker_utils import (
     get_id_tup_dict,
     get_scale_mapping_argmat,
     get_uniq_id_list_from_manifest,
+    get_uniqname_from_filepath,
+    get_windowed_cluster_avg_embs,
     labels_to_pyannote_object,
     make_rttm_with_overlap,
     parse_scale_configs,
@@ -1002,6 +1004,7 @@ class NeuralDiarizer(LightningModule):
         self.overlap_infer_spk_limit = cfg.diarizer.msdd_model.parameters.get(
             'overlap_infer_spk_limit', self.clustering_max_spks
         )
+        self._clus_label_tensors = {}
 
     def transfer_diar_params_to_model_params(self, msdd_model, cfg):
         """
@@ -1259,8 +1262,10 @@ class NeuralDiarizer(LightningModule):
         self, test_batch: List[torch.Tensor], _test_data_collection: List[Any], device: torch.device('cpu')
     ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
         """
-        This function is only used when `get_range_average` function is called. This module calculates cluster-average embeddings for
+        This function is only used when `split_infer=True`. This module calculates cluster-average embeddings for
         the given short range. The range length is set by `self.diar_window_length`, and each cluster-average is only calculated for the specified range.
+        All windows of all speaker pairs in the batch are processed at once (see `get_windowed_cluster_avg_embs`), with the same
+        result as calling `get_range_average` for each window.
 
         Args:
             test_batch: (list)
@@ -1280,22 +1285,43 @@ class NeuralDiarizer(LightningModule):
                 Shape: (batch_size)
         """
         _signals, signal_lengths, _targets, _emb_vectors = test_batch
-        sess_emb_vectors, sess_emb_seq, sess_sig_lengths = [], [], []
         split_count = torch.ceil(torch.tensor(_signals.shape[1] / self.diar_window_length)).int()
         self.max_pred_length = max(self.max_pred_length, self.diar_window_length * split_count)
-        for k in range(_signals.shape[0]):
-            signals, emb_vectors, test_data_collection = _signals[k], _emb_vectors[k], _test_data_collection[k]
-            for diar_window_index in range(split_count):
-                emb_vectors_split, emb_seq, seq_len = self.get_range_average(
-                    signals, emb_vectors, diar_window_index, test_data_collection
-                )
-                sess_emb_vectors.append(emb_vectors_split)
-                sess_emb_seq.append(emb_seq)
-                sess_sig_lengths.append(seq_len)
-        sess_emb_vectors = torch.stack(sess_emb_vectors).to(device)
-        sess_emb_seq = torch.stack(sess_emb_seq).to(device)
-        sess_sig_lengths = torch.tensor(sess_sig_lengths).to(device)
-        return sess_emb_vectors, sess_emb_seq, sess_sig_lengths
+        clus_labels = torch.full(_signals.shape[:2], -1, dtype=torch.long)
+        clus_lengths = torch.zeros(_signals.shape[0], dtype=torch.long)
+        for k, sample in enumerate(_test_data_collection):
+            uniq_id = os.path.splitext(os.path.basename(sample.audio_file))[0]
+            clus_label_tensor = self.get_clus_label_tensor(uniq_id)[: _signals.shape[1]]
+            clus_labels[k, : clus_label_tensor.shape[0]] = clus_label_tensor
+            clus_lengths[k] = clus_label_tensor.shape[0]
+        target_spks = torch.tensor([sample.target_spks for sample in _test_data_collection])
+        sess_emb_vectors, sess_emb_seq, sess_sig_lengths = get_windowed_cluster_avg_embs(
+            emb_seq=_signals,
+            clus_labels=clus_labels.to(_signals.device),
+            clus_lengths=clus_lengths.to(_signals.device),
+            target_spks=target_spks.to(_signals.device),
+            window_length=self.diar_window_length,
+        )
+        return sess_emb_vectors.to(device), sess_emb_seq.to(device), sess_sig_lengths.to(device)
+
+    def get_clus_label_tensor(self, uniq_id: str) -> torch.Tensor:
+        """
+        Get the base-scale clustering labels of a session as a tensor. The tensor is created once for all speaker pairs
+        of the session.
+
+        Args:
+            uniq_id (str):
+                Unique session ID.
+
+        Returns:
+            clus_label_tensor (Tensor):
+                Tensor containing integer clustering labels of the base-scale segments.
+        """
+        if uniq_id not in self._clus_label_tensors:
+            self._clus_label_tensors[uniq_id] = torch.tensor(
+                [x[-1] for x in self.msdd_model.clus_test_label_dict[uniq_id]]
+            )
+        return self._clus_label_tensors[uniq_id]
 
     def diar_infer(
         self, test_batch: List[torch.Tensor], test_data_collection: List[Any]
@@ -1363,10 +1389,15 @@ class NeuralDiarizer(LightningModule):
         self.out_rttm_dir = self.clustering_embedding.out_rttm_dir
         self.msdd_model.setup_test_data(self.msdd_model.cfg.test_ds)
         self.msdd_model.eval()
+        self._clus_label_tensors = {}
         cumul_sample_count = [0]
-        preds_list, targets_list, signal_lengths_list = [], [], []
+        targets_list, signal_lengths_list = [], []
         uniq_id_list = get_uniq_id_list_from_manifest(self.msdd_model.cfg.test_ds.manifest_filepath)
         test_data_collection = [d for d in self.msdd_model.data_collection]
+        sess_offsets, sess_num_spks, pair_sess_inds, pair_spk_inds = self.get_pairwise_pred_index(
+            uniq_id_list, test_data_collection
+        )
+        sum_preds = torch.zeros(sess_offsets[-1], max(sess_num_spks))
         for sidx, test_batch in enumerate(tqdm(self.msdd_model.test_dataloader())):
             signals, signal_lengths, _targets, emb_vectors = test_batch
             cumul_sample_count.append(cumul_sample_count[-1] + signal_lengths.shape[0])
@@ -1376,16 +1407,100 @@ class NeuralDiarizer(LightningModule):
             if self._cfg.diarizer.msdd_model.parameters.seq_eval_mode:
                 self.msdd_model._accuracy_test(preds, targets, signal_lengths)
 
-            preds_list.extend(list(torch.split(preds, 1)))
+            self.add_pairwise_preds(
+                sum_preds,
+                preds,
+                sess_offsets,
+                pair_sess_inds[cumul_sample_count[-2] : cumul_sample_count[-1]],
+                pair_spk_inds[cumul_sample_count[-2] : cumul_sample_count[-1]],
+            )
             targets_list.extend(list(torch.split(targets, 1)))
             signal_lengths_list.extend(list(torch.split(signal_lengths, 1)))
 
         if self._cfg.diarizer.msdd_model.parameters.seq_eval_mode:
             f1_score, simple_acc = self.msdd_model.compute_accuracies()
             logging.info(f"Test Inference F1 score. {f1_score:.4f}, simple Acc. {simple_acc:.4f}")
-        integrated_preds_list = self.get_integrated_preds_list(uniq_id_list, test_data_collection, preds_list)
+        # Each speaker appears in (n_est_spks - 1) speaker pairs
+        integrated_preds_list = [
+            (sum_preds[sess_offsets[k] : sess_offsets[k + 1], :n_est_spks] / (n_est_spks - 1)).unsqueeze(0)
+            for k, n_est_spks in enumerate(sess_num_spks)
+        ]
         return integrated_preds_list, targets_list, signal_lengths_list
 
+    def get_pairwise_pred_index(
+        self, uniq_id_list: List[str], test_data_collection: List[Any]
+    ) -> Tuple[List[int], List[int], torch.Tensor, torch.Tensor]:
+        """
+        Locate the pairwise, two-speaker, predictions of each sample in a session-level prediction matrix that has dimension of
+        `(session_len, n_est_spks)`, so that the predictions of all samples are summed into one preallocated tensor. The sessions
+        are stacked along the time axis in the order of `uniq_id_list`. This gives the same result as `get_integrated_preds_list`.
+
+        Args:
+            uniq_id_list (list):
+                List containing `uniq_id` values.
+            test_data_collection (list):
+                List containing test-set dataloader contents, i.e., the session and the targeted speaker indices of each sample.
+
+        Returns:
+            sess_offsets (list):
+                Start of each session in the stacked prediction matrix, followed by the total length.
+            sess_num_spks (list):
+                Estimated number of speakers of each session.
+            pair_sess_inds (Tensor):
+                Session index of each sample.
+            pair_spk_inds (Tensor):
+                Speaker (column) indices of the two targeted speakers of each sample.
+        """
+        sess_index = {uniq_id: k for k, uniq_id in enumerate(uniq_id_list)}
+        sess_spks = [set() for _ in uniq_id_list]
+        pair_sess_inds = []
+        for sample in test_data_collection:
+            pair_sess_inds.append(sess_index[get_uniqname_from_filepath(sample.audio_file)])
+            sess_spks[pair_sess_inds[-1]].update(sample.target_spks)
+        digit_maps = [dict(zip(sorted(spks), range(len(spks)))) for spks in sess_spks]
+        pair_spk_inds = [
+            [digit_maps[sess_idx][x] for x in sample.target_spks]
+            for sess_idx, sample in zip(pair_sess_inds, test_data_collection)
+        ]
+        sess_offsets = [0]
+        for uniq_id in uniq_id_list:
+            sess_offsets.append(sess_offsets[-1] + len(self.msdd_model.clus_test_label_dict[uniq_id]))
+        sess_num_spks = [len(spks) for spks in sess_spks]
+        return sess_offsets, sess_num_spks, torch.tensor(pair_sess_inds), torch.tensor(pair_spk_inds)
+
+    @staticmethod
+    def add_pairwise_preds(
+        sum_preds: torch.Tensor,
+        preds: torch.Tensor,
+        sess_offsets: List[int],
+        pair_sess_inds: torch.Tensor,
+        pair_spk_inds: torch.Tensor,
+    ):
+        """
+        Add a batch of pairwise predictions to the stacked session-level prediction matrix in place.
+
+        Args:
+            sum_preds (Tensor):
+                Stacked session-level prediction matrix.
+                Shape: (total_len, max_n_est_spks)
+            preds (Tensor):
+                Zero-padded pairwise predictions of the batch.
+                Shape: (batch_size, length, 2)
+            sess_offsets (list):
+                Start of each session in `sum_preds`, followed by the total length.
+            pair_sess_inds (Tensor):
+                Session index of each sample in the batch.
+            pair_spk_inds (Tensor):
+                Speaker (column) indices of the two targeted speakers of each sample in the batch.
+        """
+        sess_offsets = torch.tensor(sess_offsets)
+        steps = torch.arange(preds.shape[1])
+        sess_lengths = sess_offsets[pair_sess_inds + 1] - sess_offsets[pair_sess_inds]
+        valid = steps.unsqueeze(0) < sess_lengths.unsqueeze(1)
+        rows = sess_offsets[pair_sess_inds].unsqueeze(1) + steps.unsqueeze(0)
+        flat_inds = rows.unsqueeze(2) * sum_preds.shape[1] + pair_spk_inds.unsqueeze(1)
+        sum_preds.view(-1).index_add_(0, flat_inds[valid].flatten(), preds.cpu().float()[valid].flatten())
+
     def run_overlap_aware_eval(
         self, preds_list: List[torch.Tensor], threshold: float
     ) -> List[Optional[Tuple[DiarizationErrorRate, Dict]]]:
@@ -12,21 +12,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
 import copy
+import hashlib
+import json
 import os
 import shutil
 from collections import defaultdict
-from typing import IO, Dict, List, Optional, Tuple
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
+import soundfile as sf
 import torch
+from scipy.signal import convolve
 from scipy.stats import beta, gamma
 from tqdm import tqdm
 
 from nemo.collections.asr.parts.preprocessing.perturb import AudioAugmentor
 from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
 from nemo.collections.asr.parts.utils.manifest_utils import read_manifest, write_ctm, write_manifest, write_text
-from nemo.collections.asr.parts.utils.speaker_utils import labels_to_rttmfile
+from nemo.collections.asr.parts.utils.speaker_utils import label_to_rttm_line, labels_to_rttmfile
 from nemo.utils import logging
 
 
@@ -143,6 +148,7 @@ def read_audio_from_buffer(
     max_audio_read_sec: float = 2.5,
     min_alignment_count: int = 2,
     read_subset: bool = True,
+    audio_cache: Optional['SourceAudioCache'] = None,
 ) -> Tuple[torch.Tensor, int, dict]:
     """
     Read from the provided file path while maintaining a hash-table that saves loading time.
@@ -160,6 +166,8 @@ def read_audio_from_buffer(
                             To control the length of the audio file, use data_simulator.session_params.max_audio_read_sec.
                             Note that using large value (greater than 3~4 sec) for `max_audio_read_sec` will slow down the generation process.
                             If False, read the entire audio file.
+        audio_cache (SourceAudioCache): Shared cache of decoded source audio files. Files found in the cache are
+                                        read from it instead of being decoded.
 
     Returns:
         audio_file (torch.Tensor): Time-series audio data in a tensor.
@@ -177,16 +185,20 @@ def read_audio_from_buffer(
                 max_audio_read_sec=max_audio_read_sec,
                 min_alignment_count=min_alignment_count,
             )
+            offset, duration = audio_manifest['offset'], audio_manifest['duration']
+        else:
+            offset, duration = 0, 0
+        if audio_cache is not None and audio_manifest['audio_filepath'] in audio_cache:
+            samples, sr = audio_cache.read(audio_manifest['audio_filepath'], offset=offset, duration=duration)
+        else:
             segment = AudioSegment.from_file(
-                audio_file=audio_manifest['audio_filepath'],
-                offset=audio_manifest['offset'],
-                duration=audio_manifest['duration'],
+                audio_file=audio_manifest['audio_filepath'], offset=offset, duration=duration
             )
-        else:
-            segment = AudioSegment.from_file(audio_file=audio_manifest['audio_filepath'])
-        audio_file, sr = torch.from_numpy(segment.samples).to(device), segment.sample_rate
-        if read_subset and segment.duration < (audio_manifest['alignments'][-1] - audio_manifest['alignments'][0]):
-            audio_manifest['alignments'][-1] = min(segment.duration, audio_manifest['alignments'][-1])
+            samples, sr = segment.samples, segment.sample_rate
+        audio_file = torch.from_numpy(samples).to(device)
+        segment_duration = samples.shape[0] / sr
+        if read_subset and segment_duration < (audio_manifest['alignments'][-1] - audio_manifest['alignments'][0]):
+            audio_manifest['alignments'][-1] = min(segment_duration, audio_manifest['alignments'][-1])
         if audio_file.ndim > 1:
             audio_file = torch.mean(audio_file, 1, False).to(device)
         buffer_dict[audio_file_id] = (audio_file, sr, audio_manifest)
@@ -302,7 +314,7 @@ def get_desired_avg_power_noise(
     return desired_avg_power_noise, desired_snr
 
 
-def get_background_noise(
+def get_background_noise_segments(
     len_array: int,
     power_array: float,
     noise_samples: list,
@@ -312,9 +324,10 @@ def get_background_noise(
     background_noise_snr: float,
     seed: int,
     device: torch.device,
-):
+) -> Tuple[Iterator[Tuple[int, int, torch.Tensor]], float]:
     """
-    Augment with background noise (inserting ambient background noise up to the desired SNR for the full clip).
+    Get background noise as consecutive segments covering `len_array` samples, so that long sessions can be
+    augmented chunk by chunk. Noise files are read lazily while iterating over the segments.
 
     Args:
         len_array (int): Length of background noise required.
@@ -326,42 +339,87 @@ def get_background_noise(
         background_noise_snr (float): SNR of the background noise.
         seed (int): Seed for random number generator.
         device (torch.device): Device to use.
-    
+
     Returns:
-        bg_array (tensor): Tensor containing background noise.
+        segments (iterator): Iterator over (start, end, scaled noise signal) tuples.
         desired_snr (float): Desired SNR for adding background noise.
     """
     np.random.seed(seed)
-    bg_array = torch.zeros(len_array).to(device)
     desired_avg_power_noise, desired_snr = get_desired_avg_power_noise(
         power_array=power_array, snr_min=snr_min, snr_max=snr_max, background_noise_snr=background_noise_snr
     )
-    running_len_samples = 0
-
-    while running_len_samples < len_array:  # build background audio stream (the same length as the full file)
-        file_id = np.random.randint(len(noise_samples))
-        audio_file, sr, audio_manifest = read_audio_from_buffer(
-            audio_manifest=noise_samples[file_id],
-            buffer_dict=audio_read_buffer_dict,
-            offset_index=0,
-            device=device,
-            read_subset=False,
-        )
-        if running_len_samples + len(audio_file) < len_array:
-            end_audio_file = running_len_samples + len(audio_file)
-        else:
-            end_audio_file = len_array
-        scaled_audio_file = get_scaled_audio_signal(
-            audio_file=audio_file,
-            end_audio_file=end_audio_file,
-            running_len_samples=running_len_samples,
-            desired_avg_power_noise=desired_avg_power_noise,
-            device=device,
-        )
 
-        bg_array[running_len_samples:end_audio_file] = scaled_audio_file
-        running_len_samples = end_audio_file
+    def _segments():
+        running_len_samples = 0
+        while running_len_samples < len_array:  # build background audio stream (the same length as the full file)
+            file_id = np.random.randint(len(noise_samples))
+            audio_file, sr, audio_manifest = read_audio_from_buffer(
+                audio_manifest=noise_samples[file_id],
+                buffer_dict=audio_read_buffer_dict,
+                offset_index=0,
+                device=device,
+                read_subset=False,
+            )
+            if running_len_samples + len(audio_file) < len_array:
+                end_audio_file = running_len_samples + len(audio_file)
+            else:
+                end_audio_file = len_array
+            scaled_audio_file = get_scaled_audio_signal(
+                audio_file=audio_file,
+                end_audio_file=end_audio_file,
+                running_len_samples=running_len_samples,
+                desired_avg_power_noise=desired_avg_power_noise,
+                device=device,
+            )
+            yield running_len_samples, end_audio_file, scaled_audio_file
+            running_len_samples = end_audio_file
+
+    return _segments(), desired_snr
 
+
+def get_background_noise(
+    len_array: int,
+    power_array: float,
+    noise_samples: list,
+    audio_read_buffer_dict: dict,
+    snr_min: float,
+    snr_max: float,
+    background_noise_snr: float,
+    seed: int,
+    device: torch.device,
+):
+    """
+    Augment with background noise (inserting ambient background noise up to the desired SNR for the full clip).
+
+    Args:
+        len_array (int): Length of background noise required.
+        power_array (float): Power of the audio signal.
+        noise_samples (list): List of noise samples.
+        audio_read_buffer_dict (dict): Dictionary containing audio read buffer.
+        snr_min (float): Minimum SNR.
+        snr_max (float): Maximum SNR.
+        background_noise_snr (float): SNR of the background noise.
+        seed (int): Seed for random number generator.
+        device (torch.device): Device to use.
+    
+    Returns:
+        bg_array (tensor): Tensor containing background noise.
+        desired_snr (float): Desired SNR for adding background noise.
+    """
+    segments, desired_snr = get_background_noise_segments(
+        len_array=len_array,
+        power_array=power_array,
+        noise_samples=noise_samples,
+        audio_read_buffer_dict=audio_read_buffer_dict,
+        snr_min=snr_min,
+        snr_max=snr_max,
+        background_noise_snr=background_noise_snr,
+        seed=seed,
+        device=device,
+    )
+    bg_array = torch.zeros(len_array).to(device)
+    for start, end, scaled_audio_file in segments:
+        bg_array[start:end] = scaled_audio_file
     return bg_array, desired_snr
 
 
@@ -802,20 +860,57 @@ class DataAnnotator(object):
                 list_file.write("\n".join(self.annote_lists[f"{file_type}_list"]))
             list_file.close()
 
+    def open_annotation_files(self, basepath: str, filename: str):
+        """
+        Open RTTM and JSON files of the current session. Entries added with `add_annotation_entries` are
+        then written to disk right away instead of being kept until the end of the session.
+
+        Args:
+            basepath (str): Basepath for output files.
+            filename (str): Base filename for all output files.
+        """
+        rttm_filepath = os.path.join(self._params.data_simulator.outputs.output_dir, filename + '.rttm')
+        self._files['rttm'] = open(rttm_filepath, 'w')
+        self._files['json'] = open(os.path.join(basepath, filename + '.json'), 'w', encoding='utf-8')
+        self._uniq_id = filename
+
+    def add_annotation_entries(self, rttm_entries: List[str], json_entry: dict, ctm_entries: List[tuple]):
+        """
+        Add the annotations of a new sentence. RTTM entries are always kept in `annote_lists`
+        since they are used for the silence statistics of the session.
+
+        Args:
+            rttm_entries (list): List of RTTM entries.
+            json_entry (dict): JSON entry dictionary.
+            ctm_entries (list): List of CTM entries.
+        """
+        self.annote_lists['rttm'].extend(rttm_entries)
+        self.annote_lists['ctm'].extend(ctm_entries)
+        if self._files:
+            for rttm_entry in rttm_entries:
+                self._files['rttm'].write(label_to_rttm_line(rttm_entry, self._uniq_id))
+            json.dump(json_entry, self._files['json'])
+            self._files['json'].write('\n')
+        else:
+            self.annote_lists['json'].append(json_entry)
+
     def write_annotation_files(self, basepath: str, filename: str, meta_data: dict):
         """
         Write all annotation files: RTTM, JSON, CTM, TXT, and META.
+        RTTM and JSON files opened with `open_annotation_files` are closed instead.
 
         Args:
             basepath (str): Basepath for output files.
             filename (str): Base filename for all output files.
             meta_data (dict): Metadata for the current session.
-            rttm_list (list): List of RTTM entries.
-            json_list (list): List of JSON entries.
-            ctm_list (list): List of CTM entries.
         """
-        labels_to_rttmfile(self.annote_lists['rttm'], filename, self._params.data_simulator.outputs.output_dir)
-        write_manifest(os.path.join(basepath, filename + '.json'), self.annote_lists['json'])
+        if self._files:
+            for annotation_file in self._files.values():
+                annotation_file.close()
+            self._files = {}
+        else:
+            labels_to_rttmfile(self.annote_lists['rttm'], filename, self._params.data_simulator.outputs.output_dir)
+            write_manifest(os.path.join(basepath, filename + '.json'), self.annote_lists['json'])
         write_ctm(os.path.join(basepath, filename + '.ctm'), self.annote_lists['ctm'])
         write_text(os.path.join(basepath, filename + '.txt'), self.annote_lists['ctm'])
         write_manifest(os.path.join(basepath, filename + '.meta'), [meta_data])
@@ -1125,3 +1220,457 @@ class SpeechSampler(object):
             for k in selected_noise_ids:
                 sampled_noise_manifest.append(noise_manifest[k])
         return sampled_noise_manifest
+
+
+class SessionAudioWriter(object):
+    """
+    Buffer for the time-series signal of a simulated session that writes finished parts of the session to disk.
+
+    Sentences are added at non-decreasing positions of the session. Once the caller reports a position before which
+    no new sentence can start anymore (see `flush`), the samples before it are appended to a temporary float32 file
+    whenever at least `chunk_samples` of them are pending, so that only the last part of the session is kept in
+    memory. The peak amplitude and the speech power needed for normalization and background noise are accumulated
+    while writing, and `write_wav` writes the normalized session to the wav file chunk by chunk.
+    If `chunk_samples` is None, the whole session is kept in memory and can be retrieved with `get_session`.
+
+    Args:
+        filepath (str): Path to the output wav file.
+        sr (int): Sampling rate of the session.
+        min_length (int): Minimum length of the session (in terms of number of samples).
+        chunk_samples (int): Minimum number of samples written to disk at once, None to keep the session in memory.
+        device (torch.device): Device of the session buffer.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        sr: int,
+        min_length: int,
+        chunk_samples: Optional[int] = None,
+        device: Optional[torch.device] = None,
+    ):
+        self.filepath = filepath
+        self.sr = sr
+        self.chunk_samples = chunk_samples
+        self.device = device if device is not None else torch.device('cpu')
+        # session length so far and the number of samples already written to the temporary file
+        self.length = min_length
+        self.written_samples = 0
+        capacity = min_length if chunk_samples is None else min(min_length, 2 * chunk_samples)
+        self._array = torch.zeros(capacity, device=self.device)
+        self._is_speech = torch.zeros(capacity, device=self.device)
+        self._tmp_filepath = f"{os.path.splitext(filepath)[0]}.tmp.f32"
+        self._tmp_file = None
+        self._peak = 0.0
+        self._speech_power_sum = 0.0
+        self._speech_sample_count = 0
+
+    def _reserve(self, num_samples: int):
+        """
+        Extend the buffer to hold at least `num_samples` samples.
+        """
+        if num_samples > len(self._array):
+            num_samples = max(num_samples, 2 * len(self._array)) if self.chunk_samples is not None else num_samples
+            self._array = torch.nn.functional.pad(self._array, (0, num_samples - len(self._array)))
+            self._is_speech = torch.nn.functional.pad(self._is_speech, (0, num_samples - len(self._is_speech)))
+
+    def add(self, start: int, signal: torch.Tensor) -> int:
+        """
+        Add a sentence to the session.
+
+        Args:
+            start (int): Starting position of the sentence in the session.
+            signal (torch.Tensor): Time-series signal of the sentence.
+
+        Returns:
+            end (int): End position of the sentence in the session.
+        """
+        if start < self.written_samples:
+            raise ValueError(
+                f"Cannot add a sentence at sample {start}, the first {self.written_samples} samples are already written."
+            )
+        end = start + len(signal)
+        self._reserve(end - self.written_samples)
+        self._array[start - self.written_samples : end - self.written_samples] += signal
+        self._is_speech[start - self.written_samples : end - self.written_samples] = 1
+        self.length = max(self.length, end)
+        return end
+
+    def flush(self, position: int):
+        """
+        Write the samples before `position` to disk if at least `chunk_samples` of them are pending.
+        New sentences must not be added before `position` afterwards.
+
+        Args:
+            position (int): Position in the session before which no new sentence will be added.
+        """
+        num_samples = min(position, self.length) - self.written_samples
+        if self.chunk_samples is not None and num_samples >= self.chunk_samples:
+            self._write(num_samples)
+
+    def _write(self, num_samples: int):
+        """
+        Append the first `num_samples` samples of the buffer to the temporary file.
+        """
+        self._reserve(num_samples)
+        samples = self._array[:num_samples].cpu().numpy().astype(np.float32)
+        speech = samples[self._is_speech[:num_samples].cpu().numpy() == 1]
+        if num_samples > 0:
+            self._peak = max(self._peak, float(np.abs(samples).max()))
+        self._speech_power_sum += float(np.sum(speech.astype(np.float64) ** 2))
+        self._speech_sample_count += len(speech)
+        if self._tmp_file is None:
+            self._tmp_file = open(self._tmp_filepath, 'wb')
+        samples.tofile(self._tmp_file)
+        self._array = self._array[num_samples:].clone()
+        self._is_speech = self._is_speech[num_samples:].clone()
+        self.written_samples += num_samples
+
+    @property
+    def is_written(self) -> bool:
+        """
+        Whether a part of the session has been written to disk.
+        """
+        return self.written_samples > 0
+
+    def get_session(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Get the whole session kept in memory.
+
+        Returns:
+            array (torch.Tensor): Session array
+            is_speech (torch.Tensor): Session array containing speech/non-speech labels
+        """
+        if self.is_written:
+            raise RuntimeError("The session has been partly written to disk, use `write_wav` instead.")
+        self._reserve(self.length)
+        return self._array[: self.length], self._is_speech[: self.length]
+
+    def finish(self) -> torch.Tensor:
+        """
+        Write the rest of the session to the temporary file.
+
+        Returns:
+            (torch.Tensor): Average power of the speech samples of the session.
+        """
+        self._write(self.length - self.written_samples)
+        self._tmp_file.close()
+        return torch.tensor(self._speech_power_sum / max(self._speech_sample_count, 1), dtype=torch.float32)
+
+    def write_wav(self, noise_segments: Optional[Iterator[Tuple[int, int, torch.Tensor]]] = None):
+        """
+        Add background noise to the session written with `finish`, and write the peak-normalized session
+        to the wav file.
+
+        Args:
+            noise_segments (iterator): Iterator over (start, end, noise signal) tuples covering the session.
+        """
+        samples = np.memmap(self._tmp_filepath, dtype=np.float32, mode='r+', shape=(self.length,))
+        if noise_segments is not None:
+            self._peak = 0.0
+            for start, end, noise in noise_segments:
+                samples[start:end] += noise.cpu().numpy().astype(np.float32)
+                self._peak = max(self._peak, float(np.abs(samples[start:end]).max()))
+        with sf.SoundFile(self.filepath, 'w', samplerate=self.sr, channels=1) as wav_file:
+            for start in range(0, self.length, self.chunk_samples):
+                wav_file.write(samples[start : start + self.chunk_samples] / np.float32(self._peak))
+        del samples
+        os.remove(self._tmp_filepath)
+
+
+def _decode_source_audio(args: Tuple[str, List[str], List[Tuple[int, int]]]) -> int:
+    """
+    Decode source audio files into their (start, length) positions in the memory-mapped array of `SourceAudioCache`.
+    """
+    samples_filepath, audio_filepaths, positions = args
+    samples = np.load(samples_filepath, mmap_mode='r+')
+    for audio_filepath, (start, length) in zip(audio_filepaths, positions):
+        segment = AudioSegment.from_file(audio_file=audio_filepath)
+        audio = segment.samples if segment.samples.ndim == 1 else np.mean(segment.samples, axis=1)
+        samples[start : start + min(len(audio), length)] = audio[:length]
+    samples.flush()
+    return len(audio_filepaths)
+
+
+class SourceAudioCache(object):
+    """
+    Read-only cache of decoded source audio files shared by session generation processes.
+
+    All source files are decoded once into a single memory-mapped float32 array (multi-channel files are averaged
+    to mono, as done when reading them for the simulation), and an index with the position of each file is saved
+    in `cache_dir`. Processes open the array in read-only mode, so that the decoded audio is held once in
+    the page cache of the OS and reads of random segments don't decode compressed files again and again.
+    A cache left by a previous run is reused if it contains all the requested files.
+
+    Args:
+        cache_dir (str): Directory with `samples.npy` and `index.json` files of the cache.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, 'index.json'), 'r') as index_file:
+            self._index = json.load(index_file)
+        self._samples = None
+
+    def __getstate__(self):
+        # memory map is opened again in each process
+        state = self.__dict__.copy()
+        state['_samples'] = None
+        return state
+
+    def __contains__(self, audio_filepath: str) -> bool:
+        return self._index.get(audio_filepath) is not None
+
+    def read(self, audio_filepath: str, offset: float = 0, duration: float = 0) -> Tuple[np.ndarray, int]:
+        """
+        Read a segment of a cached audio file the same way as `AudioSegment.from_file`.
+
+        Args:
+            audio_filepath (str): Path to the source audio file.
+            offset (float): Offset in seconds.
+            duration (float): Duration in seconds, 0 to read until the end of the file.
+
+        Returns:
+            samples (np.ndarray): Time-series audio data.
+            sr (int): Sample rate of the audio file.
+        """
+        if self._samples is None:
+            self._samples = np.load(os.path.join(self.cache_dir, 'samples.npy'), mmap_mode='r')
+        start, length, sr = self._index[audio_filepath]
+        offset_samples = min(int(offset * sr), length) if offset > 0 else 0
+        num_samples = length - offset_samples
+        if duration > 0:
+            num_samples = min(int(duration * sr), num_samples)
+        return np.array(self._samples[start + offset_samples : start + offset_samples + num_samples]), sr
+
+    @classmethod
+    def build(cls, audio_filepaths: List[str], cache_dir: str, num_workers: int = 1) -> 'SourceAudioCache':
+        """
+        Decode the source audio files into a new cache, or reuse the cache in `cache_dir` if it contains all files.
+
+        Args:
+            audio_filepaths (list): List of paths to the source audio files.
+            cache_dir (str): Directory to save the cache to.
+            num_workers (int): Number of processes decoding the files.
+
+        Returns:
+            (SourceAudioCache): Cache with all the source audio files.
+        """
+        audio_filepaths = list(dict.fromkeys(audio_filepaths))
+        if os.path.exists(os.path.join(cache_dir, 'index.json')):
+            cache = cls(cache_dir)
+            if all(audio_filepath in cache._index for audio_filepath in audio_filepaths):
+                logging.info(f"Using source audio cache at {cache_dir}")
+                return cache
+            os.remove(os.path.join(cache_dir, 'index.json'))
+        os.makedirs(cache_dir, exist_ok=True)
+
+        index, total_samples = {}, 0
+        for audio_filepath in tqdm(audio_filepaths, desc="Reading source audio info", unit="files"):
+            try:
+                info = sf.info(audio_filepath)
+            except RuntimeError:
+                # formats not supported by soundfile are decoded on every read
+                index[audio_filepath] = None
+                continue
+            index[audio_filepath] = (total_samples, info.frames, info.samplerate)
+            total_samples += info.frames
+        samples_filepath = os.path.join(cache_dir, 'samples.npy')
+        np.lib.format.open_memmap(samples_filepath, mode='w+', dtype=np.float32, shape=(total_samples,)).flush()
+
+        cached_filepaths = [audio_filepath for audio_filepath, position in index.items() if position is not None]
+        shard_size = max(1, int(np.ceil(len(cached_filepaths) / (4 * max(num_workers, 1)))))
+        shards = []
+        for shard_start in range(0, len(cached_filepaths), shard_size):
+            shard_filepaths = cached_filepaths[shard_start : shard_start + shard_size]
+            shard_positions = [index[audio_filepath][:2] for audio_filepath in shard_filepaths]
+            shards.append((samples_filepath, shard_filepaths, shard_positions))
+        with tqdm(total=len(cached_filepaths), desc="Caching source audio", unit="files") as pbar:
+            if num_workers > 1:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+                    for num_files in executor.map(_decode_source_audio, shards):
+                        pbar.update(num_files)
+            else:
+                for shard in shards:
+                    pbar.update(_decode_source_audio(shard))
+
+        # the index is written last, so that an interrupted build is not reused
+        with open(os.path.join(cache_dir, 'index.json'), 'w') as index_file:
+            json.dump(index, index_file)
+        return cls(cache_dir)
+
+
+def overlap_add_convolve(
+    output: torch.Tensor,
+    signals: List[torch.Tensor],
+    starts: List[int],
+    sources: List[int],
+    rirs: np.ndarray,
+    rir_lengths: np.ndarray,
+    max_blocks: int = 256,
+) -> torch.Tensor:
+    """
+    Convolve a batch of single-channel signals with the multi-channel RIRs of their sources and add the results to
+    `output` at the start of each signal.
+
+    The signals are split into blocks which are convolved in the frequency domain together, and the blocks are
+    overlap-added directly into `output`, so the spectrum of each RIR is computed only once per batch.
+    As in the direct convolution `convolve(signal, rir[: len(signal)])`, a RIR longer than a signal is truncated
+    to the length of the signal. Such (short) signals are convolved directly.
+
+    Args:
+        output (torch.Tensor): Multi-channel output audio with shape (num_samples, num_channels), modified in place.
+            Samples of the convolved signals which fall after the end of `output` are discarded.
+        signals (list): List of single-channel signals.
+        starts (list): Start sample of each signal in `output`.
+        sources (list): Index of the RIR source of each signal.
+        rirs (np.ndarray): RIRs with shape (num_sources, num_channels, rir_len), zero-padded to the longest RIR.
+        rir_lengths (np.ndarray): Length of each RIR before zero-padding, with shape (num_sources, num_channels).
+        max_blocks (int): Maximum number of blocks convolved at once.
+
+    Returns:
+        output (torch.Tensor): Output audio with the convolved signals added.
+    """
+    num_samples, num_channels = output.shape
+    rir_len = rirs.shape[2]
+    fft_len = 2 ** int(np.ceil(np.log2(2 * rir_len)))
+    block_len = fft_len - rir_len + 1
+
+    blocks, block_starts, block_sources = [], [], []
+    for signal, start, source in zip(signals, starts, sources):
+        signal = signal.to(device=output.device, dtype=output.dtype)
+        if len(signal) < rir_lengths[source].max():
+            for channel in range(num_channels):
+                channel_rir = rirs[source, channel, : min(len(signal), rir_lengths[source, channel])]
+                out_channel = torch.tensor(convolve(signal.cpu().numpy(), channel_rir), dtype=output.dtype)
+                out_channel = out_channel[: max(num_samples - start, 0)]
+                output[start : start + len(out_channel), channel] += out_channel.to(output.device)
+            continue
+        for block_start in range(0, len(signal), block_len):
+            blocks.append(signal[block_start : block_start + block_len])
+            block_starts.append(start + block_start)
+            block_sources.append(source)
+    if len(blocks) == 0:
+        return output
+
+    rir_spectra = torch.fft.rfft(torch.tensor(rirs, dtype=output.dtype, device=output.device), n=fft_len)
+    offsets = torch.arange(fft_len, device=output.device)
+    for batch_start in range(0, len(blocks), max_blocks):
+        batch_blocks = blocks[batch_start : batch_start + max_blocks]
+        batch_blocks = torch.nn.utils.rnn.pad_sequence(batch_blocks, batch_first=True)
+        batch_sources = torch.tensor(block_sources[batch_start : batch_start + max_blocks], device=output.device)
+        batch_starts = torch.tensor(block_starts[batch_start : batch_start + max_blocks], device=output.device)
+
+        block_spectra = torch.fft.rfft(batch_blocks, n=fft_len)
+        out_blocks = torch.fft.irfft(block_spectra.unsqueeze(1) * rir_spectra[batch_sources], n=fft_len)
+
+        # overlap-add all blocks of the batch at once
+        positions = (batch_starts.unsqueeze(1) + offsets).flatten()
+        out_blocks = out_blocks.transpose(1, 2).reshape(-1, num_channels)
+        in_range = positions < num_samples
+        output.index_add_(0, positions[in_range], out_blocks[in_range])
+    return output
+
+
+class RIRBank(object):
+    """
+    Read-only bank of precomputed multi-channel RIRs shared by session generation processes.
+
+    Generating a RIR requires the simulation of the whole room, which usually takes longer than the rest of the
+    session generation. The RIRs are generated once for a room and microphone array configuration and saved
+    as a single memory-mapped float32 array, so that sessions (and later runs with the same configuration)
+    only read them. The bank is saved in a subdirectory of the bank directory named after a hash of
+    the configuration (see `get_key`).
+
+    Args:
+        bank_dir (str): Directory with `rirs.npy`, `lengths.npy` and `meta.json` files of the bank.
+    """
+
+    def __init__(self, bank_dir: str):
+        self.bank_dir = bank_dir
+        with open(os.path.join(bank_dir, 'meta.json'), 'r') as meta_file:
+            self._meta = json.load(meta_file)
+        self._lengths = np.load(os.path.join(bank_dir, 'lengths.npy'))
+        self._rirs = None
+
+    def __getstate__(self):
+        # memory map is opened again in each process
+        state = self.__dict__.copy()
+        state['_rirs'] = None
+        return state
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __getitem__(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            rir (np.ndarray): RIR with shape (num_sources, num_channels, rir_len), zero-padded to the longest RIR.
+            rir_lengths (np.ndarray): Length of each RIR before zero-padding, with shape (num_sources, num_channels).
+        """
+        if self._rirs is None:
+            self._rirs = np.load(os.path.join(self.bank_dir, 'rirs.npy'), mmap_mode='r')
+        rir_lengths = self._lengths[index]
+        return np.array(self._rirs[index, :, :, : rir_lengths.max()]), rir_lengths
+
+    @staticmethod
+    def get_key(config: dict) -> str:
+        """
+        Get the name of the bank for a RIR generation configuration.
+
+        Args:
+            config (dict): Parameters the RIRs depend on (room and microphone array geometry, absorption, etc.).
+
+        Returns:
+            (str): Hash of the configuration.
+        """
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+    @classmethod
+    def build(
+        cls,
+        generate_rir: Callable[[], Tuple[np.ndarray, np.ndarray]],
+        config: dict,
+        bank_dir: str,
+        num_rirs: int,
+        random_seed: int = 0,
+    ) -> 'RIRBank':
+        """
+        Generate a new bank of RIRs, or reuse the bank for the same configuration in `bank_dir`.
+
+        Args:
+            generate_rir (Callable): Function generating a RIR and its lengths (see `__getitem__`) for
+                the current state of the numpy random generator.
+            config (dict): Parameters the RIRs depend on, used to name the bank.
+            bank_dir (str): Directory to save the bank to.
+            num_rirs (int): Number of RIRs in the bank.
+            random_seed (int): The numpy random generator is seeded with `random_seed + index` for each RIR.
+
+        Returns:
+            (RIRBank): Bank with `num_rirs` RIRs.
+        """
+        key = cls.get_key(dict(config, num_rirs=num_rirs, random_seed=random_seed))
+        bank_dir = os.path.join(bank_dir, key)
+        if os.path.exists(os.path.join(bank_dir, 'meta.json')):
+            logging.info(f"Using RIR bank at {bank_dir}")
+            return cls(bank_dir)
+        os.makedirs(bank_dir, exist_ok=True)
+
+        rirs, lengths = [], []
+        for index in tqdm(range(num_rirs), desc="Generating RIR bank", unit="RIRs"):
+            np.random.seed(random_seed + index)
+            rir, rir_lengths = generate_rir()
+            rirs.append(rir)
+            lengths.append(rir_lengths)
+        max_len = max(rir.shape[2] for rir in rirs)
+        shape = (num_rirs, *rirs[0].shape[:2], max_len)
+        bank = np.lib.format.open_memmap(os.path.join(bank_dir, 'rirs.npy'), mode='w+', dtype=np.float32, shape=shape)
+        for index, rir in enumerate(rirs):
+            bank[index, :, :, : rir.shape[2]] = rir
+        bank.flush()
+        np.save(os.path.join(bank_dir, 'lengths.npy'), np.stack(lengths).astype(np.int64))
+
+        # the meta file is written last, so that an interrupted build is not reused
+        with open(os.path.join(bank_dir, 'meta.json'), 'w') as meta_file:
+            json.dump(config, meta_file)
+        return cls(bank_dir)
@@ -0,0 +1,389 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Batched Levenshtein distances for WER/CER computation.
+
+Tokens (words or characters) of all pairs are mapped to integer ids, pairs of similar lengths are grouped into
+padded chunks and every chunk is processed with the bit-parallel algorithm of Myers (1999) in the multi-block
+formulation of Hyyro (2003), vectorized across pairs: a DP column of every pair in the chunk is advanced with
+a few uint64 operations per block of 64 reference tokens. Substitution, insertion and deletion counts are
+recovered by backtracking over the stored bit-vectors, again for all pairs of the chunk at once.
+"""
+
+import itertools
+import multiprocessing
+from typing import Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+__all__ = ['split_texts', 'encode_sequences', 'levenshtein_distance_batch', 'edit_operations_batch']
+
+_ONE = np.uint64(1)
+_HIGH_BIT = np.uint64(63)
+
+
+def split_texts(texts: List[str], use_cer: bool = False) -> List[Sequence[str]]:
+    """
+    Splits texts into words the same way the WER metrics do. Texts are returned as is for ``use_cer``,
+    since a string is already a sequence of characters.
+
+    Args:
+        texts: list of texts
+        use_cer: set True to compare characters
+
+    Returns:
+        list of token sequences
+    """
+    if use_cer:
+        return list(texts)
+    return [text.split() for text in texts]
+
+
+def encode_sequences(*sequence_lists: List[Sequence[Hashable]]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Maps tokens (words or characters) to integer ids with a vocabulary shared by all given sequence lists.
+
+    Args:
+        sequence_lists: lists of token sequences, e.g. hypotheses and references. If all sequences are strings,
+            characters are encoded with their code points
+
+    Returns:
+        (ids, offsets) per input list: int32 array with the concatenated token ids of all sequences
+        and int64 array of shape [len(sequences) + 1] with the start of every sequence
+    """
+    encoded = []
+    if all(isinstance(sequence, str) for sequences in sequence_lists for sequence in sequences):
+        for sequences in sequence_lists:
+            ids = np.frombuffer(''.join(sequences).encode('utf-32-le'), dtype='<u4').astype(np.int32)
+            offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+            np.cumsum([len(sequence) for sequence in sequences], out=offsets[1:])
+            encoded.append((ids, offsets))
+        return encoded
+
+    flat_lists = [list(itertools.chain.from_iterable(sequences)) for sequences in sequence_lists]
+    vocab = {token: idx for idx, token in enumerate(dict.fromkeys(itertools.chain.from_iterable(flat_lists)))}
+    for sequences, flat in zip(sequence_lists, flat_lists):
+        ids = np.fromiter(map(vocab.__getitem__, flat), dtype=np.int32, count=len(flat))
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum([len(sequence) for sequence in sequences], out=offsets[1:])
+        encoded.append((ids, offsets))
+    return encoded
+
+
+def _pad(ids: np.ndarray, starts: np.ndarray, lengths: np.ndarray, pad_id: int) -> np.ndarray:
+    """Gathers sequences of the concatenated ``ids`` into a padded [len(starts), max(lengths)] matrix"""
+    positions = np.arange(lengths.max(initial=0))
+    mask = positions[None, :] < lengths[:, None]
+    padded = np.full(mask.shape, pad_id, dtype=np.int32)
+    padded[mask] = ids[(starts[:, None] + positions[None, :])[mask]]
+    return padded
+
+
+def _match_vectors(hyp: np.ndarray, hyp_lens: np.ndarray, ref: np.ndarray, ref_lens: np.ndarray) -> np.ndarray:
+    """
+    Computes the match bit-vectors of every hypothesis token against its reference.
+
+    Bits of the same (pair, token, block) are merged with a sort and a segmented OR, hypothesis tokens are mapped
+    to the columns of the resulting table with a search over (pair, token) keys.
+
+    Returns:
+        uint64 array of shape [max hypothesis length, number of blocks, batch], bit ``r`` of block ``k``
+        is set if the hypothesis token equals the reference token ``64 * k + r``
+    """
+    batch_size, max_hyp_len = hyp.shape
+    max_ref_len = ref.shape[1]
+    num_blocks = (max_ref_len + 63) // 64
+    # padding ids are negative, shift all ids to be non-negative
+    min_id = int(min(hyp.min(initial=0), ref.min(initial=0)))
+    vocab_size = int(max(hyp.max(initial=0), ref.max(initial=0))) - min_id + 1
+
+    pairs, positions = np.nonzero(np.arange(max_ref_len)[None, :] < ref_lens[:, None])
+    cells = ((pairs * vocab_size + ref[pairs, positions] - min_id) * num_blocks + positions // 64).astype(np.int64)
+    order = np.argsort(cells, kind='stable')
+    cells = cells[order]
+    starts = np.flatnonzero(np.concatenate([[True], cells[1:] != cells[:-1]]))
+    bits = np.bitwise_or.reduceat(_ONE << (positions[order] % 64).astype(np.uint64), starts)
+    cells = cells[starts]
+    keys = cells // num_blocks
+    key_starts = np.concatenate([[True], keys[1:] != keys[:-1]])
+    columns = np.cumsum(key_starts) - 1
+    keys = keys[key_starts]
+    # the last column stays zero for the tokens absent from the reference
+    table = np.zeros([num_blocks, len(keys) + 1], dtype=np.uint64)
+    table[cells % num_blocks, columns] = bits
+
+    hyp_keys = np.arange(batch_size, dtype=np.int64)[:, None] * vocab_size + hyp - min_id
+    hyp_cols = np.searchsorted(keys, hyp_keys)
+    found = keys[np.minimum(hyp_cols, len(keys) - 1)] == hyp_keys
+    found &= np.arange(max_hyp_len)[None, :] < hyp_lens[:, None]
+    hyp_cols[~found] = len(keys)
+    return np.ascontiguousarray(table[:, hyp_cols.T].transpose(1, 0, 2))
+
+
+def _count_deltas(positive: np.ndarray, negative: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Sums the vertical deltas encoded in the [num_blocks, batch] bit-vectors over the first ``lengths`` rows
+
+    Returns:
+        int64 array of shape [batch]
+    """
+    num_blocks = positive.shape[0]
+    # [batch, num_blocks * 64] bits, from the lowest bit of the first block
+    pos_bits = np.unpackbits(np.ascontiguousarray(positive.T).astype('<u8').view(np.uint8), axis=1, bitorder='little')
+    neg_bits = np.unpackbits(np.ascontiguousarray(negative.T).astype('<u8').view(np.uint8), axis=1, bitorder='little')
+    mask = np.arange(num_blocks * 64)[None, :] < lengths[:, None]
+    return (pos_bits & mask).sum(axis=1, dtype=np.int64) - (neg_bits & mask).sum(axis=1, dtype=np.int64)
+
+
+def _get_deltas(pos: np.ndarray, neg: np.ndarray, cols: np.ndarray, rows: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """Reads the deltas at row ``rows[b]`` of column ``cols[b]`` from the [column, block, batch] bit-vectors"""
+    blocks = rows // 64
+    shifts = (rows % 64).astype(np.uint64)
+    pos_bits = (pos[cols, blocks, pairs] >> shifts) & _ONE
+    neg_bits = (neg[cols, blocks, pairs] >> shifts) & _ONE
+    return pos_bits.astype(np.int64) - neg_bits.astype(np.int64)
+
+
+def _bit_parallel_chunk(
+    hyp: np.ndarray, hyp_lens: np.ndarray, ref: np.ndarray, ref_lens: np.ndarray, return_ops: bool
+) -> np.ndarray:
+    """
+    Computes Levenshtein distances (or edit operation counts) for a chunk of padded sequence pairs.
+
+    Rows of the DP table correspond to the reference tokens and columns to the hypothesis tokens, only
+    the vertical and horizontal +1/-1 deltas of the columns are kept as bit-vectors.
+
+    Among the alignments with the minimal distance, the one preferring deletions, then substitutions,
+    then insertions when backtracking from the end is counted. This matches the breakdowns of `jiwer`
+    in most cases of ties.
+
+    Returns:
+        int64 array of shape [len(hyp)] with edit distances, or of shape [len(hyp), 3] with substitutions,
+        insertions and deletions counts if ``return_ops`` is set
+    """
+    batch_size, max_hyp_len = hyp.shape
+    max_ref_len = ref.shape[1]
+    if max_ref_len == 0 or max_hyp_len == 0:
+        counts = np.stack([np.zeros(batch_size, dtype=np.int64), hyp_lens, ref_lens], axis=1).astype(np.int64)
+        return counts if return_ops else counts.sum(axis=1)
+
+    num_blocks = (max_ref_len + 63) // 64
+    match = _match_vectors(hyp, hyp_lens, ref, ref_lens)
+
+    # vertical deltas D[i, j] - D[i - 1, j] of the current column, all +1 for the first column
+    positive = np.full([num_blocks, batch_size], np.iinfo(np.uint64).max, dtype=np.uint64)
+    negative = np.zeros([num_blocks, batch_size], dtype=np.uint64)
+    if return_ops:
+        # vertical and horizontal deltas of every column for backtracking
+        vertical_pos = np.zeros([max_hyp_len, num_blocks, batch_size], dtype=np.uint64)
+        vertical_neg = np.zeros_like(vertical_pos)
+        horizontal_pos = np.zeros_like(vertical_pos)
+        horizontal_neg = np.zeros_like(vertical_pos)
+
+    dist = hyp_lens.astype(np.int64)
+    for j in range(max_hyp_len + 1):
+        finished = np.flatnonzero(hyp_lens == j)
+        if len(finished) > 0:
+            # D[m, n] = D[0, n] + sum of the vertical deltas of the last column
+            dist[finished] += _count_deltas(positive[:, finished], negative[:, finished], ref_lens[finished])
+        if j == max_hyp_len:
+            break
+
+        # horizontal delta entering the block from above, +1 at the top row
+        carry_pos = np.ones(batch_size, dtype=np.uint64)
+        carry_neg = np.zeros(batch_size, dtype=np.uint64)
+        for k in range(num_blocks):
+            pv, mv = positive[k], negative[k]
+            eq = match[j, k]
+            xv = eq | mv
+            eq = eq | carry_neg
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+            if return_ops:
+                horizontal_pos[j, k] = ph
+                horizontal_neg[j, k] = mh
+            out_pos = ph >> _HIGH_BIT
+            out_neg = mh >> _HIGH_BIT
+            ph = (ph << _ONE) | carry_pos
+            mh = (mh << _ONE) | carry_neg
+            positive[k] = mh | ~(xv | ph)
+            negative[k] = ph & xv
+            carry_pos, carry_neg = out_pos, out_neg
+        if return_ops:
+            vertical_pos[j] = positive
+            vertical_neg[j] = negative
+
+    if not return_ops:
+        return dist
+
+    # backtracking of all pairs at once, row i and column j are positions in the table with D[0, 0] at (0, 0)
+    i = ref_lens.astype(np.int64)
+    j = hyp_lens.astype(np.int64)
+    counts = np.zeros([batch_size, 3], dtype=np.int64)
+    active = np.flatnonzero((i > 0) & (j > 0))
+    while len(active) > 0:
+        row, col = i[active], j[active]
+        # D[i, j] - D[i - 1, j]
+        vertical = _get_deltas(vertical_pos, vertical_neg, col - 1, row - 1, active)
+        # D[i - 1, j] - D[i - 1, j - 1], the first row of the table increases by 1
+        horizontal = _get_deltas(horizontal_pos, horizontal_neg, col - 1, np.maximum(row - 2, 0), active)
+        horizontal[row == 1] = 1
+        cost = (hyp[active, col - 1] != ref[active, row - 1]).astype(np.int64)
+
+        deletion = vertical == 1
+        diagonal = ~deletion & (vertical + horizontal == cost)
+        insertion = ~(deletion | diagonal)
+        counts[active, 0] += diagonal * cost
+        counts[active, 1] += insertion
+        counts[active, 2] += deletion
+        i[active] = row - (deletion | diagonal)
+        j[active] = col - (insertion | diagonal)
+        active = active[(i[active] > 0) & (j[active] > 0)]
+
+    # the rest of the path runs along the first row or the first column
+    counts[:, 1] += j
+    counts[:, 2] += i
+    return counts
+
+
+def _run_chunk(args: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, bool]) -> np.ndarray:
+    return _bit_parallel_chunk(*args)
+
+
+def _split_chunks(
+    order: np.ndarray,
+    hyp_lens: np.ndarray,
+    ref_lens: np.ndarray,
+    return_ops: bool,
+    chunk_size: int,
+    max_chunk_bytes: int,
+) -> List[np.ndarray]:
+    """
+    Splits the sorted pair indices into chunks of at most ``chunk_size`` pairs, whose bit-vectors of shape
+    [max hypothesis length, number of blocks, chunk size] take at most ``max_chunk_bytes``. A chunk always
+    has at least one pair, even if that pair alone exceeds the limit.
+    """
+    # match vectors, plus vertical and horizontal deltas of every column for backtracking
+    num_vectors = 5 if return_ops else 1
+    chunks = []
+    start = 0
+    while start < len(order):
+        candidates = order[start : start + chunk_size]
+        max_hyp_lens = np.maximum.accumulate(hyp_lens[candidates])
+        max_num_blocks = np.maximum.accumulate((ref_lens[candidates] + 63) // 64)
+        chunk_bytes = num_vectors * 8 * max_hyp_lens * max_num_blocks * np.arange(1, len(candidates) + 1)
+        size = max(int(np.searchsorted(chunk_bytes, max_chunk_bytes, side='right')), 1)
+        chunks.append(candidates[:size])
+        start += size
+    return chunks
+
+
+def _run_chunked(
+    hypotheses: List[Sequence[Hashable]],
+    references: List[Sequence[Hashable]],
+    return_ops: bool,
+    chunk_size: int,
+    num_workers: int,
+    max_chunk_bytes: int,
+) -> np.ndarray:
+    """
+    Encodes the sequences, groups pairs of similar lengths into padded chunks and processes every chunk,
+    optionally in a process pool. Results are returned in the original order.
+    """
+    if len(hypotheses) != len(references):
+        raise ValueError(
+            f"Number of hypotheses ({len(hypotheses)}) does not match the number of references ({len(references)})"
+        )
+
+    results = np.zeros([len(hypotheses), 3] if return_ops else [len(hypotheses)], dtype=np.int64)
+    if len(hypotheses) == 0:
+        return results
+
+    (hyp_ids, hyp_offsets), (ref_ids, ref_offsets) = encode_sequences(hypotheses, references)
+    hyp_lens = np.diff(hyp_offsets)
+    ref_lens = np.diff(ref_offsets)
+
+    # pairs of similar lengths are processed together to reduce padding
+    order = np.lexsort((hyp_lens, ref_lens))
+    chunks = _split_chunks(order, hyp_lens, ref_lens, return_ops, chunk_size, max_chunk_bytes)
+    # padded lazily, so that only the chunks being processed are held in memory
+    chunk_args = (
+        (
+            _pad(hyp_ids, hyp_offsets[chunk], hyp_lens[chunk], -1),
+            hyp_lens[chunk],
+            _pad(ref_ids, ref_offsets[chunk], ref_lens[chunk], -2),
+            ref_lens[chunk],
+            return_ops,
+        )
+        for chunk in chunks
+    )
+
+    if num_workers > 0 and len(chunks) > 1:
+        with multiprocessing.Pool(processes=num_workers) as pool:
+            for chunk, chunk_result in zip(chunks, pool.imap(_run_chunk, chunk_args)):
+                results[chunk] = chunk_result
+    else:
+        for chunk, args in zip(chunks, chunk_args):
+            results[chunk] = _run_chunk(args)
+    return results
+
+
+def levenshtein_distance_batch(
+    hypotheses: List[Sequence[Hashable]],
+    references: List[Sequence[Hashable]],
+    chunk_size: int = 4096,
+    num_workers: int = 0,
+    max_chunk_bytes: int = 256 * 2 ** 20,
+) -> np.ndarray:
+    """
+    Computes Levenshtein distances for a batch of sequence pairs.
+
+    Args:
+        hypotheses: list of hypothesis token sequences, e.g. lists of words, or strings to compare characters
+        references: list of reference token sequences, same length as ``hypotheses``
+        chunk_size: maximum number of pairs processed together
+        num_workers: number of processes to distribute the chunks across, 0 to compute in the current process
+        max_chunk_bytes: memory limit of the bit-vectors of a chunk, chunks of long sequences have fewer pairs
+
+    Returns:
+        int64 array of shape [len(hypotheses)] with edit distances
+    """
+    return _run_chunked(hypotheses, references, False, chunk_size, num_workers, max_chunk_bytes)
+
+
+def edit_operations_batch(
+    hypotheses: List[Sequence[Hashable]],
+    references: List[Sequence[Hashable]],
+    chunk_size: int = 1024,
+    num_workers: int = 0,
+    max_chunk_bytes: int = 256 * 2 ** 20,
+) -> np.ndarray:
+    """
+    Computes substitution/insertion/deletion breakdowns of the Levenshtein distances for a batch of sequence pairs.
+
+    Args:
+        hypotheses: list of hypothesis token sequences, e.g. lists of words, or strings to compare characters
+        references: list of reference token sequences, same length as ``hypotheses``
+        chunk_size: maximum number of pairs processed together
+        num_workers: number of processes to distribute the chunks across, 0 to compute in the current process
+        max_chunk_bytes: memory limit of the bit-vectors of a chunk, the vertical and horizontal deltas of every
+            column are kept for backtracking, so chunks of long sequences have fewer pairs
+
+    Returns:
+        int64 array of shape [len(hypotheses), 3] with substitutions, insertions and deletions counts per pair,
+        the edit distance is the sum over the last axis
+    """
+    return _run_chunked(hypotheses, references, True, chunk_size, num_workers, max_chunk_bytes)
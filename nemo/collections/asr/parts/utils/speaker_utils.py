@@ -323,6 +323,16 @@ def labels_to_pyannote_object(labels, uniq_name=''):
     return annotation
 
 
+def label_to_rttm_line(label, uniq_id):
+    """
+    Convert a label with start, end and speaker (e.g. `0.5 1.2 speaker_0`) to an RTTM line
+    """
+    start, end, speaker = label.strip().split()
+    duration = float(end) - float(start)
+    start = float(start)
+    return 'SPEAKER {} 1   {:.3f}   {:.3f} <NA> <NA> {} <NA> <NA>\n'.format(uniq_id, start, duration, speaker)
+
+
 def labels_to_rttmfile(labels, uniq_id, out_rttm_dir):
     """
     Write rttm file with uniq_id name in out_rttm_dir with timestamps in labels
@@ -330,12 +340,7 @@ def labels_to_rttmfile(labels, uniq_id, out_rttm_dir):
     filename = os.path.join(out_rttm_dir, uniq_id + '.rttm')
     with open(filename, 'w') as f:
         for line in labels:
-            line = line.strip()
-            start, end, speaker = line.split()
-            duration = float(end) - float(start)
-            start = float(start)
-            log = 'SPEAKER {} 1   {:.3f}   {:.3f} <NA> <NA> {} <NA> <NA>\n'.format(uniq_id, start, duration, speaker)
-            f.write(log)
+            f.write(label_to_rttm_line(line, uniq_id))
 
     return filename
 
@@ -1363,33 +1368,34 @@ def generate_speaker_timestamps(
             Note that `ovl_labels` includes only overlapping speech that is not included in `maj_labels`.
             Example: [..., '152.495 152.745 speaker_1', '372.71 373.085 speaker_0', '554.97 555.885 speaker_1', ...]
     '''
-    msdd_preds.squeeze(0)
     estimated_num_of_spks = msdd_preds.shape[-1]
     overlap_speaker_list = [[] for _ in range(estimated_num_of_spks)]
     infer_overlap = estimated_num_of_spks < int(params['overlap_infer_spk_limit'])
-    main_speaker_lines = []
     if params['use_adaptive_thres']:
         threshold = get_adaptive_threshold(
             estimated_num_of_spks, params['threshold'], params['overlap_infer_spk_limit']
         )
     else:
         threshold = params['threshold']
-    for seg_idx, cluster_label in enumerate(clus_labels):
-        msdd_preds.squeeze(0)
-        spk_for_seg = (msdd_preds[0, seg_idx] > threshold).int().cpu().numpy().tolist()
-        sm_for_seg = msdd_preds[0, seg_idx].cpu().numpy()
 
-        if params['use_clus_as_main']:
-            main_spk_idx = int(cluster_label[2])
-        else:
-            main_spk_idx = np.argsort(msdd_preds[0, seg_idx].cpu().numpy())[::-1][0]
+    # Threshold and sort the predictions of all segments at once
+    seg_preds = msdd_preds[0, : len(clus_labels)]
+    spk_counts = (seg_preds > threshold).int().sum(dim=1).cpu().numpy()
+    sorted_spk_inds = np.argsort(seg_preds.cpu().numpy(), axis=1)[:, ::-1]
+    if params['use_clus_as_main']:
+        main_spk_inds = [int(cluster_label[2]) for cluster_label in clus_labels]
+    else:
+        main_spk_inds = sorted_spk_inds[:, 0].tolist()
 
-        if sum(spk_for_seg) > 1 and infer_overlap:
-            idx_arr = np.argsort(sm_for_seg)[::-1]
-            for ovl_spk_idx in idx_arr[: params['max_overlap_spks']].tolist():
-                if ovl_spk_idx != int(main_spk_idx):
+    if infer_overlap:
+        for seg_idx in np.nonzero(spk_counts > 1)[0].tolist():
+            for ovl_spk_idx in sorted_spk_inds[seg_idx, : params['max_overlap_spks']].tolist():
+                if ovl_spk_idx != main_spk_inds[seg_idx]:
                     overlap_speaker_list[ovl_spk_idx].append(seg_idx)
-        main_speaker_lines.append(f"{cluster_label[0]} {cluster_label[1]} speaker_{main_spk_idx}")
+    main_speaker_lines = [
+        f"{cluster_label[0]} {cluster_label[1]} speaker_{main_spk_idx}"
+        for cluster_label, main_spk_idx in zip(clus_labels, main_spk_inds)
+    ]
     cont_stamps = get_contiguous_stamps(main_speaker_lines)
     maj_labels = merge_stamps(cont_stamps)
     ovl_labels = get_overlap_stamps(cont_stamps, overlap_speaker_list)
@@ -1432,6 +1438,65 @@ def get_id_tup_dict(uniq_id_list: List[str], test_data_collection, preds_list: L
     return session_dict
 
 
+def get_windowed_cluster_avg_embs(
+    emb_seq: torch.Tensor,
+    clus_labels: torch.Tensor,
+    clus_lengths: torch.Tensor,
+    target_spks: torch.Tensor,
+    window_length: int,
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    Split the multi-scale embedding sequences of a batch into windows of `window_length` steps and calculate
+    cluster-average embeddings of the target speakers in each window. All windows of all sequences are processed
+    at once. If a window does not contain a target speaker, the cluster-average embedding of the speaker is zero-filled.
+    Steps after the end of the clustering labels of a sequence are zero-filled.
+
+    Args:
+        emb_seq (Tensor):
+            Zero-padded multi-scale embedding sequences.
+            Shape: (batch_size, length, scale_n, emb_dim)
+        clus_labels (Tensor):
+            Base-scale clustering labels of each sequence, padded with -1.
+            Shape: (batch_size, length)
+        clus_lengths (Tensor):
+            Number of clustering labels of each sequence.
+            Shape: (batch_size,)
+        target_spks (Tensor):
+            Target speaker indices of each sequence.
+            Shape: (batch_size, num_spks)
+        window_length (int):
+            Number of steps in each window.
+
+    Returns:
+        window_avg_embs (Tensor):
+            Cluster-average embeddings of the target speakers in each window, windows of the first sequence first.
+            Shape: (batch_size * window_count, scale_n, emb_dim, num_spks)
+        window_emb_seq (Tensor):
+            Multi-scale embedding sequence of each window.
+            Shape: (batch_size * window_count, window_length, scale_n, emb_dim)
+        window_lengths (Tensor):
+            Number of steps with clustering labels in each window.
+            Shape: (batch_size * window_count,)
+    """
+    batch_size, length, scale_n, emb_dim = emb_seq.shape
+    window_count = math.ceil(length / window_length)
+    pad_length = window_count * window_length - length
+    steps = torch.arange(window_count * window_length, device=emb_seq.device)
+    valid = steps.unsqueeze(0) < clus_lengths.unsqueeze(1)
+
+    window_emb_seq = torch.nn.functional.pad(emb_seq, (0, 0, 0, 0, 0, pad_length)) * valid[:, :, None, None]
+    window_emb_seq = window_emb_seq.reshape(batch_size * window_count, window_length, scale_n, emb_dim)
+    clus_labels = torch.nn.functional.pad(clus_labels, (0, pad_length), value=-1)
+    spk_mask = ((clus_labels.unsqueeze(2) == target_spks.unsqueeze(1)) & valid.unsqueeze(2)).to(emb_seq.dtype)
+    spk_mask = spk_mask.reshape(batch_size * window_count, window_length, -1)
+
+    spk_counts = spk_mask.sum(dim=1).clamp(min=1)
+    window_avg_embs = torch.einsum('wtsd,wtk->wsdk', window_emb_seq, spk_mask) / spk_counts[:, None, None, :]
+    window_starts = torch.arange(window_count, device=emb_seq.device) * window_length
+    window_lengths = (clus_lengths.unsqueeze(1) - window_starts).clamp(min=0, max=window_length).flatten()
+    return window_avg_embs, window_emb_seq, window_lengths
+
+
 def prepare_split_data(manifest_filepath, _out_dir, multiscale_args_dict, global_rank):
     """
     This function is needed for preparing diarization training data for multiscale diarization decoder (MSDD).
@@ -36,6 +36,7 @@ _synoglyphs = {
     '"': ['”', '“'],
 }
 SYNOGLYPH2ASCII = {g: asc for asc, glyphs in _synoglyphs.items() for g in glyphs}
+_SYNOGLYPH_TRANSLATION_TABLE = str.maketrans(SYNOGLYPH2ASCII)
 
 # Example of parsing by groups via _WORDS_RE_EN.
 # Regular expression pattern groups:
@@ -59,8 +60,10 @@ _WORDS_RE_ANY_LOCALE = re.compile(
 
 def english_text_preprocessing(text, lower=True):
     text = unicode(text)
-    text = ''.join(char for char in unicodedata.normalize('NFD', text) if unicodedata.category(char) != 'Mn')
-    text = ''.join(char if char not in SYNOGLYPH2ASCII else SYNOGLYPH2ASCII[char] for char in text)
+    # ascii text has neither diacritics nor synoglyphs
+    if not text.isascii():
+        text = ''.join(char for char in unicodedata.normalize('NFD', text) if unicodedata.category(char) != 'Mn')
+        text = text.translate(_SYNOGLYPH_TRANSLATION_TABLE)
 
     if lower:
         text = text.lower()
@@ -77,14 +80,8 @@ def any_locale_text_preprocessing(text: str) -> str:
 
     Returns: normalized text (str).
     """
-    res = []
-    for c in normalize_unicode_text(text):
-        if c in ['’']:  # right single quotation mark (U+2019, decimal 8217) as an apostrophe
-            res.append("'")
-        else:
-            res.append(c)
-
-    return ''.join(res)
+    # right single quotation mark (U+2019, decimal 8217) as an apostrophe
+    return normalize_unicode_text(text).replace('’', "'")
 
 
 def normalize_unicode_text(text: str) -> str:
@@ -14,10 +14,12 @@
 # limitations under the License.
 
 import itertools
+import re
 import string
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from contextlib import contextmanager
-from typing import List, Optional
+from typing import Callable, List, Optional, Union
 
 from nemo.collections.common.tokenizers.text_to_speech.ipa_lexicon import (
     get_grapheme_character_set,
@@ -35,10 +37,17 @@ from nemo.utils import logging
 from nemo.utils.decorators import experimental
 
 
+class _DeletingTranslationTable(dict):
+    """Translation table for str.translate that deletes every char without an entry."""
+
+    def __missing__(self, key):
+        return None
+
+
 class BaseTokenizer(ABC):
     PAD, BLANK, OOV = '<pad>', '<blank>', '<oov>'
 
-    def __init__(self, tokens, *, pad=PAD, blank=BLANK, oov=OOV, sep='', add_blank_at=None):
+    def __init__(self, tokens, *, pad=PAD, blank=BLANK, oov=OOV, sep='', add_blank_at=None, encode_cache_size=0):
         """Abstract class for creating an arbitrary tokenizer to convert string to list of int tokens.
         Args:
             tokens: List of tokens.
@@ -48,6 +57,7 @@ class BaseTokenizer(ABC):
             sep: Separation token as string.
             add_blank_at: Add blank to labels in the specified order ("last") or after tokens (any non None),
              if None then no blank in labels.
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
         """
         super().__init__()
 
@@ -76,7 +86,12 @@ class BaseTokenizer(ABC):
         self._token2id = {l: i for i, l in enumerate(tokens)}
         self._id2token = tokens
 
-    def __call__(self, text: str) -> List[int]:
+        self.encode_cache_size = encode_cache_size
+        self._encode_cache = OrderedDict()
+
+    def __call__(self, text: Union[str, List[str]]) -> Union[List[int], List[List[int]]]:
+        if isinstance(text, list):
+            return self.encode_batch(text)
         return self.encode(text)
 
     @abstractmethod
@@ -84,6 +99,48 @@ class BaseTokenizer(ABC):
         """Turns str text into int tokens."""
         pass
 
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """Turns a list of str texts into lists of int tokens."""
+        return [self.encode(text) for text in texts]
+
+    def clear_encode_cache(self):
+        """Clears cached encodings. Has to be called after changing anything that affects the encoding of texts,
+        for example the phoneme dictionary of the G2P module.
+        """
+        self._encode_cache.clear()
+
+    def _can_cache_encode(self) -> bool:
+        """Whether encoding is deterministic, so that encoded texts can be cached."""
+        return True
+
+    def _get_cached_encoding(self, text: str) -> Optional[List[int]]:
+        """Returns the cached int tokens of `text`, None if `text` isn't cached or the cache is disabled."""
+        if self.encode_cache_size <= 0 or not self._can_cache_encode():
+            return None
+
+        token_ids = self._encode_cache.get(text)
+        if token_ids is None:
+            return None
+        self._encode_cache.move_to_end(text)
+        return list(token_ids)
+
+    def _cache_encoding(self, text: str, token_ids: List[int]):
+        if self.encode_cache_size <= 0 or not self._can_cache_encode():
+            return
+
+        # tuples so that callers can't modify cached encodings
+        self._encode_cache[text] = tuple(token_ids)
+        if len(self._encode_cache) > self.encode_cache_size:
+            self._encode_cache.popitem(last=False)
+
+    def _cached_encode(self, text: str, encode_func: Callable[[str], List[int]]) -> List[int]:
+        """Returns `encode_func(text)`, from the LRU cache of encoded texts if `text` was encoded before."""
+        token_ids = self._get_cached_encoding(text)
+        if token_ids is None:
+            token_ids = encode_func(text)
+            self._cache_encoding(text, token_ids)
+        return token_ids
+
     def decode(self, tokens: List[int]) -> str:
         """Turns ints tokens into str text."""
         return self.sep.join(self._id2token[t] for t in tokens if t not in self._util_ids)
@@ -108,6 +165,7 @@ class BaseCharsTokenizer(BaseTokenizer):
         pad_with_space=False,
         non_default_punct_list=None,
         text_preprocessing_func=lambda x: x,
+        encode_cache_size=0,
     ):
         """Base class for char-based tokenizer.
         Args:
@@ -119,6 +177,7 @@ class BaseCharsTokenizer(BaseTokenizer):
             pad_with_space: Whether to pad text with spaces at the beginning and at the end or not.
             non_default_punct_list: List of punctuation marks which will be used instead default.
             text_preprocessing_func: Text preprocessing function for correct execution of the tokenizer.
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
         """
 
         tokens = []
@@ -132,41 +191,49 @@ class BaseCharsTokenizer(BaseTokenizer):
                 self.PUNCT_LIST = non_default_punct_list
             tokens.extend(self.PUNCT_LIST)
 
-        super().__init__(tokens, add_blank_at=add_blank_at)
+        super().__init__(tokens, add_blank_at=add_blank_at, encode_cache_size=encode_cache_size)
 
         self.punct = punct
         self.pad_with_space = pad_with_space
 
         self.text_preprocessing_func = text_preprocessing_func
 
+        # Every known char is translated to the char with the code point of its id, so that a text is filtered and
+        # mapped to ids by a single str.translate call. Unknown chars are deleted.
+        space = self.tokens[self.space]
+        self._known_chars = {space}
+        self._translation_table = _DeletingTranslationTable({ord(space): chr(self.space)})
+        for c in self.tokens:
+            if len(c) == 1 and c != space and self._is_known_char(c):
+                self._known_chars.add(c)
+                self._translation_table[ord(c)] = chr(self._token2id[c])
+        self._space_runs = re.compile(re.escape(chr(self.space)) + "+")
+
+    def _is_known_char(self, c: str) -> bool:
+        """Whether the char is kept by `encode`, spaces are handled separately."""
+        # Keep chars that are alphanumerics or an apostrophe, and punctuation that has a single char.
+        return ((c.isalnum() or c == "'") and c in self._token2id) or ((c in self.PUNCT_LIST) and self.punct)
+
     def encode(self, text):
         """See base class."""
-        cs, space, tokens = [], self.tokens[self.space], set(self.tokens)
+        return self._cached_encode(text, self._encode)
 
+    def _encode(self, text: str) -> List[int]:
         text = self.text_preprocessing_func(text)
-        for c in text:
-            # Add a whitespace if the current char is a whitespace while the previous char is not a whitespace.
-            if c == space and len(cs) > 0 and cs[-1] != space:
-                cs.append(c)
-            # Add the current char that is an alphanumeric or an apostrophe.
-            elif (c.isalnum() or c == "'") and c in tokens:
-                cs.append(c)
-            # Add a punctuation that has a single char.
-            elif (c in self.PUNCT_LIST) and self.punct:
-                cs.append(c)
-            # Warn about unknown char
-            elif c != space:
-                logging.warning(f"Text: [{text}] contains unknown char: [{c}]. Symbol will be skipped.")
 
-        # Remove trailing spaces
-        if cs:
-            while cs[-1] == space:
-                cs.pop()
+        # Warn about unknown chars
+        unknown_chars = set(text).difference(self._known_chars)
+        for c in sorted(unknown_chars, key=text.index):
+            logging.warning(f"Text: [{text}] contains unknown char: [{c}]. Symbol will be skipped.")
+
+        # Collapse repeated spaces and remove leading and trailing spaces
+        space = chr(self.space)
+        ids = self._space_runs.sub(space, text.translate(self._translation_table)).strip(space)
 
         if self.pad_with_space:
-            cs = [space] + cs + [space]
+            ids = space + ids + space
 
-        return [self._token2id[p] for p in cs]
+        return list(map(ord, ids))
 
 
 class EnglishCharsTokenizer(BaseCharsTokenizer):
@@ -178,6 +245,7 @@ class EnglishCharsTokenizer(BaseCharsTokenizer):
         pad_with_space=False,
         non_default_punct_list=None,
         text_preprocessing_func=english_text_preprocessing,
+        encode_cache_size=0,
     ):
         """English char-based tokenizer.
         Args:
@@ -189,6 +257,7 @@ class EnglishCharsTokenizer(BaseCharsTokenizer):
             non_default_punct_list: List of punctuation marks which will be used instead default.
             text_preprocessing_func: Text preprocessing function for correct execution of the tokenizer.
              Basically, it replaces all non-unicode characters with unicode ones and apply lower() function.
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
         """
         super().__init__(
             chars=string.ascii_lowercase,
@@ -198,6 +267,7 @@ class EnglishCharsTokenizer(BaseCharsTokenizer):
             pad_with_space=pad_with_space,
             non_default_punct_list=non_default_punct_list,
             text_preprocessing_func=text_preprocessing_func,
+            encode_cache_size=encode_cache_size,
         )
 
 
@@ -216,6 +286,7 @@ class GermanCharsTokenizer(BaseCharsTokenizer):
         pad_with_space=False,
         non_default_punct_list=_PUNCT_LIST,
         text_preprocessing_func=any_locale_text_preprocessing,
+        encode_cache_size=0,
     ):
         """German grapheme-based tokenizer.
         Args:
@@ -227,6 +298,7 @@ class GermanCharsTokenizer(BaseCharsTokenizer):
             non_default_punct_list: List of punctuation marks which will be used instead default.
             text_preprocessing_func: Text preprocessing function for correct execution of the tokenizer. By default, it
             would keep any word unchanged.
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
         """
         super().__init__(
             chars=chars,
@@ -236,6 +308,7 @@ class GermanCharsTokenizer(BaseCharsTokenizer):
             pad_with_space=pad_with_space,
             non_default_punct_list=non_default_punct_list,
             text_preprocessing_func=text_preprocessing_func,
+            encode_cache_size=encode_cache_size,
         )
 
 
@@ -244,7 +317,13 @@ class SpanishCharsTokenizer(BaseCharsTokenizer):
     PUNCT_LIST = get_ipa_punctuation_list("es-ES")
 
     def __init__(
-        self, punct=True, apostrophe=True, add_blank_at=None, pad_with_space=False, non_default_punct_list=None,
+        self,
+        punct=True,
+        apostrophe=True,
+        add_blank_at=None,
+        pad_with_space=False,
+        non_default_punct_list=None,
+        encode_cache_size=0,
     ):
         """Spanish grapheme tokenizer.
         Args:
@@ -254,6 +333,7 @@ class SpanishCharsTokenizer(BaseCharsTokenizer):
              if None then no blank in labels.
             pad_with_space: Whether to pad text with spaces at the beginning and at the end or not.
             non_default_punct_list: List of punctuation marks which will be used instead default.
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
         """
 
         es_alphabet = "abcdefghijklmnopqrstuvwxyzáéíñóúü"
@@ -265,6 +345,7 @@ class SpanishCharsTokenizer(BaseCharsTokenizer):
             pad_with_space=pad_with_space,
             non_default_punct_list=non_default_punct_list,
             text_preprocessing_func=spanish_text_preprocessing,
+            encode_cache_size=encode_cache_size,
         )
 
 
@@ -272,7 +353,13 @@ class ItalianCharsTokenizer(BaseCharsTokenizer):
     PUNCT_LIST = get_ipa_punctuation_list("it-IT")
 
     def __init__(
-        self, punct=True, apostrophe=True, add_blank_at=None, pad_with_space=False, non_default_punct_list=None
+        self,
+        punct=True,
+        apostrophe=True,
+        add_blank_at=None,
+        pad_with_space=False,
+        non_default_punct_list=None,
+        encode_cache_size=0,
     ):
         """Italian grapheme tokenizer.
         Args:
@@ -282,6 +369,7 @@ class ItalianCharsTokenizer(BaseCharsTokenizer):
             if None then no blank in labels.
             pad_with_space: Whether to pad text with spaces at the beginning and at the end or not.
             non_default_punct_list: List of punctuation marks which will be used instead default.
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
         """
 
         it_alphabet = "abcdefghijklmnopqrstuvwxyzàèéìòùó"
@@ -293,6 +381,7 @@ class ItalianCharsTokenizer(BaseCharsTokenizer):
             pad_with_space=pad_with_space,
             non_default_punct_list=non_default_punct_list,
             text_preprocessing_func=italian_text_preprocessing,
+            encode_cache_size=encode_cache_size,
         )
 
 
@@ -313,6 +402,7 @@ class GermanPhonemesTokenizer(BaseCharsTokenizer):
         pad_with_space=False,
         non_default_punct_list=None,
         text_preprocessing_func=any_locale_text_preprocessing,
+        encode_cache_size=0,
     ):
         """Deutsch phoneme-based tokenizer.
         Args:
@@ -324,6 +414,7 @@ class GermanPhonemesTokenizer(BaseCharsTokenizer):
             non_default_punct_list: List of punctuation marks which will be used instead default.
             text_preprocessing_func: Text preprocessing function for correct execution of the tokenizer.
              Currently, it only applies lower() function.
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
         """
 
         de_ipa = "abdefhijklmnoprstuvwxyzçðøŋœɐɑɒɔəɛɜɡɪɹɾʃʊʌʒː̃"
@@ -336,35 +427,15 @@ class GermanPhonemesTokenizer(BaseCharsTokenizer):
             pad_with_space=pad_with_space,
             non_default_punct_list=non_default_punct_list,
             text_preprocessing_func=text_preprocessing_func,
+            encode_cache_size=encode_cache_size,
         )
 
-    def encode(self, text):
+    def _is_known_char(self, c: str) -> bool:
         """See base class."""
-        cs, space, tokens = [], self.tokens[self.space], set(self.tokens)
-
-        text = self.text_preprocessing_func(text)
-        for c in text:
-            # Add space if last one isn't one
-            if c == space and len(cs) > 0 and cs[-1] != space:
-                cs.append(c)
-            # Add next char
-            elif (c.isalnum() or c == "'" or c == "\u0303") and c in tokens:
-                cs.append(c)
-            # Add punct
-            elif (c in self.PUNCT_LIST) and self.punct:
-                cs.append(c)
-            # Warn about unknown char
-            elif c != space:
-                logging.warning(f"Text: [{text}] contains unknown char: [{c}]. Symbol will be skipped.")
-
-        # Remove trailing spaces
-        while cs[-1] == space:
-            cs.pop()
-
-        if self.pad_with_space:
-            cs = [space] + cs + [space]
-
-        return [self._token2id[p] for p in cs]
+        # Keep chars that are alphanumerics, an apostrophe or a combining tilde, and punctuation
+        return ((c.isalnum() or c == "'" or c == "\u0303") and c in self._token2id) or (
+            (c in self.PUNCT_LIST) and self.punct
+        )
 
 
 class ItalianPhonemesTokenizer(BaseCharsTokenizer):
@@ -385,6 +456,7 @@ class ItalianPhonemesTokenizer(BaseCharsTokenizer):
         pad_with_space=False,
         non_default_punct_list=None,
         text_preprocessing_func=italian_text_preprocessing,
+        encode_cache_size=0,
     ):
         """Italian phoneme-based tokenizer.
         Args:
@@ -396,6 +468,7 @@ class ItalianPhonemesTokenizer(BaseCharsTokenizer):
             non_default_punct_list: List of punctuation marks which will be used instead default.
             text_preprocessing_func: Text preprocessing function for correct execution of the tokenizer.
              Currently, it only applies lower() function.
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
         """
 
         it_ipa = "abcdefghijklmnopqrstuvwxyzàèéìòùóæɐɑɔəɚɜɬɹʌʔᵻðŋɛɡɣɪɲɾʃʊʎʒʝβθd͡'t͡'øɒɕɓçɖɘɝɞɟʄɡɠɢʛɦɧħɥʜɨɬɫɮʟɱɯɰɳɵɸœɶʘɺɻʀʁɽʂʈʧʉʋⱱɤʍχʏʑʐʔʡʕʢǀǁǂᵻʃ'ː"
@@ -407,35 +480,15 @@ class ItalianPhonemesTokenizer(BaseCharsTokenizer):
             pad_with_space=pad_with_space,
             non_default_punct_list=non_default_punct_list,
             text_preprocessing_func=text_preprocessing_func,
+            encode_cache_size=encode_cache_size,
         )
 
-    def encode(self, text):
+    def _is_known_char(self, c: str) -> bool:
         """See base class."""
-        cs, space, tokens = [], self.tokens[self.space], set(self.tokens)
-
-        text = self.text_preprocessing_func(text)
-        for c in text:
-            # Add space if last one isn't one
-            if c == space and len(cs) > 0 and cs[-1] != space:
-                cs.append(c)
-            # Add next char
-            elif (c.isalnum() or c == "'" or c == "\u0303") and c in tokens:
-                cs.append(c)
-            # Add punct
-            elif (c in self.PUNCT_LIST) and self.punct:
-                cs.append(c)
-            # Warn about unknown char
-            elif c != space:
-                logging.warning(f"Text: [{text}] contains unknown char: [{c}]. Symbol will be skipped.")
-
-        # Remove trailing spaces
-        while cs[-1] == space:
-            cs.pop()
-
-        if self.pad_with_space:
-            cs = [space] + cs + [space]
-
-        return [self._token2id[p] for p in cs]
+        # Keep chars that are alphanumerics, an apostrophe or a combining tilde, and punctuation
+        return ((c.isalnum() or c == "'" or c == "\u0303") and c in self._token2id) or (
+            (c in self.PUNCT_LIST) and self.punct
+        )
 
 
 class EnglishPhonemesTokenizer(BaseTokenizer):
@@ -474,6 +527,7 @@ class EnglishPhonemesTokenizer(BaseTokenizer):
         add_blank_at=None,
         pad_with_space=False,
         text_preprocessing_func=lambda text: english_text_preprocessing(text, lower=False),
+        encode_cache_size=0,
     ):
         """English phoneme-based tokenizer.
         Args:
@@ -493,6 +547,8 @@ class EnglishPhonemesTokenizer(BaseTokenizer):
             text_preprocessing_func: Text preprocessing function for correct execution of the tokenizer.
              Basically, it replaces all non-unicode characters with unicode ones.
              Note that lower() function shouldn't be applied here, in case the text contains phonemes (it will be handled by g2p).
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
+             Encoded texts are only cached while the phoneme probability of g2p is None or 1.0.
         """
 
         self.phoneme_probability = None
@@ -527,7 +583,7 @@ class EnglishPhonemesTokenizer(BaseTokenizer):
                 self.PUNCT_LIST = non_default_punct_list
             tokens.extend(self.PUNCT_LIST)
 
-        super().__init__(tokens, oov=oov, sep=sep, add_blank_at=add_blank_at)
+        super().__init__(tokens, oov=oov, sep=sep, add_blank_at=add_blank_at, encode_cache_size=encode_cache_size)
 
         self.chars = chars if self.phoneme_probability is None else True
         self.punct = punct
@@ -537,13 +593,34 @@ class EnglishPhonemesTokenizer(BaseTokenizer):
         self.text_preprocessing_func = text_preprocessing_func
         self.g2p = g2p
 
+        # ids of G2P symbols seen so far, None for unknown symbols
+        self._symbol2id = {}
+
     def encode(self, text):
         """See base class for more information."""
+        return self._cached_encode(text, self._encode)
 
+    def _encode(self, text: str) -> List[int]:
         text = self.text_preprocessing_func(text)
         g2p_text = self.g2p(text)  # TODO: handle infer
         return self.encode_from_g2p(g2p_text, text)
 
+    def _can_cache_encode(self) -> bool:
+        phoneme_probability = getattr(self.g2p, "phoneme_probability", None)
+        return phoneme_probability is None or phoneme_probability >= 1.0
+
+    def _symbol_to_id(self, p: str) -> Optional[int]:
+        # Remove stress
+        if p.isalnum() and len(p) == 3 and not self.stresses:
+            p = p[:2]
+
+        # Add space, phoneme or char (if chars=True), or punct
+        if p == self.tokens[self.space] or ((p.isalnum() or p == "'") and p in self._token2id):
+            return self._token2id[p]
+        if (p in self.PUNCT_LIST) and self.punct:
+            return self._token2id[p]
+        return None
+
     def encode_from_g2p(self, g2p_text: List[str], raw_text: Optional[str] = None):
         """
         Encodes text that has already been run through G2P.
@@ -554,37 +631,34 @@ class EnglishPhonemesTokenizer(BaseTokenizer):
                 e.g. "see OOV" -> ['S', 'IY1', ' ', 'O', 'O', 'V']
             raw_text: original raw input
         """
-        ps, space, tokens = [], self.tokens[self.space], set(self.tokens)
+        ids, space_id, symbol2id = [], self.space, self._symbol2id
         for p in g2p_text:  # noqa
-            # Remove stress
-            if p.isalnum() and len(p) == 3 and not self.stresses:
-                p = p[:2]
+            token_id = symbol2id.get(p, -1)
+            if token_id == -1:
+                token_id = symbol2id[p] = self._symbol_to_id(p)
 
             # Add space if last one isn't one
-            if p == space and len(ps) > 0 and ps[-1] != space:
-                ps.append(p)
-            # Add next phoneme or char (if chars=True)
-            elif (p.isalnum() or p == "'") and p in tokens:
-                ps.append(p)
-            # Add punct
-            elif (p in self.PUNCT_LIST) and self.punct:
-                ps.append(p)
+            if token_id == space_id:
+                if ids and ids[-1] != space_id:
+                    ids.append(token_id)
+            # Add next phoneme, char or punct
+            elif token_id is not None:
+                ids.append(token_id)
             # Warn about unknown char/phoneme
-            elif p != space:
+            else:
                 message = f"Text: [{''.join(g2p_text)}] contains unknown char/phoneme: [{p}]."
                 if raw_text is not None:
                     message += f"Original text: [{raw_text}]. Symbol will be skipped."
                 logging.warning(message)
 
         # Remove trailing spaces
-        if ps:
-            while ps[-1] == space:
-                ps.pop()
+        while ids and ids[-1] == space_id:
+            ids.pop()
 
         if self.pad_with_space:
-            ps = [space] + ps + [space]
+            ids = [space_id] + ids + [space_id]
 
-        return [self._token2id[p] for p in ps]
+        return ids
 
     @contextmanager
     def set_phone_prob(self, prob):
@@ -614,6 +688,7 @@ class IPATokenizer(BaseTokenizer):
         sep='|',  # To be able to distinguish between symbols
         add_blank_at=None,
         pad_with_space=False,
+        encode_cache_size=0,
     ):
         """General-purpose IPA-based tokenizer.
         Args:
@@ -637,6 +712,8 @@ class IPATokenizer(BaseTokenizer):
             add_blank_at: Add blank to labels in the specified order ("last") or after tokens (any non None),
                 if None then no blank in labels.
             pad_with_space: Whether to pad text with spaces at the beginning and at the end or not.
+            encode_cache_size: Maximum number of texts in the LRU cache of encoded texts, 0 to disable the cache.
+                Encoded texts are only cached while the phoneme probability of g2p is None or 1.0.
         """
         if not hasattr(g2p, "symbols"):
             logging.error(
@@ -696,7 +773,7 @@ class IPATokenizer(BaseTokenizer):
         if silence is not None:
             self.silence, tokens = len(tokens), tokens + [silence]
 
-        super().__init__(tokens, oov=oov, sep=sep, add_blank_at=add_blank_at)
+        super().__init__(tokens, oov=oov, sep=sep, add_blank_at=add_blank_at, encode_cache_size=encode_cache_size)
 
         self.tokens_set = set(self.tokens)  # To save some repeated work when filtering entries
 
@@ -707,6 +784,9 @@ class IPATokenizer(BaseTokenizer):
 
     def encode(self, text: str) -> List[int]:
         """See base class for more information."""
+        return self._cached_encode(text, self._encode)
+
+    def _encode(self, text: str) -> List[int]:
         # normalize the input text with "NFC" form.
         text = self.text_preprocessing_func(text)
 
@@ -715,6 +795,30 @@ class IPATokenizer(BaseTokenizer):
 
         return self.encode_from_g2p(g2p_text, text)
 
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """
+        Tokenizes a list of texts. Texts that aren't cached are transliterated by a single call of `self.g2p`, so that
+        the heteronym model of the G2P module disambiguates all of them at once.
+
+        Args:
+            texts (List[str]): a list of texts.
+
+        Returns: a list of lists of integer IDs, one for each text.
+        """
+        token_ids = [self._get_cached_encoding(text) for text in texts]
+        uncached = [i for i, ids in enumerate(token_ids) if ids is None]
+        if uncached:
+            normalized_texts = [self.text_preprocessing_func(texts[i]) for i in uncached]
+            g2p_texts = self.g2p(normalized_texts)
+            for i, text, g2p_text in zip(uncached, normalized_texts, g2p_texts):
+                token_ids[i] = self.encode_from_g2p(g2p_text, text)
+                self._cache_encoding(texts[i], token_ids[i])
+        return token_ids
+
+    def _can_cache_encode(self) -> bool:
+        phoneme_probability = getattr(self.g2p, "phoneme_probability", None)
+        return phoneme_probability is None or phoneme_probability >= 1.0
+
     def encode_from_g2p(self, g2p_text: List[str], raw_text: Optional[str] = None) -> List[int]:
         """
         Tokenize the `g2p_text` that has been already run through G2P. Each item in the `g2p_text` would be encoded as
@@ -732,33 +836,26 @@ class IPATokenizer(BaseTokenizer):
 
         Returns: a list of integer IDs that tokenize the `g2p_text`.
         """
-        ps, space, tokens = [], self.tokens[self.space], set(self.tokens)
-        for p in g2p_text:
-            if p == space and len(ps) > 0 and ps[-1] != space:
-                # Add space if last token isn't one
-                ps.append(p)
-            elif p in tokens:
-                # Add next phoneme or char (if chars=True)
-                ps.append(p)
-            elif (p in self.punct_list) and self.punct:
-                # Add punct
-                ps.append(p)
-            elif p != space:
-                message = f"Text: [{''.join(g2p_text)}] contains unknown char/phoneme: [{p}]."
-                if raw_text is not None:
-                    message += f"Original text: [{raw_text}]. Symbol will be skipped."
-                logging.warning(message)
+        # Token index lookups of spaces, phonemes, chars (if chars=True) and punct. Punctuation marks are always
+        # part of the tokens when punct=True.
+        ids = list(map(self._token2id.get, g2p_text))
+        if None in ids:
+            for p, token_id in zip(g2p_text, ids):
+                if token_id is None:
+                    message = f"Text: [{''.join(g2p_text)}] contains unknown char/phoneme: [{p}]."
+                    if raw_text is not None:
+                        message += f"Original text: [{raw_text}]. Symbol will be skipped."
+                    logging.warning(message)
+            ids = [token_id for token_id in ids if token_id is not None]
 
         # Remove trailing spaces
-        if ps:
-            while ps[-1] == space:
-                ps.pop()
+        while ids and ids[-1] == self.space:
+            ids.pop()
 
         if self.pad_with_space:
-            ps = [space] + ps + [space]
+            ids = [self.space] + ids + [self.space]
 
-        # Token index lookups
-        return [self._token2id[p] for p in ps]
+        return ids
 
     @contextmanager
     def set_phone_prob(self, prob):
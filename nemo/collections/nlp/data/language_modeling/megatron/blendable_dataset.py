@@ -81,6 +81,90 @@ class BlendableDataset(torch.utils.data.Dataset):
             dataset.create_data_mmap()
 
 
+class LazyBlendableDataset(torch.utils.data.Dataset):
+    """
+    A BlendableDataset implementation which computes the dataset and sample of any index on the fly,
+    so startup time and memory do not depend on the size of the blend.
+
+    The k-th sample of dataset d is scheduled at time (k + 0.5) / weight[d] and the blend visits samples
+    in order of time, ties going to the lower dataset index. Every prefix of the blend then holds
+    each dataset in proportion to its exact weight, within about one sample. Since the mapping is a
+    function of the index alone, training can resume at any number of consumed samples.
+    """
+
+    def __init__(self, datasets, weights, size):
+        self.datasets = datasets
+        num_datasets = len(datasets)
+        assert num_datasets == len(weights)
+
+        self.size = size
+
+        # Normalize weights.
+        weights = np.array(weights, dtype=np.float64)
+        assert (weights >= 0.0).all()
+        sum_weights = np.sum(weights)
+        assert sum_weights > 0.0
+        self.weights = weights / sum_weights
+
+    def _sample_time(self, dataset_index, sample_index):
+        """Time at which a sample of a dataset is visited, datasets with zero weight are never visited."""
+        weights = self.weights[dataset_index]
+        with np.errstate(divide='ignore'):
+            return np.where(weights > 0, (sample_index + 0.5) / weights, np.inf)
+
+    def _num_samples_before(self, time):
+        """Number of samples of every dataset visited strictly before `time`."""
+        dataset_index = np.arange(len(self.weights))
+        num_samples = np.maximum(np.ceil(time * self.weights - 0.5), 0).astype(np.int64)
+        # fix floating point rounding so that counts agree with `_sample_time`
+        num_samples += self._sample_time(dataset_index, num_samples) < time
+        num_samples -= (num_samples > 0) & (self._sample_time(dataset_index, num_samples - 1) >= time)
+        return num_samples
+
+    def get_ds_sample_idx_range(self, start, stop):
+        """Returns ds indices and sample indices (within the ds) for indices [start, stop) of the blendable dataset."""
+        # the blend visits about one sample per unit of time, pad by the number of datasets to absorb rounding
+        num_datasets = len(self.weights)
+        samples_lo = self._num_samples_before(max(start - num_datasets - 1, 0))
+        samples_hi = self._num_samples_before(stop + num_datasets + 1)
+        assert samples_lo.sum() <= start and samples_hi.sum() >= stop
+
+        # every sample visited in the time window, then sorted in the order of the blend
+        num_candidates = samples_hi - samples_lo
+        ds_idx = np.repeat(np.arange(num_datasets), num_candidates)
+        candidate_offsets = np.cumsum(num_candidates) - num_candidates
+        sample_idx = np.arange(len(ds_idx)) - np.repeat(candidate_offsets - samples_lo, num_candidates)
+        order = np.lexsort((ds_idx, self._sample_time(ds_idx, sample_idx)))
+        order = order[start - samples_lo.sum() : stop - samples_lo.sum()]
+
+        return ds_idx[order], sample_idx[order]
+
+    def get_ds_sample_idx(self, idx):
+        """Returns ds index and sample index (within the ds) for the given index in the blendable dataset."""
+        ds_idx, sample_idx = self.get_ds_sample_idx_range(idx, idx + 1)
+        return ds_idx[0], sample_idx[0]
+
+    def get_dataset_num_samples(self, consumed_samples):
+        """Returns the number of samples drawn from every dataset by the first `consumed_samples` of the blend."""
+        num_samples = self._num_samples_before(max(consumed_samples - len(self.weights) - 1, 0))
+        ds_idx, _ = self.get_ds_sample_idx_range(int(num_samples.sum()), consumed_samples)
+        return num_samples + np.bincount(ds_idx, minlength=len(self.weights))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, idx):
+        # negative indices count from the end, as with the index arrays of BlendableDataset
+        if idx < 0:
+            idx += self.size
+        ds_idx, sample_idx = self.get_ds_sample_idx(idx)
+        return self.datasets[ds_idx][sample_idx]
+
+    def create_data_mmap(self):
+        for dataset in self.datasets:
+            dataset.create_data_mmap()
+
+
 class MemoryEfficientBlendableDataset(torch.utils.data.Dataset):
     """
     A BlendableDataset implementation that uses less memory than the original implementation.
@@ -14,6 +14,8 @@
 
 """GPT style dataset."""
 
+import hashlib
+import json
 import os
 import time
 
@@ -25,7 +27,10 @@ from nemo.collections.nlp.data.language_modeling.megatron.base_dataset_utils imp
     get_datasets_weights_and_num_samples,
     get_train_valid_test_split_,
 )
-from nemo.collections.nlp.data.language_modeling.megatron.blendable_dataset import BlendableDataset
+from nemo.collections.nlp.data.language_modeling.megatron.blendable_dataset import (
+    BlendableDataset,
+    LazyBlendableDataset,
+)
 from nemo.collections.nlp.data.language_modeling.megatron.indexed_dataset import deallocate_indexed_dataset_memory
 from nemo.collections.nlp.data.language_modeling.megatron.indexed_dataset import make_dataset as make_indexed_dataset
 from nemo.core import Dataset
@@ -77,7 +82,8 @@ def build_dataset(cfg, trainer, data_prefix, data_impl, num_samples, seq_length,
         for i in range(len(prefixes)):
             dataset = _build_dataset(prefixes[i], datasets_num_samples[i])
             datasets.append(dataset)
-        return BlendableDataset(datasets, weights, num_samples)
+        blendable_dataset_cls = LazyBlendableDataset if cfg.data.get('lazy_blending', False) else BlendableDataset
+        return blendable_dataset_cls(datasets, weights, num_samples)
 
 
 def build_train_valid_test_datasets(
@@ -199,15 +205,16 @@ def build_train_valid_test_datasets(
         train_n, valid_n, test_n = map(sum, zip(*datasets_train_valid_test_num_samples))
 
         # Blend.
+        blendable_dataset_cls = LazyBlendableDataset if cfg.data.get('lazy_blending', False) else BlendableDataset
         blending_train_dataset = None
         if train_datasets:
-            blending_train_dataset = BlendableDataset(train_datasets, weights, train_n)
+            blending_train_dataset = blendable_dataset_cls(train_datasets, weights, train_n)
         blending_valid_dataset = None
         if valid_datasets:
-            blending_valid_dataset = BlendableDataset(valid_datasets, weights, valid_n)
+            blending_valid_dataset = blendable_dataset_cls(valid_datasets, weights, valid_n)
         blending_test_dataset = None
         if test_datasets:
-            blending_test_dataset = BlendableDataset(test_datasets, weights, test_n)
+            blending_test_dataset = blendable_dataset_cls(test_datasets, weights, test_n)
 
         return (blending_train_dataset, blending_valid_dataset, blending_test_dataset)
 
@@ -331,6 +338,14 @@ class GPTDataset(Dataset):
         self.shuffle_documents = cfg.data.get('shuffle_documents', True)
         self.exchange_indices_distributed = cfg.data.get('exchange_indices_distributed', False)
 
+        # prefetch the tokens of the next samples, only supported by the mmap indexed dataset
+        self.prefetch_samples = cfg.data.get('prefetch_samples', 0)
+        self.prefetch_in_background = cfg.data.get('prefetch_in_background', False)
+        if self.prefetch_samples > 0 and not hasattr(indexed_dataset, 'prefetch_items'):
+            logging.warning(f'Prefetching is not supported by {type(indexed_dataset).__name__}, disabling it')
+            self.prefetch_samples = 0
+        self._prefetch_start, self._prefetch_end = 0, 0
+
         # save index mappings to a configurable dir
         self.index_mapping_dir = cfg.data.get('index_mapping_dir', None)
 
@@ -401,7 +416,30 @@ class GPTDataset(Dataset):
             )
         return sample.astype(np.int64)
 
+    def _prefetch(self, idx):
+        """Prefetches the samples following idx, a new window is requested once half of the last one was read."""
+        in_window = self._prefetch_start <= idx < self._prefetch_end
+        if in_window and idx + self.prefetch_samples // 2 < self._prefetch_end:
+            return
+        start = self._prefetch_end if in_window else idx
+        end = min(idx + self.prefetch_samples, len(self))
+        if start < end:
+            items, offsets, lengths = _get_sample_documents(
+                self.doc_idx,
+                self.sample_idx,
+                self.indexed_dataset.sizes,
+                self.shuffle_idx[start:end],
+                self.add_extra_token,
+            )
+            self.indexed_dataset.prefetch_items(items, offsets, lengths, background=self.prefetch_in_background)
+        self._prefetch_start, self._prefetch_end = idx, end
+
+    def get_io_stats(self):
+        return self.indexed_dataset.get_io_stats() if hasattr(self.indexed_dataset, 'get_io_stats') else {}
+
     def __getitem__(self, idx):
+        if self.prefetch_samples > 0 and idx >= 0:
+            self._prefetch(idx)
         text = torch.from_numpy(self._get_text(idx))
         if self.add_extra_token:
             tokens = text[:-1].contiguous()
@@ -569,6 +607,11 @@ def _build_index_mappings(
     _filename += '_{}ns'.format(num_samples)
     _filename += '_{}sl'.format(seq_length)
     _filename += '_{}s'.format(seed)
+    # The mappings also depend on the data and on settings which are not part of the readable name,
+    # add a digest of them so that stale mappings are never loaded.
+    _filename += '_{}'.format(
+        _index_mappings_digest(documents, sizes, tokens_per_epoch, drop_last, add_extra_token, shuffle_documents)
+    )
     doc_idx_filename = _filename + '_doc_idx.npy'
     sample_idx_filename = _filename + '_sample_idx.npy'
     shuffle_idx_filename = _filename + '_shuffle_idx.npy'
@@ -633,25 +676,11 @@ def _build_index_mappings(
             )
             # sample-idx.
             start_time = time.time()
-            # Use C++ implementation for speed.
-            # First compile and then import.
             assert doc_idx.dtype == np.int32
             assert sizes.dtype == np.int32
-            try:
-                from nemo.collections.nlp.data.language_modeling.megatron.dataset_utils import compile_helper
-
-                compile_helper()
-                from nemo.collections.nlp.data.language_modeling.megatron import helpers
-            except ImportError:
-                raise ImportError(
-                    f'Could not compile megatron dataset C++ helper functions and therefore cannot import helpers python file.'
-                )
-
-            sample_idx = helpers.build_sample_idx(
+            sample_idx = _build_sample_idx(
                 sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch, drop_last, add_extra_token
             )
-            # sample_idx = _build_sample_idx(sizes, doc_idx, seq_length,
-            #                              num_epochs, tokens_per_epoch, drop_last, add_extra_token)
             np.save(sample_idx_filename, sample_idx, allow_pickle=True)
             logging.info(
                 ' > elasped time to build and save sample-idx mapping '
@@ -705,6 +734,42 @@ def _build_index_mappings(
     return doc_idx, sample_idx, shuffle_idx
 
 
+def _index_mappings_digest(documents, sizes, tokens_per_epoch, drop_last, add_extra_token, shuffle_documents):
+    """Digest of the data and settings that index mappings are built from."""
+    documents = np.ascontiguousarray(documents, dtype=np.int64)
+    settings = [
+        len(sizes),
+        int(tokens_per_epoch),
+        bool(drop_last),
+        int(add_extra_token),
+        bool(shuffle_documents),
+    ]
+    digest = hashlib.sha1(json.dumps(settings).encode())
+    digest.update(documents.tobytes())
+    digest.update(np.ascontiguousarray(sizes[documents], dtype=np.int64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _get_sample_documents(doc_idx, sample_idx, sizes, indices, add_extra_token=1):
+    """
+    Returns the documents read by the given (already shuffled) samples, with the offset and number of tokens
+    read from every document, following GPTDataset._get_text.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    doc_index_f, offset_f = sample_idx[indices, 0].astype(np.int64), sample_idx[indices, 1].astype(np.int64)
+    doc_index_l, offset_l = sample_idx[indices + 1, 0].astype(np.int64), sample_idx[indices + 1, 1].astype(np.int64)
+    num_docs = doc_index_l - doc_index_f + 1
+    first = np.cumsum(num_docs) - num_docs
+    last = first + num_docs - 1
+
+    documents = doc_idx[np.arange(num_docs.sum()) + np.repeat(doc_index_f - first, num_docs)]
+    offsets = np.zeros(len(documents), dtype=np.int64)
+    offsets[first] = offset_f
+    lengths = sizes[documents].astype(np.int64) - offsets
+    lengths[last] = np.minimum(offset_l + add_extra_token - offsets[last], lengths[last])
+    return documents, offsets, lengths
+
+
 def _num_tokens(documents, sizes):
     """Total number of tokens in the dataset."""
     return np.sum(sizes[documents])
@@ -729,10 +794,7 @@ def _build_doc_idx(documents, num_epochs, np_rng, separate_last_epoch, shuffle=T
     """Build an array with length = number-of-epochs * number-of-dcuments.
     Each index is mapped to a corresponding document."""
     if not separate_last_epoch or num_epochs == 1:
-        doc_idx = np.mgrid[0:num_epochs, 0 : len(documents)][1]
-        doc_idx[:] = documents
-        doc_idx = doc_idx.reshape(-1)
-        doc_idx = doc_idx.astype(np.int32)
+        doc_idx = np.tile(np.asarray(documents, dtype=np.int32), num_epochs)
         if shuffle:
             np_rng.shuffle(doc_idx)
         else:
@@ -744,11 +806,24 @@ def _build_doc_idx(documents, num_epochs, np_rng, separate_last_epoch, shuffle=T
     return np.concatenate((doc_idx_first, doc_idx_last))
 
 
-def _build_sample_idx(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch, drop_last=True, add_extra_token=1):
+def _build_sample_idx(
+    sizes,
+    doc_idx,
+    seq_length,
+    num_epochs,
+    tokens_per_epoch,
+    drop_last=True,
+    add_extra_token=1,
+    samples_per_chunk=2 ** 22,
+):
     """Sample index mapping is a 2D array with sizes
     [number-of-samples + 1, 2] where [..., 0] contains
     the index into `doc_idx` and [..., 1] is the
-    starting offset in that document."""
+    starting offset in that document.
+
+    Documents in `doc_idx` are read as one stream of tokens, so sample i starts at token
+    i * seq_length of the stream. The document holding it is found with a binary search over
+    the cumulative document lengths, which gives the same mapping as the loop in helpers.cpp."""
 
     # Total number of samples. For -1 see comments in `_num_epochs`.
     if not drop_last:
@@ -757,46 +832,27 @@ def _build_sample_idx(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch,
         num_samples = (num_epochs * tokens_per_epoch - add_extra_token) // seq_length
     sample_idx = np.zeros([num_samples + 1, 2], dtype=np.int32)
 
-    # Index into sample_idx.
-    sample_index = 0
-    # Index into doc_idx.
-    doc_idx_index = 0
-    # Begining offset for each document.
-    doc_offset = 0
-    # Start with first document and no offset.
-    sample_idx[sample_index][0] = doc_idx_index
-    sample_idx[sample_index][1] = doc_offset
-    sample_index += 1
-    while sample_index <= num_samples:
-        # Start with a fresh sequence.
-        remaining_seq_length = seq_length + add_extra_token
-        while remaining_seq_length != 0:
-            # Get the document length.
-            doc_id = doc_idx[doc_idx_index]
-            doc_length = sizes[doc_id] - doc_offset
-            # And add it to the current sequence.
-            remaining_seq_length -= doc_length
-            # If we have more than a full sequence, adjust offset and set
-            # remaining length to zero so we return from the while loop.
-            # Note that -1 here is for the same reason we have -1 in
-            # `_num_epochs` calculations.
-            if remaining_seq_length <= 0:
-                doc_offset += remaining_seq_length + doc_length - add_extra_token
-                remaining_seq_length = 0
-            else:
-                # Otherwise, start from the begining of the next document.
-                if doc_idx_index == (len(doc_idx) - 1):
-                    assert (
-                        sample_index == num_samples
-                    ), F"sample_index={sample_index} and num_samples={num_samples} should be the same"
-                    doc_offset = sizes[doc_idx[doc_idx_index]] - add_extra_token
-                    break
-                doc_idx_index += 1
-                doc_offset = 0
-        # Record the sequence.
-        sample_idx[sample_index][0] = doc_idx_index
-        sample_idx[sample_index][1] = doc_offset
-        sample_index += 1
+    # Position right after the last token of every document in the stream.
+    doc_ends = np.cumsum(sizes[doc_idx], dtype=np.int64)
+    # Start with first document and no offset, then process samples in chunks to bound memory.
+    for chunk_start in range(1, num_samples + 1, samples_per_chunk):
+        sample_index = np.arange(chunk_start, min(chunk_start + samples_per_chunk, num_samples + 1), dtype=np.int64)
+        sample_starts = sample_index * seq_length
+        # A sample is recorded in the document holding the last token of the previous sample,
+        # i.e. the first document which ends after `add_extra_token` more tokens.
+        doc_idx_index = np.searchsorted(doc_ends, sample_starts + add_extra_token, side='left')
+        # The last sample may run past the end of the data when drop_last is False.
+        past_end = doc_idx_index == len(doc_idx)
+        doc_idx_index[past_end] = len(doc_idx) - 1
+        doc_sizes = sizes[doc_idx[doc_idx_index]]
+        doc_offset = sample_starts - (doc_ends[doc_idx_index] - doc_sizes)
+        doc_offset[past_end] = doc_sizes[past_end] - add_extra_token
+        assert not past_end[:-1].any() and (
+            not past_end[-1] or sample_index[-1] == num_samples
+        ), "only the last sample can be past the end of the data"
+
+        sample_idx[sample_index, 0] = doc_idx_index
+        sample_idx[sample_index, 1] = doc_offset
 
     return sample_idx
 
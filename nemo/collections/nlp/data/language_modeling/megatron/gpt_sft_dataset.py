@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import re
 from typing import List, Mapping, Optional
 
@@ -25,11 +26,16 @@ from datasets import load_dataset
 
 from nemo.collections.common.tokenizers.tokenizer_spec import TokenizerSpec
 from nemo.collections.nlp.data.language_modeling.megatron.dataset_utils import get_samples_mapping
+from nemo.collections.nlp.data.language_modeling.megatron.sequence_packing_utils import (
+    first_fit_decreasing,
+    load_packed_sequences,
+    write_packed_sequences,
+)
 from nemo.collections.nlp.data.language_modeling.text_memmap_dataset import JSONLMemMapDataset
 from nemo.core.classes import Dataset
-from nemo.utils import logging
+from nemo.utils import AppState, logging
 
-__all__ = ['GPTSFTDataset']
+__all__ = ['GPTSFTDataset', 'GPTSFTPackedDataset']
 
 
 class GPTSFTDataset(Dataset):
@@ -448,3 +454,186 @@ class GPTSFTDataset(Dataset):
         }
 
         return processed_batch
+
+
+class GPTSFTPackedDataset(GPTSFTDataset):
+    def __init__(
+        self, file_path: str, tokenizer: TokenizerSpec, packed_dir: str = None, pack_size: int = None, **kwargs,
+    ):
+        """
+        Packs several examples of a GPTSFTDataset into each sequence, which avoids spending most of the compute
+        on padding when examples are much shorter than `max_seq_length`.
+        Examples are tokenized once with `_process_example` and packed offline with first-fit-decreasing.
+        Packs are saved as memory mapped arrays along with the segment id of every token and reused across runs.
+        Every example attends only to itself and position ids restart at the beginning of every example.
+
+        packed_dir: Directory to save the packed sequences to. If None, will write next to the index files of the dataset.
+        pack_size: Maximum number of tokens in a packed sequence. Defaults to `max_seq_length`. Examples that do not fit are truncated.
+        Other arguments are the same as GPTSFTDataset.
+        """
+        max_seq_length = kwargs.get('max_seq_length', 1024)
+        self.pack_size = pack_size or max_seq_length
+        assert self.pack_size <= max_seq_length, f'pack_size {self.pack_size} exceeds max_seq_length {max_seq_length}'
+        if packed_dir is None:
+            index_mapping_dir = kwargs.get('index_mapping_dir', None)
+            base_path = (
+                os.path.join(index_mapping_dir, os.path.basename(file_path)) if index_mapping_dir else file_path
+            )
+            packed_dir = f'{base_path}.packed_{self.pack_size}'
+        self.packed_dir = packed_dir
+        super().__init__(file_path, tokenizer, **kwargs)
+
+    def _packing_meta(self):
+        """ Settings that change the content of the packed sequences """
+        return {
+            'file_path': os.path.abspath(self.file_path),
+            'num_source_examples': len(self.indexed_dataset),
+            'tokenizer': type(self.tokenizer).__name__,
+            'vocab_size': self.tokenizer.vocab_size,
+            'max_seq_length': self.max_seq_length,
+            'pack_size': self.pack_size,
+            'add_bos': self.add_bos,
+            'add_eos': self.add_eos,
+            'add_sep': self.add_sep,
+            'sep_id': self.sep_id,
+            'label_key': self.label_key,
+            'answer_only_loss': self.answer_only_loss,
+            'truncation_fields': ','.join(self.truncation_fields),
+            'truncation_method': self.truncation_method,
+            'prompt_template': self.prompt_template,
+            'virtual_tokens': self.virtual_tokens,
+        }
+
+    def _build_packed_sequences(self):
+        """ Tokenizes every example, packs them and writes the packs to `packed_dir` """
+        input_ids, loss_masks = [], []
+        num_truncated = 0
+        for idx in range(len(self.indexed_dataset)):
+            processed = self._process_example(self.indexed_dataset[idx])
+            # examples with a single token have no label to train on
+            if len(processed['input_ids']) < 2:
+                continue
+            # an example of n tokens takes n - 1 positions once shifted into tokens and labels
+            max_length = self.pack_size + 1
+            num_truncated += len(processed['input_ids']) > max_length
+            input_ids.append(processed['input_ids'][:max_length])
+            loss_masks.append(self._build_loss_mask(processed)[:max_length])
+        if num_truncated:
+            logging.warning(f'{num_truncated} examples exceed pack size {self.pack_size} and were truncated')
+        packs = first_fit_decreasing([len(x) - 1 for x in input_ids], self.pack_size)
+        write_packed_sequences(self.packed_dir, input_ids, loss_masks, packs, meta=self._packing_meta())
+
+    def _maybe_build_packed_sequences(self):
+        if load_packed_sequences(self.packed_dir, meta=self._packing_meta()) is None:
+            logging.info(f'Building packed sequences for {self.file_path} in {self.packed_dir}')
+            self._build_packed_sequences()
+
+    def _build_samples_mapping(self):
+        is_distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+        if not is_distributed or torch.distributed.get_rank() == 0:
+            self._maybe_build_packed_sequences()
+        if is_distributed:
+            torch.distributed.barrier()
+            # packed files built on global rank 0 are not visible to other nodes without a shared filesystem
+            if AppState().local_rank == 0:
+                self._maybe_build_packed_sequences()
+            torch.distributed.barrier()
+
+        packed = load_packed_sequences(self.packed_dir)
+        self.packed_tokens = packed['tokens']
+        self.packed_loss_mask = packed['loss_mask']
+        self.packed_segment_ids = packed['segment_ids']
+        self.pack_offsets = packed['pack_offsets']
+        num_packs = len(self.pack_offsets) - 1
+
+        if self.max_num_samples is not None:
+            # shuffle packs every epoch and repeat them until `max_num_samples` is reached
+            rng = np.random.RandomState(self.seed)
+            num_epochs = max(1, -(-self.max_num_samples // max(num_packs, 1)))
+            self.samples_mapping = np.concatenate([rng.permutation(num_packs) for _ in range(num_epochs)])
+            self.samples_mapping = self.samples_mapping[: self.max_num_samples]
+        else:
+            self.samples_mapping = None
+
+    def __len__(self):
+        if self.samples_mapping is None:
+            return len(self.pack_offsets) - 1
+        return len(self.samples_mapping)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, np.int64):
+            idx = idx.item()
+        # idx may < 0 because we pad_samples_to_global_batch_size, e.g. id = -1
+        auto_gen_idx = idx < 0
+        if auto_gen_idx:
+            idx = len(self) + idx
+        if self.samples_mapping is not None:
+            idx = self.samples_mapping[idx].item()
+
+        start, end = self.pack_offsets[idx], self.pack_offsets[idx + 1]
+        return {
+            'input_ids': np.asarray(self.packed_tokens[start:end], dtype=np.int64),
+            'loss_mask': np.asarray(self.packed_loss_mask[start:end], dtype=np.int64),
+            'segment_ids': np.asarray(self.packed_segment_ids[start:end], dtype=np.int64),
+            'metadata': {'__AUTOGENERATED__': True} if auto_gen_idx else {},
+        }
+
+    def _collate_packed_item(self, item):
+        """ Shifts every example of a pack into tokens and labels and restarts its position ids """
+        segment_ids = item['segment_ids']
+        segment_change = segment_ids[1:] != segment_ids[:-1]
+        # the last token of an example is only used as a label and its first token only as an input
+        is_input = np.append(~segment_change, False)
+        is_label = np.insert(~segment_change, 0, False)
+
+        input_segment_ids = segment_ids[is_input]
+        positions = np.arange(len(input_segment_ids))
+        is_segment_start = np.insert(input_segment_ids[1:] != input_segment_ids[:-1], 0, True)
+        segment_starts = np.maximum.accumulate(np.where(is_segment_start, positions, 0))
+        return {
+            'tokens': item['input_ids'][is_input],
+            'labels': item['input_ids'][is_label],
+            'loss_mask': item['loss_mask'][is_label],
+            'position_ids': positions - segment_starts,
+            'segment_ids': input_segment_ids,
+        }
+
+    def collate_fn(self, batch):
+        items = [self._collate_packed_item(item) for item in batch]
+        metadata = [item['metadata'] for item in batch]
+
+        max_length = max(len(item['tokens']) for item in items)
+        # increase max length to nearest multiple of 4 or 8
+        if self.pad_to_max_length:
+            max_length = self.max_seq_length
+        else:
+            max_length = min(self.max_seq_length, self._ceil_to_nearest(max_length, 8))
+        assert max_length <= self.max_seq_length
+
+        def pad(key, pad_id):
+            padded = np.full((len(items), max_length), pad_id, dtype=np.int64)
+            for i, item in enumerate(items):
+                padded[i, : len(item[key])] = item[key]
+            return torch.from_numpy(padded)
+
+        input_ids = pad('tokens', self.tokenizer.eos_id)
+        labels = pad('labels', self.tokenizer.eos_id)
+        loss_mask = pad('loss_mask', 0)
+        position_ids = pad('position_ids', 0)
+        segment_ids = pad('segment_ids', -1)
+
+        # tokens only attend to previous tokens of the same example, True marks masked out positions
+        causal_mask = torch.tril(torch.ones((max_length, max_length), dtype=torch.bool))
+        attention_mask = ~((segment_ids.unsqueeze(2) == segment_ids.unsqueeze(1)) & causal_mask)
+        attention_mask = attention_mask.unsqueeze(1)
+
+        processed_batch = {
+            'tokens': input_ids,
+            'labels': labels,
+            'attention_mask': attention_mask,
+            'loss_mask': loss_mask,
+            'position_ids': position_ids,
+            'metadata': metadata,
+        }
+
+        return processed_batch
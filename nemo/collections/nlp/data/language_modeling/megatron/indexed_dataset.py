@@ -27,9 +27,11 @@
 # Added document index to index file and made it accessible.
 #    An empty sentence no longer separates documents.
 
+import mmap
 import os
 import shutil
 import struct
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from itertools import accumulate
 
@@ -172,6 +174,26 @@ def data_file_path(prefix_path):
     return prefix_path + '.bin'
 
 
+def _append_file(path, out_file):
+    """Append the content of a file to an open binary file, using zero-copy sendfile when it is available"""
+    out_file.flush()
+    with open(path, 'rb') as f:
+        offset = 0
+        if hasattr(os, 'sendfile'):
+            size = os.fstat(f.fileno()).st_size
+            try:
+                while offset < size:
+                    sent = os.sendfile(out_file.fileno(), f.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except OSError:
+                # sendfile is not supported between these files, copy the rest through user space
+                pass
+        f.seek(offset)
+        shutil.copyfileobj(f, out_file)
+
+
 def create_doc_idx(sizes):
     doc_idx = [0]
     for i, s in enumerate(sizes):
@@ -341,20 +363,15 @@ class IndexedDatasetBuilder(object):
         assert index.dtype == self.dtype
 
         begin = self.data_offsets[-1]
-        for offset in index.data_offsets[1:]:
-            self.data_offsets.append(begin + offset)
-        self.sizes.extend(index.sizes)
+        self.data_offsets.extend((begin + index.data_offsets[1:]).tolist())
+        # documents of the merged file start after the items added so far
+        begin = len(self.sizes)
+        self.sizes.extend(index.sizes.tolist())
+        self.doc_idx.extend((begin + index.doc_idx[1:]).tolist())
         begin = self.dim_offsets[-1]
-        for dim_offset in index.dim_offsets[1:]:
-            self.dim_offsets.append(begin + dim_offset)
-
-        with open(data_file_path(another_file), 'rb') as f:
-            while True:
-                data = f.read(1024)
-                if data:
-                    self.out_file.write(data)
-                else:
-                    break
+        self.dim_offsets.extend((begin + index.dim_offsets[1:]).tolist())
+
+        _append_file(data_file_path(another_file), self.out_file)
 
     def finalize(self, index_file):
         self.out_file.close()
@@ -377,6 +394,18 @@ def _warmup_mmap_file(path):
             pass
 
 
+def _merge_byte_ranges(starts, ends):
+    """Aligns byte ranges [starts, ends) to pages and merges the ones which overlap, returns starts and lengths."""
+    starts = np.asarray(starts, dtype=np.int64) // mmap.PAGESIZE * mmap.PAGESIZE
+    ends = -(-np.asarray(ends, dtype=np.int64) // mmap.PAGESIZE) * mmap.PAGESIZE
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    new_range = np.ones(len(starts), dtype=bool)
+    new_range[1:] = starts[1:] > np.maximum.accumulate(ends)[:-1]
+    range_starts = np.flatnonzero(new_range)
+    return starts[range_starts], np.maximum.reduceat(ends, range_starts) - starts[range_starts]
+
+
 class MMapIndexedDataset(torch.utils.data.Dataset):
     class Index(object):
         _HDR_MAGIC = b'MMIDIDX\x00\x00'
@@ -508,6 +537,11 @@ class MMapIndexedDataset(torch.utils.data.Dataset):
     def _do_init(self, path, skip_warmup=True, delay_data_mmap=False):
         self._path = path
         self._index = self.Index(index_file_path(self._path), skip_warmup)
+        self._io_stats = dict.fromkeys(
+            ['read_items', 'read_bytes', 'prefetch_calls', 'prefetch_bytes', 'background_read_bytes'], 0
+        )
+        self._prefetch_fd = None
+        self._prefetch_executor = None
 
         if not delay_data_mmap:
             self._create_data_mmap(skip_warmup)
@@ -526,6 +560,10 @@ class MMapIndexedDataset(torch.utils.data.Dataset):
         self._bin_buffer = memoryview(self._bin_buffer_mmap)
 
     def __del__(self):
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown(wait=True)
+        if self._prefetch_fd is not None:
+            os.close(self._prefetch_fd)
         if self._bin_buffer_mmap is not None:
             self._bin_buffer_mmap._mmap.close()
         del self._bin_buffer_mmap
@@ -539,6 +577,8 @@ class MMapIndexedDataset(torch.utils.data.Dataset):
         if isinstance(idx, int):
             ptr, size = self._index[idx]
             np_array = np.frombuffer(self._bin_buffer, dtype=self._index.dtype, count=size, offset=ptr)
+            self._io_stats['read_items'] += 1
+            self._io_stats['read_bytes'] += np_array.nbytes
             return np_array
         elif isinstance(idx, slice):
             start, stop, step = idx.indices(len(self))
@@ -549,6 +589,8 @@ class MMapIndexedDataset(torch.utils.data.Dataset):
             offsets = list(accumulate(sizes))
             total_size = sum(sizes)
             np_array = np.frombuffer(self._bin_buffer, dtype=self._index.dtype, count=total_size, offset=ptr)
+            self._io_stats['read_items'] += len(sizes)
+            self._io_stats['read_bytes'] += np_array.nbytes
             sents = np.split(np_array, offsets[:-1])
             return sents
 
@@ -563,8 +605,69 @@ class MMapIndexedDataset(torch.utils.data.Dataset):
             length = size - offset
         ptr += offset * np.dtype(self._index.dtype).itemsize
         np_array = np.frombuffer(self._bin_buffer, dtype=self._index.dtype, count=length, offset=ptr)
+        self._io_stats['read_items'] += 1
+        self._io_stats['read_bytes'] += np_array.nbytes
         return np_array
 
+    def prefetch_items(self, indices, offsets=None, lengths=None, background=False):
+        """ Tells the OS which items are about to be read, so that their pages are fetched
+        ahead of time instead of faulting in one at a time on random access.
+
+        Args:
+            indices: indices of the items to prefetch.
+            offsets: optional offset (in elements) into every item, as in get().
+            lengths: optional number of elements to prefetch from every item, by default up to its end.
+            background: read the pages from a background thread instead of sending madvise / posix_fadvise
+                hints, for filesystems which ignore the hints.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return
+        itemsize = np.dtype(self._index.dtype).itemsize
+        offsets = np.zeros_like(indices) if offsets is None else np.asarray(offsets, dtype=np.int64)
+        if lengths is None:
+            lengths = self._index._sizes[indices] - offsets
+        starts = self._index._pointers[indices] + offsets * itemsize
+        starts, lengths = _merge_byte_ranges(starts, starts + np.asarray(lengths, dtype=np.int64) * itemsize)
+        ranges = list(zip(starts.tolist(), lengths.tolist()))
+
+        self._io_stats['prefetch_calls'] += 1
+        self._io_stats['prefetch_bytes'] += int(lengths.sum())
+        if background:
+            if self._prefetch_executor is None:
+                self._prefetch_executor = ThreadPoolExecutor(max_workers=1)
+            self._prefetch_executor.submit(self._read_byte_ranges, self._get_prefetch_fd(), ranges)
+        elif self._bin_buffer_mmap is not None and hasattr(mmap, 'MADV_WILLNEED'):
+            for start, length in ranges:
+                self._bin_buffer_mmap._mmap.madvise(mmap.MADV_WILLNEED, start, length)
+        elif hasattr(os, 'posix_fadvise'):
+            # data is not mapped yet with delay_data_mmap, hint the page cache through the file instead
+            fd = self._get_prefetch_fd()
+            for start, length in ranges:
+                os.posix_fadvise(fd, start, length, os.POSIX_FADV_WILLNEED)
+
+    def _get_prefetch_fd(self):
+        if self._prefetch_fd is None:
+            self._prefetch_fd = os.open(data_file_path(self._path), os.O_RDONLY)
+        return self._prefetch_fd
+
+    def _read_byte_ranges(self, fd, ranges, block_size=1024 * 1024):
+        for start, length in ranges:
+            end = start + length
+            while start < end:
+                num_read = len(os.pread(fd, min(block_size, end - start), start))
+                if num_read == 0:
+                    break
+                self._io_stats['background_read_bytes'] += num_read
+                start += num_read
+
+    def get_io_stats(self):
+        """ Returns counters of the items and bytes read and prefetched since the dataset was loaded. """
+        return dict(self._io_stats)
+
+    def reset_io_stats(self):
+        self._io_stats = dict.fromkeys(self._io_stats, 0)
+
     def create_data_mmap(self):
         self._create_data_mmap(self._skip_warmup)
 
@@ -608,15 +711,16 @@ class MMapIndexedDatasetBuilder(object):
 
     def merge_file_(self, another_file):
         # Concatenate index
-        index = MMapIndexedDataset.Index(index_file_path(another_file))
+        index = MMapIndexedDataset.Index(index_file_path(another_file), skip_warmup=True)
         assert index.dtype == self._dtype
 
-        for size in index.sizes:
-            self._sizes.append(size)
+        # documents of the merged file start after the items added so far
+        begin = len(self._sizes)
+        self._sizes.extend(index.sizes.tolist())
+        self._doc_idx.extend((begin + index.doc_idx[1:]).tolist())
 
         # Concatenate data
-        with open(data_file_path(another_file), 'rb') as f:
-            shutil.copyfileobj(f, self._data_file)
+        _append_file(data_file_path(another_file), self._data_file)
 
     def finalize(self, index_file):
         self._data_file.close()
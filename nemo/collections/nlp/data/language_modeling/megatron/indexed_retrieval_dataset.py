@@ -68,6 +68,8 @@ class KNNIndex(object):
     """
 
     _HDR_MAGIC = b'KNNRETM\x00\x00'
+    # magic, version, K, number of chunks and start chunk id
+    _HDR_SIZE = 9 + 8 + 8 + 8 + 8
 
     @classmethod
     def writer(cls, path, K, offset=0):
@@ -110,18 +112,53 @@ class KNNIndex(object):
 
         return _Writer()
 
-    def __init__(self, path, skip_warmup=True):
+    @classmethod
+    def allocate(cls, path, K, num_chunks, offset=0):
+        """
+        Creates an index file with room for the neighbors of `num_chunks` chunks, filled with zeros.
+        The map is then written in place through `open_map`, e.g. by several processes which
+        each handle a range of chunk ids, instead of writing shard files and merging them.
+        path: file path of the index
+        K: number of neighbors for a chunk
+        num_chunks: number of chunks in the index
+        offset: start chunk_id of the index
+        """
+        with open(path, 'wb') as f:
+            f.write(cls._HDR_MAGIC)
+            f.write(struct.pack('<Q', 1))
+            f.write(struct.pack('<Q', K))
+            f.write(struct.pack('<Q', num_chunks))
+            f.write(struct.pack('<Q', offset))
+            # sparse on most file systems, the space is only used once the neighbors are written
+            f.truncate(cls._HDR_SIZE + num_chunks * K * np.dtype(np.int64).itemsize)
+
+    @classmethod
+    def open_map(cls, path):
+        """
+        Returns a writable memory map of shape (number of chunks, K) over the KNN map of an index file,
+        and the start chunk id of the index.
+        """
+        K, length, chunk_start_id = cls._read_header(path)
+        knn_map = np.memmap(path, dtype=np.int64, mode='r+', offset=cls._HDR_SIZE, shape=(length, K))
+        return knn_map, chunk_start_id
+
+    @classmethod
+    def _read_header(cls, path):
         with open(path, 'rb') as stream:
             magic_test = stream.read(9)
-            assert self._HDR_MAGIC == magic_test, 'Index file doesn\'t match expected format. '
+            assert cls._HDR_MAGIC == magic_test, 'Index file doesn\'t match expected format. '
             version = struct.unpack('<Q', stream.read(8))
             assert (1,) == version
 
-            self.K = struct.unpack('<Q', stream.read(8))[0]
-            self.len = struct.unpack('<Q', stream.read(8))[0]
-            self.chunk_start_id = struct.unpack('<Q', stream.read(8))[0]
-            self.chunk_end_id = self.chunk_start_id + self.len
-            offset = stream.tell()
+            K = struct.unpack('<Q', stream.read(8))[0]
+            length = struct.unpack('<Q', stream.read(8))[0]
+            chunk_start_id = struct.unpack('<Q', stream.read(8))[0]
+        return K, length, chunk_start_id
+
+    def __init__(self, path, skip_warmup=True):
+        self.K, self.len, self.chunk_start_id = self._read_header(path)
+        self.chunk_end_id = self.chunk_start_id + self.len
+        offset = self._HDR_SIZE
 
         if not skip_warmup:
             logging.info("    warming up index mmap file...")
@@ -0,0 +1,152 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Utilities to pack several short fine-tuning examples into fixed size sequences."""
+
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from nemo.utils import logging
+
+__all__ = ['first_fit_decreasing', 'write_packed_sequences', 'load_packed_sequences']
+
+PACKED_FILES = ('tokens.npy', 'loss_mask.npy', 'segment_ids.npy', 'pack_offsets.npy')
+PACKED_META_FILE = 'meta.json'
+
+
+def first_fit_decreasing(seq_lens: Sequence[int], pack_size: int) -> List[List[int]]:
+    """
+    Packs sequences into bins of capacity `pack_size` with the first-fit-decreasing heuristic.
+    The first bin with enough room is found with a max segment tree over the remaining capacities,
+    so packing runs in O(n log n) instead of the O(n^2) of a linear scan over the open bins.
+
+    Args:
+        seq_lens: length of every sequence.
+        pack_size: capacity of every bin.
+
+    Returns:
+        List of packs, each one holding the indices of the sequences assigned to it.
+    """
+    seq_lens = np.asarray(seq_lens, dtype=np.int64)
+    if len(seq_lens) == 0:
+        return []
+    if seq_lens.max() > pack_size:
+        raise ValueError(f"Found a sequence of length {seq_lens.max()} which exceeds pack size {pack_size}")
+
+    num_leaves = 1
+    while num_leaves < len(seq_lens):
+        num_leaves *= 2
+    # tree[node] holds the largest remaining capacity among the bins below `node`, bins are the leaves
+    tree = [pack_size] * (2 * num_leaves)
+
+    packs = []
+    for seq_idx in np.argsort(-seq_lens, kind='stable').tolist():
+        seq_len = int(seq_lens[seq_idx])
+        node = 1
+        while node < num_leaves:
+            node = 2 * node if tree[2 * node] >= seq_len else 2 * node + 1
+        pack_idx = node - num_leaves
+        if pack_idx == len(packs):
+            packs.append([])
+        packs[pack_idx].append(seq_idx)
+
+        tree[node] -= seq_len
+        node //= 2
+        while node >= 1:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+    return packs
+
+
+def write_packed_sequences(
+    output_dir: str,
+    input_ids: Sequence[Sequence[int]],
+    loss_masks: Sequence[Sequence[float]],
+    packs: List[List[int]],
+    meta: Optional[Dict] = None,
+):
+    """
+    Writes packed sequences to `output_dir`. Tokens, loss masks and segment ids of all packs are
+    concatenated into flat arrays and `pack_offsets` marks where every pack starts. `meta.json` is written
+    last, so an interrupted run is detected and rebuilt on the next call.
+
+    Args:
+        output_dir: directory to write the packed files to.
+        input_ids: token ids of every example.
+        loss_masks: loss mask of every example, aligned with `input_ids`.
+        packs: indices of the examples of every pack, as returned by `first_fit_decreasing`.
+        meta: settings used to build the packs, used to check if the files can be reused.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    meta_path = os.path.join(output_dir, PACKED_META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    pack_lens = [sum(len(input_ids[i]) for i in pack) for pack in packs]
+    pack_offsets = np.zeros(len(packs) + 1, dtype=np.int64)
+    np.cumsum(pack_lens, out=pack_offsets[1:])
+    num_tokens = int(pack_offsets[-1])
+
+    open_memmap = np.lib.format.open_memmap
+    tokens = open_memmap(os.path.join(output_dir, 'tokens.npy'), mode='w+', dtype=np.int32, shape=(num_tokens,))
+    loss_mask = open_memmap(os.path.join(output_dir, 'loss_mask.npy'), mode='w+', dtype=np.uint8, shape=(num_tokens,))
+    segment_ids = open_memmap(
+        os.path.join(output_dir, 'segment_ids.npy'), mode='w+', dtype=np.int32, shape=(num_tokens,)
+    )
+    for pack, start in zip(packs, pack_offsets[:-1].tolist()):
+        for segment_id, example_idx in enumerate(pack):
+            end = start + len(input_ids[example_idx])
+            tokens[start:end] = input_ids[example_idx]
+            loss_mask[start:end] = loss_masks[example_idx]
+            segment_ids[start:end] = segment_id
+            start = end
+    tokens.flush()
+    loss_mask.flush()
+    segment_ids.flush()
+    np.save(os.path.join(output_dir, 'pack_offsets.npy'), pack_offsets)
+
+    meta = dict(meta or {})
+    meta.update({'num_packs': len(packs), 'num_examples': sum(len(pack) for pack in packs), 'num_tokens': num_tokens})
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    logging.info(
+        f"Packed {meta['num_examples']} examples into {len(packs)} sequences "
+        f"({num_tokens / max(len(packs), 1):.1f} tokens per sequence on average) in {output_dir}"
+    )
+
+
+def load_packed_sequences(output_dir: str, meta: Optional[Dict] = None) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Memory maps packed sequences written by `write_packed_sequences`.
+
+    Args:
+        output_dir: directory the packed files were written to.
+        meta: if given, the files are only loaded when they were built with the same settings.
+
+    Returns:
+        Dictionary with `tokens`, `loss_mask`, `segment_ids` and `pack_offsets`,
+        or None if the files are missing, incomplete or built with different settings.
+    """
+    meta_path = os.path.join(output_dir, PACKED_META_FILE)
+    if not os.path.exists(meta_path) or not all(os.path.exists(os.path.join(output_dir, f)) for f in PACKED_FILES):
+        return None
+    with open(meta_path, 'r') as f:
+        saved_meta = json.load(f)
+    if meta is not None and any(saved_meta.get(k) != v for k, v in meta.items()):
+        logging.info(f"Packed sequences in {output_dir} were built with different settings")
+        return None
+    return {f[: -len('.npy')]: np.load(os.path.join(output_dir, f), mmap_mode='r') for f in PACKED_FILES}
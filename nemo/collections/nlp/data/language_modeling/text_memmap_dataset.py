@@ -43,23 +43,75 @@ def _build_index_from_memdata(fn, newline_int):
     mdata = np.memmap(fn, dtype=np.uint8, mode="r")
     # find newline positions
     midx = np.where(mdata == newline_int)[0]
-    midx_dtype = midx.dtype
-    # make sure to account for all data
-    midx = midx.tolist()
+    midx = _finalize_index(midx, len(mdata))
+
+    # free memmap
+    mdata._mmap.close()
+    del mdata
+
+    return midx
+
+
+def _find_newlines_in_range(task):
+    """
+    Find delimiter positions within the byte range [start, end) of a file.
+    Used by build_index_files to scan large files in parallel chunks.
+
+    Args:
+        task: tuple of (fn, newline_int, start, end).
+
+    Returns a 1D array of ints with absolute positions in the file.
+    """
+    fn, newline_int, start, end = task
+    mdata = np.memmap(fn, dtype=np.uint8, mode="r")
+    midx = np.where(mdata[start:end] == newline_int)[0] + start
+
+    # free memmap
+    mdata._mmap.close()
+    del mdata
+
+    return midx
+
+
+def _finalize_index(midx, data_len):
+    """
+    Account for the last sample in case there is no delimiter at the end of the file,
+    and remove empty lines from the end of the file.
+    """
     # add last item in case there is no new-line at the end of the file
-    if (len(midx) == 0) or (midx[-1] + 1 != len(mdata)):
-        midx = midx + [len(mdata) + 1]
+    if (len(midx) == 0) or (midx[-1] + 1 != data_len):
+        midx = np.append(midx, data_len + 1)
 
     # remove empty lines from end of file
-    while len(midx) > 1 and (midx[-1] - midx[-2]) < 2:
-        midx.pop(-1)
-    midx = np.asarray(midx, dtype=midx_dtype)
+    num_lines = len(midx)
+    while num_lines > 1 and (midx[num_lines - 1] - midx[num_lines - 2]) < 2:
+        num_lines -= 1
+
+    return midx[:num_lines]
+
+
+def _count_tokens_in_lines(fn, token_count_fn, line_ranges):
+    """
+    Count the tokens of lines in a file.
+
+    Args:
+        fn: file name.
+        token_count_fn: a callable token_count_fn(text) -> int.
+        line_ranges: tuple of (starts, ends) byte positions of the lines.
+
+    Returns a 1D array of token counts.
+    """
+    mdata = np.memmap(fn, dtype=np.uint8, mode="r")
+    starts, ends = line_ranges
+    token_counts = np.array(
+        [token_count_fn(mdata[i:j].tobytes().decode("utf-8")) for i, j in zip(starts, ends)], dtype=np.int32
+    )
 
     # free memmap
     mdata._mmap.close()
     del mdata
 
-    return midx
+    return token_counts
 
 
 class TextMemMapDataset(Dataset):
@@ -107,6 +159,7 @@ class TextMemMapDataset(Dataset):
         self._header_lines = header_lines
         self._files_list = dataset_paths
         self._worker = workers
+        self._index_mapping_dir = index_mapping_dir
         self.tokenizer = tokenizer
         self._sort_dataset_paths = sort_dataset_paths
 
@@ -282,6 +335,24 @@ class TextMemMapDataset(Dataset):
 
         return (mdata, midx)
 
+    def load_token_counts(self):
+        """
+        Loads the number of tokens of every sample, which allows length-aware batching without reading the text.
+        Token counts are stored next to the index files by build_index_files when a token_count_fn is given.
+
+        Returns:
+            token_counts - 1D array with the number of tokens of every sample, or None if token counts are missing
+        """
+        token_counts = []
+        for fn in self._files_list:
+            token_counts_fn = _token_counts_fn(_index_fn(fn, self._index_mapping_dir))
+            if not os.path.exists(token_counts_fn):
+                logging.warning(f"Token counts for {fn} are not found: {token_counts_fn}")
+                return None
+            token_counts.append(np.load(token_counts_fn, mmap_mode="r")[self._header_lines :])
+
+        return np.concatenate(token_counts)
+
 
 class CSVMemMapDataset(TextMemMapDataset):
     """
@@ -484,6 +555,36 @@ def _index_fn(fn: str, index_mapping_dir: str) -> str:
     return idx_fn
 
 
+def _token_counts_fn(idx_fn: str) -> str:
+    """Return file name of per-line token counts associated with index files"""
+    return f"{idx_fn}.tokens.npy"
+
+
+def _save_array(fn: str, arr: np.ndarray):
+    """Save array to a temporary file first, so that interrupted runs never leave a partial file behind"""
+    tmp_fn = f"{fn}.tmp"
+    with open(tmp_fn, "wb") as f:
+        np.save(f, arr, allow_pickle=True)
+    os.replace(tmp_fn, fn)
+
+
+def _save_memmap_index_files(midx, newline_int, idx_fn: str):
+    """Helper function to save index files. The metadata file is saved last to mark the index as complete"""
+    # validate midx
+    midx = np.asarray(midx)
+    if not np.issubdtype(midx.dtype, np.integer):
+        raise TypeError(f"midx must be an integer array, but got type = {midx.dtype}")
+
+    # create e metadata file
+    data = dict(newline_int=newline_int, version=__idx_version__)
+
+    # save index as numpy array to enable memmap reading
+    logging.info(f"Saving idx file = {idx_fn}.npy")
+    _save_array(idx_fn + ".npy", midx)
+    logging.info(f"Saving metadata file = {idx_fn}.info")
+    pickle.dump(data, open(idx_fn + ".info", "wb"))
+
+
 def _build_memmap_index_files(newline_int, build_index_fn, fn, index_mapping_dir: str):
     """Helper function to build an index file"""
     idx_fn = _index_fn(fn, index_mapping_dir)
@@ -495,42 +596,92 @@ def _build_memmap_index_files(newline_int, build_index_fn, fn, index_mapping_dir
         logging.info(f"Building indexing for fn = {fn}")
         # find all newline positions
         midx = build_index_fn(fn, newline_int)
-        # validate midx
-        midx = np.asarray(midx)
-        if not np.issubdtype(midx.dtype, np.integer):
-            raise TypeError(f"midx must be an integer array, but got type = {midx.dtype}")
-
-        # create e metadata file
-        data = dict(newline_int=newline_int, version=__idx_version__)
-
-        # save index as numpy array to enable memmap reading
-        logging.info(f"Saving idx file = {idx_fn}.npy")
-        np.save(idx_fn + ".npy", midx, allow_pickle=True)
-        logging.info(f"Saving metadata file = {idx_fn}.info")
-        pickle.dump(data, open(idx_fn + ".info", "wb"))
+        _save_memmap_index_files(midx, newline_int, idx_fn)
 
         return True
 
 
 def build_index_files(
-    dataset_paths, newline_int, workers=None, build_index_fn=_build_index_from_memdata, index_mapping_dir: str = None,
+    dataset_paths,
+    newline_int,
+    workers=None,
+    build_index_fn=_build_index_from_memdata,
+    index_mapping_dir: str = None,
+    token_count_fn: Optional[Callable[[str], int]] = None,
+    chunk_size: int = 256 * 1024 * 1024,
 ):
-    """Auxiliary method to build multiple index files"""
+    """
+    Auxiliary method to build multiple index files.
+
+    Files with existing index files are skipped, so an interrupted run can be resumed.
+    With the default build_index_fn files are split into byte ranges of chunk_size which are
+    scanned for newlines in parallel, so a single large file makes use of all workers.
+
+    Args:
+        dataset_paths: list of text file paths.
+        newline_int: ASCII code to use to interpret newlines in file.
+        workers: number of workers to use for creating index files.
+        build_index_fn: a callable build_index_fn(fn, newline_int) -> midx [np.array].
+        index_mapping_dir: directory to save the index mapping to.
+            If None, will write to the same folder as the dataset.
+        token_count_fn: an optional pickleable callable token_count_fn(text) -> int.
+            If given, the number of tokens of every line is saved next to the index files
+            (see TextMemMapDataset.load_token_counts).
+        chunk_size: size in bytes of the chunks of a file scanned by a single worker.
+    """
     if len(dataset_paths) < 1:
         raise ValueError("files_list must contain at leat one file name")
 
     if workers is None:
         workers = max(1, os.cpu_count() // 2)
 
-    logging.info(f"Processing {len(dataset_paths)} data files using {workers} workers")
+    idx_fns = [_index_fn(fn, index_mapping_dir) for fn in dataset_paths]
+    missing_index = [(fn, idx_fn) for fn, idx_fn in zip(dataset_paths, idx_fns) if not _index_file_exists(idx_fn)]
+    missing_token_counts = []
+    if token_count_fn is not None:
+        missing_token_counts = [
+            (fn, idx_fn) for fn, idx_fn in zip(dataset_paths, idx_fns) if not os.path.exists(_token_counts_fn(idx_fn))
+        ]
+
+    logging.info(
+        f"Processing {len(dataset_paths)} data files using {workers} workers, "
+        f"{len(dataset_paths) - len(missing_index)} already indexed"
+    )
     # load all files into memmap
     start_time = time.time()
     with mp.Pool(workers) as p:
-        build_status = p.map(
-            partial(_build_memmap_index_files, newline_int, build_index_fn, index_mapping_dir=index_mapping_dir,),
-            dataset_paths,
+        if build_index_fn is _build_index_from_memdata:
+            # split every file into byte ranges and scan all of them in a single pool
+            tasks, num_chunks = [], []
+            for fn, _ in missing_index:
+                starts = range(0, max(os.path.getsize(fn), 1), chunk_size)
+                tasks.extend((fn, newline_int, start, start + chunk_size) for start in starts)
+                num_chunks.append(len(starts))
+            chunk_midx = p.imap(_find_newlines_in_range, tasks)
+            # results come in order, each file is saved as soon as all of its chunks are scanned
+            for (fn, idx_fn), n in zip(missing_index, num_chunks):
+                logging.info(f"Building indexing for fn = {fn}")
+                midx = np.concatenate([next(chunk_midx) for _ in range(n)])
+                midx = _finalize_index(midx, os.path.getsize(fn))
+                _save_memmap_index_files(midx, newline_int, idx_fn)
+        else:
+            p.map(
+                partial(_build_memmap_index_files, newline_int, build_index_fn, index_mapping_dir=index_mapping_dir,),
+                [fn for fn, _ in missing_index],
+            )
+
+        logging.info(
+            f"Time building {len(missing_index)} / {len(dataset_paths)} mem-mapped files: {datetime.timedelta(seconds=time.time() - start_time)}"
         )
 
-    logging.info(
-        f"Time building {sum(build_status)} / {len(build_status)} mem-mapped files: {datetime.timedelta(seconds=time.time() - start_time)}"
-    )
+        for fn, idx_fn in missing_token_counts:
+            logging.info(f"Counting tokens for fn = {fn}")
+            midx = np.load(idx_fn + ".npy", allow_pickle=True)
+            starts = np.concatenate([[0], midx[:-1] + 1])
+            num_blocks = max(1, min(len(midx), 4 * workers))
+            token_counts = p.map(
+                partial(_count_tokens_in_lines, fn, token_count_fn),
+                zip(np.array_split(starts, num_blocks), np.array_split(midx, num_blocks)),
+            )
+            logging.info(f"Saving token counts file = {_token_counts_fn(idx_fn)}")
+            _save_array(_token_counts_fn(idx_fn), np.concatenate(token_counts))
@@ -17,7 +17,7 @@ from functools import partial
 from typing import Any, Optional
 
 import torch
-from omegaconf import DictConfig, ListConfig
+from omegaconf import DictConfig, ListConfig, open_dict
 from pytorch_lightning.trainer.trainer import Trainer
 
 from nemo.collections.common.metrics import MetricStringToTorchMetric
@@ -26,7 +26,7 @@ from nemo.collections.nlp.data.language_modeling.megatron.base_dataset_utils imp
 )
 from nemo.collections.nlp.data.language_modeling.megatron.blendable_dataset import BlendableDataset
 from nemo.collections.nlp.data.language_modeling.megatron.gpt_sft_chat_dataset import GPTSFTChatDataset
-from nemo.collections.nlp.data.language_modeling.megatron.gpt_sft_dataset import GPTSFTDataset
+from nemo.collections.nlp.data.language_modeling.megatron.gpt_sft_dataset import GPTSFTDataset, GPTSFTPackedDataset
 from nemo.collections.nlp.data.language_modeling.megatron.megatron_batch_samplers import (
     MegatronPretrainingBatchSampler,
 )
@@ -73,6 +73,7 @@ class MegatronGPTSFTModel(NLPAdapterModelMixin, MegatronGPTModel):
             raise ImportError(
                 "Apex was not found. Please see the NeMo README for installation instructions: https://github.com/NVIDIA/NeMo#megatron-gpt."
             )
+        self._setup_packed_sequence_attention(cfg)
         super().__init__(cfg, trainer=trainer)
         self.sep_id = cfg.get('sep_id', 49704)
         if hasattr(self.cfg.data, "validation_ds"):
@@ -98,6 +99,33 @@ class MegatronGPTSFTModel(NLPAdapterModelMixin, MegatronGPTModel):
         self._reset_sequence_parallelism_args()
         self.virtual_tokens = 0
 
+    @staticmethod
+    def _setup_packed_sequence_attention(cfg: DictConfig):
+        """
+        Packed sequences are trained with a block diagonal attention mask, so that examples of a pack don't attend to
+        each other. The mask has to be passed to the model and applied by the unfused softmax, since the fused causal
+        softmax, flash attention and the attention of Transformer Engine and Megatron Core apply a causal mask instead.
+        """
+        train_ds_cfg = cfg.get('data', {}).get('train_ds', {})
+        if not train_ds_cfg.get('packed_sequence', False):
+            return
+
+        if cfg.get('mcore_gpt', False) or cfg.get('transformer_engine', False):
+            raise ValueError(
+                'packed_sequence is not supported with mcore_gpt or transformer_engine, '
+                'which ignore the attention mask of packed sequences'
+            )
+        if cfg.get('use_flash_attention', False):
+            raise ValueError('packed_sequence is not supported with use_flash_attention')
+
+        if cfg.get('get_attention_mask_from_fusion', True) or cfg.get('masked_softmax_fusion', True):
+            logging.info(
+                'Setting get_attention_mask_from_fusion and masked_softmax_fusion to False for packed_sequence'
+            )
+            with open_dict(cfg):
+                cfg.get_attention_mask_from_fusion = False
+                cfg.masked_softmax_fusion = False
+
     def setup_metric(self, data_cfg):
         metric_name = "exact_string_match"
         if not hasattr(data_cfg, "metric"):
@@ -261,8 +289,17 @@ class MegatronGPTSFTModel(NLPAdapterModelMixin, MegatronGPTModel):
             data_cfg.max_seq_length = self.cfg.max_position_embeddings
 
         for file_path, num_samples in zip(data_cfg.file_names, num_train_samples_per_dataset):
+            dataset_kwargs = {}
             if self.cfg.data.get("chat", False):
+                if is_train and data_cfg.get('packed_sequence', False):
+                    raise ValueError('packed_sequence is not supported with chat datasets')
                 dataset_cls = GPTSFTChatDataset
+            elif is_train and data_cfg.get('packed_sequence', False):
+                dataset_cls = GPTSFTPackedDataset
+                dataset_kwargs = {
+                    'packed_dir': data_cfg.get('packed_dir', None),
+                    'pack_size': data_cfg.get('pack_size', None),
+                }
             else:
                 dataset_cls = GPTSFTDataset
             dataset = dataset_cls(
@@ -298,6 +335,7 @@ class MegatronGPTSFTModel(NLPAdapterModelMixin, MegatronGPTModel):
                 special_tokens=self.cfg.data.get(
                     'chat_prompt_tokens', None
                 ),  # special tokens for the chat prompts, a dictionary of {token_type: token}. Default: {'system_turn_start': '<extra_id_0>', 'turn_start': '<extra_id_1>', 'label_start': '<extra_id_2>', 'end_of_turn': '\n', "end_of_name": "\n"}
+                **dataset_kwargs,
             )
             datasets.append(dataset)
         if is_train:
@@ -18,12 +18,18 @@ import threading
 import time
 from typing import List, Union
 
+import numpy as np
 import torch
 from flask import Flask, jsonify, request
 from flask_restful import Api, Resource
 from sentence_transformers import SentenceTransformer
 
 from nemo.collections.common.tokenizers.tokenizer_spec import TokenizerSpec
+from nemo.collections.nlp.modules.common.megatron.retrieval_services.util import (
+    LRUCache,
+    MicroBatcher,
+    normalize_query,
+)
 
 BERT_RETRIEVER_PORT_NUM = 17190
 
@@ -32,10 +38,12 @@ class SentenceBertResource(Resource):
     """
     SentenceBERT Flask resource.
     The PUT method is to get token/str embedding.
+    Embeddings are cached by normalized text and the sentences of concurrent requests are encoded together
+    when a MicroBatcher is given.
     """
 
     def __init__(
-        self, bert_model, tokenizer, pool, sentence_bert_batch,
+        self, bert_model, tokenizer, pool, sentence_bert_batch, encoder=None, cache=None,
     ):
         # server
         self.bert_model = bert_model
@@ -43,6 +51,8 @@ class SentenceBertResource(Resource):
         self.pool = pool
         self.sentence_bert_batch = sentence_bert_batch
         self.embedding_dim = self.bert_model.get_sentence_embedding_dimension()
+        self.encoder = encoder if encoder is not None else self.encode
+        self.cache = cache if cache is not None else LRUCache(max_size=0)
 
     def put(self):
         data = request.get_json()
@@ -62,10 +72,22 @@ class SentenceBertResource(Resource):
                 text = self.tokenizer.ids_to_text(q)
                 sentence_list.append(text)
             query = sentence_list
-        emb = self.bert_model.encode_multi_process(
-            sentences=query, pool=self.pool, batch_size=self.sentence_bert_batch
+        keys = [normalize_query(q) for q in query]
+        embs = {key: self.cache.get(key) for key in keys}
+        # the normalized text is only the cache key, the original text of the first query with the key is encoded
+        missing = {}
+        for key, q in zip(keys, query):
+            if embs[key] is None and key not in missing:
+                missing[key] = q
+        for key, emb in zip(missing, self.encoder(list(missing.values()))):
+            self.cache.put(key, emb)
+            embs[key] = emb
+        return np.stack([embs[key] for key in keys], axis=0)
+
+    def encode(self, sentences: List[str]):
+        return self.bert_model.encode_multi_process(
+            sentences=sentences, pool=self.pool, batch_size=self.sentence_bert_batch
         )
-        return emb
 
 
 class SentenceBertServer(object):
@@ -80,6 +102,8 @@ class SentenceBertServer(object):
         tokenizer: TokenizerSpec,
         sentence_bert: str = 'all-mpnet-base-v2',
         sentence_bert_batch: int = 4,
+        cache_size: int = 10000,
+        max_batch_size: int = 256,
     ):
         self.app = Flask(__name__, static_url_path='')
 
@@ -93,11 +117,26 @@ class SentenceBertServer(object):
         self.tokenizer = tokenizer
         self.pool = self.bert_model.start_multi_process_pool(device_list)
         self.sentence_bert_batch = sentence_bert_batch
+        # shared by all requests, flask creates a new resource for every request
+        self.cache = LRUCache(max_size=cache_size)
+        self.encoder = MicroBatcher(
+            lambda sentences: self.bert_model.encode_multi_process(
+                sentences=sentences, pool=self.pool, batch_size=self.sentence_bert_batch
+            ),
+            max_batch_size=max_batch_size,
+        )
         api = Api(self.app)
         api.add_resource(
             SentenceBertResource,
             '/knn',
-            resource_class_args=[self.bert_model, self.tokenizer, self.pool, self.sentence_bert_batch,],
+            resource_class_args=[
+                self.bert_model,
+                self.tokenizer,
+                self.pool,
+                self.sentence_bert_batch,
+                self.encoder,
+                self.cache,
+            ],
         )
 
     def run(self, url, port=None):
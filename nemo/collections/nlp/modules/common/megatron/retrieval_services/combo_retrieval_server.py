@@ -14,6 +14,7 @@
 
 import pickle
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Union
 
 import faiss
@@ -38,9 +39,11 @@ class ComboRetrievalResource(Resource):
     The PUT method is to get KNN tokens, add new chunks, reset index.
     """
 
-    def __init__(self, retrieval_services, weight_container):
+    def __init__(self, retrieval_services, weight_container, executor=None):
         self.retrieval_services = retrieval_services
         self.updatable = any([service.updatable for service in retrieval_services])
+        # queries the services concurrently
+        self.executor = executor
 
         self.weight_container = weight_container
         weights = np.array(weight_container[0])
@@ -54,8 +57,8 @@ class ComboRetrievalResource(Resource):
             sentences = data['sentences']
             # do knn query
             num_neighbors = data['neighbors']
-            with lock:  # Need to get lock to keep multiple threads from hitting code
-                neighbors = self.get_knn(sentences, num_neighbors)
+            # no lock, the child services batch concurrent queries themselves
+            neighbors = self.get_knn(sentences, num_neighbors)
             return jsonify(neighbors.tolist())
         elif 'reset' in data:
             with lock:  # Need to get lock to keep multiple threads from hitting code
@@ -103,7 +106,7 @@ class ComboRetrievalResource(Resource):
         if neighbors == 0:
             return self.retrieval_services[0].get_knn(query, 0)
         total_neighbors = 0
-        results = []
+        requests = []
         for i, service in enumerate(self.retrieval_services):
             k = int(neighbors * weights[i])
             if i == len(self.retrieval_services) - 1:
@@ -112,8 +115,12 @@ class ComboRetrievalResource(Resource):
             if k == 0:
                 # empty, skip it
                 continue
-            result = service.get_knn(query, k)
-            results.append(result)
+            requests.append((service, k))
+        if self.executor is None or len(requests) == 1:
+            results = [service.get_knn(query, k) for service, k in requests]
+        else:
+            futures = [self.executor.submit(service.get_knn, query, k) for service, k in requests]
+            results = [future.result() for future in futures]
         return np.concatenate(results, axis=1)
 
     def add_docs_to_index(self, query: List[str], add_eos: bool = True):
@@ -174,10 +181,11 @@ class ComboRetrievalServer(object):
             services.append(service)
         self.weight_container = [weights]
         self.tokenizer = tokenizer
+        self.executor = ThreadPoolExecutor(max_workers=len(services))
 
         api = Api(self.app)
         api.add_resource(
-            ComboRetrievalResource, '/knn', resource_class_args=[services, self.weight_container,],
+            ComboRetrievalResource, '/knn', resource_class_args=[services, self.weight_container, self.executor],
         )
 
     def run(self, url, port=None):
@@ -18,6 +18,7 @@ import pickle
 import threading
 import time
 from collections import namedtuple
+from functools import partial
 from typing import List
 
 import faiss
@@ -29,8 +30,14 @@ from flask_restful import Api
 from nemo.collections.common.tokenizers.tokenizer_spec import TokenizerSpec
 from nemo.collections.nlp.modules.common.megatron.retrieval_services.static_retrieval_server import (
     FaissRetrievalResource,
+    search_batch,
+)
+from nemo.collections.nlp.modules.common.megatron.retrieval_services.util import (
+    LRUCache,
+    MicroBatcher,
+    lock,
+    request_data,
 )
-from nemo.collections.nlp.modules.common.megatron.retrieval_services.util import lock, request_data
 
 # define this type to mimic the indexed dataset
 DType = namedtuple('DType', ['dtype'])
@@ -81,8 +88,10 @@ class DynamicRetrievalResource(FaissRetrievalResource):
         query_bert_ip,
         query_bert_port,
         output_filename,
+        searcher=None,
+        cache=None,
     ):
-        super().__init__(index, tokenizer, store, query_bert_ip, query_bert_port)
+        super().__init__(index, tokenizer, store, query_bert_ip, query_bert_port, searcher=searcher, cache=cache)
         self.chunk_size = chunk_size
         self.stride = stride
         self.pad_id = self.tokenizer.pad_id
@@ -96,8 +105,8 @@ class DynamicRetrievalResource(FaissRetrievalResource):
             sentences = data['sentences']
             # do knn query
             num_neighbors = data['neighbors']
-            with lock:  # Need to get lock to keep multiple threads from hitting code
-                neighbors = self.get_knn(sentences, num_neighbors)
+            # the index is locked by search_batch, not here, so that concurrent requests can be batched
+            neighbors = self.get_knn(sentences, num_neighbors)
             return jsonify(neighbors.tolist())
         elif 'reset' in data:
             with lock:  # Need to get lock to keep multiple threads from hitting code
@@ -125,6 +134,7 @@ class DynamicRetrievalResource(FaissRetrievalResource):
     def reset(self):
         self.index.reset()
         self.ds.reset()
+        self.cache.clear()
 
     def add_docs_to_index(self, docs: List[str], add_eos: bool = True):
         """
@@ -153,6 +163,8 @@ class DynamicRetrievalResource(FaissRetrievalResource):
             emb_data = base64.b64decode(emb.encode())
             emb = pickle.loads(emb_data)
             self.index.add(emb)  # add vectors to the index
+        # cached neighbors may be outdated now
+        self.cache.clear()
 
 
 class DynamicRetrievalServer(object):
@@ -173,6 +185,8 @@ class DynamicRetrievalServer(object):
         query_bert_ip: str = None,
         query_bert_port: int = 0,
         output_filename: str = 'dynamic_db',
+        cache_size: int = 10000,
+        max_batch_size: int = 256,
     ):
         self.app = Flask(__name__, static_url_path='')
         has_gpu = torch.cuda.is_available() and hasattr(faiss, "index_gpu_to_cpu")
@@ -207,6 +221,9 @@ class DynamicRetrievalServer(object):
             logging.info(f'convert Faiss db to GPU takes {end - beg} s')
 
         self.tokenizer = tokenizer
+        # shared by all requests, flask creates a new resource for every request
+        self.searcher = MicroBatcher(partial(search_batch, self.index), max_batch_size=max_batch_size)
+        self.cache = LRUCache(max_size=cache_size)
 
         api = Api(self.app)
         api.add_resource(
@@ -223,6 +240,8 @@ class DynamicRetrievalServer(object):
                 query_bert_ip,
                 query_bert_port,
                 output_filename,
+                self.searcher,
+                self.cache,
             ],
         )
 
@@ -17,6 +17,7 @@ import logging
 import pickle
 import threading
 import time
+from functools import partial
 from typing import List, Union
 
 import faiss
@@ -27,17 +28,25 @@ from flask_restful import Api, Resource
 
 from nemo.collections.common.tokenizers.tokenizer_spec import TokenizerSpec
 from nemo.collections.nlp.data.language_modeling.megatron.indexed_retrieval_dataset import MMapRetrievalIndexedDataset
-from nemo.collections.nlp.modules.common.megatron.retrieval_services.util import lock, request_data
+from nemo.collections.nlp.modules.common.megatron.retrieval_services.util import (
+    LRUCache,
+    MicroBatcher,
+    lock,
+    normalize_query,
+    request_data,
+)
 
 
 class FaissRetrievalResource(Resource):
     """
     Static Faiss Retrieval Flask resource.
     The PUT method is to get KNN tokens.
+    Neighbors are cached by normalized query text and the queries of concurrent requests are searched
+    together when a MicroBatcher wrapping search_batch is given.
     """
 
     def __init__(
-        self, index, tokenizer, ds, query_bert_ip, query_bert_port,
+        self, index, tokenizer, ds, query_bert_ip, query_bert_port, searcher=None, cache=None,
     ):
         # server
         self.index = index
@@ -48,13 +57,15 @@ class FaissRetrievalResource(Resource):
         self.chunk_size = ds.chunk_size
         pad_id = self.tokenizer.pad_id
         self.no_retrieval = np.ones((1, 1, 2 * self.chunk_size), dtype=ds._index.dtype) * pad_id
+        self.searcher = searcher if searcher is not None else partial(search_batch, self.index)
+        self.cache = cache if cache is not None else LRUCache(max_size=0)
 
     def put(self):
         data = request.get_json()
         sentences = data['sentences']
         num_neighbors = data['neighbors']
-        with lock:  # Need to get lock to keep multiple threads from hitting code
-            neighbors = self.get_knn(sentences, num_neighbors)
+        # the index is locked by search_batch, not here, so that concurrent requests can be batched
+        neighbors = self.get_knn(sentences, num_neighbors)
         return jsonify(neighbors.tolist())
         # check keys
 
@@ -72,28 +83,53 @@ class FaissRetrievalResource(Resource):
                 text = self.tokenizer.ids_to_text(q)
                 sentence_list.append(text)
             query = sentence_list
-        emb = request_data(query, self.query_bert_ip, self.query_bert_port)
-        emb_data = base64.b64decode(emb.encode())
-        emb = pickle.loads(emb_data)
-        if self.index.ntotal == 0:
-            # A workaround to fix searching an empty Faiss index
-            knn = [[-1] * neighbors for i in range(len(emb))]
-        else:
-            _, knn = self.index.search(emb, neighbors)
-        results = []
-        for sentence_neighbors in knn:
-            chunks = []
-            for neighbor_chunk_id in sentence_neighbors:
-                chunk_id = self.ds.get_chunk(neighbor_chunk_id)
-                chunks.append(chunk_id)
-            chunks = np.stack(chunks, axis=0).astype(np.int64)
-            results.append(chunks)
+        keys = [(normalize_query(q), neighbors) for q in query]
+        cached = {key: self.cache.get(key) for key in keys}
+        # the normalized text is only the cache key, the original text of the first query with the key is searched
+        missing = {}
+        for key, q in zip(keys, query):
+            if cached[key] is None and key not in missing:
+                missing[key] = q
+        if missing:
+            generation = self.cache.generation
+            emb = request_data(list(missing.values()), self.query_bert_ip, self.query_bert_port)
+            emb_data = base64.b64decode(emb.encode())
+            emb = pickle.loads(emb_data)
+            knn = self.searcher([(sentence_emb, neighbors) for sentence_emb in emb])
+            with lock:
+                for key, sentence_neighbors in zip(missing, knn):
+                    chunks = []
+                    for neighbor_chunk_id in sentence_neighbors:
+                        chunk_id = self.ds.get_chunk(neighbor_chunk_id)
+                        chunks.append(chunk_id)
+                    cached[key] = np.stack(chunks, axis=0).astype(np.int64)
+                    # skip results computed before the index was updated
+                    if self.cache.generation == generation:
+                        self.cache.put(key, cached[key])
+        results = [cached[key] for key in keys]
         if single_sentence:
             # unpack the single sentence input
             return results[0]
         return np.stack(results, axis=0).astype(np.int64)
 
 
+def search_batch(index, queries):
+    """
+    Searches the index once for a list of (embedding, number of neighbors) queries
+    and returns the neighbor ids of every query.
+    """
+    emb = np.stack([query_emb for query_emb, _ in queries], axis=0)
+    max_neighbors = max(neighbors for _, neighbors in queries)
+    with lock:  # Need to get lock to keep multiple threads from hitting code
+        if index.ntotal == 0:
+            # A workaround to fix searching an empty Faiss index
+            knn = np.full((len(emb), max_neighbors), -1, dtype=np.int64)
+        else:
+            _, knn = index.search(emb, max_neighbors)
+    # neighbors are sorted by distance, so a query with fewer neighbors gets a prefix of the results
+    return [sentence_neighbors[:neighbors] for sentence_neighbors, (_, neighbors) in zip(knn, queries)]
+
+
 class RetrievalServer(object):
     """
     Flask Retrieval server, which helps to get the KNN tokens given the query chunk
@@ -108,6 +144,8 @@ class RetrievalServer(object):
         tokenizer: TokenizerSpec,
         query_bert_ip: str,
         query_bert_port: int = None,
+        cache_size: int = 10000,
+        max_batch_size: int = 256,
     ):
         self.app = Flask(__name__, static_url_path='')
         # server
@@ -131,11 +169,22 @@ class RetrievalServer(object):
         self.index.nprobe = nprobe
         self.tokenizer = tokenizer
         self.ds = MMapRetrievalIndexedDataset(retrieval_index)
+        # shared by all requests, flask creates a new resource for every request
+        self.searcher = MicroBatcher(partial(search_batch, self.index), max_batch_size=max_batch_size)
+        self.cache = LRUCache(max_size=cache_size)
         api = Api(self.app)
         api.add_resource(
             FaissRetrievalResource,
             '/knn',
-            resource_class_args=[self.index, self.tokenizer, self.ds, query_bert_ip, query_bert_port],
+            resource_class_args=[
+                self.index,
+                self.tokenizer,
+                self.ds,
+                query_bert_ip,
+                query_bert_port,
+                self.searcher,
+                self.cache,
+            ],
         )
 
     def run(self, url, port=None):
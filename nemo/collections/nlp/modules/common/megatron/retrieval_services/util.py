@@ -14,6 +14,8 @@
 
 import json
 import threading
+import time
+from collections import OrderedDict, deque
 
 import requests
 
@@ -21,7 +23,7 @@ headers = {"Content-Type": "application/json"}
 
 lock = threading.Lock()
 
-__all__ = ["request_data", "lock"]
+__all__ = ["request_data", "lock", "normalize_query", "LRUCache", "MicroBatcher"]
 
 
 def request_data(data, ip='localhost', port=None):
@@ -45,3 +47,116 @@ def convert_retrieved_to_md(retrieved):
                 output_str += f"<tr><td>{neighbor}</td></tr>"
     output_str += '</table>'
     return output_str
+
+
+def normalize_query(text):
+    """ Normalizes the whitespace of a query, so that equivalent queries share cache entries """
+    return ' '.join(text.split())
+
+
+class LRUCache(object):
+    """
+    Thread safe least recently used cache.
+
+    Args:
+        max_size: maximum number of entries, 0 disables the cache
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        # incremented by clear, lets writers detect that their value was computed before the cache was invalidated
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MicroBatcher(object):
+    """
+    Merges the items submitted by concurrent threads into a single call of batch_fn, made from a worker thread.
+    Items which arrive while a batch is running are merged into the next one.
+
+    Args:
+        batch_fn: function mapping a list of items to a list of results of the same length
+        max_batch_size: maximum number of items passed to batch_fn at once
+        max_wait_time: seconds to wait for more items before calling batch_fn with a batch that is not full
+    """
+
+    def __init__(self, batch_fn, max_batch_size=256, max_wait_time=0.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __call__(self, items):
+        """ Returns the results of the given items, blocks until they are computed """
+        if len(items) == 0:
+            return []
+        job = {'items': list(items), 'results': None, 'error': None, 'done': threading.Event()}
+        with self._condition:
+            self._queue.append(job)
+            self._condition.notify()
+        job['done'].wait()
+        if job['error'] is not None:
+            raise job['error']
+        return job['results']
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+            deadline = time.monotonic() + self.max_wait_time
+            while True:
+                num_items = sum(len(job['items']) for job in self._queue)
+                timeout = deadline - time.monotonic()
+                if num_items >= self.max_batch_size or timeout <= 0:
+                    break
+                self._condition.wait(timeout)
+            # always take the first job, even if it is larger than max_batch_size
+            jobs = [self._queue.popleft()]
+            num_items = len(jobs[0]['items'])
+            while self._queue and num_items + len(self._queue[0]['items']) <= self.max_batch_size:
+                jobs.append(self._queue.popleft())
+                num_items += len(jobs[-1]['items'])
+            return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._next_batch()
+            try:
+                results = self.batch_fn([item for job in jobs for item in job['items']])
+                start = 0
+                for job in jobs:
+                    job['results'] = results[start : start + len(job['items'])]
+                    start += len(job['items'])
+            except Exception as e:
+                for job in jobs:
+                    job['error'] = e
+            for job in jobs:
+                job['done'].set()
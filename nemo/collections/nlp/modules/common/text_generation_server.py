@@ -13,8 +13,10 @@
 # limitations under the License.
 """Utilities for generating text."""
 
+import collections
 import json
 import threading
+import time
 
 import torch
 from flask import Flask, jsonify, request
@@ -30,6 +32,12 @@ from nemo.utils import logging
 GENERATE_NUM = 0
 lock = threading.Lock()
 
+# sampling parameters which generate accepts per prompt, requests differing only in these can share a batch
+PER_ROW_PARAMS = ['temperature', 'top_k', 'top_p', 'repetition_penalty']
+
+# outputs of generate with one entry per prompt, split between the requests of a batch
+PER_SENTENCE_OUTPUT_KEYS = ['sentences', 'tokens', 'logprob', 'full_logprob', 'token_ids', 'offsets']
+
 API_ALLOWED_KEYS = set(
     [
         'all_probs',
@@ -50,9 +58,10 @@ API_ALLOWED_KEYS = set(
 
 
 class MegatronGenerate(Resource):
-    def __init__(self, model, inference_strategy=None):
+    def __init__(self, model, inference_strategy=None, scheduler=None):
         self.model = model
         self.inference_strategy = inference_strategy
+        self.scheduler = scheduler
 
     @staticmethod
     def send_do_generate():
@@ -165,55 +174,216 @@ class MegatronGenerate(Resource):
             if neighbors < 0:
                 return "num of neighbors must be an integer no less than 0"
 
-        with lock:  # Need to get lock to keep multiple threads from hitting code
-            MegatronGenerate.send_do_generate()  # Tell other ranks we're doing generate
-            extra = {}
-            if task_ids is not None:
-                extra['task_ids'] = task_ids
-            if self.inference_strategy is not None:
-                extra['strategy'] = self.inference_strategy
-                # RETRO specific arguments
-                if isinstance(
-                    self.inference_strategy, (RetroModelTextGenerationStrategy, RetroQAModelTextGenerationStrategy)
-                ):
-                    if neighbors is not None:
-                        self.inference_strategy.update_neighbors(neighbors)
-
-            output = generate(
-                self.model,
-                sentences,
-                tokens_to_generate,
-                all_probs,
-                temperature,
-                add_BOS,
-                top_k,
-                top_p,
-                greedy,
-                repetition_penalty,
-                end_strings=end_strings,
-                min_tokens_to_generate=min_tokens_to_generate,
-                **extra,
-            )
-            for k in output:
-                if isinstance(output[k], torch.Tensor):
-                    output[k] = output[k].tolist()
-        if not all_probs:
-            del output['full_logprob']
-
-        if self.inference_strategy is not None:
-            if isinstance(
-                self.inference_strategy, (RetroModelTextGenerationStrategy, RetroQAModelTextGenerationStrategy)
-            ):
-                retrieved_doc = self.inference_strategy.retrieved_text
-                output['retrieved'] = retrieved_doc
+        params = dict(
+            tokens_to_generate=tokens_to_generate,
+            all_probs=all_probs,
+            temperature=temperature,
+            add_BOS=add_BOS,
+            top_k=top_k,
+            top_p=top_p,
+            greedy=greedy,
+            repetition_penalty=repetition_penalty,
+            end_strings=end_strings,
+            min_tokens_to_generate=min_tokens_to_generate,
+            neighbors=neighbors,
+        )
+        generation_request = GenerationRequest(sentences, params, task_ids=task_ids)
+        if self.scheduler is not None:
+            output = self.scheduler.submit(generation_request)
+        else:
+            output = generate_batch(self.model, self.inference_strategy, [generation_request])[0]
         return jsonify(output)
 
 
+class GenerationRequest(object):
+    """ Prompts of one request to the server, with the arguments to call generate with """
+
+    def __init__(self, sentences, params, task_ids=None):
+        self.sentences = sentences
+        self.params = params
+        self.task_ids = task_ids
+        self.output = None
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def num_sentences(self):
+        return len(self.sentences[0]) if isinstance(self.sentences, tuple) else len(self.sentences)
+
+    @property
+    def batch_key(self):
+        """ Requests with the same key can be generated in one batch, None if the request has to run alone """
+        if self.task_ids is not None or isinstance(self.sentences, tuple):
+            return None
+        return tuple(
+            (k, tuple(v) if isinstance(v, list) else v)
+            for k, v in sorted(self.params.items())
+            if k not in PER_ROW_PARAMS
+        )
+
+
+def generate_batch(model, inference_strategy, requests):
+    """
+    Calls generate once for the prompts of all requests, which must share the same batch key,
+    and splits the output between the requests.
+    """
+    params = requests[0].params
+    if len(requests) == 1:
+        sentences = requests[0].sentences
+    else:
+        sentences = [sentence for generation_request in requests for sentence in generation_request.sentences]
+        params = dict(params)
+        for k in PER_ROW_PARAMS:
+            params[k] = [
+                generation_request.params[k]
+                for generation_request in requests
+                for _ in range(generation_request.num_sentences)
+            ]
+
+    with lock:  # Need to get lock to keep multiple threads from hitting code
+        MegatronGenerate.send_do_generate()  # Tell other ranks we're doing generate
+        extra = {}
+        if requests[0].task_ids is not None:
+            extra['task_ids'] = requests[0].task_ids
+        if inference_strategy is not None:
+            extra['strategy'] = inference_strategy
+            # RETRO specific arguments
+            if isinstance(inference_strategy, (RetroModelTextGenerationStrategy, RetroQAModelTextGenerationStrategy)):
+                if params['neighbors'] is not None:
+                    inference_strategy.update_neighbors(params['neighbors'])
+
+        output = generate(
+            model,
+            sentences,
+            params['tokens_to_generate'],
+            params['all_probs'],
+            params['temperature'],
+            params['add_BOS'],
+            params['top_k'],
+            params['top_p'],
+            params['greedy'],
+            params['repetition_penalty'],
+            end_strings=params['end_strings'],
+            min_tokens_to_generate=params['min_tokens_to_generate'],
+            **extra,
+        )
+        for k in output:
+            if isinstance(output[k], torch.Tensor):
+                output[k] = output[k].tolist()
+    if not params['all_probs']:
+        del output['full_logprob']
+
+    if inference_strategy is not None:
+        if isinstance(inference_strategy, (RetroModelTextGenerationStrategy, RetroQAModelTextGenerationStrategy)):
+            retrieved_doc = inference_strategy.retrieved_text
+            output['retrieved'] = retrieved_doc
+
+    if len(requests) == 1:
+        return [output]
+    outputs = []
+    start = 0
+    for generation_request in requests:
+        end = start + generation_request.num_sentences
+        outputs.append(
+            {k: v[start:end] if k in PER_SENTENCE_OUTPUT_KEYS and v is not None else v for k, v in output.items()}
+        )
+        start = end
+    return outputs
+
+
+class GenerationScheduler(object):
+    """
+    Queues the requests to the server and generates them from a single worker thread. Every time the model
+    is free, the oldest request is batched with all waiting requests which have the same generation parameters
+    (temperature, top_k, top_p and repetition_penalty may differ), up to max_batch_size prompts, so concurrent
+    clients share forward passes instead of running one by one.
+
+    Args:
+        model: text generative model
+        inference_strategy: inference strategy passed to generate
+        max_batch_size: maximum number of prompts generated together
+        batch_timeout: seconds to wait for more compatible requests before starting a batch that is not full
+    """
+
+    def __init__(self, model, inference_strategy=None, max_batch_size=128, batch_timeout=0.0):
+        self.model = model
+        self.inference_strategy = inference_strategy
+        self.max_batch_size = max_batch_size
+        self.batch_timeout = batch_timeout
+        # RETRO strategies keep the neighbors and retrieved documents of the whole batch
+        self.merge_requests = not isinstance(
+            inference_strategy, (RetroModelTextGenerationStrategy, RetroQAModelTextGenerationStrategy)
+        )
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, generation_request):
+        """ Queues a request and blocks until its output is ready """
+        with self.condition:
+            self.queue.append(generation_request)
+            self.condition.notify()
+        generation_request.done.wait()
+        if generation_request.error is not None:
+            raise generation_request.error
+        return generation_request.output
+
+    def _next_batch(self):
+        with self.condition:
+            while not self.queue:
+                self.condition.wait()
+            batch = [self.queue.popleft()]
+            batch_key = batch[0].batch_key
+            if batch_key is None or not self.merge_requests:
+                return batch
+
+            num_sentences = batch[0].num_sentences
+            deadline = time.monotonic() + self.batch_timeout
+            while True:
+                remaining = collections.deque()
+                for generation_request in self.queue:
+                    if (
+                        generation_request.batch_key == batch_key
+                        and num_sentences + generation_request.num_sentences <= self.max_batch_size
+                    ):
+                        batch.append(generation_request)
+                        num_sentences += generation_request.num_sentences
+                    else:
+                        remaining.append(generation_request)
+                self.queue = remaining
+                timeout = deadline - time.monotonic()
+                if num_sentences >= self.max_batch_size or timeout <= 0:
+                    return batch
+                self.condition.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if len(batch) > 1:
+                logging.info(f"Generating {len(batch)} requests in one batch")
+            try:
+                outputs = generate_batch(self.model, self.inference_strategy, batch)
+                for generation_request, output in zip(batch, outputs):
+                    generation_request.output = output
+            except Exception as e:
+                logging.error(f"Generation failed: {e}")
+                for generation_request in batch:
+                    generation_request.error = e
+            for generation_request in batch:
+                generation_request.done.set()
+
+
 class MegatronServer(object):
-    def __init__(self, model, inference_strategy=None):
+    def __init__(self, model, inference_strategy=None, max_batch_size=128, batch_timeout=0.0):
         self.app = Flask(__name__, static_url_path='')
         api = Api(self.app)
-        api.add_resource(MegatronGenerate, '/generate', resource_class_args=[model, inference_strategy])
+        self.scheduler = GenerationScheduler(
+            model, inference_strategy, max_batch_size=max_batch_size, batch_timeout=batch_timeout
+        )
+        api.add_resource(
+            MegatronGenerate, '/generate', resource_class_args=[model, inference_strategy, self.scheduler]
+        )
 
     def run(self, url, port=5000):
         self.app.run(url, threaded=True, port=port, debug=False)
@@ -208,6 +208,13 @@ def tab_logits(logits, min_id, max_id, filter_value=-float('Inf')):
     return logits
 
 
+def _per_row(value, logits):
+    """Reshapes a per-row sampling parameter to broadcast against logits of shape [batch_size, vocab_size]."""
+    if isinstance(value, torch.Tensor):
+        return value.to(logits.device).view(-1, 1)
+    return value
+
+
 def top_k_logits(logits, top_k=0, top_p=0.0, filter_value=-float('Inf'), started=None):
     """
        This function has been mostly taken from huggingface conversational
@@ -216,52 +223,62 @@ def top_k_logits(logits, top_k=0, top_p=0.0, filter_value=-float('Inf'), started
               conversational-ai-with-transfer-learning-2d818ac26313 
 
         @param logits: logits tensor
-        @param top_k: keep only top k tokens with highest probability
-        @param top_p: keep the top tokens with cumulative probability
+        @param top_k: keep only top k tokens with highest probability, an int or a tensor with one value per row
+        @param top_p: keep the top tokens with cumulative probability, a float or a tensor with one value per row
         @filter_value: value to set filtered tokens to
         @started: a tensor of bools indicating whether the text generation starts for the batch
         returns the filtered logits
     """
-    if top_k > 0:
+    batch_size, vocab_size = logits.shape
+    rows = torch.ones(batch_size, dtype=torch.bool, device=logits.device)
+    if started is not None:
+        rows = started.to(device=logits.device, dtype=torch.bool).view(-1)
+    top_k = torch.as_tensor(top_k, device=logits.device).long().clamp(0, vocab_size).expand(batch_size)
+    top_p = torch.as_tensor(top_p, device=logits.device).expand(batch_size)
+    apply_top_k = rows & (top_k > 0)
+    apply_top_p = rows & (top_p > 0.0)
+
+    max_top_k = int(torch.where(apply_top_k, top_k, 0).max())
+    if max_top_k > 0:
         # Remove all tokens with a probability less than the
         # last token of the top-k
-        indices_to_remove = logits < torch.topk(logits, top_k)[0][..., -1, None]
-        if started is not None:
-            for i in np.arange(indices_to_remove.size(0))[started.cpu().numpy()]:
-                logits[i, indices_to_remove[i]] = filter_value
+        top_logits = torch.topk(logits, max_top_k)[0]
+        kth_logits = top_logits.gather(1, (top_k.clamp(min=1) - 1).unsqueeze(1))
+        logits.masked_fill_((logits < kth_logits) & apply_top_k.unsqueeze(1), filter_value)
+
+    if apply_top_p.any():
+        if max_top_k > 0 and not (apply_top_p & ~apply_top_k).any():
+            # rows filtered by top-p only keep their top-k tokens, so the candidates are already sorted
+            ranks = torch.arange(max_top_k, device=logits.device)
+            sorted_logits = top_logits.masked_fill(ranks >= top_k.unsqueeze(1), filter_value)
         else:
-            logits[indices_to_remove] = filter_value
-
-    if top_p > 0.0:
-        # Cconvert to 1D
-        sorted_logits, sorted_indices = torch.sort(logits, descending=True, dim=-1)
+            sorted_logits = torch.sort(logits, descending=True, dim=-1)[0]
         cumulative_probs = torch.cumsum(F.softmax(sorted_logits, dim=-1), dim=-1)
 
-        # Remove tokens with cumulative probability above the threshold
-        sorted_indices_to_remove = cumulative_probs > top_p
-        # Shift the indices to the right to keep also the first token
-        # above the threshold
-        sorted_indices_to_remove[..., 1:] = sorted_indices_to_remove[..., :-1].clone()
-        sorted_indices_to_remove[..., 0] = 0
-        if started is not None:
-            for i in np.arange(sorted_indices.size(0))[started.cpu().numpy()]:
-                indices_to_remove = sorted_indices[i][sorted_indices_to_remove[i]]
-                logits[i, indices_to_remove] = filter_value
-        else:
-            for i in range(sorted_indices.size(0)):
-                indices_to_remove = sorted_indices[i][sorted_indices_to_remove[i]]
-                logits[i, indices_to_remove] = filter_value
+        # Remove tokens with cumulative probability above the threshold,
+        # keeping also the first token above the threshold
+        num_keep = ((cumulative_probs <= top_p.unsqueeze(1)).sum(dim=-1) + 1).clamp(max=sorted_logits.size(-1))
+        min_logits = sorted_logits.gather(1, (num_keep - 1).unsqueeze(1))
+        logits.masked_fill_((logits < min_logits) & apply_top_p.unsqueeze(1), filter_value)
 
     return logits
 
 
-def repetition_penalty(logits, repetition_penalty, used_tokens):
+def repetition_penalty(logits, repetition_penalty, used_tokens=None, token_counts=None):
     """ Implement the repetition penalty, check paper 
     https://arxiv.org/pdf/1909.05858.pdf
+
+    `repetition_penalty` is a float or a tensor with one value per row. The used tokens are given either as
+    token ids `used_tokens` [batch_size, num_tokens] or as the number of times every token was used,
+    `token_counts` [batch_size, vocab_size], which can be updated incrementally while generating.
     """
-    if used_tokens is not None and repetition_penalty != 1.0:
+    if not isinstance(repetition_penalty, torch.Tensor) and repetition_penalty == 1.0:
+        return logits
+    if token_counts is not None:
+        return torch.where(token_counts > 0, logits / _per_row(repetition_penalty, logits), logits)
+    if used_tokens is not None:
         logits_update = torch.gather(logits, 1, used_tokens)
-        logits = torch.scatter(logits, 1, used_tokens, logits_update / repetition_penalty)
+        logits = torch.scatter(logits, 1, used_tokens, logits_update / _per_row(repetition_penalty, logits))
     return logits
 
 
@@ -278,17 +295,36 @@ def get_model_parallel_src_rank():
     return all_ranks[:, dp_rank, :].min()
 
 
+def _pack_sampling_params(batch_size, temperature, top_k, top_p, repetition_penalty):
+    """Stacks the sampling parameters, each a scalar or one value per row, into a [4, batch_size] tensor."""
+    sampling_params = torch.empty(4, batch_size, dtype=torch.float64, device=torch.cuda.current_device())
+    for i, value in enumerate([temperature, top_k, top_p, repetition_penalty]):
+        sampling_params[i] = torch.as_tensor(value, dtype=torch.float64)
+    return sampling_params
+
+
+def _unpack_sampling_params(sampling_params):
+    """
+    Inverse of _pack_sampling_params. A parameter which is the same for all rows is returned as a scalar,
+    so that homogeneous batches are sampled exactly as before, otherwise as a tensor with one value per row.
+    """
+    is_uniform = (sampling_params == sampling_params[:, :1]).all(dim=1).tolist()
+    first_row = sampling_params[:, 0].tolist()
+    temperature, top_k, top_p, repetition_penalty = [
+        first_row[i] if is_uniform[i] else sampling_params[i] for i in range(4)
+    ]
+    top_k = int(top_k) if is_uniform[1] else top_k.long()
+    return temperature, top_k, top_p, repetition_penalty
+
+
 def send_generate_info(
     context_tokens_tensor,
     context_length_tensor,
+    sampling_params_tensor,
     tokens_to_generate,
     all_probs,
     compute_logprob,
-    temperature,
-    top_k,
-    top_p,
     greedy,
-    repetition_penalty,
     min_tokens_to_generate,
     end_strings,
 ):
@@ -304,11 +340,7 @@ def send_generate_info(
         tokens_to_generate,
         all_probs,
         compute_logprob,  # whether to compute log probabilities matrix
-        temperature,
-        top_k,
-        top_p,
         greedy,
-        repetition_penalty,
         min_tokens_to_generate,
     ]
     input_info_tensor = torch.cuda.FloatTensor(input_info)
@@ -317,6 +349,8 @@ def send_generate_info(
     # Send variables to all ranks
     torch.distributed.broadcast(context_length_tensor, src, model_parallel_group)
     torch.distributed.broadcast(context_tokens_tensor, src, model_parallel_group)
+    # temperature, top_k, top_p and repetition_penalty of every row
+    torch.distributed.broadcast(sampling_params_tensor, src, model_parallel_group)
 
     # send end strings
     string_tensor = torch.as_tensor(
@@ -333,25 +367,23 @@ def receive_generate_info():
     """
     model_parallel_group = parallel_state.get_model_parallel_group()
     src = get_model_parallel_src_rank()
-    input_info_tensor = torch.empty(11, dtype=torch.float32, device=torch.cuda.current_device())
+    input_info_tensor = torch.empty(7, dtype=torch.float32, device=torch.cuda.current_device())
     torch.distributed.broadcast(input_info_tensor, src, model_parallel_group)
     batch_size = int(input_info_tensor[0].item())
     seq_len = int(input_info_tensor[1].item())
     tokens_to_generate = int(input_info_tensor[2].item())
     all_probs = bool(input_info_tensor[3].item())
     compute_logprob = bool(input_info_tensor[4].item())  # whether to compute log probabilities matrix
-    temperature = float(input_info_tensor[5].item())
-    top_k = int(input_info_tensor[6].item())
-    top_p = float(input_info_tensor[7].item())
-    greedy = bool(input_info_tensor[8].item())
-    repetition_penalty = float(input_info_tensor[9].item())
-    min_tokens_to_generate = int(input_info_tensor[10].item())
+    greedy = bool(input_info_tensor[5].item())
+    min_tokens_to_generate = int(input_info_tensor[6].item())
 
     context_length_tensor = torch.empty(batch_size, dtype=torch.int64, device=torch.cuda.current_device())
     context_tokens_tensor = torch.empty(batch_size, seq_len, dtype=torch.int64, device=torch.cuda.current_device())
+    sampling_params_tensor = torch.empty(4, batch_size, dtype=torch.float64, device=torch.cuda.current_device())
     # Send variables to all ranks
     torch.distributed.broadcast(context_length_tensor, src, model_parallel_group)
     torch.distributed.broadcast(context_tokens_tensor, src, model_parallel_group)
+    torch.distributed.broadcast(sampling_params_tensor, src, model_parallel_group)
 
     array_size = torch.empty(1, dtype=torch.int64, device=torch.cuda.current_device())
     torch.distributed.broadcast(array_size, src, model_parallel_group)
@@ -364,14 +396,11 @@ def receive_generate_info():
     return (
         context_length_tensor,
         context_tokens_tensor,
+        sampling_params_tensor,
         tokens_to_generate,
         all_probs,
         compute_logprob,
-        temperature,
-        top_k,
-        top_p,
         greedy,
-        repetition_penalty,
         min_tokens_to_generate,
         end_strings,
     )
@@ -503,6 +532,8 @@ def generate(
         top_p (float): If set to float < 1, only the most probable tokens with probabilities that add up to top_p or higher are kept for generation.
         greedy (bool):  Whether or not to use sampling ; use greedy decoding otherwise
         repetition_penalty (float): The parameter for repetition penalty. 1.0 means no penalty
+        temperature, top_k, top_p and repetition_penalty also accept a list with one value per input,
+            so that inputs with different sampling parameters can be generated in one batch
         min_tokens_to_generate (int): The minimum length of the tokens to be generated
         strategy_args, the extra arguments are treated as inference strategy arguments
         end_strings, a list of strings to stop generation when they are encountered in the output.
@@ -528,17 +559,17 @@ def generate(
                 inputs, tokens_to_generate, add_BOS
             )
 
+        sampling_params_tensor = _pack_sampling_params(
+            context_tokens_tensor.size(0), temperature, top_k, top_p, repetition_penalty
+        )
         send_generate_info(
             context_tokens_tensor,
             context_length_tensor,
+            sampling_params_tensor,
             tokens_to_generate,
             all_probs,
             compute_logprob,
-            temperature,
-            top_k,
-            top_p,
             greedy,
-            repetition_penalty,
             min_tokens_to_generate,
             end_strings,
         )
@@ -546,17 +577,15 @@ def generate(
         (
             context_length_tensor,
             context_tokens_tensor,
+            sampling_params_tensor,
             tokens_to_generate,
             all_probs,
             compute_logprob,
-            temperature,
-            top_k,
-            top_p,
             greedy,
-            repetition_penalty,
             min_tokens_to_generate,
             end_strings,
         ) = receive_generate_info()
+    temperature, top_k, top_p, repetition_penalty = _unpack_sampling_params(sampling_params_tensor)
 
     output = synced_generate(
         model,
@@ -694,7 +723,7 @@ def sample_sequence_batch(
         is_done = torch.zeros([batch_size]).byte().cuda()
         tokens = context_tokens
         output_logits = None
-        all_generated_indices = None  # used to track all generated indices
+        token_counts = None  # number of times every token was used, for the repetition penalty
         # Generate enough tokens for the longest sequence
         maxlen = tokens_to_generate + context_lengths.max().item()
 
@@ -737,9 +766,11 @@ def sample_sequence_batch(
                     prev = torch.argmax(logits, dim=-1).view(-1)
                 else:
                     logits = logits.float()
-                    logits /= temperature
+                    logits /= _per_row(temperature, logits)
                     # handle repetition penality
-                    logits = repetition_penalty(logits, extra.get('repetition_penalty', 1.2), all_generated_indices)
+                    logits = repetition_penalty(
+                        logits, extra.get('repetition_penalty', 1.2), token_counts=token_counts
+                    )
                     logits = top_k_logits(
                         logits, top_k=extra.get('top_k', 0), top_p=extra.get('top_p', 0.9), started=started
                     )
@@ -765,7 +796,11 @@ def sample_sequence_batch(
 
                         indices = torch.unsqueeze(tokens[:, 1 : context_length + 1], 2)
                         output_logits = torch.gather(output, 2, indices).squeeze(2)
-                        all_generated_indices = indices[:, :, 0]
+                        token_counts = torch.zeros(
+                            output.size(0), output.size(2), dtype=torch.int32, device=output.device
+                        )
+                        used_tokens = indices[:, :, 0]
+                        token_counts.scatter_add_(1, used_tokens, torch.ones_like(used_tokens, dtype=torch.int32))
                         if all_probs:
                             full_logits = output
                     else:
@@ -775,7 +810,8 @@ def sample_sequence_batch(
 
                         # TODO(rprenger) we're copying output_logits every time.  Should pre-allocate
                         output_logits = torch.cat([output_logits, new_output_logits], 1)
-                        all_generated_indices = torch.cat([all_generated_indices, indices[:, :, 0]], 1)
+                        used_tokens = indices[:, :, 0]
+                        token_counts.scatter_add_(1, used_tokens, torch.ones_like(used_tokens, dtype=torch.int32))
                         if all_probs:
                             full_logits = torch.cat([full_logits, output], 1)
 
@@ -904,7 +940,7 @@ def tab_sample_sequence_batch(
                 logits = output[:, -1].view(batch_size, -1).contiguous()
                 token_in_row = (counter + offset) % tokens_per_row
                 logits = logits.float()
-                logits /= temperature
+                logits /= _per_row(temperature, logits)
                 if token_in_row == tokens_per_row - 1:
                     # line break
                     eor_id = tokenizer.eor
@@ -1010,6 +1046,7 @@ def sample_token_topk(logits, top_k=0, top_p=0.0, temperature=1.0, filter_value=
         top_k: int - if > 0: only sample from top k tokens with highest probability
         top_p: float - if > 0.0: only sample from a subset of candidates, where the cumulative probability
         temperature: float - temperature for sampling
+        top_k, top_p and temperature can also be tensors of shape [batch_size] with one value per row
         filter_value: float - value to set filtered tokens to
     
     Returns:
@@ -1017,7 +1054,7 @@ def sample_token_topk(logits, top_k=0, top_p=0.0, temperature=1.0, filter_value=
         token_ids: [batch_size] - sampled token ids
     """
     logits = logits.float()
-    logits /= temperature
+    logits /= _per_row(temperature, logits)
     logits = top_k_logits(logits, top_k=top_k, top_p=top_p, filter_value=filter_value)
     log_probs = torch.nn.functional.log_softmax(logits, dim=-1)
 
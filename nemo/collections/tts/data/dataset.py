@@ -34,11 +34,12 @@ from nemo.collections.common.tokenizers.text_to_speech.tts_tokenizers import (
     EnglishCharsTokenizer,
     EnglishPhonemesTokenizer,
 )
+from nemo.collections.tts.parts.preprocessing.pitch_estimation import PITCH_ESTIMATORS, yin_pitch_batch
 from nemo.collections.tts.parts.utils.tts_dataset_utils import (
+    BatchedBetaBinomialPrior,
     BetaBinomialInterpolator,
-    beta_binomial_prior_distribution,
-    general_padding,
     get_base_dir,
+    stack_tensors,
 )
 from nemo.collections.tts.torch.tts_data_types import (
     DATA_STR2DATA_CLASS,
@@ -166,8 +167,11 @@ class TTSDataset(Dataset):
             durs_file (Optional[str]): String path to pickled durations location.
             durs_type (Optional[str]): Type of durations. Currently, supported only "aligner-based".
             use_beta_binomial_interpolator (Optional[bool]): Whether to use beta-binomial interpolator for calculating alignment prior matrix. Defaults to False.
+                Otherwise exact alignment prior matrices are computed for the whole batch in the collate function.
             pitch_fmin (Optional[float]): The fmin input to librosa.pyin. Defaults to librosa.note_to_hz('C2').
             pitch_fmax (Optional[float]): The fmax input to librosa.pyin. Defaults to librosa.note_to_hz('C7').
+            pitch_estimator (Optional[str]): How to compute missing pitch, either "pyin" for librosa.pyin or "yin" for
+                the batched YIN estimator, which is much faster. Defaults to "pyin".
             pitch_mean (Optional[float]): The mean that we use to normalize the pitch.
             pitch_std (Optional[float]): The std that we use to normalize the pitch.
             segment_max_duration (Optional[float]): If audio length is greater than segment_max_duration, take a random segment of segment_max_duration (Used for SV task in SSLDisentangler)
@@ -410,16 +414,13 @@ class TTSDataset(Dataset):
 
     def add_align_prior_matrix(self, **kwargs):
         self.use_beta_binomial_interpolator = kwargs.pop('use_beta_binomial_interpolator', False)
-        if not self.cache_text:
-            if 'use_beta_binomial_interpolator' in kwargs and not self.use_beta_binomial_interpolator:
-                logging.warning(
-                    "phoneme_probability is not None, but use_beta_binomial_interpolator=False, we"
-                    " set use_beta_binomial_interpolator=True manually to use phoneme_probability."
-                )
-            self.use_beta_binomial_interpolator = True
 
         if self.use_beta_binomial_interpolator:
             self.beta_binomial_interpolator = BetaBinomialInterpolator()
+        else:
+            # exact priors are computed for the whole batch at collate time, which also supports
+            # text lengths changing between epochs with phoneme_probability
+            self.batched_beta_binomial_prior = BatchedBetaBinomialPrior()
 
     def add_pitch(self, **kwargs):
         self.pitch_folder = kwargs.pop('pitch_folder', None)
@@ -433,6 +434,9 @@ class TTSDataset(Dataset):
 
         self.pitch_fmin = kwargs.pop("pitch_fmin", librosa.note_to_hz('C2'))
         self.pitch_fmax = kwargs.pop("pitch_fmax", librosa.note_to_hz('C7'))
+        self.pitch_estimator = kwargs.pop("pitch_estimator", "pyin")
+        if self.pitch_estimator not in PITCH_ESTIMATORS:
+            raise ValueError(f"Unknown pitch estimator {self.pitch_estimator}, expected one of {PITCH_ESTIMATORS}")
         self.pitch_mean = kwargs.pop("pitch_mean", None)
         self.pitch_std = kwargs.pop("pitch_std", None)
         self.pitch_norm = kwargs.pop("pitch_norm", False)
@@ -530,6 +534,88 @@ class TTSDataset(Dataset):
                 )
         return wav
 
+    def _get_rel_audio_path_as_text_id(self, sample):
+        # Let's keep audio name and all internal directories in rel_audio_path_as_text_id to avoid any collisions
+        rel_audio_path = Path(sample["audio_filepath"]).relative_to(self.base_data_dir).with_suffix("")
+        return str(rel_audio_path).replace("/", "_")
+
+    def _load_audio(self, sample):
+        features = self.featurizer.process(
+            sample["audio_filepath"],
+            trim=self.trim,
+            trim_ref=self.trim_ref,
+            trim_top_db=self.trim_top_db,
+            trim_frame_length=self.trim_frame_length,
+            trim_hop_length=self.trim_hop_length,
+        )
+        if self.pad_multiple > 1:
+            features = self._pad_wav_to_multiple(features)
+        return features
+
+    def _compute_pitch(self, audio):
+        """
+        Computes pitch, voiced mask and p_voiced of the audio with the configured pitch estimator.
+        """
+        if self.pitch_estimator == "yin":
+            pitch, voiced_mask, p_voiced, _ = yin_pitch_batch(
+                audio=audio.unsqueeze(0),
+                audio_len=torch.tensor([audio.shape[0]]),
+                sample_rate=self.sample_rate,
+                fmin=self.pitch_fmin,
+                fmax=self.pitch_fmax,
+                frame_length=self.win_length,
+            )
+            return pitch[0], voiced_mask[0], p_voiced[0]
+
+        voiced_tuple = librosa.pyin(
+            audio.numpy(),
+            fmin=self.pitch_fmin,
+            fmax=self.pitch_fmax,
+            frame_length=self.win_length,
+            sr=self.sample_rate,
+            fill_na=0.0,
+        )
+        return tuple(torch.from_numpy(voiced_item) for voiced_item in voiced_tuple)
+
+    def precompute_pitch(self, batch_size: int = 32, num_workers: int = 0):
+        """
+        Computes the missing pitch, voiced mask and p_voiced files of the dataset ahead of training, in batches with
+        the batched YIN estimator, so that __getitem__ only loads them. Audio is loaded in parallel by `num_workers`
+        data loader workers.
+        """
+        voiced_items = [item for item in [Pitch, Voiced_mask, P_voiced] if item in self.sup_data_types_set]
+        if not voiced_items:
+            return
+
+        def get_filepaths(sample):
+            rel_audio_path_as_text_id = self._get_rel_audio_path_as_text_id(sample)
+            return [getattr(self, f"{item.name}_folder") / f"{rel_audio_path_as_text_id}.pt" for item in voiced_items]
+
+        indices = [i for i, sample in enumerate(self.data) if not all(p.exists() for p in get_filepaths(sample))]
+        logging.info(f"Computing pitch of {len(indices)} out of {len(self.data)} samples")
+        if not indices:
+            return
+
+        dataloader = torch.utils.data.DataLoader(
+            _AudioLoadingDataset(self, indices),
+            batch_size=batch_size,
+            collate_fn=_AudioLoadingDataset.collate_fn,
+            num_workers=num_workers,
+        )
+        for batch_indices, audio, audio_len in tqdm(dataloader):
+            pitch, voiced_mask, p_voiced, pitch_len = yin_pitch_batch(
+                audio=audio,
+                audio_len=audio_len,
+                sample_rate=self.sample_rate,
+                fmin=self.pitch_fmin,
+                fmax=self.pitch_fmax,
+                frame_length=self.win_length,
+            )
+            voiced_tensors = {Pitch: pitch, Voiced_mask: voiced_mask, P_voiced: p_voiced}
+            for i, index in enumerate(batch_indices.tolist()):
+                for item, filepath in zip(voiced_items, get_filepaths(self.data[index])):
+                    torch.save(voiced_tensors[item][i, : pitch_len[i]].float().clone(), filepath)
+
     # Random sample a reference index from the same speaker
     def sample_reference_index(self, speaker_id):
         reference_pool = self.speaker_to_index_map[speaker_id]
@@ -539,9 +625,7 @@ class TTSDataset(Dataset):
     def __getitem__(self, index):
         sample = self.data[index]
 
-        # Let's keep audio name and all internal directories in rel_audio_path_as_text_id to avoid any collisions
-        rel_audio_path = Path(sample["audio_filepath"]).relative_to(self.base_data_dir).with_suffix("")
-        rel_audio_path_as_text_id = str(rel_audio_path).replace("/", "_")
+        rel_audio_path_as_text_id = self._get_rel_audio_path_as_text_id(sample)
 
         if (
             self.segment_max_duration is not None
@@ -563,17 +647,7 @@ class TTSDataset(Dataset):
                 features = self._pad_wav_to_multiple(features)
             audio, audio_length = features, torch.tensor(features.shape[0]).long()
         else:
-            features = self.featurizer.process(
-                sample["audio_filepath"],
-                trim=self.trim,
-                trim_ref=self.trim_ref,
-                trim_top_db=self.trim_top_db,
-                trim_frame_length=self.trim_frame_length,
-                trim_hop_length=self.trim_hop_length,
-            )
-
-            if self.pad_multiple > 1:
-                features = self._pad_wav_to_multiple(features)
+            features = self._load_audio(sample)
             audio_shifted = None
             if self.pitch_augment:
                 audio_shifted = self.pitch_shift(
@@ -619,12 +693,9 @@ class TTSDataset(Dataset):
 
         # Load alignment prior matrix if needed
         align_prior_matrix = None
-        if AlignPriorMatrix in self.sup_data_types_set:
+        if AlignPriorMatrix in self.sup_data_types_set and self.use_beta_binomial_interpolator:
             mel_len = self.get_log_mel(audio).shape[2]
-            if self.use_beta_binomial_interpolator:
-                align_prior_matrix = torch.from_numpy(self.beta_binomial_interpolator(mel_len, text_length.item()))
-            else:
-                align_prior_matrix = torch.from_numpy(beta_binomial_prior_distribution(text_length, mel_len))
+            align_prior_matrix = torch.from_numpy(self.beta_binomial_interpolator(mel_len, text_length.item()))
 
         non_exist_voiced_index = []
         my_var = locals()
@@ -638,16 +709,9 @@ class TTSDataset(Dataset):
                     non_exist_voiced_index.append((i, voiced_item.name, voiced_filepath))
 
         if len(non_exist_voiced_index) != 0:
-            voiced_tuple = librosa.pyin(
-                audio.numpy(),
-                fmin=self.pitch_fmin,
-                fmax=self.pitch_fmax,
-                frame_length=self.win_length,
-                sr=self.sample_rate,
-                fill_na=0.0,
-            )
+            voiced_tuple = self._compute_pitch(audio)
             for (i, voiced_name, voiced_filepath) in non_exist_voiced_index:
-                my_var.__setitem__(voiced_name, torch.from_numpy(voiced_tuple[i]).float())
+                my_var.__setitem__(voiced_name, voiced_tuple[i].float())
                 torch.save(my_var.get(voiced_name), voiced_filepath)
 
         pitch = my_var.get('pitch', None)
@@ -746,11 +810,11 @@ class TTSDataset(Dataset):
 
     def general_collate_fn(self, batch):
         (
-            _,
+            audios,
             audio_lengths,
-            _,
+            tokens,
             tokens_lengths,
-            _,
+            log_mels,
             log_mel_lengths,
             durations_list,
             align_prior_matrices_list,
@@ -758,147 +822,94 @@ class TTSDataset(Dataset):
             pitches_lengths,
             energies,
             energies_lengths,
-            _,
+            speaker_ids,
             voiced_masks,
             p_voiceds,
-            _,
-            _,
+            audios_shifted,
+            reference_audios,
             reference_audio_lengths,
         ) = zip(*batch)
 
-        max_audio_len = max(audio_lengths).item()
-        max_tokens_len = max(tokens_lengths).item()
-        max_log_mel_len = max(log_mel_lengths) if LogMel in self.sup_data_types_set else None
-        max_durations_len = max([len(i) for i in durations_list]) if Durations in self.sup_data_types_set else None
-        max_pitches_len = max(pitches_lengths).item() if Pitch in self.sup_data_types_set else None
-        max_energies_len = max(energies_lengths).item() if Energy in self.sup_data_types_set else None
-        max_reference_audio_len = (
-            max(reference_audio_lengths).item() if ReferenceAudio in self.sup_data_types_set else None
-        )
+        # Every field is padded into a single tensor allocated with the batch shape, see stack_tensors()
+        audio_lengths = torch.stack(audio_lengths)
+        tokens_lengths = torch.stack(tokens_lengths)
+        max_audio_len = audio_lengths.max().item()
+        data_dict = {
+            "audio": stack_tensors(audios, max_lens=[max_audio_len]),
+            "audio_lens": audio_lengths,
+            "text": stack_tensors(
+                tokens, max_lens=[tokens_lengths.max().item()], pad_value=self.text_tokenizer_pad_id
+            ),
+            "text_lens": tokens_lengths,
+            "log_mel": None,
+            "log_mel_lens": None,
+            "durations": None,
+            "align_prior_matrix": None,
+            "pitch": None,
+            "pitch_lens": None,
+            "energy": None,
+            "energy_lens": None,
+            "speaker_id": None,
+            "voiced_mask": None,
+            "p_voiced": None,
+            "audio_shifted": None,
+            "reference_audio": None,
+            "reference_audio_lens": None,
+        }
 
-        if LogMel in self.sup_data_types_set:
-            log_mel_pad = torch.finfo(batch[0][4].dtype).tiny
+        if audios_shifted[0] is not None:
+            data_dict["audio_shifted"] = stack_tensors(audios_shifted, max_lens=[max_audio_len])
 
-        align_prior_matrices = (
-            torch.zeros(
-                len(align_prior_matrices_list),
-                max([prior_i.shape[0] for prior_i in align_prior_matrices_list]),
-                max([prior_i.shape[1] for prior_i in align_prior_matrices_list]),
+        if LogMel in self.sup_data_types_set:
+            log_mel_lengths = torch.stack(log_mel_lengths)
+            log_mel_pad = torch.finfo(log_mels[0].dtype).tiny
+            data_dict["log_mel"] = stack_tensors(
+                log_mels, max_lens=[log_mel_lengths.max().item()], pad_value=log_mel_pad
             )
-            if AlignPriorMatrix in self.sup_data_types_set
-            else []
-        )
-        (
-            audios,
-            tokens,
-            log_mels,
-            durations_list,
-            pitches,
-            energies,
-            speaker_ids,
-            voiced_masks,
-            p_voiceds,
-            audios_shifted,
-            reference_audios,
-        ) = (
-            [],
-            [],
-            [],
-            [],
-            [],
-            [],
-            [],
-            [],
-            [],
-            [],
-            [],
-        )
+            data_dict["log_mel_lens"] = log_mel_lengths
 
-        for i, sample_tuple in enumerate(batch):
-            (
-                audio,
-                audio_len,
-                token,
-                token_len,
-                log_mel,
-                log_mel_len,
-                durations,
-                align_prior_matrix,
-                pitch,
-                pitch_length,
-                energy,
-                energy_length,
-                speaker_id,
-                voiced_mask,
-                p_voiced,
-                audio_shifted,
-                reference_audio,
-                reference_audios_length,
-            ) = sample_tuple
-
-            audio = general_padding(audio, audio_len.item(), max_audio_len)
-            audios.append(audio)
-
-            token = general_padding(token, token_len.item(), max_tokens_len, pad_value=self.text_tokenizer_pad_id)
-            tokens.append(token)
-
-            if audio_shifted is not None:
-                audio_shifted = general_padding(audio_shifted, audio_len.item(), max_audio_len)
-                audios_shifted.append(audio_shifted)
-
-            if LogMel in self.sup_data_types_set:
-                log_mels.append(general_padding(log_mel, log_mel_len, max_log_mel_len, pad_value=log_mel_pad))
-
-            if Durations in self.sup_data_types_set:
-                durations_list.append(general_padding(durations, len(durations), max_durations_len))
-
-            if AlignPriorMatrix in self.sup_data_types_set:
-                align_prior_matrices[
-                    i, : align_prior_matrix.shape[0], : align_prior_matrix.shape[1]
-                ] = align_prior_matrix
-
-            if Pitch in self.sup_data_types_set:
-                pitches.append(general_padding(pitch, pitch_length.item(), max_pitches_len))
-
-            if Voiced_mask in self.sup_data_types_set:
-                voiced_masks.append(general_padding(voiced_mask, pitch_length.item(), max_pitches_len))
-
-            if P_voiced in self.sup_data_types_set:
-                p_voiceds.append(general_padding(p_voiced, pitch_length.item(), max_pitches_len))
-
-            if Energy in self.sup_data_types_set:
-                energies.append(general_padding(energy, energy_length.item(), max_energies_len))
-
-            if SpeakerID in self.sup_data_types_set:
-                speaker_ids.append(speaker_id)
-
-            if ReferenceAudio in self.sup_data_types_set:
-                reference_audios.append(
-                    general_padding(reference_audio, reference_audios_length.item(), max_reference_audio_len)
+        if Durations in self.sup_data_types_set:
+            max_durations_len = max([len(durations) for durations in durations_list])
+            data_dict["durations"] = stack_tensors(durations_list, max_lens=[max_durations_len])
+
+        if AlignPriorMatrix in self.sup_data_types_set:
+            if self.use_beta_binomial_interpolator:
+                max_mel_len = max([prior.shape[0] for prior in align_prior_matrices_list])
+                max_text_len = max([prior.shape[1] for prior in align_prior_matrices_list])
+                data_dict["align_prior_matrix"] = stack_tensors(
+                    [prior.float() for prior in align_prior_matrices_list], max_lens=[max_text_len, max_mel_len]
                 )
+            else:
+                # number of frames of the centered STFT of get_log_mel()
+                mel_lengths = 1 + audio_lengths // self.hop_len
+                data_dict["align_prior_matrix"] = self.batched_beta_binomial_prior(tokens_lengths, mel_lengths)
 
-        data_dict = {
-            "audio": torch.stack(audios),
-            "audio_lens": torch.stack(audio_lengths),
-            "text": torch.stack(tokens),
-            "text_lens": torch.stack(tokens_lengths),
-            "log_mel": torch.stack(log_mels) if LogMel in self.sup_data_types_set else None,
-            "log_mel_lens": torch.stack(log_mel_lengths) if LogMel in self.sup_data_types_set else None,
-            "durations": torch.stack(durations_list) if Durations in self.sup_data_types_set else None,
-            "align_prior_matrix": align_prior_matrices if AlignPriorMatrix in self.sup_data_types_set else None,
-            "pitch": torch.stack(pitches) if Pitch in self.sup_data_types_set else None,
-            "pitch_lens": torch.stack(pitches_lengths) if Pitch in self.sup_data_types_set else None,
-            "energy": torch.stack(energies) if Energy in self.sup_data_types_set else None,
-            "energy_lens": torch.stack(energies_lengths) if Energy in self.sup_data_types_set else None,
-            "speaker_id": torch.stack(speaker_ids) if SpeakerID in self.sup_data_types_set else None,
-            "voiced_mask": torch.stack(voiced_masks) if Voiced_mask in self.sup_data_types_set else None,
-            "p_voiced": torch.stack(p_voiceds) if P_voiced in self.sup_data_types_set else None,
-            "audio_shifted": torch.stack(audios_shifted) if audio_shifted is not None else None,
-            "reference_audio": torch.stack(reference_audios) if ReferenceAudio in self.sup_data_types_set else None,
-            "reference_audio_lens": torch.stack(reference_audio_lengths)
-            if ReferenceAudio in self.sup_data_types_set
-            else None,
-        }
+        if Pitch in self.sup_data_types_set:
+            pitches_lengths = torch.stack(pitches_lengths)
+            max_pitches_len = pitches_lengths.max().item()
+            data_dict["pitch"] = stack_tensors(pitches, max_lens=[max_pitches_len])
+            data_dict["pitch_lens"] = pitches_lengths
+
+        if Voiced_mask in self.sup_data_types_set:
+            data_dict["voiced_mask"] = stack_tensors(voiced_masks, max_lens=[max_pitches_len])
+
+        if P_voiced in self.sup_data_types_set:
+            data_dict["p_voiced"] = stack_tensors(p_voiceds, max_lens=[max_pitches_len])
+
+        if Energy in self.sup_data_types_set:
+            energies_lengths = torch.stack(energies_lengths)
+            data_dict["energy"] = stack_tensors(energies, max_lens=[energies_lengths.max().item()])
+            data_dict["energy_lens"] = energies_lengths
+
+        if SpeakerID in self.sup_data_types_set:
+            data_dict["speaker_id"] = torch.stack(speaker_ids)
+
+        if ReferenceAudio in self.sup_data_types_set:
+            reference_audio_lengths = torch.stack(reference_audio_lengths)
+            data_dict["reference_audio"] = stack_tensors(
+                reference_audios, max_lens=[reference_audio_lengths.max().item()]
+            )
+            data_dict["reference_audio_lens"] = reference_audio_lengths
 
         return data_dict
 
@@ -908,6 +919,32 @@ class TTSDataset(Dataset):
         return joined_data
 
 
+class _AudioLoadingDataset(torch.utils.data.Dataset):
+    """
+    Loads the audio of a subset of the samples of a TTSDataset, to compute features of several samples at once.
+    """
+
+    def __init__(self, dataset: TTSDataset, indices: List[int]):
+        self.dataset = dataset
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        sample_index = self.indices[index]
+        return sample_index, self.dataset._load_audio(self.dataset.data[sample_index])
+
+    @staticmethod
+    def collate_fn(batch):
+        indices, audios = zip(*batch)
+        audio_len = torch.tensor([audio.shape[0] for audio in audios]).long()
+        audio = torch.zeros(len(audios), int(audio_len.max()))
+        for i, wav in enumerate(audios):
+            audio[i, : wav.shape[0]] = wav
+        return torch.tensor(indices).long(), audio, audio_len
+
+
 class MixerTTSXDataset(TTSDataset):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 import json
 from dataclasses import dataclass
 from pathlib import Path
@@ -24,14 +25,15 @@ from nemo.collections.asr.parts.utils.manifest_utils import read_manifest
 from nemo.collections.common.tokenizers.text_to_speech.tts_tokenizers import BaseTokenizer
 from nemo.collections.tts.parts.preprocessing.feature_processors import FeatureProcessor
 from nemo.collections.tts.parts.preprocessing.features import Featurizer
+from nemo.collections.tts.parts.utils.tarred_dataset_utils import TarredSampleStream
 from nemo.collections.tts.parts.utils.tts_dataset_utils import (
-    beta_binomial_prior_distribution,
+    BatchedBetaBinomialPrior,
     filter_dataset_by_duration,
     get_abs_rel_paths,
     get_weighted_sampler,
     stack_tensors,
 )
-from nemo.core.classes import Dataset
+from nemo.core.classes import Dataset, IterableDataset
 from nemo.utils import logging
 from nemo.utils.decorators import experimental
 
@@ -101,6 +103,8 @@ class TextToSpeechDataset(Dataset):
         self.weighted_sampling_steps_per_epoch = weighted_sampling_steps_per_epoch
         self.align_prior_hop_length = align_prior_hop_length
         self.include_align_prior = self.align_prior_hop_length is not None
+        if self.include_align_prior:
+            self.beta_binomial_prior = BatchedBetaBinomialPrior()
 
         if speaker_path:
             self.include_speaker = True
@@ -217,13 +221,6 @@ class TextToSpeechDataset(Dataset):
             example["speaker"] = data.speaker
             example["speaker_index"] = data.speaker_index
 
-        if self.include_align_prior:
-            text_len = len(tokens)
-            spec_len = 1 + librosa.core.samples_to_frames(audio.shape[0], hop_length=self.align_prior_hop_length)
-            align_prior = beta_binomial_prior_distribution(phoneme_count=text_len, mel_count=spec_len)
-            align_prior = torch.tensor(align_prior, dtype=torch.float32)
-            example["align_prior"] = align_prior
-
         for featurizer in self.featurizers:
             feature_dict = featurizer.load(
                 manifest_entry=data.manifest_entry, audio_dir=data.audio_dir, feature_dir=data.feature_dir
@@ -236,61 +233,241 @@ class TextToSpeechDataset(Dataset):
         return example
 
     def collate_fn(self, batch: List[dict]):
-        dataset_name_list = []
-        audio_filepath_list = []
-        audio_list = []
-        audio_len_list = []
-        token_list = []
-        token_len_list = []
-        speaker_list = []
-        prior_list = []
-
-        for example in batch:
-            dataset_name_list.append(example["dataset_name"])
-            audio_filepath_list.append(example["audio_filepath"])
-
-            audio_tensor = torch.tensor(example["audio"], dtype=torch.float32)
-            audio_list.append(audio_tensor)
-            audio_len_list.append(audio_tensor.shape[0])
-
-            token_tensor = torch.tensor(example["tokens"], dtype=torch.int32)
-            token_list.append(token_tensor)
-            token_len_list.append(token_tensor.shape[0])
+        return _collate_text_to_speech_batch(
+            batch,
+            text_tokenizer=self.text_tokenizer,
+            featurizers=self.featurizers,
+            include_speaker=self.include_speaker,
+            beta_binomial_prior=self.beta_binomial_prior if self.include_align_prior else None,
+            align_prior_hop_length=self.align_prior_hop_length,
+        )
 
-            if self.include_speaker:
-                speaker_list.append(example["speaker_index"])
 
-            if self.include_align_prior:
-                prior_list.append(example["align_prior"])
+@experimental
+class TarredTextToSpeechDataset(IterableDataset):
+    """
+    Class for streaming text to speech training examples from tar shards, which pack the audio, text and
+    precomputed features of every example. Shards are created with
+    scripts.dataset_processing.tts.create_tarred_dataset.py. Examples and batches have the same format as
+    TextToSpeechDataset.
+
+    Shuffling is done by the dataset, so the data loader has to be created without shuffling or a sampler.
+
+    Args:
+        dataset_meta: Dict of dataset names (string) to tarred dataset metadata, with the path of the
+            "metadata.json" file of the tarred dataset, optionally the directory or URL prefix of the shards if they
+            were moved, and the sample weight.
+        sample_rate: Sample rate to load audio as. If the audio is stored at a different sample rate, then it will
+            be resampled.
+        text_tokenizer: Tokenizer to apply to the text field.
+        weighted_sampling_steps_per_epoch: Optional int, If provided, then data will be sampled (with replacement)
+            based on the sample weights provided in the dataset metadata and speaker_weights. If None, then sample
+            weights will be ignored.
+        speaker_path: Optional, path to JSON file with speaker indices, for multi-speaker training. Can be created with
+            scripts.dataset_processing.tts.create_speaker_map.py
+        speaker_weights: Optional dict of speaker names to sampling weights, for weighted sampling.
+        featurizers: Optional, list of featurizers used to collate the features stored in the shards. Should be
+            the same config provided when creating the tarred dataset.
+        feature_processors: Optional, list of feature processors to run on training examples.
+        align_prior_hop_length: Optional int, hop length of audio features.
+            If provided alignment prior will be calculated and included in batch output. Must match hop length
+            of audio features used for training.
+        min_duration: Optional float, if provided audio files shorter than 'min_duration' will be ignored.
+        max_duration: Optional float, if provided audio files longer than 'max_duration' will be ignored.
+        shuffle_n: Size of the buffer used to shuffle examples, 0 to only shuffle the order of the shards.
+        shard_strategy: 'scatter' to split the shards between the distributed ranks, or 'replicate' to read all
+            shards on every rank.
+        global_rank: Global rank of this process.
+        world_size: Number of distributed processes.
+    """
+
+    def __init__(
+        self,
+        dataset_meta: Dict,
+        sample_rate: int,
+        text_tokenizer: BaseTokenizer,
+        weighted_sampling_steps_per_epoch: Optional[int] = None,
+        speaker_path: Optional[Path] = None,
+        speaker_weights: Optional[Dict[str, float]] = None,
+        featurizers: Optional[Dict[str, Featurizer]] = None,
+        feature_processors: Optional[Dict[str, FeatureProcessor]] = None,
+        align_prior_hop_length: Optional[int] = None,
+        min_duration: Optional[float] = None,
+        max_duration: Optional[float] = None,
+        shuffle_n: int = 0,
+        shard_strategy: str = "scatter",
+        global_rank: int = 0,
+        world_size: int = 1,
+    ):
+        super().__init__()
+
+        self.sample_rate = sample_rate
+        self.text_tokenizer = text_tokenizer
+        self.weighted_sampling_steps_per_epoch = weighted_sampling_steps_per_epoch
+        self.world_size = world_size
+        self.align_prior_hop_length = align_prior_hop_length
+        self.include_align_prior = self.align_prior_hop_length is not None
+        if self.include_align_prior:
+            self.beta_binomial_prior = BatchedBetaBinomialPrior()
+
+        if speaker_path:
+            self.include_speaker = True
+            with open(speaker_path, 'r', encoding="utf-8") as speaker_f:
+                self.speaker_index_map = json.load(speaker_f)
+        else:
+            self.include_speaker = False
+            self.speaker_index_map = None
+
+        if featurizers:
+            logging.info(f"Found featurizers {featurizers.keys()}")
+            self.featurizers = list(featurizers.values())
+        else:
+            self.featurizers = []
+
+        if feature_processors:
+            logging.info(f"Found featurize processors {feature_processors.keys()}")
+            self.feature_processors = list(feature_processors.values())
+        else:
+            self.feature_processors = []
+
+        self.sample_stream = TarredSampleStream(
+            dataset_meta=dataset_meta,
+            shuffle_n=shuffle_n,
+            shard_strategy=shard_strategy,
+            global_rank=global_rank,
+            world_size=world_size,
+            min_duration=min_duration,
+            max_duration=max_duration,
+            speaker_weights=speaker_weights,
+        )
+
+    def get_sampler(self, batch_size: int) -> Optional[torch.utils.data.Sampler]:
+        # Iterable datasets can't be sampled by index, weighted sampling is done by the sample stream instead
+        if self.weighted_sampling_steps_per_epoch:
+            num_samples = batch_size * self.weighted_sampling_steps_per_epoch
+            self.sample_stream.num_weighted_samples = num_samples // self.world_size
+        return None
+
+    def __len__(self):
+        return len(self.sample_stream)
 
-        batch_audio_len = torch.IntTensor(audio_len_list)
-        audio_max_len = int(batch_audio_len.max().item())
+    def __iter__(self):
+        for sample in self.sample_stream:
+            yield self._build_example(sample)
 
-        batch_token_len = torch.IntTensor(token_len_list)
-        token_max_len = int(batch_token_len.max().item())
+    def _build_example(self, sample):
+        audio, _ = librosa.load(io.BytesIO(sample.audio_bytes), sr=self.sample_rate)
 
-        batch_audio = stack_tensors(audio_list, max_lens=[audio_max_len])
-        batch_tokens = stack_tensors(token_list, max_lens=[token_max_len], pad_value=self.text_tokenizer.pad)
+        if "normalized_text" in sample.manifest_entry:
+            text = sample.manifest_entry["normalized_text"]
+        else:
+            text = sample.manifest_entry["text"]
+        tokens = self.text_tokenizer(text)
 
-        batch_dict = {
-            "dataset_names": dataset_name_list,
-            "audio_filepaths": audio_filepath_list,
-            "audio": batch_audio,
-            "audio_lens": batch_audio_len,
-            "text": batch_tokens,
-            "text_lens": batch_token_len,
+        example = {
+            "dataset_name": sample.dataset_name,
+            "audio_filepath": Path(sample.manifest_entry["audio_filepath"]),
+            "audio": audio,
+            "tokens": tokens,
         }
 
         if self.include_speaker:
-            batch_dict["speaker_id"] = torch.IntTensor(speaker_list)
+            speaker = sample.manifest_entry["speaker"]
+            example["speaker"] = speaker
+            example["speaker_index"] = self.speaker_index_map[speaker]
 
-        if self.include_align_prior:
-            spec_max_len = max([prior.shape[0] for prior in prior_list])
-            text_max_len = max([prior.shape[1] for prior in prior_list])
-            batch_dict["align_prior_matrix"] = stack_tensors(prior_list, max_lens=[text_max_len, spec_max_len],)
+        for feature_name, feature_array in sample.features.items():
+            example[feature_name] = torch.from_numpy(feature_array)
 
-        for featurizer in self.featurizers:
-            feature_dict = featurizer.collate_fn(batch)
-            batch_dict.update(feature_dict)
+        for processor in self.feature_processors:
+            processor.process(example)
 
-        return batch_dict
+        return example
+
+    def collate_fn(self, batch: List[dict]):
+        return _collate_text_to_speech_batch(
+            batch,
+            text_tokenizer=self.text_tokenizer,
+            featurizers=self.featurizers,
+            include_speaker=self.include_speaker,
+            beta_binomial_prior=self.beta_binomial_prior if self.include_align_prior else None,
+            align_prior_hop_length=self.align_prior_hop_length,
+        )
+
+
+def _collate_text_to_speech_batch(
+    batch: List[dict],
+    text_tokenizer: BaseTokenizer,
+    featurizers: List[Featurizer],
+    include_speaker: bool,
+    beta_binomial_prior: Optional[BatchedBetaBinomialPrior] = None,
+    align_prior_hop_length: Optional[int] = None,
+) -> dict:
+    """
+    Collates text to speech examples, as returned by TextToSpeechDataset and TarredTextToSpeechDataset, into a
+    batch.
+
+    Args:
+        batch: List of training examples.
+        text_tokenizer: Tokenizer the text was encoded with, used to pad the tokens.
+        featurizers: List of featurizers used to collate the features of the examples.
+        include_speaker: Whether to include the speaker indices of the examples.
+        beta_binomial_prior: Optional, prior used to compute the alignment prior of the batch.
+        align_prior_hop_length: Hop length of the audio features, required to compute the alignment prior.
+
+    Returns:
+        Dictionary of batched tensors.
+    """
+    dataset_name_list = []
+    audio_filepath_list = []
+    audio_list = []
+    audio_len_list = []
+    token_list = []
+    token_len_list = []
+    speaker_list = []
+
+    for example in batch:
+        dataset_name_list.append(example["dataset_name"])
+        audio_filepath_list.append(example["audio_filepath"])
+
+        audio_tensor = torch.tensor(example["audio"], dtype=torch.float32)
+        audio_list.append(audio_tensor)
+        audio_len_list.append(audio_tensor.shape[0])
+
+        token_tensor = torch.tensor(example["tokens"], dtype=torch.int32)
+        token_list.append(token_tensor)
+        token_len_list.append(token_tensor.shape[0])
+
+        if include_speaker:
+            speaker_list.append(example["speaker_index"])
+
+    batch_audio_len = torch.IntTensor(audio_len_list)
+    audio_max_len = int(batch_audio_len.max().item())
+
+    batch_token_len = torch.IntTensor(token_len_list)
+    token_max_len = int(batch_token_len.max().item())
+
+    batch_audio = stack_tensors(audio_list, max_lens=[audio_max_len])
+    batch_tokens = stack_tensors(token_list, max_lens=[token_max_len], pad_value=text_tokenizer.pad)
+
+    batch_dict = {
+        "dataset_names": dataset_name_list,
+        "audio_filepaths": audio_filepath_list,
+        "audio": batch_audio,
+        "audio_lens": batch_audio_len,
+        "text": batch_tokens,
+        "text_lens": batch_token_len,
+    }
+
+    if include_speaker:
+        batch_dict["speaker_id"] = torch.IntTensor(speaker_list)
+
+    if beta_binomial_prior is not None:
+        spec_len = 1 + batch_audio_len // align_prior_hop_length
+        batch_dict["align_prior_matrix"] = beta_binomial_prior(phoneme_counts=batch_token_len, mel_counts=spec_len)
+
+    for featurizer in featurizers:
+        feature_dict = featurizer.collate_fn(batch)
+        batch_dict.update(feature_dict)
+
+    return batch_dict
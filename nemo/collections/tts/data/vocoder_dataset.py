@@ -12,10 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 import traceback
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
 import librosa
 import torch.utils.data
@@ -23,13 +24,14 @@ import torch.utils.data
 from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
 from nemo.collections.asr.parts.utils.manifest_utils import read_manifest
 from nemo.collections.tts.parts.preprocessing.feature_processors import FeatureProcessor
+from nemo.collections.tts.parts.utils.tarred_dataset_utils import TarredSampleStream
 from nemo.collections.tts.parts.utils.tts_dataset_utils import (
     filter_dataset_by_duration,
     get_abs_rel_paths,
     get_weighted_sampler,
     stack_tensors,
 )
-from nemo.core.classes import Dataset
+from nemo.core.classes import Dataset, IterableDataset
 from nemo.utils import logging
 from nemo.utils.decorators import experimental
 
@@ -121,34 +123,14 @@ class VocoderDataset(Dataset):
         )
         return sampler
 
-    def _segment_audio(self, audio_filepath: Path) -> AudioSegment:
-        # File seeking sometimes fails when reading flac files with libsndfile < 1.0.30.
-        # Read audio as int32 to minimize issues, and retry read on a different segment in case of failure.
-        # https://github.com/bastibe/python-soundfile/issues/274
-        for _ in range(self.num_audio_retries):
-            try:
-                audio_segment = AudioSegment.segment_from_file(
-                    audio_filepath, target_sr=self.sample_rate, n_segments=self.n_samples, dtype="int32"
-                )
-                return audio_segment
-            except Exception:
-                traceback.print_exc()
-
-        raise ValueError(f"Failed to read audio {audio_filepath}")
-
     def _sample_audio(self, audio_filepath: Path) -> Tuple[torch.Tensor, torch.Tensor]:
-        if not self.n_samples:
-            audio_array, _ = librosa.load(audio_filepath, sr=self.sample_rate)
-        else:
-            audio_segment = self._segment_audio(audio_filepath)
-            audio_array = audio_segment.samples
-
-        if self.trunc_samples:
-            audio_array = audio_array[: self.trunc_samples]
-
-        audio = torch.tensor(audio_array)
-        audio_len = torch.tensor(audio.shape[0])
-        return audio, audio_len
+        return _sample_audio(
+            audio_filepath,
+            sample_rate=self.sample_rate,
+            n_samples=self.n_samples,
+            trunc_samples=self.trunc_samples,
+            num_audio_retries=self.num_audio_retries,
+        )
 
     @staticmethod
     def _preprocess_manifest(
@@ -198,27 +180,209 @@ class VocoderDataset(Dataset):
         return example
 
     def collate_fn(self, batch: List[dict]):
-        dataset_name_list = []
-        audio_filepath_list = []
-        audio_list = []
-        audio_len_list = []
-
-        for example in batch:
-            dataset_name_list.append(example["dataset_name"])
-            audio_filepath_list.append(example["audio_filepath"])
-            audio_list.append(example["audio"])
-            audio_len_list.append(example["audio_len"])
-
-        batch_audio_len = torch.IntTensor(audio_len_list)
-        audio_max_len = int(batch_audio_len.max().item())
-
-        batch_audio = stack_tensors(audio_list, max_lens=[audio_max_len])
-
-        batch_dict = {
-            "dataset_names": dataset_name_list,
-            "audio_filepaths": audio_filepath_list,
-            "audio": batch_audio,
-            "audio_lens": batch_audio_len,
+        return _collate_vocoder_batch(batch)
+
+
+@experimental
+class TarredVocoderDataset(IterableDataset):
+    """
+    Class for streaming Vocoder training examples from tar shards created with
+    scripts.dataset_processing.tts.create_tarred_dataset.py. Examples and batches have the same format as
+    VocoderDataset, features stored in the shards are ignored.
+
+    Shuffling is done by the dataset, so the data loader has to be created without shuffling or a sampler.
+
+    Args:
+        dataset_meta: Dict of dataset names (string) to tarred dataset metadata, with the path of the
+            "metadata.json" file of the tarred dataset, optionally the directory or URL prefix of the shards if they
+            were moved, and the sample weight.
+        sample_rate: Sample rate to load audio as. If the audio is stored at a different sample rate, then it will
+            be resampled.
+        n_samples: Optional int, if provided then n_samples samples will be randomly sampled from the full
+            audio file.
+        weighted_sampling_steps_per_epoch: Optional int, If provided, then data will be sampled (with replacement)
+            based on the sample weights provided in the dataset metadata and speaker_weights. If None, then sample
+            weights will be ignored.
+        speaker_weights: Optional dict of speaker names to sampling weights, for weighted sampling.
+        feature_processors: Optional, list of feature processors to run on training examples.
+        min_duration: Optional float, if provided audio files shorter than 'min_duration' will be ignored.
+        max_duration: Optional float, if provided audio files longer than 'max_duration' will be ignored.
+        trunc_duration: Optional int, if provided audio will be truncated to at most 'trunc_duration' seconds.
+        num_audio_retries: Number of read attempts to make when sampling audio, to avoid training failing
+            from sporadic decoding errors.
+        shuffle_n: Size of the buffer used to shuffle examples, 0 to only shuffle the order of the shards.
+        shard_strategy: 'scatter' to split the shards between the distributed ranks, or 'replicate' to read all
+            shards on every rank.
+        global_rank: Global rank of this process.
+        world_size: Number of distributed processes.
+    """
+
+    def __init__(
+        self,
+        dataset_meta: Dict,
+        sample_rate: int,
+        n_samples: Optional[int] = None,
+        weighted_sampling_steps_per_epoch: Optional[int] = None,
+        speaker_weights: Optional[Dict[str, float]] = None,
+        feature_processors: Optional[Dict[str, FeatureProcessor]] = None,
+        min_duration: Optional[float] = None,
+        max_duration: Optional[float] = None,
+        trunc_duration: Optional[float] = None,
+        num_audio_retries: int = 5,
+        shuffle_n: int = 0,
+        shard_strategy: str = "scatter",
+        global_rank: int = 0,
+        world_size: int = 1,
+    ):
+        super().__init__()
+
+        self.sample_rate = sample_rate
+        self.n_samples = n_samples
+        self.weighted_sampling_steps_per_epoch = weighted_sampling_steps_per_epoch
+        self.num_audio_retries = num_audio_retries
+        self.world_size = world_size
+        self.load_precomputed_mel = False
+
+        if trunc_duration:
+            self.trunc_samples = int(trunc_duration * self.sample_rate)
+        else:
+            self.trunc_samples = None
+
+        if feature_processors:
+            logging.info(f"Found feature processors {feature_processors.keys()}")
+            self.feature_processors = list(feature_processors.values())
+        else:
+            self.feature_processors = []
+
+        self.sample_stream = TarredSampleStream(
+            dataset_meta=dataset_meta,
+            shuffle_n=shuffle_n,
+            shard_strategy=shard_strategy,
+            global_rank=global_rank,
+            world_size=world_size,
+            min_duration=min_duration,
+            max_duration=max_duration,
+            speaker_weights=speaker_weights,
+        )
+
+    def get_sampler(self, batch_size: int) -> Optional[torch.utils.data.Sampler]:
+        # Iterable datasets can't be sampled by index, weighted sampling is done by the sample stream instead
+        if self.weighted_sampling_steps_per_epoch:
+            num_samples = batch_size * self.weighted_sampling_steps_per_epoch
+            self.sample_stream.num_weighted_samples = num_samples // self.world_size
+        return None
+
+    def __len__(self):
+        return len(self.sample_stream)
+
+    def __iter__(self):
+        for sample in self.sample_stream:
+            yield self._build_example(sample)
+
+    def _build_example(self, sample):
+        audio, audio_len = _sample_audio(
+            io.BytesIO(sample.audio_bytes),
+            sample_rate=self.sample_rate,
+            n_samples=self.n_samples,
+            trunc_samples=self.trunc_samples,
+            num_audio_retries=self.num_audio_retries,
+        )
+
+        example = {
+            "dataset_name": sample.dataset_name,
+            "audio_filepath": Path(sample.manifest_entry["audio_filepath"]),
+            "audio": audio,
+            "audio_len": audio_len,
         }
 
-        return batch_dict
+        for processor in self.feature_processors:
+            processor.process(example)
+
+        return example
+
+    def collate_fn(self, batch: List[dict]):
+        return _collate_vocoder_batch(batch)
+
+
+def _segment_audio(
+    audio_file: Union[Path, io.BytesIO], sample_rate: int, n_samples: int, num_audio_retries: int
+) -> AudioSegment:
+    # File seeking sometimes fails when reading flac files with libsndfile < 1.0.30.
+    # Read audio as int32 to minimize issues, and retry read on a different segment in case of failure.
+    # https://github.com/bastibe/python-soundfile/issues/274
+    for _ in range(num_audio_retries):
+        try:
+            if isinstance(audio_file, io.IOBase):
+                # Every read attempt starts from the beginning of the in-memory audio file
+                audio_file.seek(0)
+            audio_segment = AudioSegment.segment_from_file(
+                audio_file, target_sr=sample_rate, n_segments=n_samples, dtype="int32"
+            )
+            return audio_segment
+        except Exception:
+            traceback.print_exc()
+
+    raise ValueError(f"Failed to read audio {audio_file}")
+
+
+def _sample_audio(
+    audio_file: Union[Path, io.BytesIO],
+    sample_rate: int,
+    n_samples: Optional[int],
+    trunc_samples: Optional[int],
+    num_audio_retries: int,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Loads the audio of a vocoder training example, shared by VocoderDataset and TarredVocoderDataset.
+
+    Args:
+        audio_file: Path of the audio file, or in-memory audio file.
+        sample_rate: Sample rate to load audio as.
+        n_samples: Optional int, if provided then n_samples samples will be randomly sampled from the audio.
+        trunc_samples: Optional int, if provided audio will be truncated to at most 'trunc_samples' samples.
+        num_audio_retries: Number of read attempts to make when sampling audio.
+
+    Returns:
+        Audio tensor and its length.
+    """
+    if not n_samples:
+        audio_array, _ = librosa.load(audio_file, sr=sample_rate)
+    else:
+        audio_segment = _segment_audio(
+            audio_file, sample_rate=sample_rate, n_samples=n_samples, num_audio_retries=num_audio_retries
+        )
+        audio_array = audio_segment.samples
+
+    if trunc_samples:
+        audio_array = audio_array[:trunc_samples]
+
+    audio = torch.tensor(audio_array)
+    audio_len = torch.tensor(audio.shape[0])
+    return audio, audio_len
+
+
+def _collate_vocoder_batch(batch: List[dict]) -> dict:
+    dataset_name_list = []
+    audio_filepath_list = []
+    audio_list = []
+    audio_len_list = []
+
+    for example in batch:
+        dataset_name_list.append(example["dataset_name"])
+        audio_filepath_list.append(example["audio_filepath"])
+        audio_list.append(example["audio"])
+        audio_len_list.append(example["audio_len"])
+
+    batch_audio_len = torch.IntTensor(audio_len_list)
+    audio_max_len = int(batch_audio_len.max().item())
+
+    batch_audio = stack_tensors(audio_list, max_lens=[audio_max_len])
+
+    batch_dict = {
+        "dataset_names": dataset_name_list,
+        "audio_filepaths": audio_filepath_list,
+        "audio": batch_audio,
+        "audio_lens": batch_audio_len,
+    }
+
+    return batch_dict
@@ -13,7 +13,9 @@
 # limitations under the License.
 
 from abc import ABC, abstractmethod
-from typing import Optional
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple, Union
+
 from nemo.utils import logging
 
 
@@ -24,6 +26,7 @@ class BaseG2p(ABC):
         word_tokenize_func=lambda x: x,
         apply_to_oov_word=None,
         mapping_file: Optional[str] = None,
+        word_cache_size: int = 0,
     ):
         """Abstract class for creating an arbitrary module to convert grapheme words
         to phoneme sequences, leave unchanged, or use apply_to_oov_word.
@@ -31,17 +34,46 @@ class BaseG2p(ABC):
             phoneme_dict: Arbitrary representation of dictionary (phoneme -> grapheme) for known words.
             word_tokenize_func: Function for tokenizing text to words.
             apply_to_oov_word: Function that will be applied to out of phoneme_dict word.
+            word_cache_size: Maximum number of words in the LRU cache of word conversions, 0 to disable the cache.
         """
         self.phoneme_dict = phoneme_dict
         self.word_tokenize_func = word_tokenize_func
         self.apply_to_oov_word = apply_to_oov_word
         self.mapping_file = mapping_file
         self.heteronym_model = None  # heteronym classification model
+        self.word_cache_size = word_cache_size
+        self._word_cache = OrderedDict()
 
     @abstractmethod
     def __call__(self, text: str) -> str:
         pass
 
+    def clear_word_cache(self):
+        """Clears cached word conversions. Has to be called after changing the phoneme dictionary or the rules."""
+        self._word_cache.clear()
+
+    def _cached_parse(
+        self, word: str, parse_func: Callable[[str], Tuple[Union[str, List[str]], bool]]
+    ) -> Tuple[Union[str, List[str]], bool]:
+        """Returns `parse_func(word)`, from the LRU cache of word conversions if `word` was converted before.
+        `parse_func` must be deterministic, any randomness has to be applied by the caller.
+        """
+        if self.word_cache_size <= 0:
+            return parse_func(word)
+
+        cached = self._word_cache.get(word)
+        if cached is None:
+            cached = parse_func(word)
+            self._word_cache[word] = cached
+            if len(self._word_cache) > self.word_cache_size:
+                self._word_cache.popitem(last=False)
+        else:
+            self._word_cache.move_to_end(word)
+
+        pron, is_handled = cached
+        # copy so that callers can't modify cached pronunciations, strings are immutable
+        return pron[:], is_handled
+
     # TODO @xueyang: replace `wordid_to_phonemes_file` default variable with a global variable defined in util file.
     def setup_heteronym_model(
         self,
@@ -16,13 +16,18 @@ import pathlib
 import random
 import re
 import time
-from typing import Optional
+from typing import List, Optional, Union
 
 import nltk
 import torch
 
 from nemo.collections.common.tokenizers.text_to_speech.tokenizer_utils import english_word_tokenize
 from nemo.collections.tts.g2p.models.base import BaseG2p
+from nemo.collections.tts.g2p.utils import (
+    is_compiled_phoneme_dict,
+    load_compiled_phoneme_dict,
+    save_compiled_phoneme_dict,
+)
 from nemo.utils import logging
 from nemo.utils.get_rank import is_global_rank_zero
 
@@ -38,12 +43,14 @@ class EnglishG2p(BaseG2p):
         encoding='latin-1',
         phoneme_probability: Optional[float] = None,
         mapping_file: Optional[str] = None,
+        word_cache_size: int = 10000,
     ):
         """English G2P module. This module converts words from grapheme to phoneme representation using phoneme_dict in CMU dict format.
         Optionally, it can ignore words which are heteronyms, ambiguous or marked as unchangeable by word_tokenize_func (see code for details).
         Ignored words are left unchanged or passed through apply_to_oov_word for handling.
         Args:
             phoneme_dict (str, Path, Dict): Path to file in CMUdict format or dictionary of CMUdict-like entries.
+                It can also be a path to a dictionary compiled with `EnglishG2p.compile_phoneme_dict`.
             word_tokenize_func: Function for tokenizing text to words.
                 It has to return List[Tuple[Union[str, List[str]], bool]] where every tuple denotes word representation and flag whether to leave unchanged or not.
                 It is expected that unchangeable word representation will be represented as List[str], other cases are represented as str.
@@ -55,6 +62,9 @@ class EnglishG2p(BaseG2p):
             phoneme_probability (Optional[float]): The probability (0.<var<1.) that each word is phonemized. Defaults to None which is the same as 1.
                 Note that this code path is only run if the word can be phonemized. For example: If the word does not have an entry in the g2p dict, it will be returned
                 as characters. If the word has multiple entries and ignore_ambiguous_words is True, it will be returned as characters.
+            word_cache_size (int): Maximum number of words in the LRU cache of word conversions, 0 disables it.
+                `phoneme_probability` is applied before the cache, so cached words may still be kept as characters.
+                Results of `apply_to_oov_word` are cached as well, so it should be deterministic.
         """
         phoneme_dict = (
             self._parse_as_cmu_dict(phoneme_dict, encoding)
@@ -75,6 +85,7 @@ class EnglishG2p(BaseG2p):
             word_tokenize_func=word_tokenize_func,
             apply_to_oov_word=apply_to_oov_word,
             mapping_file=mapping_file,
+            word_cache_size=word_cache_size,
         )
 
         self.ignore_ambiguous_words = ignore_ambiguous_words
@@ -127,6 +138,9 @@ class EnglishG2p(BaseG2p):
 
             return nltk.corpus.cmudict.dict()
 
+        if is_compiled_phoneme_dict(phoneme_dict_path):
+            return load_compiled_phoneme_dict(phoneme_dict_path)
+
         _alt_re = re.compile(r'\([0-9]+\)')
         g2p_dict = {}
         with open(phoneme_dict_path, encoding=encoding) as file:
@@ -143,6 +157,14 @@ class EnglishG2p(BaseG2p):
                         g2p_dict[word] = [pronunciation]
         return g2p_dict
 
+    @staticmethod
+    def compile_phoneme_dict(phoneme_dict_path, output_path, encoding='latin-1'):
+        """
+        Parses a phoneme dictionary in CMUdict format and saves it in a binary form that loads much faster.
+        The output path has to end with `.npz`, and can be passed as `phoneme_dict` instead of the text file.
+        """
+        save_compiled_phoneme_dict(EnglishG2p._parse_as_cmu_dict(phoneme_dict_path, encoding), output_path)
+
     @staticmethod
     def _parse_file_by_lines(p, encoding):
         with open(p, encoding=encoding) as f:
@@ -160,6 +182,9 @@ class EnglishG2p(BaseG2p):
         if self.phoneme_probability is not None and self._rng.random() > self.phoneme_probability:
             return word, True
 
+        return self._cached_parse(word, self._parse_one_word)
+
+    def _parse_one_word(self, word: str):
         # punctuation or whitespace.
         if re.search(r"[a-zA-ZÀ-ÿ\d]", word) is None:
             return list(word), True
@@ -197,7 +222,13 @@ class EnglishG2p(BaseG2p):
         else:
             return word, False
 
-    def __call__(self, text):
+    def __call__(self, text: Union[str, List[str]]):
+        """Converts a sentence, or each sentence of a list, to a list of phonemes and graphemes."""
+        if isinstance(text, list):
+            return [self._convert_sentence(sentence) for sentence in text]
+        return self._convert_sentence(text)
+
+    def _convert_sentence(self, text: str):
         words = self.word_tokenize_func(text)
 
         prons = []
@@ -26,7 +26,14 @@ from nemo.collections.common.tokenizers.text_to_speech.tokenizer_utils import (
     normalize_unicode_text,
 )
 from nemo.collections.tts.g2p.models.base import BaseG2p
-from nemo.collections.tts.g2p.utils import GRAPHEME_CASE_MIXED, GRAPHEME_CASE_UPPER, set_grapheme_case
+from nemo.collections.tts.g2p.utils import (
+    GRAPHEME_CASE_MIXED,
+    GRAPHEME_CASE_UPPER,
+    is_compiled_phoneme_dict,
+    load_compiled_phoneme_dict,
+    save_compiled_phoneme_dict,
+    set_grapheme_case,
+)
 from nemo.utils import logging
 from nemo.utils.decorators import experimental
 
@@ -53,6 +60,7 @@ class IpaG2p(BaseG2p):
         grapheme_case: Optional[str] = GRAPHEME_CASE_UPPER,
         grapheme_prefix: Optional[str] = "",
         mapping_file: Optional[str] = None,
+        word_cache_size: int = 10000,
     ) -> None:
         """
         Generic IPA G2P module. This module converts words from graphemes to International Phonetic Alphabet
@@ -65,6 +73,7 @@ class IpaG2p(BaseG2p):
                 entries. For example,
                 a dictionary file: scripts/tts_dataset_files/ipa_cmudict-0.7b_nv22.06.txt;
                 a dictionary object: {..., "Wire": [["ˈ", "w", "a", "ɪ", "ɚ"], ["ˈ", "w", "a", "ɪ", "ɹ"]], ...}.
+                It can also be a path to a dictionary compiled with `IpaG2p.compile_phoneme_dict`, which loads faster.
             locale (str): Locale used to determine a locale-specific tokenization logic. Currently, it supports "en-US",
                 "de-DE", and "es-ES". Defaults to "en-US". Specify None if implementing custom logic for a new locale.
             apply_to_oov_word (Callable): Function that deals with the out-of-vocabulary (OOV) words that do not exist
@@ -92,6 +101,9 @@ class IpaG2p(BaseG2p):
                 from phonemes because there may be overlaps between the two set. It is suggested to choose a prefix that
                 is not used or preserved somewhere else. "#" could be a good candidate. Default to "".
             TODO @borisfom: add docstring for newly added `mapping_file` argument.
+            word_cache_size (int): Maximum number of words in the LRU cache of word conversions, 0 disables it.
+                `phoneme_probability` is applied before the cache, so cached words may still be kept as graphemes.
+                Results of `apply_to_oov_word` are cached as well, so it should be deterministic.
         """
         self.use_stresses = use_stresses
         self.grapheme_case = grapheme_case
@@ -141,6 +153,7 @@ class IpaG2p(BaseG2p):
             word_tokenize_func=word_tokenize_func,
             apply_to_oov_word=apply_to_oov_word,
             mapping_file=mapping_file,
+            word_cache_size=word_cache_size,
         )
 
         self.ignore_ambiguous_words = ignore_ambiguous_words
@@ -169,7 +182,11 @@ class IpaG2p(BaseG2p):
 
         Returns: a dict object (Dict[str, List[List[str]]]).
         """
-        if isinstance(phoneme_dict, str) or isinstance(phoneme_dict, pathlib.Path):
+        if (isinstance(phoneme_dict, str) or isinstance(phoneme_dict, pathlib.Path)) and is_compiled_phoneme_dict(
+            phoneme_dict
+        ):
+            phoneme_dict_obj = load_compiled_phoneme_dict(phoneme_dict)
+        elif isinstance(phoneme_dict, str) or isinstance(phoneme_dict, pathlib.Path):
             # load the dictionary file where there may exist a digit suffix after a word, e.g. "Word(2)", which
             # represents the pronunciation variant of that word.
             phoneme_dict_obj = defaultdict(list)
@@ -224,6 +241,15 @@ class IpaG2p(BaseG2p):
         Replace model's phoneme dictionary with a custom one
         """
         self.phoneme_dict = self._parse_phoneme_dict(phoneme_dict)
+        self.clear_word_cache()
+
+    @staticmethod
+    def compile_phoneme_dict(phoneme_dict_path: Union[str, pathlib.Path], output_path: Union[str, pathlib.Path]):
+        """
+        Parses a phoneme dictionary file in CMUdict format and saves it in a binary form that loads much faster.
+        The output path has to end with `.npz`, and can be passed as `phoneme_dict` instead of the text file.
+        """
+        save_compiled_phoneme_dict(IpaG2p._parse_phoneme_dict(phoneme_dict_path), output_path)
 
     @staticmethod
     def _parse_file_by_lines(p: Union[str, pathlib.Path]) -> List[str]:
@@ -339,6 +365,7 @@ class IpaG2p(BaseG2p):
             self.phoneme_dict.update(replacement_dict)
 
         self.symbols = new_symbols
+        self.clear_word_cache()
 
     def is_unique_in_phoneme_dict(self, word: str) -> bool:
         return len(self.phoneme_dict[word]) == 1
@@ -356,6 +383,9 @@ class IpaG2p(BaseG2p):
         if self.phoneme_probability is not None and self._rng.random() > self.phoneme_probability:
             return self._prepend_prefix_for_one_word(word), True
 
+        return self._cached_parse(word, self._parse_one_word)
+
+    def _parse_one_word(self, word: str) -> Tuple[List[str], bool]:
         # Heteronyms
         if self.heteronyms and word in self.heteronyms:
             return self._prepend_prefix_for_one_word(word), True
@@ -428,15 +458,23 @@ class IpaG2p(BaseG2p):
         else:
             return self._prepend_prefix_for_one_word(word), False
 
-    def __call__(self, text: str) -> List[str]:
-        text = normalize_unicode_text(text)
+    def __call__(self, text: Union[str, List[str]]) -> Union[List[str], List[List[str]]]:
+        """Converts a sentence, or each sentence of a list, to a list of phonemes and graphemes.
+        Heteronyms of all sentences of a list are disambiguated in a single call of the heteronym model.
+        """
+        is_batch = isinstance(text, list)
+        sentences = [normalize_unicode_text(sentence) for sentence in (text if is_batch else [text])]
 
         if self.heteronym_model is not None:
             try:
-                text = self.heteronym_model.disambiguate(sentences=[text])[1][0]
+                sentences = self.heteronym_model.disambiguate(sentences=sentences)[1]
             except Exception as e:
                 logging.warning(f"Heteronym model failed {e}, skipping")
 
+        prons = [self._convert_sentence(sentence) for sentence in sentences]
+        return prons if is_batch else prons[0]
+
+    def _convert_sentence(self, text: str) -> List[str]:
         words_list_of_tuple = self.word_tokenize_func(text)
 
         prons = []
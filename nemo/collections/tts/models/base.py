@@ -15,13 +15,18 @@
 import json
 from abc import ABC, abstractmethod
 from contextlib import ExitStack, contextmanager
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional
 
 import torch
 from omegaconf import DictConfig
 from tqdm import tqdm
 
-from nemo.collections.tts.parts.utils.helpers import OperationMode
+from nemo.collections.tts.parts.utils.helpers import (
+    OperationMode,
+    get_length_buckets,
+    get_vocoder_receptive_field,
+    vocode_in_chunks,
+)
 from nemo.core.classes import ModelPT
 from nemo.core.classes.common import PretrainedModelInfo, typecheck
 from nemo.core.neural_types.elements import AudioSignal
@@ -54,6 +59,39 @@ class SpectrogramGenerator(ModelPT, ABC):
             spectrograms
         """
 
+    def parse_batch(self, str_inputs: List[str], num_workers: int = 0, **kwargs) -> 'List[torch.tensor]':
+        """
+        Parses a list of raw python strings with `parse`. Models can override it to parse strings in parallel,
+        otherwise `num_workers` is ignored.
+
+        Args:
+            str_inputs: strings to parse.
+            num_workers: number of worker processes to parse strings.
+            kwargs: arguments of `parse`.
+
+        Returns:
+            A list with the 1D tensor of every string.
+        """
+        return [self.parse(str_input, **kwargs).squeeze(0) for str_input in str_inputs]
+
+    def generate_spectrograms(
+        self, tokens: 'List[torch.tensor]', max_batch_size: int = 32, **kwargs
+    ) -> 'List[torch.tensor]':
+        """
+        Generates the spectrogram of every text of a list, e.g. from `parse_batch`. By default, texts are passed one
+        by one to `generate_spectrogram`. Models that support padded inputs override it to generate spectrograms of
+        texts with similar lengths together, in batches of at most `max_batch_size` texts.
+
+        Args:
+            tokens: A list of 1D tensors representing the texts to be generated
+            max_batch_size: maximum number of texts in a batch.
+            kwargs: arguments of `generate_spectrogram`.
+
+        Returns:
+            A list of ['n_freqs', 'T'] spectrograms, without padding
+        """
+        return [self.generate_spectrogram(tokens=text.unsqueeze(0), **kwargs).squeeze(0) for text in tokens]
+
     @classmethod
     def list_available_models(cls) -> 'List[PretrainedModelInfo]':
         """
@@ -99,6 +137,79 @@ class Vocoder(ModelPT, ABC):
             audio
         """
 
+    def convert_spectrograms_to_audio(
+        self, specs: 'List[torch.tensor]', max_batch_size: int = 32, max_batch_frames: Optional[int] = None, **kwargs,
+    ) -> 'List[torch.tensor]':
+        """
+        Converts a list of spectrograms of different lengths to audio. Spectrograms with similar lengths are converted
+        together with `convert_spectrogram_to_audio`. Shorter spectrograms of a batch are padded by repeating their
+        last frame, which is usually silence, and audio is trimmed to the length of every spectrogram.
+
+        Args:
+            specs: A list of ['n_freqs', 'T'] spectrograms.
+            max_batch_size: maximum number of spectrograms in a batch.
+            max_batch_frames: Optional, maximum number of frames in a batch, including padding.
+            kwargs: arguments of `convert_spectrogram_to_audio`.
+
+        Returns:
+            A list of ['T_audio'] audio, without padding.
+        """
+        audio = [None] * len(specs)
+        spec_lens = [spec.shape[-1] for spec in specs]
+        batches = get_length_buckets(spec_lens, max_batch_size=max_batch_size, max_batch_length=max_batch_frames)
+        for batch_idx in batches:
+            max_len = spec_lens[batch_idx[0]]
+            if max_len == 0:
+                for i in batch_idx:
+                    audio[i] = specs[i].new_zeros(0)
+                continue
+
+            batch_specs = []
+            for i in batch_idx:
+                spec = specs[i]
+                last_frame = spec[:, -1:] if spec_lens[i] > 0 else spec.new_zeros(spec.shape[0], 1)
+                batch_specs.append(torch.cat([spec, last_frame.expand(-1, max_len - spec_lens[i])], dim=-1))
+
+            batch_audio = self.convert_spectrogram_to_audio(spec=torch.stack(batch_specs), **kwargs)
+            samples_per_frame = batch_audio.shape[-1] // max_len
+            for i, item_audio in zip(batch_idx, batch_audio):
+                audio[i] = item_audio[: spec_lens[i] * samples_per_frame]
+        return audio
+
+    def convert_spectrogram_to_audio_chunks(
+        self, spec: 'torch.tensor', chunk_size: int = 32, **kwargs
+    ) -> 'Iterator[torch.tensor]':
+        """
+        Converts a batch of spectrograms to audio in chunks of `chunk_size` frames, for streaming inference with
+        convolutional vocoders such as HiFi-GAN. Every chunk is vocoded with enough frames of context on each side
+        to cover the receptive field of the vocoder, so the concatenated chunks are equal to the output of
+        `convert_spectrogram_to_audio` up to floating point error.
+
+        Args:
+            spec: ['B', 'n_freqs', 'T'], A torch tensor representing the spectrograms to be vocoded.
+            chunk_size: number of frames of every chunk.
+            kwargs: arguments of `convert_spectrogram_to_audio`.
+
+        Returns:
+            Iterator over the ['B', 'T_audio'] audio of every chunk.
+        """
+        return self._vocode_in_chunks(
+            lambda inputs: self.convert_spectrogram_to_audio(spec=inputs[0], **kwargs), [spec], chunk_size
+        )
+
+    def _vocode_in_chunks(
+        self, vocode_func: Callable, inputs: 'List[torch.tensor]', chunk_size: int
+    ) -> 'Iterator[torch.tensor]':
+        """Vocodes frame level inputs in chunks, measuring the receptive field of the vocoder the first time."""
+        if not hasattr(self, "_receptive_fields"):
+            self._receptive_fields = {}
+        key = tuple(x.shape[1] for x in inputs)
+        if key not in self._receptive_fields:
+            self._receptive_fields[key] = get_vocoder_receptive_field(
+                vocode_func, input_channels=list(key), device=inputs[0].device, dtype=inputs[0].dtype
+            )
+        return vocode_in_chunks(vocode_func, inputs, chunk_size, self._receptive_fields[key])
+
     @classmethod
     def list_available_models(cls) -> 'List[PretrainedModelInfo]':
         """
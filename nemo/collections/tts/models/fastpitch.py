@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import contextlib
+import functools
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List, Optional
@@ -32,6 +33,7 @@ from nemo.collections.tts.parts.utils.callbacks import LoggingCallback
 from nemo.collections.tts.parts.utils.helpers import (
     batch_from_ragged,
     g2p_backward_compatible_support,
+    get_length_buckets,
     plot_alignment_to_numpy,
     plot_spectrogram_to_numpy,
     process_batch,
@@ -52,6 +54,13 @@ from nemo.core.neural_types.elements import (
 from nemo.core.neural_types.neural_type import NeuralType
 from nemo.utils import logging, model_utils
 
+TARRED_TEXT_TO_SPEECH_DATASET = "nemo.collections.tts.data.text_to_speech_dataset.TarredTextToSpeechDataset"
+# Datasets which are created with the tokenizer of the model and return batches as dictionaries
+TEXT_TO_SPEECH_DATASETS = [
+    "nemo.collections.tts.data.text_to_speech_dataset.TextToSpeechDataset",
+    TARRED_TEXT_TO_SPEECH_DATASET,
+]
+
 
 @dataclass
 class G2PConfig:
@@ -103,8 +112,8 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
             self.ds_class_name = self.ds_class.split(".")[-1]
             if not self.ds_class in [
                 "nemo.collections.tts.data.dataset.TTSDataset",
-                "nemo.collections.tts.data.text_to_speech_dataset.TextToSpeechDataset",
                 "nemo.collections.tts.torch.data.TTSDataset",
+                *TEXT_TO_SPEECH_DATASETS,
             ]:
                 raise ValueError(f"Unknown dataset class: {self.ds_class}.")
 
@@ -290,6 +299,31 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
         if self.training:
             logging.warning("parse() is meant to be called in eval mode.")
 
+        tokens = self._tokenize(str_input, normalize=normalize)
+        x = torch.tensor(tokens).unsqueeze_(0).long().to(self.device)
+        return x
+
+    def parse_batch(self, str_inputs: List[str], num_workers: int = 0, normalize=True) -> List[torch.tensor]:
+        """
+        Parses a list of raw python strings, in `num_workers` DataLoader worker processes if it is larger than 0.
+        Workers only normalize and tokenize text on CPU, so they can be used with models on GPU.
+        """
+        if self.training:
+            logging.warning("parse_batch() is meant to be called in eval mode.")
+
+        tokenize_func = functools.partial(self._tokenize, normalize=normalize)
+        if num_workers > 0 and len(str_inputs) > 1:
+            # create the parser once before workers are started
+            _ = self.parser
+            loader = torch.utils.data.DataLoader(
+                _TextTokenizingDataset(str_inputs, tokenize_func), batch_size=None, num_workers=num_workers
+            )
+            tokens = list(loader)
+        else:
+            tokens = [torch.tensor(tokenize_func(str_input)) for str_input in str_inputs]
+        return [text.long().to(self.device) for text in tokens]
+
+    def _tokenize(self, str_input: str, normalize=True) -> List[int]:
         if normalize and self.text_normalizer_call is not None:
             str_input = self.text_normalizer_call(str_input, **self.text_normalizer_call_kwargs)
 
@@ -304,8 +338,7 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
         else:
             tokens = self.parser(str_input)
 
-        x = torch.tensor(tokens).unsqueeze_(0).long().to(self.device)
-        return x
+        return tokens
 
     @typecheck(
         input_types={
@@ -379,6 +412,62 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
         )
         return spect
 
+    def generate_spectrograms(
+        self,
+        tokens: List[torch.tensor],
+        max_batch_size: int = 32,
+        speaker: Optional[int] = None,
+        pace: float = 1.0,
+        reference_spec: Optional[torch.tensor] = None,
+        reference_spec_lens: Optional[torch.tensor] = None,
+    ) -> List[torch.tensor]:
+        """
+        Generates the spectrogram of every text of a list. Texts with similar lengths are padded and generated
+        together, in batches of at most `max_batch_size` texts, and spectrograms are trimmed to their predicted
+        number of frames. As in training, the duration and pitch predictors see the padding next to the last tokens
+        of shorter texts, so their spectrograms can differ slightly from the ones generated one text at a time.
+
+        Args:
+            tokens: A list of 1D tensors representing the texts to be generated, e.g. from `parse_batch`.
+            max_batch_size: maximum number of texts in a batch.
+            speaker: Optional, speaker id used for all texts.
+            pace: pace used for all texts.
+            reference_spec: Optional, [1, 'D', 'T_spec'] reference spectrogram used for all texts.
+            reference_spec_lens: Optional, [1] length of the reference spectrogram.
+
+        Returns:
+            A list of ['D', 'T_spec'] spectrograms, without padding.
+        """
+        if self.training:
+            logging.warning("generate_spectrograms() is meant to be called in eval mode.")
+
+        spects = [None] * len(tokens)
+        for batch_idx in get_length_buckets([len(text) for text in tokens], max_batch_size=max_batch_size):
+            batch_size = len(batch_idx)
+            text = torch.nn.utils.rnn.pad_sequence(
+                [tokens[i] for i in batch_idx], batch_first=True, padding_value=self.fastpitch.encoder.padding_idx
+            ).to(self.device)
+            batch_speaker = None
+            if speaker is not None:
+                batch_speaker = torch.full((batch_size,), speaker, dtype=torch.long, device=self.device)
+            batch_reference_spec, batch_reference_spec_lens = None, None
+            if reference_spec is not None:
+                batch_reference_spec = reference_spec.expand(batch_size, -1, -1)
+                batch_reference_spec_lens = reference_spec_lens.expand(batch_size)
+
+            spect, num_frames, *_ = self(
+                text=text,
+                durs=None,
+                pitch=None,
+                speaker=batch_speaker,
+                pace=pace,
+                reference_spec=batch_reference_spec,
+                reference_spec_lens=batch_reference_spec_lens,
+            )
+            for i, item_spect, item_num_frames in zip(batch_idx, spect, num_frames):
+                spects[i] = item_spect[:, : int(item_num_frames)]
+        return spects
+
     def training_step(self, batch, batch_idx):
         attn_prior, durs, speaker, energy, reference_audio, reference_audio_len = (
             None,
@@ -389,7 +478,7 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
             None,
         )
         if self.learn_alignment:
-            if self.ds_class == "nemo.collections.tts.data.text_to_speech_dataset.TextToSpeechDataset":
+            if self.ds_class in TEXT_TO_SPEECH_DATASETS:
                 batch_dict = batch
             else:
                 batch_dict = process_batch(batch, self._train_dl.dataset.sup_data_types_set)
@@ -502,7 +591,7 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
             None,
         )
         if self.learn_alignment:
-            if self.ds_class == "nemo.collections.tts.data.text_to_speech_dataset.TextToSpeechDataset":
+            if self.ds_class in TEXT_TO_SPEECH_DATASETS:
                 batch_dict = batch
             else:
                 batch_dict = process_batch(batch, self._train_dl.dataset.sup_data_types_set)
@@ -592,13 +681,18 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
             self.log_train_images = True
         self.validation_step_outputs.clear()  # free memory)
 
+    def _get_dataset_kwargs(self, cfg):
+        if cfg.dataset._target_ == TARRED_TEXT_TO_SPEECH_DATASET:
+            return {"global_rank": self.global_rank, "world_size": self.world_size}
+        return {}
+
     def _setup_train_dataloader(self, cfg):
         phon_mode = contextlib.nullcontext()
         if hasattr(self.vocab, "set_phone_prob"):
             phon_mode = self.vocab.set_phone_prob(self.vocab.phoneme_probability)
 
         with phon_mode:
-            dataset = instantiate(cfg.dataset, text_tokenizer=self.vocab,)
+            dataset = instantiate(cfg.dataset, text_tokenizer=self.vocab, **self._get_dataset_kwargs(cfg))
 
         sampler = dataset.get_sampler(cfg.dataloader_params.batch_size)
         return torch.utils.data.DataLoader(
@@ -611,7 +705,7 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
             phon_mode = self.vocab.set_phone_prob(0.0)
 
         with phon_mode:
-            dataset = instantiate(cfg.dataset, text_tokenizer=self.vocab,)
+            dataset = instantiate(cfg.dataset, text_tokenizer=self.vocab, **self._get_dataset_kwargs(cfg))
 
         return torch.utils.data.DataLoader(dataset, collate_fn=dataset.collate_fn, **cfg.dataloader_params)
 
@@ -651,13 +745,13 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
         return torch.utils.data.DataLoader(dataset, collate_fn=dataset.collate_fn, **cfg.dataloader_params)
 
     def setup_training_data(self, cfg):
-        if self.ds_class == "nemo.collections.tts.data.text_to_speech_dataset.TextToSpeechDataset":
+        if self.ds_class in TEXT_TO_SPEECH_DATASETS:
             self._train_dl = self._setup_train_dataloader(cfg)
         else:
             self._train_dl = self.__setup_dataloader_from_config(cfg)
 
     def setup_validation_data(self, cfg):
-        if self.ds_class == "nemo.collections.tts.data.text_to_speech_dataset.TextToSpeechDataset":
+        if self.ds_class in TEXT_TO_SPEECH_DATASETS:
             self._validation_dl = self._setup_test_dataloader(cfg)
         else:
             self._validation_dl = self.__setup_dataloader_from_config(cfg, shuffle_should_be=False, name="val")
@@ -892,3 +986,17 @@ class FastPitchModel(SpectrogramGenerator, Exportable, FastPitchAdapterModelMixi
         )
         new_speaker_emb = weight_speaker_1 * speaker_emb_1 + weight_speaker_2 * speaker_emb_2
         self.fastpitch.speaker_emb.weight.data[new_speaker_id] = new_speaker_emb
+
+
+class _TextTokenizingDataset(torch.utils.data.Dataset):
+    """Tokenizes texts in DataLoader workers for `FastPitchModel.parse_batch`."""
+
+    def __init__(self, texts: List[str], tokenize_func):
+        self.texts = texts
+        self.tokenize_func = tokenize_func
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, index):
+        return torch.tensor(self.tokenize_func(self.texts[index]))
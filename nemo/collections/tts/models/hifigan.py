@@ -39,6 +39,10 @@ try:
 except ModuleNotFoundError:
     HAVE_WANDB = False
 
+TARRED_VOCODER_DATASET = "nemo.collections.tts.data.vocoder_dataset.TarredVocoderDataset"
+# Datasets which return batches as dictionaries
+VOCODER_DATASETS = ["nemo.collections.tts.data.vocoder_dataset.VocoderDataset", TARRED_VOCODER_DATASET]
+
 
 class HifiGanModel(Vocoder, Exportable):
     """
@@ -299,7 +303,7 @@ class HifiGanModel(Vocoder, Exportable):
             audio_mel_len = [audio_mel.shape[1]] * audio_mel.shape[0]
             return audio, audio_len, audio_mel, audio_mel_len
 
-        if self.ds_class == "nemo.collections.tts.data.vocoder_dataset.VocoderDataset":
+        if self.ds_class in VOCODER_DATASETS:
             audio = batch.get("audio")
             audio_len = batch.get("audio_lens")
         else:
@@ -335,8 +339,13 @@ class HifiGanModel(Vocoder, Exportable):
 
         return audio_denoised
 
+    def _get_dataset_kwargs(self, cfg):
+        if cfg.dataset._target_ == TARRED_VOCODER_DATASET:
+            return {"global_rank": self.global_rank, "world_size": self.world_size}
+        return {}
+
     def _setup_train_dataloader(self, cfg):
-        dataset = instantiate(cfg.dataset)
+        dataset = instantiate(cfg.dataset, **self._get_dataset_kwargs(cfg))
         sampler = dataset.get_sampler(cfg.dataloader_params.batch_size)
         data_loader = torch.utils.data.DataLoader(
             dataset, collate_fn=dataset.collate_fn, sampler=sampler, **cfg.dataloader_params
@@ -344,7 +353,7 @@ class HifiGanModel(Vocoder, Exportable):
         return data_loader
 
     def _setup_test_dataloader(self, cfg):
-        dataset = instantiate(cfg.dataset)
+        dataset = instantiate(cfg.dataset, **self._get_dataset_kwargs(cfg))
         data_loader = torch.utils.data.DataLoader(dataset, collate_fn=dataset.collate_fn, **cfg.dataloader_params)
         return data_loader
 
@@ -370,13 +379,13 @@ class HifiGanModel(Vocoder, Exportable):
         return torch.utils.data.DataLoader(dataset, collate_fn=dataset.collate_fn, **cfg.dataloader_params)
 
     def setup_training_data(self, cfg):
-        if self.ds_class == "nemo.collections.tts.data.vocoder_dataset.VocoderDataset":
+        if self.ds_class in VOCODER_DATASETS:
             self._train_dl = self._setup_train_dataloader(cfg)
         else:
             self._train_dl = self.__setup_dataloader_from_config(cfg)
 
     def setup_validation_data(self, cfg):
-        if self.ds_class == "nemo.collections.tts.data.vocoder_dataset.VocoderDataset":
+        if self.ds_class in VOCODER_DATASETS:
             self._validation_dl = self._setup_test_dataloader(cfg)
         else:
             self._validation_dl = self.__setup_dataloader_from_config(cfg, shuffle_should_be=False, name="validation")
@@ -160,6 +160,19 @@ class UnivNetModel(Vocoder, Exportable):
     def convert_spectrogram_to_audio(self, spec: 'torch.tensor') -> 'torch.tensor':
         return self(spec=spec).squeeze(1)
 
+    def convert_spectrogram_to_audio_chunks(self, spec: 'torch.tensor', chunk_size: int = 32):
+        """
+        Converts a batch of spectrograms to audio in chunks of `chunk_size` frames, see
+        `Vocoder.convert_spectrogram_to_audio_chunks`. Noise is drawn once for all frames, so that every chunk is
+        vocoded with the noise of its frames.
+        """
+        noise = torch.randn(
+            spec.shape[0], self.generator.noise_dim, spec.shape[-1], dtype=spec.dtype, device=spec.device
+        )
+        return self._vocode_in_chunks(
+            lambda inputs: self.generator(x=inputs[0], noise=inputs[1]).squeeze(1), [spec, noise], chunk_size
+        )
+
     def training_step(self, batch, batch_idx):
         if self.input_as_mel:
             # Pre-computed spectrograms will be used as input
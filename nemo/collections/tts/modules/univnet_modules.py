@@ -348,6 +348,7 @@ class Generator(NeuralModule):
     def input_types(self):
         return {
             "x": NeuralType(('B', 'D', 'T'), MelSpectrogramType()),
+            "noise": NeuralType(('B', 'D', 'T'), VoidType(), optional=True),
         }
 
     @property
@@ -357,10 +358,11 @@ class Generator(NeuralModule):
         }
 
     @typecheck()
-    def forward(self, x):
-        # UnivNet starts with Gaussian noise
-        z = torch.randn(x.size(0), self.noise_dim, x.size(2), dtype=x.dtype, device=x.device)
-        z = self.conv_pre(z)  # (B, c_g, L)
+    def forward(self, x, noise=None):
+        # UnivNet starts with Gaussian noise, which can be given to vocode a spectrogram in chunks with the same noise
+        if noise is None:
+            noise = torch.randn(x.size(0), self.noise_dim, x.size(2), dtype=x.dtype, device=x.device)
+        z = self.conv_pre(noise)  # (B, c_g, L)
 
         for res_block in self.res_stack:
             z = res_block(z, x)  # (B, c_g, L * s_0 * ... * s_i)
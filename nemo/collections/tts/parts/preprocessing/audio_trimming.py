@@ -85,18 +85,18 @@ class EnergyAudioTrimmer(AudioTrimmer):
         self.pad_seconds = pad_seconds
         self.volume_norm = volume_norm
 
+        # Frames with power more than db_threshold decibels below ref_amplitude are silence, with the same
+        # minimum amplitude of 1e-5 as librosa.amplitude_to_db().
+        self.min_power = 1e-10
+        self.power_threshold = max(self.min_power, ref_amplitude ** 2) * 10.0 ** (-db_threshold / 10.0)
+
     def trim_audio(self, audio: np.array, sample_rate: int, audio_id: str = "") -> Tuple[np.array, int, int]:
         if self.volume_norm:
             # Normalize volume so we have a fixed scale relative to the reference amplitude
             audio = normalize_volume(audio=audio, volume_level=1.0)
 
-        speech_frames = librosa.effects._signal_to_frame_nonsilent(
-            audio,
-            ref=self.ref_amplitude,
-            frame_length=self.trim_win_length,
-            hop_length=self.trim_hop_length,
-            top_db=self.db_threshold,
-        )
+        frame_power = get_frame_power(audio=audio, frame_length=self.trim_win_length, hop_length=self.trim_hop_length)
+        speech_frames = np.maximum(frame_power, self.min_power) > self.power_threshold
 
         start_frame, end_frame = get_start_and_end_of_speech_frames(
             is_speech=speech_frames, speech_frame_threshold=self.speech_frame_threshold, audio_id=audio_id,
@@ -188,7 +188,8 @@ class VadAudioTrimmer(AudioTrimmer):
         # VAD outputs 2 values for each audio frame with logits indicating the likelihood that
         # each frame is non-speech or speech, respectively.
         # [num_frames, 2]
-        log_probs = self.vad_model(input_signal=audio_signal, input_signal_length=audio_signal_len)
+        with torch.no_grad():
+            log_probs = self.vad_model(input_signal=audio_signal, input_signal_length=audio_signal_len)
         probs = torch.softmax(log_probs, dim=-1)
         probs = probs.detach().cpu().numpy()
         # [num_frames]
@@ -265,32 +266,45 @@ def get_start_and_end_of_speech_frames(
 
        Returns integers representing the frame indices of the start (inclusive) and end (exclusive) of speech.
     """
-    num_frames = is_speech.shape[0]
-
-    # Iterate forwards over the utterance until we find the first speech_frame_threshold consecutive speech frames.
-    start_frame = None
-    for i in range(0, num_frames - speech_frame_threshold + 1):
-        high_i = i + speech_frame_threshold
-        if all(is_speech[i:high_i]):
-            start_frame = i
-            break
-
-    # Iterate backwards over the utterance until we find the last speech_frame_threshold consecutive speech frames.
-    end_frame = None
-    for i in range(num_frames, speech_frame_threshold - 1, -1):
-        low_i = i - speech_frame_threshold
-        if all(is_speech[low_i:i]):
-            end_frame = i
-            break
-
-    if start_frame is None or end_frame is None:
-        # Algorithm is symmetric, so if the start is not found then the end should also not be found.
+    if speech_frame_threshold < 1:
+        raise ValueError(f"speech_frame_threshold must be at least 1, got {speech_frame_threshold}")
+
+    # Number of speech frames in every window of speech_frame_threshold consecutive frames
+    cumulative_speech = np.concatenate([[0], np.cumsum(is_speech.astype(bool), dtype=np.int64)])
+    window_speech = cumulative_speech[speech_frame_threshold:] - cumulative_speech[:-speech_frame_threshold]
+    speech_windows = np.flatnonzero(window_speech == speech_frame_threshold)
+
+    if speech_windows.size == 0:
         logging.warning(f"Could not find start or end of speech for '{audio_id}'")
         return 0, 0
 
+    # The first window of consecutive speech frames starts the speech, and the last one ends it.
+    start_frame = int(speech_windows[0])
+    end_frame = int(speech_windows[-1]) + speech_frame_threshold
+
     return start_frame, end_frame
 
 
+def get_frame_power(audio: np.array, frame_length: int, hop_length: int) -> np.array:
+    """Computes the mean power of every audio frame, the square of librosa.feature.rms() with centered frames.
+       The power is computed as a dot product of every frame with itself on a strided view of the audio, without
+       copying the frames or their squared values.
+       Args:
+           audio: Numpy array containing audio samples.
+           frame_length: Length of audio frames.
+           hop_length: Stride of audio frames.
+
+       Returns [num_frames] float array with the mean power of each frame.
+    """
+    # Frames are centered by padding frame_length // 2 zeros on both sides of the audio
+    padding = frame_length // 2
+    audio = np.pad(audio, (padding, padding))
+    # [frame_length, num_frames]
+    frames = librosa.util.frame(audio, frame_length=frame_length, hop_length=hop_length)
+    frame_power = np.einsum("ij,ij->j", frames, frames) / frame_length
+    return frame_power
+
+
 def pad_sample_indices(
     start_sample: int, end_sample: int, max_sample: int, sample_rate: int, pad_seconds: float
 ) -> Tuple[int, int]:
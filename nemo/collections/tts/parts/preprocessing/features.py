@@ -13,6 +13,7 @@
 # limitations under the License.
 
 
+import json
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union
@@ -23,6 +24,7 @@ import torch
 from torch import Tensor
 
 from nemo.collections.asr.modules import AudioToMelSpectrogramPreprocessor
+from nemo.collections.tts.parts.preprocessing.pitch_estimation import PITCH_ESTIMATORS, yin_pitch_batch
 from nemo.collections.tts.parts.utils.tts_dataset_utils import get_audio_filepaths, stack_tensors
 from nemo.utils.decorators import experimental
 
@@ -32,6 +34,23 @@ class Featurizer(ABC):
     def __init__(self, feature_names: List[str]) -> None:
         self.feature_names = feature_names
 
+    @abstractmethod
+    def compute_features(
+        self, manifest_entry: Dict[str, Any], audio_dir: Path, intermediates: Optional[Dict[Any, Any]] = None
+    ) -> Dict[str, Tensor]:
+        """
+        Compute feature values for given manifest entry.
+
+        Args:
+            manifest_entry: Manifest entry dictionary.
+            audio_dir: base directory where audio is stored.
+            intermediates: Optional, dictionary used to share intermediate results, such as the decoded audio,
+                between the featurizers which process the same manifest entry.
+
+        Returns:
+            Dictionary of feature names to Tensors
+        """
+
     @abstractmethod
     def save(self, manifest_entry: Dict[str, Any], audio_dir: Path, feature_dir: Path) -> None:
         """
@@ -79,6 +98,42 @@ def _get_feature_filepath(
     return feature_filepath
 
 
+def _load_audio(
+    manifest_entry: Dict[str, Any], audio_dir: Path, sample_rate: int, intermediates: Optional[Dict[Any, Any]]
+) -> np.ndarray:
+    """
+    Load the audio for the input manifest entry, reusing the audio in intermediates if it was already
+    loaded with the same sample rate.
+    """
+    key = ("audio", sample_rate)
+    if intermediates is not None and key in intermediates:
+        return intermediates[key]
+
+    audio_filepath, _ = get_audio_filepaths(manifest_entry=manifest_entry, audio_dir=audio_dir)
+    audio, _ = librosa.load(path=audio_filepath, sr=sample_rate)
+    if intermediates is not None:
+        intermediates[key] = audio
+    return audio
+
+
+def compute_all_features(
+    featurizers: List[Featurizer], manifest_entry: Dict[str, Any], audio_dir: Path
+) -> Dict[str, Tensor]:
+    """
+    Compute the features of all featurizers for the input manifest entry in a single pass, the audio
+    and the spectrograms are only computed once and shared between the featurizers.
+    """
+    intermediates = {}
+    feature_dict = {}
+    for featurizer in featurizers:
+        feature_dict.update(
+            featurizer.compute_features(
+                manifest_entry=manifest_entry, audio_dir=audio_dir, intermediates=intermediates
+            )
+        )
+    return feature_dict
+
+
 def _save_pt_feature(
     feature_name: Optional[str],
     feature_tensor: Tensor,
@@ -112,6 +167,11 @@ def _load_pt_feature(
     if feature_name is None:
         return
 
+    feature_store = get_packed_feature_store(feature_dir=feature_dir, feature_name=feature_name)
+    if feature_store is not None:
+        feature_dict[feature_name] = feature_store.load(manifest_entry=manifest_entry, audio_dir=audio_dir)
+        return
+
     feature_filepath = _get_feature_filepath(
         manifest_entry=manifest_entry, audio_dir=audio_dir, feature_dir=feature_dir, feature_name=feature_name
     )
@@ -119,6 +179,141 @@ def _load_pt_feature(
     feature_dict[feature_name] = feature_tensor
 
 
+PACKED_FEATURE_INDEX = "index.json"
+
+
+def _get_packed_shard_name(shard_id: int) -> str:
+    return f"shard_{shard_id}"
+
+
+class PackedFeatureWriter:
+    """
+    Writes features of many manifest entries into one shard of a packed feature store, instead of one .pt file
+    per feature and manifest entry. Every feature is appended to "<feature_dir>/<feature_name>/shard_<id>.bin",
+    and the location and shape of every entry is kept in "shard_<id>.json". Shards are written independently,
+    for example by different workers, and combined into a single index with finalize_packed_features().
+
+    Args:
+        feature_dir: base directory where features will be stored.
+        shard_id: index of the shard written by this writer.
+    """
+
+    def __init__(self, feature_dir: Path, shard_id: int) -> None:
+        self.feature_dir = Path(feature_dir)
+        self.shard_id = shard_id
+        self.files = {}
+        self.indices = {}
+
+    def add(self, manifest_entry: Dict[str, Any], audio_dir: Path, feature_dict: Dict[str, Tensor]) -> None:
+        _, audio_filepath_rel = get_audio_filepaths(manifest_entry=manifest_entry, audio_dir=audio_dir)
+        for feature_name, feature_tensor in feature_dict.items():
+            feature_array = feature_tensor.numpy()
+            if feature_name not in self.files:
+                feature_path = self.feature_dir / feature_name
+                feature_path.mkdir(exist_ok=True, parents=True)
+                shard_name = _get_packed_shard_name(self.shard_id)
+                self.files[feature_name] = open(feature_path / f"{shard_name}.bin", "wb")
+                self.indices[feature_name] = {"dtype": feature_array.dtype.name, "entries": {}}
+
+            index = self.indices[feature_name]
+            if feature_array.dtype.name != index["dtype"]:
+                raise ValueError(
+                    f"Feature {feature_name} has dtype {feature_array.dtype.name}, expected {index['dtype']}"
+                )
+            offset = self.files[feature_name].tell() // feature_array.itemsize
+            self.files[feature_name].write(np.ascontiguousarray(feature_array).tobytes())
+            index["entries"][audio_filepath_rel.as_posix()] = [offset, list(feature_array.shape)]
+
+    def close(self) -> None:
+        shard_name = _get_packed_shard_name(self.shard_id)
+        for feature_name, feature_file in self.files.items():
+            feature_file.close()
+            with open(self.feature_dir / feature_name / f"{shard_name}.json", "w", encoding="utf-8") as index_f:
+                json.dump(self.indices[feature_name], index_f)
+        self.files = {}
+
+
+def finalize_packed_features(feature_dir: Path, feature_names: List[str], num_shards: int) -> None:
+    """
+    Combine the shard indices written by PackedFeatureWriter into "<feature_dir>/<feature_name>/index.json".
+
+    Args:
+        feature_dir: base directory where features are stored.
+        feature_names: names of the features to finalize.
+        num_shards: number of shards which were written.
+    """
+    for feature_name in feature_names:
+        feature_path = Path(feature_dir) / feature_name
+        index = {"dtype": None, "shards": [], "entries": {}}
+        for shard_id in range(num_shards):
+            shard_name = _get_packed_shard_name(shard_id)
+            shard_index_path = feature_path / f"{shard_name}.json"
+            if not shard_index_path.exists():
+                # shard without any manifest entry
+                continue
+            with open(shard_index_path, "r", encoding="utf-8") as index_f:
+                shard_index = json.load(index_f)
+            if index["dtype"] is not None and index["dtype"] != shard_index["dtype"]:
+                raise ValueError(f"Shards of feature {feature_name} have different dtypes")
+            index["dtype"] = shard_index["dtype"]
+            shard_idx = len(index["shards"])
+            index["shards"].append(f"{shard_name}.bin")
+            for audio_filepath_rel, (offset, shape) in shard_index["entries"].items():
+                index["entries"][audio_filepath_rel] = [shard_idx, offset, shape]
+
+        with open(feature_path / PACKED_FEATURE_INDEX, "w", encoding="utf-8") as index_f:
+            json.dump(index, index_f)
+        for shard_id in range(num_shards):
+            shard_index_path = feature_path / f"{_get_packed_shard_name(shard_id)}.json"
+            if shard_index_path.exists():
+                shard_index_path.unlink()
+
+
+class PackedFeatureStore:
+    """
+    Reads a feature from a packed feature store written by PackedFeatureWriter. Shards are memory mapped
+    on first access, so that data loader workers only map the shards they read from.
+
+    Args:
+        feature_dir: base directory where features are stored.
+        feature_name: name of the feature to read.
+    """
+
+    def __init__(self, feature_dir: Path, feature_name: str) -> None:
+        self.feature_path = Path(feature_dir) / feature_name
+        with open(self.feature_path / PACKED_FEATURE_INDEX, "r", encoding="utf-8") as index_f:
+            index = json.load(index_f)
+        self.dtype = np.dtype(index["dtype"])
+        self.shards = index["shards"]
+        self.entries = index["entries"]
+        self.shard_arrays = [None] * len(self.shards)
+
+    def load(self, manifest_entry: Dict[str, Any], audio_dir: Path) -> Tensor:
+        _, audio_filepath_rel = get_audio_filepaths(manifest_entry=manifest_entry, audio_dir=audio_dir)
+        shard_idx, offset, shape = self.entries[audio_filepath_rel.as_posix()]
+        if self.shard_arrays[shard_idx] is None:
+            self.shard_arrays[shard_idx] = np.memmap(
+                self.feature_path / self.shards[shard_idx], dtype=self.dtype, mode="r"
+            )
+        feature_array = self.shard_arrays[shard_idx][offset : offset + int(np.prod(shape))].reshape(shape)
+        return torch.from_numpy(np.array(feature_array))
+
+
+_PACKED_FEATURE_STORES = {}
+
+
+def get_packed_feature_store(feature_dir: Path, feature_name: str) -> Optional[PackedFeatureStore]:
+    """
+    Return the packed feature store of the feature, or None if the feature is stored as .pt files.
+    """
+    key = (str(feature_dir), feature_name)
+    if key not in _PACKED_FEATURE_STORES:
+        if not (Path(feature_dir) / feature_name / PACKED_FEATURE_INDEX).exists():
+            return None
+        _PACKED_FEATURE_STORES[key] = PackedFeatureStore(feature_dir=feature_dir, feature_name=feature_name)
+    return _PACKED_FEATURE_STORES[key]
+
+
 def _collate_feature(
     feature_dict: Dict[str, Tensor], feature_name: Optional[str], train_batch: List[Dict[str, Tensor]]
 ) -> None:
@@ -130,7 +325,8 @@ def _collate_feature(
         feature_tensor = example[feature_name]
         feature_tensors.append(feature_tensor)
 
-    max_len = max([f.shape[0] for f in feature_tensors])
+    # features are padded along the time axis, which is the last axis of spectrograms
+    max_len = max([f.shape[-1] for f in feature_tensors])
     stacked_features = stack_tensors(feature_tensors, max_lens=[max_len])
     feature_dict[feature_name] = stacked_features
 
@@ -154,6 +350,20 @@ class MelSpectrogramFeaturizer:
         self.sample_rate = sample_rate
         self.win_length = win_length
         self.hop_length = hop_length
+        # Spectrograms computed with the same settings are shared, e.g. with the featurizer used for energy
+        self.cache_key = (
+            "mel_spec",
+            sample_rate,
+            mel_dim,
+            win_length,
+            hop_length,
+            lowfreq,
+            highfreq,
+            log,
+            log_zero_guard_type,
+            log_zero_guard_value,
+            mel_norm,
+        )
 
         self.preprocessor = AudioToMelSpectrogramPreprocessor(
             sample_rate=sample_rate,
@@ -176,20 +386,29 @@ class MelSpectrogramFeaturizer:
             dither=0.0,
         )
 
-    def compute_mel_spec(self, manifest_entry: Dict[str, Any], audio_dir: Path) -> Tensor:
+    def compute_mel_spec(
+        self, manifest_entry: Dict[str, Any], audio_dir: Path, intermediates: Optional[Dict[Any, Any]] = None
+    ) -> Tensor:
         """
         Computes mel spectrogram for the input manifest entry.
 
         Args:
             manifest_entry: Manifest entry dictionary.
             audio_dir: base directory where audio is store
+            intermediates: Optional, dictionary of intermediate results shared with other featurizers.
 
         Returns:
             [spec_dim, T_spec] float tensor containing spectrogram features.
         """
+        if intermediates is not None and self.cache_key in intermediates:
+            return intermediates[self.cache_key]
 
-        audio_filepath, _ = get_audio_filepaths(manifest_entry=manifest_entry, audio_dir=audio_dir)
-        audio, _ = librosa.load(path=audio_filepath, sr=self.sample_rate)
+        audio = _load_audio(
+            manifest_entry=manifest_entry,
+            audio_dir=audio_dir,
+            sample_rate=self.sample_rate,
+            intermediates=intermediates,
+        )
 
         # [1, T_audio]
         audio_tensor = torch.tensor(audio[np.newaxis, :], dtype=torch.float32)
@@ -201,8 +420,18 @@ class MelSpectrogramFeaturizer:
         # [spec_dim, T_spec]
         spec_tensor = spec_tensor.detach()[0]
 
+        if intermediates is not None:
+            intermediates[self.cache_key] = spec_tensor
         return spec_tensor
 
+    def compute_features(
+        self, manifest_entry: Dict[str, Any], audio_dir: Path, intermediates: Optional[Dict[Any, Any]] = None
+    ) -> Dict[str, Tensor]:
+        spec_tensor = self.compute_mel_spec(
+            manifest_entry=manifest_entry, audio_dir=audio_dir, intermediates=intermediates
+        )
+        return {self.feature_name: spec_tensor}
+
     def save(self, manifest_entry: Dict[str, Any], audio_dir: Path, feature_dir: Path) -> None:
         spec_tensor = self.compute_mel_spec(manifest_entry=manifest_entry, audio_dir=audio_dir)
         _save_pt_feature(
@@ -235,24 +464,37 @@ class EnergyFeaturizer:
         self.feature_name = feature_name
         self.spec_featurizer = spec_featurizer
 
-    def compute_energy(self, manifest_entry: Dict[str, Any], audio_dir: Path) -> Tensor:
+    def compute_energy(
+        self, manifest_entry: Dict[str, Any], audio_dir: Path, intermediates: Optional[Dict[Any, Any]] = None
+    ) -> Tensor:
         """
         Computes energy for the input manifest entry.
 
         Args:
             manifest_entry: Manifest entry dictionary.
             audio_dir: base directory where audio is store
+            intermediates: Optional, dictionary of intermediate results shared with other featurizers.
 
         Returns:
             [T_spec] float tensor containing energy features.
         """
         # [1, T_audio]
-        spec = self.spec_featurizer.compute_mel_spec(manifest_entry=manifest_entry, audio_dir=audio_dir)
+        spec = self.spec_featurizer.compute_mel_spec(
+            manifest_entry=manifest_entry, audio_dir=audio_dir, intermediates=intermediates
+        )
         # [T_audio]
         energy = torch.linalg.norm(spec, axis=0)
 
         return energy
 
+    def compute_features(
+        self, manifest_entry: Dict[str, Any], audio_dir: Path, intermediates: Optional[Dict[Any, Any]] = None
+    ) -> Dict[str, Tensor]:
+        energy_tensor = self.compute_energy(
+            manifest_entry=manifest_entry, audio_dir=audio_dir, intermediates=intermediates
+        )
+        return {self.feature_name: energy_tensor}
+
     def save(self, manifest_entry: Dict[str, Any], audio_dir: Path, feature_dir: Path) -> None:
         energy_tensor = self.compute_energy(manifest_entry=manifest_entry, audio_dir=audio_dir)
         _save_pt_feature(
@@ -291,7 +533,11 @@ class PitchFeaturizer:
         hop_length: int = 256,
         pitch_fmin: int = librosa.note_to_hz('C2'),
         pitch_fmax: int = librosa.note_to_hz('C7'),
+        pitch_estimator: str = "pyin",
     ) -> None:
+        if pitch_estimator not in PITCH_ESTIMATORS:
+            raise ValueError(f"Unknown pitch estimator {pitch_estimator}, expected one of {PITCH_ESTIMATORS}")
+
         self.pitch_name = pitch_name
         self.voiced_mask_name = voiced_mask_name
         self.voiced_prob_name = voiced_prob_name
@@ -300,22 +546,42 @@ class PitchFeaturizer:
         self.hop_length = hop_length
         self.pitch_fmin = pitch_fmin
         self.pitch_fmax = pitch_fmax
+        self.pitch_estimator = pitch_estimator
 
-    def compute_pitch(self, manifest_entry: Dict[str, Any], audio_dir: Path) -> Tuple[Tensor, Tensor, Tensor]:
+    def compute_pitch(
+        self, manifest_entry: Dict[str, Any], audio_dir: Path, intermediates: Optional[Dict[Any, Any]] = None
+    ) -> Tuple[Tensor, Tensor, Tensor]:
         """
         Computes pitch and optional voiced mask for the input manifest entry.
 
         Args:
             manifest_entry: Manifest entry dictionary.
             audio_dir: base directory where audio is store
+            intermediates: Optional, dictionary of intermediate results shared with other featurizers.
 
         Returns:
             pitch: [T_spec] float tensor containing pitch for each audio frame.
             voiced_mask: [T_spec] bool tensor indicating whether each audio frame is voiced.
             voiced_prob: [T_spec] float array with [0, 1] probability that each audio frame is voiced.
         """
-        audio_filepath, _ = get_audio_filepaths(manifest_entry=manifest_entry, audio_dir=audio_dir)
-        audio, _ = librosa.load(path=audio_filepath, sr=self.sample_rate)
+        audio = _load_audio(
+            manifest_entry=manifest_entry,
+            audio_dir=audio_dir,
+            sample_rate=self.sample_rate,
+            intermediates=intermediates,
+        )
+
+        if self.pitch_estimator == "yin":
+            pitch_tensor, voiced_mask_tensor, voiced_prob_tensor, _ = yin_pitch_batch(
+                audio=torch.tensor(audio[np.newaxis, :], dtype=torch.float32),
+                audio_len=torch.tensor([audio.shape[0]]),
+                sample_rate=self.sample_rate,
+                fmin=self.pitch_fmin,
+                fmax=self.pitch_fmax,
+                frame_length=self.win_length,
+                hop_length=self.hop_length,
+            )
+            return pitch_tensor[0], voiced_mask_tensor[0], voiced_prob_tensor[0]
 
         pitch, voiced_mask, voiced_prob = librosa.pyin(
             audio,
@@ -332,6 +598,22 @@ class PitchFeaturizer:
 
         return pitch_tensor, voiced_mask_tensor, voiced_prob_tensor
 
+    def compute_features(
+        self, manifest_entry: Dict[str, Any], audio_dir: Path, intermediates: Optional[Dict[Any, Any]] = None
+    ) -> Dict[str, Tensor]:
+        pitch_tensor, voiced_mask_tensor, voiced_prob_tensor = self.compute_pitch(
+            manifest_entry=manifest_entry, audio_dir=audio_dir, intermediates=intermediates
+        )
+        feature_dict = {}
+        for feature_name, feature_tensor in [
+            (self.pitch_name, pitch_tensor),
+            (self.voiced_mask_name, voiced_mask_tensor),
+            (self.voiced_prob_name, voiced_prob_tensor),
+        ]:
+            if feature_name is not None:
+                feature_dict[feature_name] = feature_tensor
+        return feature_dict
+
     def save(self, manifest_entry: Dict[str, Any], audio_dir: Path, feature_dir: Path) -> None:
         pitch_tensor, voiced_mask_tensor, voiced_prob_tensor = self.compute_pitch(
             manifest_entry=manifest_entry, audio_dir=audio_dir
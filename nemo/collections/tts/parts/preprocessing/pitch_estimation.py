@@ -0,0 +1,193 @@
+# Copyright (c) 2023, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+from typing import Dict, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+from torch import Tensor
+
+PITCH_ESTIMATORS = ("pyin", "yin")
+
+
+def _cumulative_mean_normalized_difference(frames: Tensor, min_period: int, max_period: int) -> Tensor:
+    """
+    Cumulative mean normalized difference function of YIN.
+
+    The difference of every period k is taken over the whole frame, d(k) = sum_{m=0}^{N-1} (y(m) - y(m + k))^2 with
+    y zero after the end of the frame. librosa.pyin instead compares windows of frame_length // 2 samples, so the
+    values are close to, but not the same as, those of librosa.
+
+    Args:
+        frames: [B, T_spec, frame_length] float tensor of audio frames.
+        min_period: smallest period to consider, in samples.
+        max_period: largest period to consider, in samples.
+
+    Returns:
+        [B, T_spec, max_period - min_period + 1] float tensor with the normalized difference of every period.
+    """
+    frame_length = frames.shape[-1]
+    # zero padding to avoid the circular autocorrelation wrapping around for periods up to max_period
+    n_fft = 1 << (frame_length + max_period).bit_length()
+    spec = torch.fft.rfft(frames, n=n_fft)
+    acf = torch.fft.irfft(spec.real ** 2 + spec.imag ** 2, n=n_fft)[..., : max_period + 1]
+
+    # d(k) = 2 * (ACF(0) - ACF(k)) - sum_{m=0}^{k-1} y(m)^2
+    energy = torch.cumsum(frames[..., :max_period] ** 2, dim=-1)
+    diff = 2 * (acf[..., :1] - acf[..., 1:]) - energy
+
+    periods = torch.arange(1, max_period + 1, device=frames.device, dtype=frames.dtype)
+    cumulative_mean = torch.cumsum(diff, dim=-1) / periods
+    numerator = diff[..., min_period - 1 :]
+    denominator = cumulative_mean[..., min_period - 1 :]
+    return numerator / (denominator + torch.finfo(frames.dtype).tiny)
+
+
+def _beta_2_18_survival(x: Tensor) -> Tensor:
+    """
+    Probability that a threshold drawn from the Beta(2, 18) prior of pYIN is larger than x.
+    """
+    x = x.clamp(0.0, 1.0)
+    return (1 - x) ** 19 + 19 * x * (1 - x) ** 18
+
+
+def yin_pitch_batch(
+    audio: Tensor,
+    audio_len: Tensor,
+    sample_rate: int,
+    fmin: float,
+    fmax: float,
+    frame_length: int = 2048,
+    hop_length: Optional[int] = None,
+    voicing_threshold: Optional[float] = None,
+) -> Tuple[Tensor, Tensor, Tensor, Tensor]:
+    """
+    Estimates pitch for a batch of padded audio with YIN, as a fast alternative to librosa.pyin.
+    All frames of the batch are processed at once with FFT based autocorrelation, on the device of the input.
+
+    Frames are centered and zero padded like librosa.pyin, so the outputs have the same number of frames.
+    Instead of the HMM decoding of pYIN, the first trough of the normalized difference below a threshold is used
+    as period. The voiced probability is the probability that a threshold drawn from the Beta(2, 18) prior of
+    pYIN is above the value of the best trough, which closely follows the voiced probability of pYIN.
+    In the HMM of pYIN, the voiced probability of a frame competes with the unvoiced probability spread over all
+    pitch bins, so frames are voiced by default when the voiced probability is at least 1 / (num_pitch_bins + 1),
+    with pitch bins of 10 cents.
+
+    Args:
+        audio: [B, T_audio] float tensor of audio, padded with zeros.
+        audio_len: [B] int tensor with the length of every audio.
+        sample_rate: sample rate of the audio.
+        fmin: minimum frequency, in Hz.
+        fmax: maximum frequency, in Hz.
+        frame_length: length of every analysis frame, in samples.
+        hop_length: number of samples between frames. Defaults to frame_length // 4, as in librosa.pyin.
+        voicing_threshold: Optional, minimum voiced probability of voiced frames.
+
+    Returns:
+        pitch: [B, T_spec] float tensor with pitch for each frame, 0 for unvoiced frames.
+        voiced_mask: [B, T_spec] bool tensor indicating whether each frame is voiced.
+        voiced_prob: [B, T_spec] float tensor with [0, 1] probability that each frame is voiced.
+        pitch_len: [B] int tensor with the number of frames of every audio.
+    """
+    if hop_length is None:
+        hop_length = frame_length // 4
+    if voicing_threshold is None:
+        num_pitch_bins = int(120 * math.log2(fmax / fmin)) + 1
+        voicing_threshold = 1.0 / (num_pitch_bins + 1)
+
+    min_period = max(int(sample_rate // fmax), 1)
+    max_period = min(int(-(-sample_rate // fmin)), frame_length - 1)
+    if min_period >= max_period:
+        raise ValueError(f"Pitch range [{fmin}, {fmax}] is too narrow for sample rate {sample_rate}")
+
+    audio = audio.float()
+    pitch_len = 1 + audio_len.long() // hop_length
+    num_frames = int(pitch_len.max()) if len(pitch_len) > 0 else 0
+    padding = frame_length // 2
+    required_len = (num_frames - 1) * hop_length + frame_length
+    audio = F.pad(audio, (padding, max(required_len - audio.shape[-1] - padding, padding)))
+    # [B, T_spec, frame_length]
+    frames = audio.unfold(-1, frame_length, hop_length)[:, :num_frames]
+
+    # [B, T_spec, num_periods]
+    cmnd = _cumulative_mean_normalized_difference(frames, min_period=min_period, max_period=max_period)
+
+    # troughs are local minima, the last period counts as a trough if the difference is still decreasing
+    is_trough = torch.zeros_like(cmnd, dtype=torch.bool)
+    is_trough[..., 1:-1] = (cmnd[..., 1:-1] < cmnd[..., :-2]) & (cmnd[..., 1:-1] <= cmnd[..., 2:])
+    is_trough[..., -1] = cmnd[..., -1] < cmnd[..., -2]
+
+    trough_values = cmnd.masked_fill(~is_trough, float("inf"))
+    best_value = trough_values.min(dim=-1).values
+    has_trough = torch.isfinite(best_value)
+    voiced_prob = torch.where(has_trough, _beta_2_18_survival(best_value), torch.zeros_like(best_value))
+
+    # first trough below the threshold implied by the voiced probability, as in the original YIN
+    threshold = best_value.clamp(min=0.1).unsqueeze(-1)
+    below = is_trough & (cmnd <= threshold)
+    period_idx = below.int().argmax(dim=-1)
+
+    # parabolic interpolation around the selected period
+    prev_idx = (period_idx - 1).clamp(min=0)
+    next_idx = (period_idx + 1).clamp(max=cmnd.shape[-1] - 1)
+    prev_value = cmnd.gather(-1, prev_idx.unsqueeze(-1)).squeeze(-1)
+    value = cmnd.gather(-1, period_idx.unsqueeze(-1)).squeeze(-1)
+    next_value = cmnd.gather(-1, next_idx.unsqueeze(-1)).squeeze(-1)
+    curvature = prev_value - 2 * value + next_value
+    shift = 0.5 * (prev_value - next_value) / curvature
+    interior = (period_idx > 0) & (period_idx < cmnd.shape[-1] - 1) & (curvature > 0)
+    shift = torch.where(interior, shift.clamp(-1.0, 1.0), torch.zeros_like(shift))
+    period = min_period + period_idx + shift
+
+    frame_idx = torch.arange(num_frames, device=audio.device)
+    in_audio = frame_idx.unsqueeze(0) < pitch_len.to(audio.device).unsqueeze(1)
+    voiced_prob = voiced_prob * in_audio
+    voiced_mask = (voiced_prob >= voicing_threshold) & in_audio
+    pitch = torch.where(voiced_mask, sample_rate / period, torch.zeros_like(period))
+
+    return pitch, voiced_mask, voiced_prob, pitch_len
+
+
+def compare_pitch(
+    pitch: Tensor, voiced_mask: Tensor, ref_pitch: Tensor, ref_voiced_mask: Tensor, gross_error_ratio: float = 0.2
+) -> Dict[str, float]:
+    """
+    Compares estimated pitch against reference pitch, for example from librosa.pyin.
+
+    Args:
+        pitch: [T_spec] float tensor with estimated pitch.
+        voiced_mask: [T_spec] bool tensor with estimated voicing.
+        ref_pitch: [T_spec] float tensor with reference pitch.
+        ref_voiced_mask: [T_spec] bool tensor with reference voicing.
+        gross_error_ratio: relative deviation above which a pitch estimate is counted as a gross error.
+
+    Returns:
+        Dictionary with
+            voicing_accuracy: fraction of frames with the same voicing decision.
+            gross_pitch_error: fraction of frames voiced in both with a gross pitch error.
+            median_cents_error: median absolute pitch difference in cents on frames voiced in both.
+    """
+    voiced_mask = voiced_mask.bool()
+    ref_voiced_mask = ref_voiced_mask.bool()
+    both_voiced = voiced_mask & ref_voiced_mask
+    metrics = {"voicing_accuracy": (voiced_mask == ref_voiced_mask).float().mean().item()}
+    if both_voiced.any():
+        ratio = pitch[both_voiced].double() / ref_pitch[both_voiced].double()
+        metrics["gross_pitch_error"] = ((ratio - 1).abs() > gross_error_ratio).double().mean().item()
+        metrics["median_cents_error"] = (1200 * torch.log2(ratio)).abs().median().item()
+    else:
+        metrics["gross_pitch_error"] = 0.0
+        metrics["median_cents_error"] = 0.0
+    return metrics
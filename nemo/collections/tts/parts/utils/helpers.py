@@ -43,7 +43,7 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from enum import Enum
-from typing import Optional, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple
 
 import librosa
 import matplotlib.pylab as plt
@@ -785,6 +785,125 @@ def batch_from_ragged(
     return texts, pitches, paces, volumes, lens
 
 
+def get_length_buckets(
+    lengths: List[int], max_batch_size: int, max_batch_length: Optional[int] = None
+) -> List[List[int]]:
+    """
+    Groups items of similar lengths into batches, to minimize padding in batched inference.
+
+    Args:
+        lengths: length of every item.
+        max_batch_size: maximum number of items in a batch.
+        max_batch_length: Optional, maximum total length of a batch including padding, i.e. the number of items in
+            the batch times the length of its longest item. A longer item is still put in a batch by itself.
+
+    Returns:
+        A list of batches, each one a list of item indices, from the longest items to the shortest.
+    """
+    if max_batch_size < 1:
+        raise ValueError(f"max_batch_size has to be at least 1, got {max_batch_size}")
+
+    batches = []
+    batch = []
+    for idx in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        # items are sorted by decreasing length, so the first item of a batch is the longest
+        if batch and (
+            len(batch) == max_batch_size
+            or (max_batch_length is not None and (len(batch) + 1) * lengths[batch[0]] > max_batch_length)
+        ):
+            batches.append(batch)
+            batch = []
+        batch.append(idx)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def get_vocoder_receptive_field(
+    vocode_func: Callable[[List[torch.Tensor]], torch.Tensor],
+    input_channels: List[int],
+    device: Optional[torch.device] = None,
+    dtype: torch.dtype = torch.float32,
+    max_frames: int = 8192,
+) -> Tuple[int, int]:
+    """
+    Measures the receptive field of a convolutional vocoder with autograd, i.e. how many input frames before and
+    after a frame its audio depends on. Inputs are random, long enough for the receptive field of the middle frame
+    not to reach the edges.
+
+    Args:
+        vocode_func: converts a list of ['B', 'C', 'T'] frame level inputs, e.g. a spectrogram, to ['B', 'T_audio']
+            audio with the same number of samples per frame.
+        input_channels: number of channels of every input.
+        device: device of the inputs.
+        dtype: dtype of the inputs.
+        max_frames: maximum number of frames to try before giving up.
+
+    Returns:
+        Number of frames of left and right context.
+    """
+    num_frames = 64
+    while num_frames <= max_frames:
+        inputs = [
+            torch.randn(1, channels, num_frames, device=device, dtype=dtype, requires_grad=True)
+            for channels in input_channels
+        ]
+        with torch.enable_grad():
+            audio = vocode_func(inputs)
+            samples_per_frame = audio.shape[-1] // num_frames
+            center = num_frames // 2
+            center_audio = audio[..., center * samples_per_frame : (center + 1) * samples_per_frame]
+            # autograd.grad instead of backward, so that gradients of the parameters are not modified
+            grads = torch.autograd.grad(center_audio.sum(), inputs, allow_unused=True)
+
+        depends_on = torch.zeros(num_frames, dtype=torch.bool, device=device)
+        for grad in grads:
+            if grad is not None:
+                depends_on |= (grad[0] != 0).any(dim=0)
+        frames = depends_on.nonzero().squeeze(1)
+        first, last = int(frames.min()), int(frames.max())
+        if first > 0 and last < num_frames - 1:
+            return center - first, last - center
+        num_frames *= 2
+
+    raise ValueError(f"Receptive field of the vocoder is larger than {max_frames} frames.")
+
+
+def vocode_in_chunks(
+    vocode_func: Callable[[List[torch.Tensor]], torch.Tensor],
+    inputs: List[torch.Tensor],
+    chunk_size: int,
+    receptive_field: Tuple[int, int],
+) -> Iterator[torch.Tensor]:
+    """
+    Vocodes frame level inputs chunk by chunk. Every chunk is vocoded with the context of its receptive field and
+    only its own samples are kept, so the concatenated chunks are equal to vocoding all frames at once, up to
+    floating point error.
+
+    Args:
+        vocode_func: converts a list of ['B', 'C', 'T'] frame level inputs, e.g. a spectrogram, to ['B', 'T_audio']
+            audio with the same number of samples per frame.
+        inputs: list of ['B', 'C', 'T'] inputs with the same number of frames.
+        chunk_size: number of frames of every chunk.
+        receptive_field: number of frames of left and right context, e.g. from `get_vocoder_receptive_field`.
+
+    Returns:
+        Iterator over the ['B', 'T_audio'] audio of every chunk.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size has to be at least 1, got {chunk_size}")
+
+    left_context, right_context = receptive_field
+    num_frames = inputs[0].shape[-1]
+    for start in range(0, num_frames, chunk_size):
+        end = min(start + chunk_size, num_frames)
+        context_start = max(start - left_context, 0)
+        context_end = min(end + right_context, num_frames)
+        audio = vocode_func([x[..., context_start:context_end] for x in inputs])
+        samples_per_frame = audio.shape[-1] // (context_end - context_start)
+        yield audio[..., (start - context_start) * samples_per_frame : (end - context_start) * samples_per_frame]
+
+
 def sample_tts_input(
     export_config, device, max_batch=1, max_dim=127,
 ):
@@ -840,3 +959,37 @@ def g2p_backward_compatible_support(g2p_target: str) -> str:
     # for backward compatibility
     g2p_target_new = g2p_target.replace("nemo_text_processing.g2p", "nemo.collections.tts.g2p")
     return g2p_target_new
+
+
+def synthesize_texts(
+    spec_generator,
+    vocoder,
+    texts: List[str],
+    max_batch_size: int = 32,
+    max_vocoder_batch_frames: Optional[int] = None,
+    num_workers: int = 0,
+    **kwargs,
+) -> List[torch.Tensor]:
+    """
+    Converts a list of texts to audio. Texts are parsed with `spec_generator.parse_batch`, texts with similar
+    token lengths are passed together to `spec_generator.generate_spectrograms`, and spectrograms with similar
+    frame counts are vocoded together with `vocoder.convert_spectrograms_to_audio`.
+
+    Args:
+        spec_generator: SpectrogramGenerator model, in eval mode.
+        vocoder: Vocoder model, in eval mode.
+        texts: texts to convert.
+        max_batch_size: maximum number of texts or spectrograms in a batch.
+        max_vocoder_batch_frames: Optional, maximum number of spectrogram frames in a vocoder batch, including padding.
+        num_workers: number of worker processes to parse texts, if supported by the spectrogram generator.
+        kwargs: arguments of `spec_generator.generate_spectrograms`, e.g. speaker or pace.
+
+    Returns:
+        A list with the ['T_audio'] audio of every text, without padding.
+    """
+    with torch.no_grad():
+        tokens = spec_generator.parse_batch(texts, num_workers=num_workers)
+        specs = spec_generator.generate_spectrograms(tokens, max_batch_size=max_batch_size, **kwargs)
+        return vocoder.convert_spectrograms_to_audio(
+            specs, max_batch_size=max_batch_size, max_batch_frames=max_vocoder_batch_frames
+        )
@@ -0,0 +1,321 @@
+# Copyright (c) 2023, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import random
+import tarfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import torch
+import webdataset as wd
+
+from nemo.collections.tts.parts.utils.tts_dataset_utils import get_audio_filepaths
+from nemo.utils import logging
+from nemo.utils.data_utils import datastore_path_to_webdataset_url, is_datastore_path, is_tarred_path
+
+TARRED_METADATA = "metadata.json"
+FEATURES_EXTENSION = "features.npz"
+AUDIO_EXTENSIONS = ("wav", "flac", "ogg", "mp3", "opus")
+
+
+@dataclass
+class TarredDatasetMeta:
+    metadata_path: Path
+    tar_dir: Optional[str] = None
+    sample_weight: float = 1.0
+
+
+@dataclass
+class TarredShard:
+    dataset_name: str
+    url: str
+    num_samples: int
+    sample_weight: float
+
+
+@dataclass
+class TarredSample:
+    dataset_name: str
+    manifest_entry: Dict[str, Any]
+    audio_bytes: bytes
+    features: Dict[str, np.ndarray]
+
+
+def get_tarred_shard_name(shard_id: int) -> str:
+    return f"shard_{shard_id}.tar"
+
+
+def _add_tar_member(tar: tarfile.TarFile, name: str, data: bytes) -> None:
+    member = tarfile.TarInfo(name=name)
+    member.size = len(data)
+    tar.addfile(member, io.BytesIO(data))
+
+
+def write_tarred_shard(
+    entries: List[Dict[str, Any]],
+    audio_dir: Path,
+    output_dir: Path,
+    shard_id: int,
+    featurizers: Optional[List[Any]] = None,
+    feature_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Packs the audio, manifest entries and precomputed features of the input manifest entries into the tar shard
+    "<output_dir>/shard_<id>.tar". Every entry is stored under a unique key as "<key>.json" with the manifest entry,
+    "<key>.<audio extension>" with the original audio file and, if featurizers are provided, "<key>.features.npz"
+    with all features loaded by the featurizers.
+
+    Args:
+        entries: List of manifest entry dictionaries.
+        audio_dir: base directory where audio is stored.
+        output_dir: directory where the shard will be written.
+        shard_id: index of the shard.
+        featurizers: Optional, list of featurizers to load precomputed features with.
+        feature_dir: base directory where precomputed features are stored.
+
+    Returns:
+        Dictionary with the shard name and the duration of every entry, to be written with write_tarred_metadata().
+    """
+    shard_name = get_tarred_shard_name(shard_id)
+    with tarfile.open(Path(output_dir) / shard_name, "w") as tar:
+        for i, entry in enumerate(entries):
+            key = f"{shard_id:06d}_{i:09d}"
+            audio_filepath, audio_filepath_rel = get_audio_filepaths(manifest_entry=entry, audio_dir=audio_dir)
+
+            tarred_entry = dict(entry)
+            tarred_entry["audio_filepath"] = audio_filepath_rel.as_posix()
+            _add_tar_member(tar, f"{key}.json", json.dumps(tarred_entry).encode("utf-8"))
+
+            audio_extension = audio_filepath.suffix[1:].lower()
+            with open(audio_filepath, "rb") as audio_f:
+                _add_tar_member(tar, f"{key}.{audio_extension}", audio_f.read())
+
+            if featurizers:
+                feature_dict = {}
+                for featurizer in featurizers:
+                    feature_dict.update(
+                        featurizer.load(manifest_entry=entry, audio_dir=audio_dir, feature_dir=feature_dir)
+                    )
+                features_buffer = io.BytesIO()
+                np.savez(features_buffer, **{name: tensor.numpy() for name, tensor in feature_dict.items()})
+                _add_tar_member(tar, f"{key}.{FEATURES_EXTENSION}", features_buffer.getvalue())
+
+    return {"name": shard_name, "durations": [entry["duration"] for entry in entries]}
+
+
+def write_tarred_metadata(output_dir: Path, shards: List[Dict[str, Any]]) -> None:
+    """
+    Writes "<output_dir>/metadata.json" with the shard metadata returned by write_tarred_shard().
+    """
+    with open(Path(output_dir) / TARRED_METADATA, "w", encoding="utf-8") as metadata_f:
+        json.dump({"shards": shards}, metadata_f)
+
+
+def _read_tarred_shard(url: str) -> Iterator[Dict[str, Any]]:
+    shard = [dict(url=url)]
+    return wd.group_by_keys(wd.tar_file_expander(wd.url_opener(shard)))
+
+
+def _decode_sample(dataset_name: str, sample: Dict[str, Any]) -> TarredSample:
+    manifest_entry = json.loads(sample["json"])
+
+    audio_bytes = None
+    for extension in AUDIO_EXTENSIONS:
+        if extension in sample:
+            audio_bytes = sample[extension]
+            break
+    if audio_bytes is None:
+        raise ValueError(f"Sample {sample['__key__']} of dataset {dataset_name} has no audio")
+
+    features = {}
+    if FEATURES_EXTENSION in sample:
+        with np.load(io.BytesIO(sample[FEATURES_EXTENSION])) as feature_arrays:
+            features = {name: feature_arrays[name] for name in feature_arrays.files}
+
+    return TarredSample(
+        dataset_name=dataset_name, manifest_entry=manifest_entry, audio_bytes=audio_bytes, features=features
+    )
+
+
+class TarredSampleStream:
+    """
+    Streams samples from the tar shards written by write_tarred_shard(), so that large datasets are read
+    sequentially from a few large files instead of opening one small file per audio and feature.
+
+    Shards are split between the data loader workers and, with the 'scatter' strategy, between the distributed
+    ranks. The order of the shards is shuffled every epoch, and samples are shuffled within a buffer of 'shuffle_n'
+    samples.
+
+    With weighted sampling, shards are drawn with replacement proportionally to their number of samples, and every
+    sample is kept with probability proportional to its weight. Like get_weighted_sampler() for map-style datasets,
+    samples are drawn proportionally to the weights, at the cost of reading the samples which are skipped. With the
+    'scatter' strategy, every rank needs at least one shard with a positive sample weight.
+
+    Args:
+        dataset_meta: Dict of dataset names (string) to tarred dataset metadata.
+        shuffle_n: Size of the buffer used to shuffle samples, 0 to disable shuffling within shards.
+        shard_strategy: 'scatter' to split the shards between the distributed ranks, or 'replicate' to read all
+            shards on every rank.
+        global_rank: Global rank of this process.
+        world_size: Number of distributed processes.
+        min_duration: Optional float, if provided audio files shorter than 'min_duration' will be ignored.
+        max_duration: Optional float, if provided audio files longer than 'max_duration' will be ignored.
+        speaker_weights: Optional dict of speaker names to sampling weights, which are multiplied with the sample
+            weight of the dataset when sampling is weighted. Speakers which are not in the dict have weight 1.
+    """
+
+    def __init__(
+        self,
+        dataset_meta: Dict,
+        shuffle_n: int = 0,
+        shard_strategy: str = "scatter",
+        global_rank: int = 0,
+        world_size: int = 1,
+        min_duration: Optional[float] = None,
+        max_duration: Optional[float] = None,
+        speaker_weights: Optional[Dict[str, float]] = None,
+    ):
+        valid_shard_strategies = ["scatter", "replicate"]
+        if shard_strategy not in valid_shard_strategies:
+            raise ValueError(f"`shard_strategy` must be one of {valid_shard_strategies}")
+
+        self.shuffle_n = shuffle_n
+        self.global_rank = global_rank
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.speaker_weights = speaker_weights or {}
+        # Number of samples per epoch on this rank with weighted sampling, None to iterate over the shards instead
+        self.num_weighted_samples = None
+
+        shards = []
+        dataset_weights = []
+        for dataset_name, dataset_info in dataset_meta.items():
+            dataset = TarredDatasetMeta(**dataset_info)
+            dataset_weights.append(dataset.sample_weight)
+            metadata_path = Path(dataset.metadata_path)
+            with open(metadata_path, "r", encoding="utf-8") as metadata_f:
+                metadata = json.load(metadata_f)
+            tar_dir = dataset.tar_dir if dataset.tar_dir else str(metadata_path.parent)
+
+            num_samples = 0
+            for shard in metadata["shards"]:
+                url = f"{tar_dir.rstrip('/')}/{shard['name']}"
+                if is_datastore_path(url) and is_tarred_path(url):
+                    url = datastore_path_to_webdataset_url(url)
+                shard_num_samples = sum(self._keep_duration(duration) for duration in shard["durations"])
+                num_samples += shard_num_samples
+                shards.append(
+                    TarredShard(
+                        dataset_name=dataset_name,
+                        url=url,
+                        num_samples=shard_num_samples,
+                        sample_weight=dataset.sample_weight,
+                    )
+                )
+            logging.info(f"{dataset_name}: {len(metadata['shards'])} shards with {num_samples} samples")
+
+        # Weighted sampling rejects samples until enough are kept, it would never end if all weights were 0
+        if any(weight < 0 for weight in dataset_weights + list(self.speaker_weights.values())):
+            raise ValueError("Sample weights and speaker weights must not be negative")
+        if dataset_weights and not any(dataset_weights):
+            raise ValueError("At least one dataset must have a positive sample weight")
+        if self.speaker_weights and not any(self.speaker_weights.values()):
+            raise ValueError("At least one speaker must have a positive weight")
+
+        if world_size > 1 and shard_strategy == "scatter":
+            if len(shards) % world_size != 0:
+                logging.warning(
+                    f"Number of shards in tarred dataset ({len(shards)}) is not divisible "
+                    f"by number of distributed workers ({world_size})."
+                )
+            # interleave, so that every rank reads from all datasets
+            shards = shards[global_rank::world_size]
+        self.shards = shards
+
+        self.max_sample_weight = max([shard.sample_weight for shard in shards], default=1.0) * max(
+            [1.0] + list(self.speaker_weights.values())
+        )
+
+    def _keep_duration(self, duration: float) -> bool:
+        # same filter as filter_dataset_by_duration()
+        too_short = self.min_duration and duration < self.min_duration
+        too_long = self.max_duration and duration > self.max_duration
+        return not (too_short or too_long)
+
+    def __len__(self):
+        if self.num_weighted_samples is not None:
+            return self.num_weighted_samples
+        return sum(shard.num_samples for shard in self.shards)
+
+    def _read_shards(self, shards: Iterator[TarredShard]) -> Iterator[TarredSample]:
+        for shard in shards:
+            for sample in _read_tarred_shard(shard.url):
+                sample = _decode_sample(dataset_name=shard.dataset_name, sample=sample)
+                if self._keep_duration(sample.manifest_entry["duration"]):
+                    yield sample
+
+    def _sample_weighted(self, rng: random.Random, num_samples: int) -> Iterator[TarredSample]:
+        # samples of shards with weight 0 are always rejected, so these shards are not read at all
+        shard_weights = [shard.num_samples if shard.sample_weight > 0 else 0 for shard in self.shards]
+        sample_weights = {shard.dataset_name: shard.sample_weight for shard in self.shards}
+
+        def _draw_shards():
+            while True:
+                yield rng.choices(self.shards, weights=shard_weights)[0]
+
+        samples = self._read_shards(_draw_shards())
+        count = 0
+        while count < num_samples:
+            sample = next(samples)
+            speaker = sample.manifest_entry.get("speaker")
+            weight = sample_weights[sample.dataset_name] * self.speaker_weights.get(speaker, 1.0)
+            if rng.random() * self.max_sample_weight < weight:
+                count += 1
+                yield sample
+
+    def __iter__(self) -> Iterator[TarredSample]:
+        worker_info = torch.utils.data.get_worker_info()
+        if worker_info is None:
+            worker_id, num_workers = 0, 1
+        else:
+            worker_id, num_workers = worker_info.id, worker_info.num_workers
+
+        # torch seeds every data loader worker differently in every epoch
+        seed = int(torch.empty((), dtype=torch.int64).random_().item())
+        rng = random.Random(seed + self.global_rank)
+
+        if self.num_weighted_samples is None:
+            shards = self.shards[worker_id::num_workers]
+            rng.shuffle(shards)
+            samples = self._read_shards(iter(shards))
+        elif not any(shard.num_samples for shard in self.shards):
+            samples = iter([])
+        elif not any(shard.num_samples and shard.sample_weight for shard in self.shards):
+            # scattering can leave a rank with only weight 0 shards, it would never accept a sample
+            raise ValueError(
+                f"All shards of rank {self.global_rank} have sample weight 0. Weighted sampling needs a shard with a "
+                f"positive sample weight on every rank, use more shards or shard_strategy='replicate'."
+            )
+        else:
+            num_samples = self.num_weighted_samples // num_workers
+            num_samples += int(worker_id < self.num_weighted_samples % num_workers)
+            samples = self._sample_weighted(rng=rng, num_samples=num_samples)
+
+        if self.shuffle_n > 0:
+            samples = wd.iterators.shuffle(samples, bufsize=self.shuffle_n, initial=self.shuffle_n, rng=rng)
+        return samples
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import functools
+import math
 import os
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
@@ -111,6 +112,8 @@ def stack_tensors(tensors: List[torch.Tensor], max_lens: List[int], pad_value: f
     """
     Create batch by stacking input tensor list along the time axes.
 
+    The output tensor is allocated once with the padded batch shape, and every input tensor is copied into it.
+
     Args:
         tensors: List of tensors to pad and stack
         max_lens: List of lengths to pad each axis to, starting with the last axis
@@ -119,16 +122,15 @@ def stack_tensors(tensors: List[torch.Tensor], max_lens: List[int], pad_value: f
     Returns:
         Padded and stacked tensor.
     """
-    padded_tensors = []
-    for tensor in tensors:
-        padding = []
-        for i, max_len in enumerate(max_lens, 1):
-            padding += [0, max_len - tensor.shape[-i]]
+    batch_shape = list(tensors[0].shape)
+    for i, max_len in enumerate(max_lens, 1):
+        batch_shape[-i] = int(max_len)
 
-        padded_tensor = torch.nn.functional.pad(tensor, pad=padding, value=pad_value)
-        padded_tensors.append(padded_tensor)
+    stacked_tensor = tensors[0].new_full([len(tensors)] + batch_shape, pad_value)
+    for i, tensor in enumerate(tensors):
+        index = (i,) + tuple(slice(0, length) for length in tensor.shape)
+        stacked_tensor[index] = tensor
 
-    stacked_tensor = torch.stack(padded_tensors)
     return stacked_tensor
 
 
@@ -154,6 +156,71 @@ def beta_binomial_prior_distribution(phoneme_count: int, mel_count: int, scaling
     return logbetabinom(n, a, b, x).exp().numpy()
 
 
+class BatchedBetaBinomialPrior:
+    """
+    Calculates exact alignment prior matrices (based on beta-binomial distribution) for a whole batch of
+    (phoneme count, mel count) pairs, e.g. at collate time. The result is the same as calling
+    beta_binomial_prior_distribution() for every pair, without the interpolation of BetaBinomialInterpolator
+    or precomputed prior files.
+
+    With a = s * (m + 1) and b = s * (M - m) for mel frame m of M, and n = P - 1 for P phonemes, all the log-gamma
+    terms of the log-pmf at phoneme p are entries of the table lgamma(p + s * (m + 1)), read at (m, p) and at
+    (M - 1 - m, P - 1 - p), plus terms depending on a single length. The table only depends on the scaling factor,
+    so it is cached row by row and grown to the largest lengths seen, and the prior of every sample is computed
+    with a few tensor operations on a slice of it.
+
+    Args:
+        scaling_factor: scaling factor of the beta-binomial distribution parameters.
+    """
+
+    def __init__(self, scaling_factor: float = 1.0):
+        self.scaling_factor = scaling_factor
+        self.log_gamma_table = torch.zeros(0, 0, dtype=torch.float64)
+
+    def _get_log_gamma_table(self, max_mel_count: int, max_phoneme_count: int) -> torch.Tensor:
+        num_rows, num_cols = self.log_gamma_table.shape
+        if max_mel_count > num_rows or max_phoneme_count > num_cols:
+            # grow geometrically to avoid recomputing the table for slowly increasing lengths
+            num_rows = max(max_mel_count, 2 * num_rows)
+            num_cols = max(max_phoneme_count, 2 * num_cols)
+            x = torch.arange(0, num_cols, dtype=torch.float64).view(1, -1)
+            y = torch.arange(1, num_rows + 1, dtype=torch.float64).view(-1, 1)
+            self.log_gamma_table = gammaln(x + self.scaling_factor * y)
+        return self.log_gamma_table
+
+    def __call__(self, phoneme_counts: torch.Tensor, mel_counts: torch.Tensor) -> torch.Tensor:
+        """
+        Args:
+            phoneme_counts: [B] int tensor with the number of phonemes of every sample.
+            mel_counts: [B] int tensor with the number of mel frames of every sample.
+
+        Returns:
+            [B, max_mel_count, max_phoneme_count] float tensor with the prior of every sample, padded with zeros.
+        """
+        phoneme_counts = torch.as_tensor(phoneme_counts).view(-1).tolist()
+        mel_counts = torch.as_tensor(mel_counts).view(-1).tolist()
+        max_phoneme_count = max(phoneme_counts)
+        max_mel_count = max(mel_counts)
+        table = self._get_log_gamma_table(max_mel_count, max_phoneme_count)
+        scaling_factor = self.scaling_factor
+
+        priors = torch.zeros(len(phoneme_counts), max_mel_count, max_phoneme_count)
+        for i, (phoneme_count, mel_count) in enumerate(zip(phoneme_counts, mel_counts)):
+            # [mel_count, phoneme_count], lgamma(p + a) and lgamma(n - p + b)
+            log_gamma = table[:mel_count, :phoneme_count]
+            log_prior = log_gamma + log_gamma.flip(0, 1)
+
+            x = torch.arange(0, phoneme_count, dtype=torch.float64)
+            log_combinations = logcombinations(torch.tensor(phoneme_count - 1, dtype=torch.float64), x)
+            # logbeta(a, b), lgamma(a) and lgamma(b) are the first column of the table
+            log_beta = log_gamma[:, 0] + log_gamma[:, 0].flip(0) - math.lgamma(scaling_factor * (mel_count + 1))
+            log_normalizer = math.lgamma(phoneme_count - 1 + scaling_factor * (mel_count + 1))
+
+            log_prior += log_combinations.view(1, -1) - log_beta.view(-1, 1) - log_normalizer
+            priors[i, :mel_count, :phoneme_count] = log_prior.exp()
+        return priors
+
+
 def get_base_dir(paths):
     def is_relative_to(path1, path2):
         try:
@@ -22,9 +22,14 @@ $ python <nemo_root_path>/scripts/dataset_processing/tts/compute_features.py \
     --audio_dir=<data_root_path>/audio \
     --feature_dir=<data_root_path>/features \
     --num_workers=1
+
+All featurizers are computed in a single pass over the manifest, so every audio file is only decoded once.
+With --packed the features are written to a packed feature store, with one binary file per feature and worker
+instead of one .pt file per feature and utterance. Featurizer.load() reads from the packed store when it is found.
 """
 
 import argparse
+import os
 from pathlib import Path
 
 from hydra.utils import instantiate
@@ -33,6 +38,12 @@ from omegaconf import OmegaConf
 from tqdm import tqdm
 
 from nemo.collections.asr.parts.utils.manifest_utils import read_manifest
+from nemo.collections.tts.parts.preprocessing.features import (
+    PackedFeatureWriter,
+    _save_pt_feature,
+    compute_all_features,
+    finalize_packed_features,
+)
 
 
 def get_args():
@@ -54,10 +65,45 @@ def get_args():
     parser.add_argument(
         "--num_workers", default=1, type=int, help="Number of parallel threads to use. If -1 all CPUs are used."
     )
+    parser.add_argument(
+        "--packed",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Whether to write the features to a packed feature store instead of one .pt file per utterance.",
+    )
+    parser.add_argument(
+        "--num_shards",
+        default=None,
+        type=int,
+        help="Number of shards of the packed feature store. Defaults to one shard per worker.",
+    )
     args = parser.parse_args()
     return args
 
 
+def save_features(featurizers, entry, audio_dir, feature_dir):
+    feature_dict = compute_all_features(featurizers=featurizers, manifest_entry=entry, audio_dir=audio_dir)
+    for feature_name, feature_tensor in feature_dict.items():
+        _save_pt_feature(
+            feature_name=feature_name,
+            feature_tensor=feature_tensor,
+            manifest_entry=entry,
+            audio_dir=audio_dir,
+            feature_dir=feature_dir,
+        )
+
+
+def save_packed_features(featurizers, entries, audio_dir, feature_dir, shard_id):
+    writer = PackedFeatureWriter(feature_dir=feature_dir, shard_id=shard_id)
+    try:
+        for entry in entries:
+            feature_dict = compute_all_features(featurizers=featurizers, manifest_entry=entry, audio_dir=audio_dir)
+            writer.add(manifest_entry=entry, audio_dir=audio_dir, feature_dict=feature_dict)
+    finally:
+        writer.close()
+    return list(writer.indices.keys())
+
+
 def main():
     args = get_args()
     feature_config_path = args.feature_config_path
@@ -77,13 +123,32 @@ def main():
     featurizers = feature_config.featurizers
 
     entries = read_manifest(manifest_path)
+    featurizers = list(featurizers.values())
 
-    for feature_name, featurizer in featurizers.items():
-        print(f"Computing: {feature_name}")
+    print(f"Computing: {', '.join(type(featurizer).__name__ for featurizer in featurizers)}")
+    if not args.packed:
         Parallel(n_jobs=num_workers)(
-            delayed(featurizer.save)(manifest_entry=entry, audio_dir=audio_dir, feature_dir=feature_dir,)
+            delayed(save_features)(featurizers=featurizers, entry=entry, audio_dir=audio_dir, feature_dir=feature_dir)
             for entry in tqdm(entries)
         )
+        return
+
+    num_shards = args.num_shards
+    if num_shards is None:
+        num_shards = os.cpu_count() if num_workers == -1 else num_workers
+    shard_size = (len(entries) + num_shards - 1) // num_shards
+    feature_names = Parallel(n_jobs=num_workers)(
+        delayed(save_packed_features)(
+            featurizers=featurizers,
+            entries=entries[shard_id * shard_size : (shard_id + 1) * shard_size],
+            audio_dir=audio_dir,
+            feature_dir=feature_dir,
+            shard_id=shard_id,
+        )
+        for shard_id in tqdm(range(num_shards))
+    )
+    feature_names = sorted(set(name for shard_feature_names in feature_names for name in shard_feature_names))
+    finalize_packed_features(feature_dir=feature_dir, feature_names=feature_names, num_shards=num_shards)
 
 
 if __name__ == "__main__":
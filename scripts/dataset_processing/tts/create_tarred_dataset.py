@@ -0,0 +1,136 @@
+# Copyright (c) 2023, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This script packs the audio, text and precomputed features of a TTS dataset into tar shards, which can be read with
+TarredTextToSpeechDataset and TarredVocoderDataset. Features have to be computed beforehand with compute_features.py.
+
+$ python <nemo_root_path>/scripts/dataset_processing/tts/create_tarred_dataset.py \
+    --manifest_path=<data_root_path>/manifest.json \
+    --audio_dir=<data_root_path>/audio \
+    --output_dir=<data_root_path>/tarred \
+    --feature_config_path=<nemo_root_path>/examples/tts/conf/features/feature_22050.yaml \
+    --feature_dir=<data_root_path>/features \
+    --num_shards=64 \
+    --num_workers=8
+
+The shards and "metadata.json" are written to 'output_dir'. The dataset config refers to the metadata file:
+
+    dataset_meta:
+      my_dataset:
+        metadata_path: <data_root_path>/tarred/metadata.json
+        # Optional, if the shards were moved, for example to object storage
+        tar_dir: <shard_dir>
+
+Entries are shuffled before sharding by default, so that every shard contains a mix of speakers. The order of the
+shards and the samples within a buffer are shuffled again during training.
+"""
+
+import argparse
+import random
+from pathlib import Path
+
+from hydra.utils import instantiate
+from joblib import Parallel, delayed
+from omegaconf import OmegaConf
+from tqdm import tqdm
+
+from nemo.collections.asr.parts.utils.manifest_utils import read_manifest
+from nemo.collections.tts.parts.utils.tarred_dataset_utils import write_tarred_metadata, write_tarred_shard
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter, description="Create tarred TTS dataset.",
+    )
+    parser.add_argument(
+        "--manifest_path", required=True, type=Path, help="Path to training manifest.",
+    )
+    parser.add_argument(
+        "--audio_dir", required=True, type=Path, help="Path to base directory with audio data.",
+    )
+    parser.add_argument(
+        "--output_dir", required=True, type=Path, help="Path to directory where the shards will be stored.",
+    )
+    parser.add_argument(
+        "--feature_config_path",
+        default=None,
+        type=Path,
+        help="Optional, path to feature config file. If provided, precomputed features are packed with the audio.",
+    )
+    parser.add_argument(
+        "--feature_dir", default=None, type=Path, help="Path to directory where feature data is stored.",
+    )
+    parser.add_argument(
+        "--num_shards", required=True, type=int, help="Number of shards to create.",
+    )
+    parser.add_argument(
+        "--shuffle",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Whether to shuffle the manifest entries before sharding.",
+    )
+    parser.add_argument(
+        "--shuffle_seed", default=None, type=int, help="Random seed used to shuffle the manifest entries.",
+    )
+    parser.add_argument(
+        "--num_workers", default=1, type=int, help="Number of parallel threads to use. If -1 all CPUs are used."
+    )
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_args()
+    manifest_path = args.manifest_path
+    audio_dir = args.audio_dir
+    output_dir = args.output_dir
+    num_shards = args.num_shards
+
+    if not manifest_path.exists():
+        raise ValueError(f"Manifest {manifest_path} does not exist.")
+
+    if not audio_dir.exists():
+        raise ValueError(f"Audio directory {audio_dir} does not exist.")
+
+    featurizers = None
+    if args.feature_config_path:
+        if not args.feature_dir:
+            raise ValueError("feature_dir has to be provided with feature_config_path.")
+        feature_config = OmegaConf.load(args.feature_config_path)
+        feature_config = instantiate(feature_config)
+        featurizers = list(feature_config.featurizers.values())
+
+    entries = read_manifest(manifest_path)
+    if args.shuffle:
+        random.Random(args.shuffle_seed).shuffle(entries)
+
+    output_dir.mkdir(exist_ok=True, parents=True)
+    shard_size = (len(entries) + num_shards - 1) // num_shards
+    shards = Parallel(n_jobs=args.num_workers)(
+        delayed(write_tarred_shard)(
+            entries=entries[shard_id * shard_size : (shard_id + 1) * shard_size],
+            audio_dir=audio_dir,
+            output_dir=output_dir,
+            shard_id=shard_id,
+            featurizers=featurizers,
+            feature_dir=args.feature_dir,
+        )
+        for shard_id in tqdm(range(num_shards))
+    )
+    write_tarred_metadata(output_dir=output_dir, shards=shards)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,11 +12,29 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-
+"""
+This script computes the supplementary data of a TTS dataset, such as pitch, and prints pitch statistics.
+
+With `dataset.pitch_estimator=yin`, missing pitch is computed in batches of `pitch_batch_size` utterances with the
+batched YIN estimator instead of librosa.pyin. Set `pitch_check_samples` to compare it against librosa.pyin on the
+first utterances of the dataset before extraction, e.g.
+
+$ python scripts/dataset_processing/tts/extract_sup_data.py \
+    --config-path=ljspeech/ds_conf \
+    --config-name=ds_for_fastpitch_align.yaml \
+    manifest_filepath=<data_root_path>/train_manifest.json \
+    sup_data_path=<data_root_path>/sup_data \
+    +dataset.pitch_estimator=yin \
+    +pitch_batch_size=32 \
+    +pitch_check_samples=20
+"""
+
+import librosa
 import torch
 from hydra.utils import instantiate
 from tqdm import tqdm
 
+from nemo.collections.tts.parts.preprocessing.pitch_estimation import compare_pitch, yin_pitch_batch
 from nemo.core.config import hydra_runner
 
 
@@ -58,6 +76,34 @@ def preprocess_ds_for_mixer_tts_x(dataloader):
     get_pitch_stats(pitch_list)
 
 
+def check_pitch_quality(dataset, num_samples):
+    metrics = []
+    for sample in tqdm(dataset.data[:num_samples]):
+        audio = dataset._load_audio(sample)
+        pitch, voiced_mask, _, _ = yin_pitch_batch(
+            audio=audio.unsqueeze(0),
+            audio_len=torch.tensor([audio.shape[0]]),
+            sample_rate=dataset.sample_rate,
+            fmin=dataset.pitch_fmin,
+            fmax=dataset.pitch_fmax,
+            frame_length=dataset.win_length,
+        )
+        ref_pitch, ref_voiced_mask, _ = librosa.pyin(
+            audio.numpy(),
+            fmin=dataset.pitch_fmin,
+            fmax=dataset.pitch_fmax,
+            frame_length=dataset.win_length,
+            sr=dataset.sample_rate,
+            fill_na=0.0,
+        )
+        metrics.append(
+            compare_pitch(pitch[0], voiced_mask[0], torch.from_numpy(ref_pitch), torch.from_numpy(ref_voiced_mask))
+        )
+
+    for name in metrics[0]:
+        print(f"YIN vs pYIN {name}: {sum(m[name] for m in metrics) / len(metrics):.4f}")
+
+
 CFG_NAME2FUNC = {
     "ds_for_fastpitch_align": preprocess_ds_for_fastpitch_align,
     "ds_for_mixer_tts": preprocess_ds_for_fastpitch_align,
@@ -68,11 +114,15 @@ CFG_NAME2FUNC = {
 @hydra_runner(config_path='ljspeech/ds_conf', config_name='ds_for_fastpitch_align')
 def main(cfg):
     dataset = instantiate(cfg.dataset)
+    num_workers = cfg.get("dataloader_params", {}).get("num_workers", 4)
+
+    if getattr(dataset, "pitch_estimator", None) == "yin":
+        if cfg.get("pitch_check_samples", 0) > 0:
+            check_pitch_quality(dataset, cfg.pitch_check_samples)
+        dataset.precompute_pitch(batch_size=cfg.get("pitch_batch_size", 32), num_workers=num_workers)
+
     dataloader = torch.utils.data.DataLoader(
-        dataset=dataset,
-        batch_size=1,
-        collate_fn=dataset._collate_fn,
-        num_workers=cfg.get("dataloader_params", {}).get("num_workers", 4),
+        dataset=dataset, batch_size=1, collate_fn=dataset._collate_fn, num_workers=num_workers,
     )
 
     print(f"Processing {cfg.manifest_filepath}:")
@@ -29,7 +29,7 @@ $ python <nemo_root_path>/scripts/dataset_processing/tts/preprocess_audio.py \
     --output_manifest="<data_root_path>/manifest_processed.json" \
     --input_audio_dir="<data_root_path>/audio" \
     --output_audio_dir="<data_root_path>/audio_processed" \
-    --num_workers=1 \
+    --num_workers=8 \
     --trim_config_path="<nemo_root_path>/examples/tts/conf/trim/energy.yaml" \
     --output_sample_rate=22050 \
     --output_format=flac \
@@ -37,6 +37,10 @@ $ python <nemo_root_path>/scripts/dataset_processing/tts/preprocess_audio.py \
     --min_duration=0.5 \
     --max_duration=20.0 \
     --filter_file="filtered.txt"
+
+Audio is processed with a pool of 'num_workers' processes by default, so that decoding, trimming, resampling and
+encoding of different files run in parallel. The VAD trimmer runs a torch model, so it is always run with the
+'threading' backend, which shares the model between threads instead of copying it to every worker process.
 """
 
 import argparse
@@ -52,7 +56,7 @@ from omegaconf import OmegaConf
 from tqdm import tqdm
 
 from nemo.collections.asr.parts.utils.manifest_utils import read_manifest, write_manifest
-from nemo.collections.tts.parts.preprocessing.audio_trimming import AudioTrimmer
+from nemo.collections.tts.parts.preprocessing.audio_trimming import AudioTrimmer, VadAudioTrimmer
 from nemo.collections.tts.parts.utils.tts_dataset_utils import get_abs_rel_paths, normalize_volume
 from nemo.utils import logging
 
@@ -84,7 +88,17 @@ def get_args():
         help="Whether to overwrite the output manifest file if it exists.",
     )
     parser.add_argument(
-        "--num_workers", default=1, type=int, help="Number of parallel threads to use. If -1 all CPUs are used."
+        "--num_workers", default=1, type=int, help="Number of parallel workers to use. If -1 all CPUs are used."
+    )
+    parser.add_argument(
+        "--joblib_backend",
+        choices=["loky", "threading"],
+        type=str,
+        help="Joblib backend, 'loky' to process audio in separate processes or 'threading' to use threads. "
+        "Defaults to 'threading' with the VAD trimmer and 'loky' otherwise.",
+    )
+    parser.add_argument(
+        "--joblib_batch_size", type=int, help="Batch size for joblib workers. Defaults to 'auto' if not provided."
     )
     parser.add_argument(
         "--trim_config_path",
@@ -189,6 +203,8 @@ def main():
     overwrite_audio = args.overwrite_audio
     overwrite_manifest = args.overwrite_manifest
     num_workers = args.num_workers
+    joblib_backend = args.joblib_backend
+    batch_size = args.joblib_batch_size
     max_entries = args.max_entries
     output_sample_rate = args.output_sample_rate
     output_format = args.output_format
@@ -209,6 +225,13 @@ def main():
     else:
         audio_trimmer = None
 
+    if isinstance(audio_trimmer, VadAudioTrimmer):
+        if joblib_backend == "loky":
+            raise ValueError("The VAD trimmer runs a torch model and can only be used with the 'threading' backend")
+        joblib_backend = "threading"
+    elif not joblib_backend:
+        joblib_backend = "loky"
+
     if output_format:
         if output_format.upper() not in sf.available_formats():
             raise ValueError(f"Unsupported output audio format: {output_format}")
@@ -220,8 +243,10 @@ def main():
     if max_entries:
         entries = entries[:max_entries]
 
-    # 'threading' backend is required when parallelizing torch models.
-    job_outputs = Parallel(n_jobs=num_workers, backend='threading')(
+    if not batch_size:
+        batch_size = 'auto'
+
+    job_outputs = Parallel(n_jobs=num_workers, backend=joblib_backend, batch_size=batch_size)(
         delayed(_process_entry)(
             entry=entry,
             input_audio_dir=input_audio_dir,
@@ -13,18 +13,61 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Processing data for megatron pretraining."""
+"""
+Builds index files for a list of text files or a corpus directory, so that training does not wait for them.
+Files with existing index files are skipped, so an interrupted run can be resumed.
+
+Optionally stores the number of tokens of every line next to the index files, which allows
+length-aware batching without reading the text (see TextMemMapDataset.load_token_counts):
+
+python build_index_memmap_data.py /path/to/corpus_dir \
+    --files-filter '**/*.jsonl' \
+    --json-key text \
+    --tokenizer-library sentencepiece \
+    --tokenizer-model /path/to/tokenizer.model
+"""
 
 import argparse
 import glob
+import json
+import os
 
 from nemo.collections.nlp.data.language_modeling.text_memmap_dataset import build_index_files
+from nemo.collections.nlp.modules.common.tokenizer_utils import get_nmt_tokenizer
+
+# tokenizers are created once per worker process
+_TOKENIZERS = {}
+
+
+class TokenCounter:
+    """Pickleable callable which counts the tokens of a line"""
+
+    def __init__(self, tokenizer_library, tokenizer_type, tokenizer_model, vocab_file, merge_file, json_key):
+        self.tokenizer_args = (tokenizer_library, tokenizer_type, tokenizer_model, vocab_file, merge_file)
+        self.json_key = json_key
+
+    def __call__(self, text):
+        if self.tokenizer_args not in _TOKENIZERS:
+            library, model_name, tokenizer_model, vocab_file, merges_file = self.tokenizer_args
+            _TOKENIZERS[self.tokenizer_args] = get_nmt_tokenizer(
+                library=library,
+                model_name=model_name,
+                tokenizer_model=tokenizer_model,
+                vocab_file=vocab_file,
+                merges_file=merges_file,
+            )
+        if self.json_key is not None:
+            text = json.loads(text)[self.json_key]
+        return len(_TOKENIZERS[self.tokenizer_args].text_to_ids(text))
 
 
 def main():
     parser = argparse.ArgumentParser(description="Builds index files for a list of text files",)
     parser.add_argument(
-        'dataset_paths', type=str, nargs='+', help='Input text files (support glob)',
+        'dataset_paths', type=str, nargs='+', help='Input text files or directories (support glob)',
+    )
+    parser.add_argument(
+        '--files-filter', type=str, default='**/*.json*', help='Files filter used when a directory is given',
     )
     parser.add_argument(
         '--newline_int', type=int, default=10, help='Int value to split text (default: newline "\\n"',
@@ -35,16 +78,63 @@ def main():
         default=None,
         help='Number of workers to parse files in parallel (default: max(cpu num // 2, 1)',
     )
+    parser.add_argument(
+        '--chunk-size-mb', type=int, default=256, help='Size of the chunks of a file scanned by a single worker',
+    )
+    parser.add_argument(
+        '--index-mapping-dir',
+        type=str,
+        default=None,
+        help='Directory to save the index files to (default: next to the data files)',
+    )
+    group = parser.add_argument_group(title='token counts')
+    group.add_argument(
+        '--tokenizer-library',
+        type=str,
+        default=None,
+        choices=['yttm', 'sentencepiece', 'megatron', 'huggingface', 'tabular'],
+        help='If set, the number of tokens of every line is saved next to the index files',
+    )
+    group.add_argument('--tokenizer-type', type=str, default=None, help='What type of tokenizer to use.')
+    group.add_argument('--tokenizer-model', type=str, default=None, help='Path to tokenizer model.')
+    group.add_argument('--vocab-file', type=str, default=None, help='Path to the vocab file')
+    group.add_argument('--merge-file', type=str, default=None, help='Path to the BPE merge file (if necessary).')
+    group.add_argument(
+        '--json-key', type=str, default=None, help='Key of the text to tokenize in JSON lines (default: whole line)'
+    )
     args = parser.parse_args()
 
     # expand all dataset_paths
     dataset_paths = []
     for ds in args.dataset_paths:
-        dataset_paths.extend(glob.glob(ds))
+        for path in sorted(glob.glob(ds)):
+            if os.path.isdir(path):
+                for fn in sorted(glob.glob(os.path.join(path, args.files_filter), recursive=True)):
+                    # skip index files from previous runs
+                    if os.path.isfile(fn) and not fn.endswith(('.npy', '.info', '.tmp')):
+                        dataset_paths.append(fn)
+            else:
+                dataset_paths.append(path)
+
+    token_count_fn = None
+    if args.tokenizer_library is not None:
+        token_count_fn = TokenCounter(
+            args.tokenizer_library,
+            args.tokenizer_type,
+            args.tokenizer_model,
+            args.vocab_file,
+            args.merge_file,
+            args.json_key,
+        )
 
     # build index files in parallel
     build_index_files(
-        dataset_paths=dataset_paths, newline_int=args.newline_int, workers=args.workers,
+        dataset_paths=dataset_paths,
+        newline_int=args.newline_int,
+        workers=args.workers,
+        index_mapping_dir=args.index_mapping_dir,
+        token_count_fn=token_count_fn,
+        chunk_size=args.chunk_size_mb * 1024 * 1024,
     )
 
 
@@ -70,10 +70,36 @@ python scripts/nlp_language_modeling/build_knn_map_index.py  \
     --output_file=knn_final.save \
     --shard_index_input=knn_shard
 ```
+
+Alternatively, use `--resumable` to let all the shards write their part of a single, preallocated KNN map in place,
+without a merge stage. The chunk ids are split into blocks of `--knn_block_size` chunks, each shard handles a
+contiguous range of blocks and records the finished blocks in a progress file next to the output file. Running the
+same command again after an interruption only processes the blocks which are not finished yet. Shard 0 creates the
+output file and the manifest, the other shards wait for them. Example for shard 0 of 2:
+
+```python
+python scripts/nlp_language_modeling/build_knn_map_index.py \
+    --input_file=PATH_TO_INPUT_TRAINING_DATA \
+    --tokenizer-library=sentencepiece \
+    --tokenizer-model=tokenizer.model \
+    --process_chunk_size=10000 \
+    --K_neighbors=16 \
+    --remove_duplicate \
+    --workers=2 \
+    --shard_id=0 \
+    --total_shards=2 \
+    --devices=0,1,2 \
+    --resumable \
+    --knn_block_size=1000000 \
+    --output_file=knn_final.save \
+    --faiss_index=faiss.index
+```
 """
 
 import argparse
+import json
 import multiprocessing
+import os
 import pathlib
 import sys
 import time
@@ -182,37 +208,44 @@ def process_sentence_chunks(
     workers: int,
     shard_id: int,
     total_shards: int,
+    ranges=None,
 ):
     """
     This function takes chunked tokens from the retrieval dataset and map it back to text.
     In stage 1, it divides the total work into `total_shards`, and process only at the `shard_id`.  
     If the stage is None, it process all the chunks.
+    If `ranges` of chunk ids are given, only these ranges are processed.
     """
-    total_chunks = ds.chunks
-    start = 0
+    if ranges is None:
+        total_chunks = ds.chunks
+        start = 0
+        if stage == 1:
+            start, total_chunks = calculate_start_end(
+                total_chunks=total_chunks, total_shards=total_shards, shard_id=shard_id
+            )
+            logging.info(f'shard_id {shard_id}, create index from chunk {start} to {total_chunks}')
+        ranges = [(start, total_chunks)]
+    num_chunks = sum(end - start for start, end in ranges)
+    processed = 0
     threshold = 0
 
-    if stage == 1:
-        start, total_chunks = calculate_start_end(
-            total_chunks=total_chunks, total_shards=total_shards, shard_id=shard_id
-        )
-        logging.info(f'shard_id {shard_id}, create index from chunk {start} to {total_chunks}')
-
     with Pool(workers) as p:
-        while start < total_chunks:
-            if start / total_chunks > threshold:
-                logging.info(f"sentence processing {start / total_chunks} is done")
-                threshold += 0.1
-            slice_id = (start, min(start + chunk_size, total_chunks))
-            beg = time.time()
-            id_slices = ds.get_chunk(slice(*slice_id), force_no_cont_ids=True)
-            end = time.time()
-            logging.info(f"load {chunk_size} chunks takes {end-beg}")
-            start = min(start + chunk_size, total_chunks)
-            sentences = p.map(tokenizer.ids_to_text, id_slices)
-            end2 = time.time()
-            logging.info(f"tokenize {chunk_size} chunks takes {end2-end}")
-            queue.put((sentences, slice_id))
+        for start, total_chunks in ranges:
+            while start < total_chunks:
+                if processed / num_chunks > threshold:
+                    logging.info(f"sentence processing {processed / num_chunks} is done")
+                    threshold += 0.1
+                slice_id = (start, min(start + chunk_size, total_chunks))
+                beg = time.time()
+                id_slices = ds.get_chunk(slice(*slice_id), force_no_cont_ids=True)
+                end = time.time()
+                logging.info(f"load {chunk_size} chunks takes {end-beg}")
+                processed += slice_id[1] - slice_id[0]
+                start = min(start + chunk_size, total_chunks)
+                sentences = p.map(tokenizer.ids_to_text, id_slices)
+                end2 = time.time()
+                logging.info(f"tokenize {chunk_size} chunks takes {end2-end}")
+                queue.put((sentences, slice_id))
     queue.put((None, None))
 
 
@@ -237,6 +270,65 @@ def get_emb():
     return emb_queue.get()
 
 
+def get_manifest_file(output_file):
+    return output_file + '.manifest.json'
+
+
+def get_progress_file(output_file, shard_id):
+    return f'{output_file}.progress.{shard_id}'
+
+
+def prepare_resumable_output(args, total_chunks, manifest):
+    """
+    Creates the KNN map for all the chunks and its manifest on shard 0, the other shards wait for the manifest.
+    An existing output is reused if its manifest matches, so that interrupted jobs resume.
+    """
+    manifest_file = get_manifest_file(args.output_file)
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r') as f:
+            existing_manifest = json.load(f)
+        if existing_manifest != manifest:
+            raise ValueError(
+                f'{args.output_file} was started with different settings {existing_manifest}, '
+                f'remove it with its manifest and progress files to start again'
+            )
+        return
+    if args.shard_id in (None, 0):
+        logging.info(f'allocating the KNN map of {total_chunks} chunks in {args.output_file}')
+        KNNIndex.allocate(args.output_file, manifest['K'], total_chunks)
+        # written last, marks the output file as ready for all shards
+        with open(manifest_file + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_file + '.tmp', manifest_file)
+    else:
+        while not os.path.exists(manifest_file):
+            logging.info(f'waiting for shard 0 to create {manifest_file}')
+            time.sleep(10)
+        prepare_resumable_output(args, total_chunks, manifest)
+
+
+def get_pending_ranges(output_file, total_chunks, block_size, total_shards, shard_id):
+    """
+    Returns the chunk id ranges of the blocks of this shard which are not finished yet, according to the progress
+    files of all the shards, and the chunk id range of the whole shard.
+    """
+    finished_blocks = set()
+    for progress_file in pathlib.Path(output_file).parent.glob(pathlib.Path(output_file).name + '.progress.*'):
+        with open(progress_file, 'r') as f:
+            # a line cut by a preemption is ignored, its block is computed again
+            finished_blocks.update(int(line) for line in f.read().split('\n')[:-1] if line.isdigit())
+    num_blocks = (total_chunks + block_size - 1) // block_size
+    shard_blocks = np.array_split(np.arange(num_blocks), total_shards)[shard_id]
+    ranges = [
+        (block * block_size, min((block + 1) * block_size, total_chunks))
+        for block in shard_blocks.tolist()
+        if block not in finished_blocks
+    ]
+    if len(shard_blocks) == 0:
+        return ranges, (0, 0)
+    return ranges, (int(shard_blocks[0]) * block_size, min((int(shard_blocks[-1]) + 1) * block_size, total_chunks))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="build Faiss index",)
     parser.add_argument(
@@ -317,6 +409,17 @@ if __name__ == "__main__":
         default=None,
         help='the knn sharding index files, which are created at stage 1',
     )
+    group.add_argument(
+        '--resumable',
+        action='store_true',
+        help='write the neighbors of all shards in place into a single output file and resume interrupted jobs',
+    )
+    group.add_argument(
+        '--knn_block_size',
+        type=int,
+        default=1000000,
+        help='number of chunks in a block, the unit of work which is checkpointed with --resumable',
+    )
 
     args = parser.parse_args()
 
@@ -362,14 +465,46 @@ if __name__ == "__main__":
 
     start = 0
     total_chunks = ds.chunks
-    if args.stage == 1:
+    ranges = None
+    if args.resumable:
+        if args.stage is not None:
+            raise ValueError('--resumable writes a single output file and does not use stages')
+        total_shards = args.total_shards or 1
+        shard_id = args.shard_id or 0
+        manifest = {
+            'K': args.K_neighbors,
+            'total_chunks': ds.chunks,
+            'knn_block_size': args.knn_block_size,
+            'input_file': os.path.abspath(args.input_file),
+            'faiss_index': os.path.abspath(args.faiss_index),
+            'remove_duplicate': args.remove_duplicate,
+        }
+        prepare_resumable_output(args, ds.chunks, manifest)
+        ranges, (start, total_chunks) = get_pending_ranges(
+            args.output_file, ds.chunks, args.knn_block_size, total_shards, shard_id
+        )
+        logging.info(
+            f'shard_id {shard_id}, {sum(e - b for b, e in ranges)} chunks left to process in [{start}, {total_chunks})'
+        )
+        if len(ranges) == 0:
+            sys.exit(0)
+    elif args.stage == 1:
         start, total_chunks = calculate_start_end(
             total_chunks=total_chunks, total_shards=args.total_shards, shard_id=args.shard_id
         )
 
     process = multiprocessing.Process(
         target=process_sentence_chunks,
-        args=(ds, tokenizer, args.process_chunk_size, args.stage, args.workers, args.shard_id, args.total_shards),
+        args=(
+            ds,
+            tokenizer,
+            args.process_chunk_size,
+            args.stage,
+            args.workers,
+            args.shard_id,
+            args.total_shards,
+            ranges,
+        ),
     )
     process.start()
 
@@ -387,29 +522,54 @@ if __name__ == "__main__":
     else:
         neighbors = args.K_neighbors
 
-    chunk_id_start = start
-    with KNNIndex.writer(args.output_file, args.K_neighbors, offset=start) as w:
-        while True:
-            emb, slice_id = get_emb()
-            if emb is None:
-                break
+    def search_neighbors(emb, slice_id):
+        beg = time.time()
+        D, I = index.search(emb, neighbors)
+        end = time.time()
+        logging.info(f'search {slice_id[0]} - {slice_id[1]} takes {end-beg}')
+        if ds._index.retrieval_db and args.remove_duplicate:
             beg = time.time()
-            D, I = index.search(emb, neighbors)
+            tmp_neighbors = np.ones_like(I) * -1
+            dedup(chunk_id_to_doc_id_map, I, tmp_neighbors, slice_id[0], start)
+            I = tmp_neighbors[:, : args.K_neighbors]
             end = time.time()
-            logging.info(f'search {slice_id[0]} - {slice_id[1]} takes {end-beg}')
-            assert chunk_id_start == slice_id[0]
-            if ds._index.retrieval_db and args.remove_duplicate:
+            logging.info(f'dedup {slice_id[0]} - {slice_id[1]} takes {end-beg}')
+        return I
+
+    if args.resumable:
+        knn_map, _ = KNNIndex.open_map(args.output_file)
+        remaining = {b // args.knn_block_size: e - b for b, e in ranges}
+        with open(get_progress_file(args.output_file, shard_id), 'a') as progress:
+            while True:
+                emb, slice_id = get_emb()
+                if emb is None:
+                    break
+                I = search_neighbors(emb, slice_id)
+                knn_map[slice_id[0] : slice_id[1]] = I
+                block = slice_id[0] // args.knn_block_size
+                remaining[block] -= len(I)
+                if remaining[block] == 0:
+                    # the neighbors must be on disk before the block is marked as finished
+                    knn_map.flush()
+                    progress.write(f'{block}\n')
+                    progress.flush()
+                    os.fsync(progress.fileno())
+                    logging.info(f'finished block {block}')
+        del knn_map
+    else:
+        chunk_id_start = start
+        with KNNIndex.writer(args.output_file, args.K_neighbors, offset=start) as w:
+            while True:
+                emb, slice_id = get_emb()
+                if emb is None:
+                    break
+                assert chunk_id_start == slice_id[0]
+                I = search_neighbors(emb, slice_id)
                 beg = time.time()
-                tmp_neighbors = np.ones_like(I) * -1
-                dedup(chunk_id_to_doc_id_map, I, tmp_neighbors, chunk_id_start, start)
-                I = tmp_neighbors[:, : args.K_neighbors]
+                w.write(I)
                 end = time.time()
-                logging.info(f'dedup {slice_id[0]} - {slice_id[1]} takes {end-beg}')
-            beg = time.time()
-            w.write(I)
-            end = time.time()
-            logging.info(f'write {slice_id[0]} - {slice_id[1]} takes {end-beg}')
-            chunk_id_start += len(I)
+                logging.info(f'write {slice_id[0]} - {slice_id[1]} takes {end-beg}')
+                chunk_id_start += len(I)
 
     process.join()
     emb_process.join()
@@ -80,6 +80,25 @@ python scripts/nlp_language_modeling/preprocess_data_for_megatron.py \
     --chunk_size=64 \
     --workers=64 
 ```
+
+Large corpora can be preprocessed in shards by setting --shard-size-mb. Input files are split into shards of
+roughly that size. Every worker tokenizes a whole shard into its own .bin/.idx files, and the main process merges the
+shards at the end, so throughput scales with --workers. Finished shards are kept in OUTPUT_PREFIX_shards and
+skipped when the script is restarted with the same arguments.
+
+```python
+python scripts/nlp_language_modeling/preprocess_data_for_megatron.py \
+    --input=PATH_TO_THE_FOLDER_WITH_JSON_FILES \
+    --preproc-folder \
+    --json-keys=text \
+    --tokenizer-library=sentencepiece \
+    --tokenizer-model=tokenizer.model \
+    --dataset-impl=mmap \
+    --output-prefix=YOUR_DATA_PREFIX \
+    --append-eod \
+    --shard-size-mb=1024 \
+    --workers=64
+```
 """
 
 import argparse
@@ -88,6 +107,7 @@ import json
 import multiprocessing
 import os
 import pathlib
+import shutil
 import sys
 import time
 
@@ -140,6 +160,71 @@ def get_tokenizer(args):
     return tokenizer
 
 
+def get_level(args):
+    return "sentence" if args.split_sentences else "document"
+
+
+def get_builder(args, tokenizer, output_bin_file):
+    return indexed_dataset.make_builder(
+        output_bin_file,
+        impl=args.dataset_impl,
+        chunk_size=args.chunk_size,
+        pad_id=tokenizer.pad_id if hasattr(tokenizer, "pad_id") else 0,
+        retrieval_db=args.retrieval_db,
+        vocab_size=tokenizer.vocab_size,
+        stride=args.chunk_stride_size,
+    )
+
+
+def add_document(builders, doc):
+    for key, sentences in doc.items():
+        if len(sentences) == 0:
+            continue
+        for sentence in sentences:
+            builders[key].add_item(torch.IntTensor(sentence))
+        builders[key].end_document()
+
+
+def get_shards(json_files, shard_size):
+    """Split input files into byte ranges of shard_size, compressed files are a single shard"""
+    shards = []
+    for json_file in json_files:
+        if json_file.endswith('.gz'):
+            shards.append((json_file, 0, None))
+        else:
+            file_size = os.path.getsize(json_file)
+            for start in range(0, file_size, shard_size):
+                shards.append((json_file, start, min(start + shard_size, file_size)))
+    return shards
+
+
+def read_shard(json_file, start, end):
+    """Yield the lines starting in the byte range [start, end) of a file, or all lines if end is None"""
+    if end is None:
+        with gzip.open(json_file, 'rt', encoding='utf-8') as fin:
+            yield from fin
+        return
+
+    with open(json_file, 'rb') as fin:
+        if start > 0:
+            # the line crossing the start of the shard belongs to the previous shard
+            fin.seek(start - 1)
+            fin.readline()
+        while fin.tell() < end:
+            line = fin.readline()
+            if not line:
+                break
+            yield line.decode('utf-8')
+
+
+def get_shard_prefix(shard_dir, key, level, shard_idx):
+    return os.path.join(shard_dir, f"{key}_{level}_{shard_idx:06d}")
+
+
+def get_shard_done_file(shard_dir, shard_idx):
+    return os.path.join(shard_dir, f"shard_{shard_idx:06d}.done")
+
+
 class Encoder(object):
     def __init__(self, args):
         self.args = args
@@ -196,6 +281,30 @@ class Encoder(object):
             ids['text'] = doc_ids
         return ids, len(json_line)
 
+    def encode_shard(self, shard):
+        """Tokenize a shard of the input into its own .bin/.idx files, returns number of documents and bytes"""
+        shard_idx, (json_file, start, end) = shard
+        shard_dir = f"{self.args.output_prefix}_shards"
+        level = get_level(self.args)
+        builders = {}
+        for key in self.args.json_keys:
+            shard_prefix = get_shard_prefix(shard_dir, key, level, shard_idx)
+            builders[key] = get_builder(self.args, Encoder.tokenizer, indexed_dataset.data_file_path(shard_prefix))
+
+        num_docs, total_bytes_processed = 0, 0
+        for json_line in read_shard(json_file, start, end):
+            doc, bytes_processed = self.encode(json_line)
+            add_document(builders, doc)
+            num_docs += 1
+            total_bytes_processed += bytes_processed
+
+        for key in self.args.json_keys:
+            shard_prefix = get_shard_prefix(shard_dir, key, level, shard_idx)
+            builders[key].finalize(indexed_dataset.index_file_path(shard_prefix))
+        # mark the shard as complete only once all of its files are written
+        open(get_shard_done_file(shard_dir, shard_idx), 'w').close()
+        return num_docs, total_bytes_processed
+
 
 def get_args():
     parser = argparse.ArgumentParser()
@@ -251,6 +360,14 @@ def get_args():
         help='If set, will preprocess all .json or .json.gz files into a single .bin and .idx file. Folder path provided via the --input arg',
     )
     group.add_argument('--apply-ftfy', action='store_true', help='If set, will apply ftfy to the input text')
+    group.add_argument(
+        '--shard-size-mb',
+        type=float,
+        default=None,
+        help='If set, input files are split into shards of this size. Each worker writes its own .bin/.idx files '
+        'per shard which are merged at the end. Finished shards are skipped when the script is restarted.',
+    )
+    group.add_argument('--keep-shards', action='store_true', help='If set, will not delete the shards after merging')
     args = parser.parse_args()
     args.keep_empty = False
 
@@ -293,32 +410,29 @@ def main():
         assert args.need_pad_id, "retmmap need --need_pad_id flag"
     tokenizer = get_tokenizer(args)
 
-    level = "document"
-    if args.split_sentences:
-        level = "sentence"
+    level = get_level(args)
 
     print(f"Vocab size: {tokenizer.vocab_size}")
     print(f"Output prefix: {args.output_prefix}")
     output_bin_files = {}
     output_idx_files = {}
-    builders = {}
     for key in args.json_keys:
         output_bin_files[key] = "{}_{}_{}.bin".format(args.output_prefix, key, level)
         output_idx_files[key] = "{}_{}_{}.idx".format(args.output_prefix, key, level)
-        builders[key] = indexed_dataset.make_builder(
-            output_bin_files[key],
-            impl=args.dataset_impl,
-            chunk_size=args.chunk_size,
-            pad_id=tokenizer.pad_id if hasattr(tokenizer, "pad_id") else 0,
-            retrieval_db=args.retrieval_db,
-            vocab_size=tokenizer.vocab_size,
-            stride=args.chunk_stride_size,
-        )
 
     startup_end = time.time()
+    print("Time to startup:", startup_end - startup_start)
+
+    if args.shard_size_mb is not None:
+        preprocess_shards(args, encoder, tokenizer, json_files, output_bin_files, output_idx_files)
+        return
+
+    builders = {}
+    for key in args.json_keys:
+        builders[key] = get_builder(args, tokenizer, output_bin_files[key])
+
     proc_start = time.time()
     total_bytes_processed = 0
-    print("Time to startup:", startup_end - startup_start)
 
     pool = multiprocessing.Pool(args.workers, initializer=encoder.initializer)
 
@@ -327,18 +441,13 @@ def main():
         if json_file.endswith('.gz'):
             fin = gzip.open(json_file, 'r')
         else:
-            fin = open(args.input, 'r', encoding='utf-8')
+            fin = open(json_file, 'r', encoding='utf-8')
 
         encoded_docs = pool.imap(encoder.encode, fin, 25)
 
         for i, (doc, bytes_processed) in enumerate(encoded_docs, start=1):
             total_bytes_processed += bytes_processed
-            for key, sentences in doc.items():
-                if len(sentences) == 0:
-                    continue
-                for sentence in sentences:
-                    builders[key].add_item(torch.IntTensor(sentence))
-                builders[key].end_document()
+            add_document(builders, doc)
             if i % args.log_interval == 0:
                 current = time.time()
                 elapsed = current - proc_start
@@ -349,5 +458,59 @@ def main():
         builders[key].finalize(output_idx_files[key])
 
 
+def preprocess_shards(args, encoder, tokenizer, json_files, output_bin_files, output_idx_files):
+    """Tokenize shards of the input in parallel, each worker writing its own files, then merge them in order"""
+    shard_dir = f"{args.output_prefix}_shards"
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = get_shards(json_files, max(1, int(args.shard_size_mb * 1024 * 1024)))
+
+    # shard indices are only meaningful for the same inputs and shard size
+    shards_file = os.path.join(shard_dir, 'shards.json')
+    if os.path.exists(shards_file):
+        with open(shards_file, 'r') as f:
+            if [tuple(shard) for shard in json.load(f)] != shards:
+                raise ValueError(
+                    f'Existing shards in {shard_dir} were created for different inputs or shard size, remove them first.'
+                )
+    else:
+        with open(shards_file, 'w') as f:
+            json.dump(shards, f)
+
+    pending_shards = [
+        (shard_idx, shard)
+        for shard_idx, shard in enumerate(shards)
+        if not os.path.exists(get_shard_done_file(shard_dir, shard_idx))
+    ]
+    print(f'Processing {len(pending_shards)} shards, {len(shards) - len(pending_shards)} already done')
+
+    # every worker holds a single shard at a time and only returns its statistics,
+    # so memory stays bounded no matter how fast documents are tokenized
+    proc_start = time.time()
+    total_docs, total_bytes_processed = 0, 0
+    with multiprocessing.Pool(args.workers, initializer=encoder.initializer) as pool:
+        encoded_shards = pool.imap_unordered(encoder.encode_shard, pending_shards)
+        for i, (num_docs, bytes_processed) in enumerate(encoded_shards, start=1):
+            total_docs += num_docs
+            total_bytes_processed += bytes_processed
+            elapsed = time.time() - proc_start
+            mbs = total_bytes_processed / elapsed / 1024 / 1024
+            print(
+                f"Processed {i}/{len(pending_shards)} shards, {total_docs} documents",
+                f"({total_docs/elapsed} docs/s, {mbs} MB/s).",
+                file=sys.stderr,
+            )
+
+    level = get_level(args)
+    for key in args.json_keys:
+        print(f'Merging {len(shards)} shards into {output_bin_files[key]}')
+        builder = get_builder(args, tokenizer, output_bin_files[key])
+        for shard_idx in range(len(shards)):
+            builder.merge_file_(get_shard_prefix(shard_dir, key, level, shard_idx))
+        builder.finalize(output_idx_files[key])
+
+    if not args.keep_shards:
+        shutil.rmtree(shard_dir)
+
+
 if __name__ == '__main__':
     main()
@@ -94,7 +94,12 @@ def main(cfg) -> None:
 
     # running text generation, use inference server
     if parallel_state.is_pipeline_first_stage() and parallel_state.get_tensor_model_parallel_rank() == 0:
-        server = MegatronServer(model.cuda(), inference_strategy=model.inference_strategy)
+        server = MegatronServer(
+            model.cuda(),
+            inference_strategy=model.inference_strategy,
+            max_batch_size=cfg.get('max_batch_size', 128),
+            batch_timeout=cfg.get('batch_timeout', 0.0),
+        )
         server.run("0.0.0.0", port=cfg.port)
 
     while True:
@@ -19,6 +19,8 @@ from copy import deepcopy
 from typing import List
 from unittest.mock import Mock, patch
 
+import editdistance
+import numpy as np
 import pytest
 import torch
 from torchmetrics.audio.snr import SignalNoiseRatio
@@ -35,6 +37,7 @@ from nemo.collections.asr.metrics.wer import (
     word_error_rate_per_utt,
 )
 from nemo.collections.asr.metrics.wer_bpe import WERBPE, CTCBPEDecoding, CTCBPEDecodingConfig
+from nemo.collections.asr.parts.utils.edit_distance_utils import edit_operations_batch, levenshtein_distance_batch
 from nemo.collections.asr.parts.utils.rnnt_utils import Hypothesis
 from nemo.collections.common.tokenizers import CharTokenizer
 from nemo.utils.config_utils import assert_dataclass_signature_match
@@ -146,6 +149,37 @@ class TestWordErrorRate:
             hypotheses=['ducuti motorcycle', 'G P U'], references=['ducati motorcycle', 'GPU'], use_cer=True
         ) == ([1 / 17, 2 / 3], 0.15)
 
+    @pytest.mark.unit
+    def test_edit_distance_batch(self):
+        hypotheses = [['a', 'b', 'c'], ['a', 'b'], [], ['x'], 'kitten', 'G P U']
+        references = [['a', 'c'], ['a', 'b', 'd', 'e'], ['a'], [], 'sitting', 'GPU']
+        assert levenshtein_distance_batch(hypotheses, references).tolist() == [1, 2, 1, 1, 3, 2]
+        assert edit_operations_batch(hypotheses, references).tolist() == [
+            [0, 1, 0],
+            [0, 0, 2],
+            [0, 0, 1],
+            [0, 1, 0],
+            [2, 0, 1],
+            [0, 2, 0],
+        ]
+
+        # long sequences span several 64-token blocks of the bit-parallel algorithm
+        rng = random.Random(0)
+        hypotheses = [[rng.choice('abc') for _ in range(rng.randint(0, 200))] for _ in range(64)]
+        references = [[rng.choice('abc') for _ in range(rng.randint(0, 200))] for _ in range(64)]
+        expected = np.array([editdistance.eval(h, r) for h, r in zip(hypotheses, references)])
+        ops = edit_operations_batch(hypotheses, references, chunk_size=16)
+        assert (levenshtein_distance_batch(hypotheses, references, chunk_size=16) == expected).all()
+        assert (ops.sum(axis=1) == expected).all()
+        assert (ops[:, 1] - ops[:, 2] == [len(h) - len(r) for h, r in zip(hypotheses, references)]).all()
+
+        # chunks are split further to bound the memory of the bit-vectors, down to a single pair
+        for max_chunk_bytes in [1, 5 * 8 * 200 * 4 * 5]:
+            assert (edit_operations_batch(hypotheses, references, max_chunk_bytes=max_chunk_bytes) == ops).all()
+            assert (
+                levenshtein_distance_batch(hypotheses, references, max_chunk_bytes=max_chunk_bytes) == expected
+            ).all()
+
     @pytest.mark.unit
     @pytest.mark.parametrize("batch_dim_index", [0, 1])
     @pytest.mark.parametrize("test_wer_bpe", [False, True])
@@ -42,6 +42,7 @@ from nemo.collections.asr.parts.utils.speaker_utils import (
     OnlineSegmentor,
     check_ranges,
     fl2int,
+    generate_speaker_timestamps,
     get_new_cursor_for_update,
     get_online_segments_from_slices,
     get_online_subsegments_from_buffer,
@@ -49,6 +50,7 @@ from nemo.collections.asr.parts.utils.speaker_utils import (
     get_sub_range_list,
     get_subsegments,
     get_target_sig,
+    get_windowed_cluster_avg_embs,
     int2fl,
     is_overlap,
     merge_float_intervals,
@@ -545,6 +547,50 @@ class TestDiarizationSegmentationUtils:
         assert len(sig_rangel_list) == 2
         assert len(sig_indexes) == 2
 
+    @pytest.mark.unit
+    @pytest.mark.parametrize("window_length", [5, 8, 30])
+    def test_get_windowed_cluster_avg_embs(self, window_length):
+        clus_lengths = torch.tensor([30, 17, 4])
+        emb_seq = torch.randn(3, 30, 2, 8)
+        clus_labels = torch.full((3, 30), -1)
+        for k, length in enumerate(clus_lengths):
+            emb_seq[k, length:] = 0
+            clus_labels[k, :length] = torch.randint(0, 3, (length,))
+        target_spks = torch.tensor([[0, 1], [1, 2], [0, 2]])
+        window_avg_embs, window_emb_seq, window_lengths = get_windowed_cluster_avg_embs(
+            emb_seq, clus_labels, clus_lengths, target_spks, window_length
+        )
+        window_count = int(np.ceil(30 / window_length))
+        assert window_avg_embs.shape == (3 * window_count, 2, 8, 2)
+        assert window_emb_seq.shape == (3 * window_count, window_length, 2, 8)
+        for k in range(3):
+            for w in range(window_count):
+                stt, end = w * window_length, min((w + 1) * window_length, int(clus_lengths[k]))
+                idx = k * window_count + w
+                assert window_lengths[idx] == max(end - stt, 0)
+                assert torch.equal(window_emb_seq[idx, : max(end - stt, 0)], emb_seq[k, stt:end])
+                for spk_idx, spk in enumerate(target_spks[k]):
+                    spk_mask = clus_labels[k, stt:end] == spk
+                    expected = emb_seq[k, stt:end][spk_mask].mean(dim=0) if spk_mask.any() else torch.zeros(2, 8)
+                    assert torch.allclose(window_avg_embs[idx, :, :, spk_idx], expected, atol=1e-6)
+
+    @pytest.mark.unit
+    def test_generate_speaker_timestamps(self):
+        clus_labels = [[0.0, 0.5, 0], [0.5, 1.0, 0], [1.0, 1.5, 1], [1.5, 2.0, 1]]
+        msdd_preds = torch.tensor([[[0.9, 0.1, 0.0], [0.9, 0.8, 0.2], [0.2, 0.9, 0.1], [0.1, 0.3, 0.95]]])
+        params = {
+            'overlap_infer_spk_limit': 5,
+            'use_adaptive_thres': False,
+            'max_overlap_spks': 2,
+            'threshold': 0.7,
+        }
+        maj_labels, ovl_labels = generate_speaker_timestamps(clus_labels, msdd_preds, use_clus_as_main=False, **params)
+        assert maj_labels == ['0.0 1.0 speaker_0', '1.0 1.5 speaker_1', '1.5 2.0 speaker_2']
+        assert ovl_labels == ['0.5 1.0 speaker_1']
+        maj_labels, ovl_labels = generate_speaker_timestamps(clus_labels, msdd_preds, use_clus_as_main=True, **params)
+        assert maj_labels == ['0.0 1.0 speaker_0', '1.0 2.0 speaker_1']
+        assert ovl_labels == ['0.5 1.0 speaker_1']
+
 
 class TestClusteringUtilFunctions:
     @pytest.mark.parametrize("p_value", [1, 5, 9])
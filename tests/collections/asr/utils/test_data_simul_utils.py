@@ -16,17 +16,23 @@ import os
 
 import numpy as np
 import pytest
+import soundfile as sf
 import torch
 from omegaconf import DictConfig
 
+from nemo.collections.asr.parts.preprocessing.segment import AudioSegment
 from nemo.collections.asr.parts.utils.data_simulation_utils import (
     DataAnnotator,
+    RIRBank,
+    SessionAudioWriter,
+    SourceAudioCache,
     SpeechSampler,
     add_silence_to_alignments,
     binary_search_alignments,
     get_cleaned_base_path,
     get_split_points_in_alignments,
     normalize_audio,
+    overlap_add_convolve,
     read_noise_manifest,
 )
 
@@ -199,6 +205,107 @@ class TestDataSimulatorUtils:
             assert audio_manifest['alignments'] == alignments
             assert audio_manifest['words'] == words
 
+    @pytest.mark.unit
+    @pytest.mark.parametrize("chunk_samples", [None, 100, 1000])
+    def test_session_audio_writer(self, tmp_path, chunk_samples):
+        sr, min_length = 1000, 2000
+        sentences = [(0, 300), (250, 500), (900, 700), (1500, 900), (1600, 100)]
+        expected, expected_is_speech = torch.zeros(2400), torch.zeros(2400)
+        filepath = os.path.join(tmp_path, 'session.wav')
+        writer = SessionAudioWriter(filepath, sr=sr, min_length=min_length, chunk_samples=chunk_samples)
+        for start, length in sentences:
+            signal = torch.rand(length, dtype=torch.float64) - 0.5
+            expected[start : start + length] += signal
+            expected_is_speech[start : start + length] = 1
+            writer.add(start=start, signal=signal)
+            writer.flush(start)
+        assert writer.length == len(expected)
+
+        if chunk_samples is None:
+            array, is_speech = writer.get_session()
+            assert not writer.is_written
+            assert torch.equal(array, expected)
+            assert torch.equal(is_speech, expected_is_speech)
+        else:
+            assert writer.is_written
+            with pytest.raises(ValueError):
+                writer.add(start=0, signal=torch.ones(10))
+            power = writer.finish()
+            assert abs(power - torch.mean(expected[expected_is_speech == 1] ** 2)) < 1e-6
+            writer.write_wav()
+            audio, _ = sf.read(filepath, dtype='float32')
+            assert np.allclose(audio, (expected / expected.abs().max()).numpy(), atol=1.0 / 2 ** 14)
+            assert not os.path.exists(writer._tmp_filepath)
+
+    @pytest.mark.unit
+    def test_source_audio_cache(self, tmp_path):
+        audio_filepaths = []
+        for idx, num_channels in enumerate([1, 1, 2]):
+            audio_filepath = os.path.join(tmp_path, f'source_{idx}.wav')
+            sf.write(audio_filepath, np.random.uniform(-0.5, 0.5, [16000 + 1000 * idx, num_channels]), 16000)
+            audio_filepaths.append(audio_filepath)
+        cache_dir = os.path.join(tmp_path, 'cache')
+        cache = SourceAudioCache.build(audio_filepaths, cache_dir=cache_dir)
+        for audio_filepath in audio_filepaths:
+            assert audio_filepath in cache
+            for offset, duration in [(0, 0), (0.25, 0.5), (0.9, 0.5)]:
+                segment = AudioSegment.from_file(audio_filepath, offset=offset, duration=duration)
+                samples, sr = cache.read(audio_filepath, offset=offset, duration=duration)
+                expected = segment.samples if segment.samples.ndim == 1 else segment.samples.mean(axis=1)
+                assert sr == segment.sample_rate
+                assert np.allclose(samples, expected, atol=1e-6)
+        assert 'unknown.wav' not in cache
+        # existing cache is reused
+        assert SourceAudioCache.build(audio_filepaths[:2], cache_dir=cache_dir)._index == cache._index
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("max_blocks", [1, 256])
+    def test_overlap_add_convolve(self, max_blocks):
+        num_sources, num_channels = 3, 2
+        rir_lengths = np.random.randint(50, 300, size=(num_sources, num_channels))
+        rirs = np.zeros((num_sources, num_channels, rir_lengths.max()), dtype=np.float32)
+        for source in range(num_sources):
+            for channel in range(num_channels):
+                rirs[source, channel, : rir_lengths[source, channel]] = np.random.randn(rir_lengths[source, channel])
+        # the last signal is shorter than the RIRs and runs past the end of the output
+        signals = [torch.randn(length, dtype=torch.float64) for length in [3000, 1200, 700, 40]]
+        starts, sources = [0, 1500, 2000, 4980], [0, 1, 2, 1]
+
+        output = torch.zeros(5000, num_channels)
+        overlap_add_convolve(output, signals, starts, sources, rirs, rir_lengths, max_blocks=max_blocks)
+        expected = np.zeros((5500, num_channels))
+        for signal, start, source in zip(signals, starts, sources):
+            for channel in range(num_channels):
+                channel_rir = rirs[source, channel, : min(len(signal), rir_lengths[source, channel])]
+                out_channel = np.convolve(signal.numpy(), channel_rir)
+                expected[start : start + len(out_channel), channel] += out_channel
+        assert np.allclose(output.numpy(), expected[:5000], atol=1e-3)
+
+    @pytest.mark.unit
+    def test_rir_bank(self, tmp_path):
+        def generate_rir():
+            rir_lengths = np.random.randint(10, 100, size=(3, 2))
+            rir = np.zeros((3, 2, rir_lengths.max()), dtype=np.float32)
+            for source in range(3):
+                for channel in range(2):
+                    rir[source, channel, : rir_lengths[source, channel]] = np.random.rand(rir_lengths[source, channel])
+            return rir, rir_lengths
+
+        config = {'room_sz': [3, 3, 3], 'T60': 0.2}
+        bank = RIRBank.build(generate_rir, config=config, bank_dir=str(tmp_path), num_rirs=4, random_seed=7)
+        assert len(bank) == 4
+        for index in range(4):
+            np.random.seed(7 + index)
+            expected_rir, expected_lengths = generate_rir()
+            rir, rir_lengths = bank[index]
+            assert np.array_equal(rir_lengths, expected_lengths)
+            assert np.array_equal(rir, expected_rir)
+        # existing bank is reused for the same configuration
+        reused_bank = RIRBank.build(None, config=config, bank_dir=str(tmp_path), num_rirs=4, random_seed=7)
+        assert reused_bank.bank_dir == bank.bank_dir
+        other_bank = RIRBank.build(generate_rir, config=dict(config, T60=0.3), bank_dir=str(tmp_path), num_rirs=2)
+        assert other_bank.bank_dir != bank.bank_dir
+
 
 class TestDataAnnotator:
     def test_init(self, annotator):
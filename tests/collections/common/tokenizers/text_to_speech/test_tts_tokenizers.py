@@ -222,3 +222,47 @@ class TestTTSTokenizers:
         chars, tokens = self._parse_text(tokenizer, "Hello, wound")
         expected_output = "HELLO, ˈwund"
         assert chars == expected_output
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_chars_tokenizer_spaces(self):
+        tokenizer = EnglishCharsTokenizer(pad_with_space=True)
+        chars, tokens = self._parse_text(tokenizer, "  Hello 🙂  world!  ")
+
+        assert chars == " hello world! "
+        assert tokens[0] == tokens[-1] == tokenizer.space
+        assert tokenizer.encode("🙂") == [tokenizer.space, tokenizer.space]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_chars_tokenizer_encode_cache(self):
+        input_texts = ["Hello world!", "Hey there", "Hello world!"]
+        tokenizer = EnglishCharsTokenizer(encode_cache_size=1)
+
+        tokens = tokenizer(input_texts)
+        assert tokens == [EnglishCharsTokenizer().encode(text) for text in input_texts]
+        assert list(tokenizer._encode_cache) == ["Hello world!"]
+
+        # cached encodings can't be modified by callers
+        tokens[0].clear()
+        assert tokenizer.encode("Hello world!") == tokens[2]
+
+        tokenizer.clear_encode_cache()
+        assert not tokenizer._encode_cache
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_ipa_tokenizer_encode_batch(self):
+        input_texts = ["Hello, world!", "Welt", "Hello, world!"]
+        g2p = IpaG2p(phoneme_dict=self.PHONEME_DICT_EN, phoneme_probability=0.5)
+        tokenizer = IPATokenizer(g2p=g2p, locale="en-US", encode_cache_size=10)
+
+        with tokenizer.set_phone_prob(prob=1.0):
+            expected_tokens = [tokenizer.encode(text) for text in input_texts]
+            assert tokenizer(input_texts) == expected_tokens
+        assert len(tokenizer._encode_cache) == 2
+
+        # encodings aren't cached while words are randomly kept as graphemes
+        tokenizer.clear_encode_cache()
+        tokenizer(input_texts)
+        assert not tokenizer._encode_cache
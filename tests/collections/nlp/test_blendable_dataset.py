@@ -0,0 +1,63 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from nemo.collections.nlp.data.language_modeling.megatron.blendable_dataset import LazyBlendableDataset
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("num_datasets", [1, 3, 10])
+def test_lazy_blendable_dataset(num_datasets):
+    rng = np.random.RandomState(num_datasets)
+    weights = rng.rand(num_datasets)
+    if num_datasets > 1:
+        weights[0] = 0.0
+    size = 2000
+    datasets = [[(ds, i) for i in range(size)] for ds in range(num_datasets)]
+    dataset = LazyBlendableDataset(datasets, weights, size)
+
+    ds_idx, sample_idx = dataset.get_ds_sample_idx_range(0, size)
+    assert len(ds_idx) == len(dataset) == size
+    assert [dataset[i] for i in range(0, size, 97)] == list(zip(ds_idx[::97], sample_idx[::97]))
+    assert dataset[-1] == (ds_idx[-1], sample_idx[-1])
+
+    # samples of every dataset are visited in order, without gaps, and datasets with zero weight are skipped
+    for ds in range(num_datasets):
+        assert np.array_equal(sample_idx[ds_idx == ds], np.arange(np.sum(ds_idx == ds)))
+    assert (dataset.weights[ds_idx] > 0).all()
+
+    # every prefix follows the weights
+    counts = np.zeros((size, num_datasets))
+    counts[np.arange(size), ds_idx] = 1
+    counts = np.cumsum(counts, axis=0)
+    expected = np.arange(1, size + 1)[:, None] * dataset.weights
+    assert np.abs(counts - expected).max() < 1.5
+
+    # any window and any resume point agree with the full blend
+    for _ in range(20):
+        start, stop = sorted(rng.randint(1, size, size=2))
+        window_ds_idx, window_sample_idx = dataset.get_ds_sample_idx_range(start, stop)
+        assert np.array_equal(window_ds_idx, ds_idx[start:stop])
+        assert np.array_equal(window_sample_idx, sample_idx[start:stop])
+        assert np.array_equal(dataset.get_dataset_num_samples(stop), counts[stop - 1])
+
+
+@pytest.mark.unit
+def test_lazy_blendable_dataset_equal_weights():
+    dataset = LazyBlendableDataset([None] * 3, [1, 1, 1], 9)
+    ds_idx, sample_idx = dataset.get_ds_sample_idx_range(0, 9)
+    assert ds_idx.tolist() == [0, 1, 2] * 3
+    assert sample_idx.tolist() == [0, 0, 0, 1, 1, 1, 2, 2, 2]
@@ -0,0 +1,117 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from nemo.collections.nlp.data.language_modeling.megatron.gpt_dataset import (
+    _build_doc_idx,
+    _build_sample_idx,
+    _get_sample_documents,
+    _index_mappings_digest,
+    _num_epochs,
+)
+
+
+def _reference_sample_idx(sizes, doc_idx, seq_length, num_samples, add_extra_token):
+    """Sample index built one document at a time, as in helpers.cpp"""
+    sample_idx = np.zeros([num_samples + 1, 2], dtype=np.int32)
+    doc_idx_index, doc_offset = 0, 0
+    for sample_index in range(1, num_samples + 1):
+        remaining_seq_length = seq_length + add_extra_token
+        while remaining_seq_length != 0:
+            doc_length = sizes[doc_idx[doc_idx_index]] - doc_offset
+            remaining_seq_length -= doc_length
+            if remaining_seq_length <= 0:
+                doc_offset += remaining_seq_length + doc_length - add_extra_token
+                remaining_seq_length = 0
+            else:
+                if doc_idx_index == len(doc_idx) - 1:
+                    doc_offset = sizes[doc_idx[doc_idx_index]] - add_extra_token
+                    break
+                doc_idx_index += 1
+                doc_offset = 0
+        sample_idx[sample_index] = doc_idx_index, doc_offset
+    return sample_idx
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("drop_last", [True, False])
+@pytest.mark.parametrize("add_extra_token", [0, 1])
+def test_build_sample_idx(drop_last, add_extra_token):
+    rng = np.random.RandomState(0)
+    for _ in range(50):
+        sizes = rng.randint(0, 40, size=rng.randint(5, 30)).astype(np.int32)
+        documents = np.arange(len(sizes))
+        seq_length = rng.randint(2, 30)
+        tokens_per_epoch = int(sizes.sum())
+        num_epochs = _num_epochs(tokens_per_epoch, seq_length, rng.randint(1, 10), add_extra_token)
+        doc_idx = _build_doc_idx(documents, num_epochs, np.random.RandomState(1), separate_last_epoch=False)
+        assert doc_idx.dtype == np.int32
+        assert sorted(doc_idx.tolist()) == sorted(documents.tolist() * num_epochs)
+
+        sample_idx = _build_sample_idx(
+            sizes,
+            doc_idx,
+            seq_length,
+            num_epochs,
+            tokens_per_epoch,
+            drop_last=drop_last,
+            add_extra_token=add_extra_token,
+            samples_per_chunk=3,
+        )
+        expected = _reference_sample_idx(sizes, doc_idx, seq_length, len(sample_idx) - 1, add_extra_token)
+        assert sample_idx.dtype == np.int32
+        assert np.array_equal(sample_idx, expected)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("add_extra_token", [0, 1])
+def test_get_sample_documents(add_extra_token):
+    rng = np.random.RandomState(0)
+    sizes = rng.randint(1, 40, size=30).astype(np.int32)
+    tokens = [rng.randint(0, 1000, size=size) for size in sizes]
+    seq_length = 16
+    tokens_per_epoch = int(sizes.sum())
+    num_epochs = _num_epochs(tokens_per_epoch, seq_length, 50, add_extra_token)
+    doc_idx = _build_doc_idx(np.arange(len(sizes)), num_epochs, rng, separate_last_epoch=False)
+    sample_idx = _build_sample_idx(
+        sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch, drop_last=True, add_extra_token=add_extra_token
+    )
+    indices = rng.permutation(len(sample_idx) - 1)[:20]
+
+    documents, offsets, lengths = _get_sample_documents(doc_idx, sample_idx, sizes, indices, add_extra_token)
+    text = np.concatenate([tokens[d][o : o + l] for d, o, l in zip(documents, offsets, lengths)])
+    expected = []
+    for idx in indices:
+        (doc_f, offset_f), (doc_l, offset_l) = sample_idx[idx], sample_idx[idx + 1]
+        sample = np.concatenate([tokens[d] for d in doc_idx[doc_f : doc_l + 1]])
+        expected.append(sample[offset_f : len(sample) - sizes[doc_idx[doc_l]] + offset_l + add_extra_token])
+    assert np.array_equal(text, np.concatenate(expected))
+    assert len(text) == len(indices) * (seq_length + add_extra_token)
+
+
+@pytest.mark.unit
+def test_index_mappings_digest():
+    sizes = np.array([5, 7, 3, 9, 4], dtype=np.int32)
+    documents = np.arange(len(sizes), dtype=np.int32)
+
+    def digest(documents, sizes, drop_last=True):
+        return _index_mappings_digest(documents, sizes, int(sizes[documents].sum()), drop_last, 1, True)
+
+    assert digest(documents, sizes) == digest(documents.astype(np.int64), sizes.copy())
+    assert digest(documents, sizes) != digest(documents, sizes, drop_last=False)
+    # same number of documents and tokens and same first and last document, but different data
+    assert digest(documents, sizes) != digest(documents, np.array([5, 3, 7, 9, 4], dtype=np.int32))
+    assert digest(documents, sizes) != digest(np.array([0, 2, 1, 3, 4]), np.array([5, 3, 7, 9, 4], dtype=np.int32))
@@ -0,0 +1,231 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+from omegaconf import OmegaConf
+
+from nemo.collections.nlp.data.language_modeling.megatron.gpt_sft_dataset import GPTSFTDataset, GPTSFTPackedDataset
+from nemo.collections.nlp.data.language_modeling.megatron.sequence_packing_utils import first_fit_decreasing
+from nemo.collections.nlp.models.language_modeling import megatron_gpt_model
+from nemo.collections.nlp.models.language_modeling.megatron_gpt_model import MegatronGPTModel
+from nemo.collections.nlp.models.language_modeling.megatron_gpt_sft_model import MegatronGPTSFTModel
+
+
+class CharTokenizer:
+    """ Maps every character to its code point, enough to exercise the dataset without tokenizer files """
+
+    bos_id = 1
+    eos_id = 2
+    vocab_size = 256
+
+    def text_to_ids(self, text):
+        return [ord(c) for c in text]
+
+
+@pytest.fixture
+def sft_jsonl_file(tmp_path):
+    rng = np.random.RandomState(0)
+    file_path = str(tmp_path / "sft.jsonl")
+    with open(file_path, "w") as f:
+        for _ in range(50):
+            record = {
+                "input": "q" * rng.randint(1, 20),
+                "output": "a" * rng.randint(1, 10),
+            }
+            f.write(json.dumps(record) + "\n")
+    return file_path
+
+
+def _dataset_kwargs(max_seq_length):
+    return dict(
+        max_seq_length=max_seq_length,
+        add_bos=True,
+        add_eos=True,
+        label_key="output",
+        truncation_field="input",
+        prompt_template="{input} {output}",
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("pack_size", [8, 13, 64])
+def test_first_fit_decreasing(pack_size):
+    rng = np.random.RandomState(pack_size)
+    seq_lens = rng.randint(1, pack_size + 1, size=200)
+
+    packs = first_fit_decreasing(seq_lens, pack_size)
+
+    assert sorted(i for pack in packs for i in pack) == list(range(len(seq_lens)))
+    pack_lens = [sum(seq_lens[i] for i in pack) for pack in packs]
+    assert max(pack_lens) <= pack_size
+
+    # compare with a naive linear scan over the open packs
+    expected_packs, remaining = [], []
+    for i in np.argsort(-seq_lens, kind='stable'):
+        for j, space in enumerate(remaining):
+            if seq_lens[i] <= space:
+                expected_packs[j].append(i)
+                remaining[j] -= seq_lens[i]
+                break
+        else:
+            expected_packs.append([i])
+            remaining.append(pack_size - seq_lens[i])
+    assert packs == expected_packs
+
+
+@pytest.mark.unit
+def test_first_fit_decreasing_too_long():
+    with pytest.raises(ValueError):
+        first_fit_decreasing([3, 9], 8)
+
+
+@pytest.mark.unit
+def test_gpt_sft_packed_dataset(sft_jsonl_file, tmp_path):
+    tokenizer = CharTokenizer()
+    max_seq_length = 48
+    dataset = GPTSFTDataset(sft_jsonl_file, tokenizer, **_dataset_kwargs(max_seq_length))
+    packed_dir = str(tmp_path / "packed")
+    packed_dataset = GPTSFTPackedDataset(
+        sft_jsonl_file, tokenizer, packed_dir=packed_dir, **_dataset_kwargs(max_seq_length)
+    )
+    assert len(packed_dataset) < len(dataset)
+    assert os.path.exists(os.path.join(packed_dir, "meta.json"))
+
+    # every example is found exactly once, with the loss mask of the unpacked dataset
+    expected = sorted((dataset[i]['input_ids'], dataset._build_loss_mask(dataset[i])) for i in range(len(dataset)))
+    found = []
+    for pack in (packed_dataset[i] for i in range(len(packed_dataset))):
+        for segment_id in np.unique(pack['segment_ids']):
+            in_segment = pack['segment_ids'] == segment_id
+            found.append((pack['input_ids'][in_segment].tolist(), pack['loss_mask'][in_segment].tolist()))
+    assert sorted(found) == expected
+
+    batch = packed_dataset.collate_fn([packed_dataset[i] for i in range(4)])
+    seq_length = batch['tokens'].shape[1]
+    assert seq_length <= max_seq_length and seq_length % 8 == 0
+    assert batch['attention_mask'].shape == (4, 1, seq_length, seq_length)
+    for i in range(4):
+        item = packed_dataset[i]
+        starts = np.flatnonzero(np.diff(item['segment_ids'], prepend=-1))
+        ends = np.append(starts[1:], len(item['segment_ids']))
+        offset = 0
+        for start, end in zip(starts, ends):
+            num_inputs = end - start - 1
+            inputs = slice(offset, offset + num_inputs)
+            assert batch['tokens'][i, inputs].tolist() == item['input_ids'][start : end - 1].tolist()
+            assert batch['labels'][i, inputs].tolist() == item['input_ids'][start + 1 : end].tolist()
+            assert batch['loss_mask'][i, inputs].tolist() == item['loss_mask'][start + 1 : end].tolist()
+            assert batch['position_ids'][i, inputs].tolist() == list(range(num_inputs))
+            # tokens attend causally within their own example only
+            expected_mask = ~torch.tril(torch.ones((num_inputs, num_inputs), dtype=torch.bool))
+            assert torch.equal(batch['attention_mask'][i, 0, inputs, inputs], expected_mask)
+            assert batch['attention_mask'][i, 0, inputs, :offset].all()
+            offset += num_inputs
+
+    # packed files are reused when the settings do not change
+    mtime = os.path.getmtime(os.path.join(packed_dir, "tokens.npy"))
+    packed_dataset = GPTSFTPackedDataset(
+        sft_jsonl_file, tokenizer, packed_dir=packed_dir, max_num_samples=100, **_dataset_kwargs(max_seq_length)
+    )
+    assert os.path.getmtime(os.path.join(packed_dir, "tokens.npy")) == mtime
+    assert len(packed_dataset) == 100
+
+
+@pytest.mark.unit
+def test_gpt_sft_packed_dataset_truncates_to_pack_size(sft_jsonl_file, tmp_path):
+    tokenizer = CharTokenizer()
+    max_seq_length, pack_size = 48, 12
+    dataset = GPTSFTDataset(sft_jsonl_file, tokenizer, **_dataset_kwargs(max_seq_length))
+    assert max(len(dataset[i]['input_ids']) for i in range(len(dataset))) > pack_size + 1
+    packed_dataset = GPTSFTPackedDataset(
+        sft_jsonl_file,
+        tokenizer,
+        packed_dir=str(tmp_path / "packed"),
+        pack_size=pack_size,
+        **_dataset_kwargs(max_seq_length),
+    )
+
+    # examples longer than the pack are truncated instead of failing the packing
+    expected = sorted(
+        (dataset[i]['input_ids'][: pack_size + 1], dataset._build_loss_mask(dataset[i])[: pack_size + 1])
+        for i in range(len(dataset))
+    )
+    found = []
+    for pack in (packed_dataset[i] for i in range(len(packed_dataset))):
+        segment_ids = np.unique(pack['segment_ids'])
+        assert len(pack['input_ids']) - len(segment_ids) <= pack_size
+        for segment_id in segment_ids:
+            in_segment = pack['segment_ids'] == segment_id
+            found.append((pack['input_ids'][in_segment].tolist(), pack['loss_mask'][in_segment].tolist()))
+    assert sorted(found) == expected
+
+
+@pytest.mark.unit
+def test_packed_sequence_attention_config():
+    cfg = OmegaConf.create({"data": {"train_ds": {"packed_sequence": True}}})
+    OmegaConf.set_struct(cfg, True)
+    MegatronGPTSFTModel._setup_packed_sequence_attention(cfg)
+    assert cfg.get_attention_mask_from_fusion is False
+    assert cfg.masked_softmax_fusion is False
+
+    # configs without packed sequences are unchanged
+    cfg = OmegaConf.create({"data": {"train_ds": {"packed_sequence": False}}, "mcore_gpt": True})
+    MegatronGPTSFTModel._setup_packed_sequence_attention(cfg)
+    assert "get_attention_mask_from_fusion" not in cfg
+
+    for unsupported in ["mcore_gpt", "transformer_engine", "use_flash_attention"]:
+        cfg = OmegaConf.create({"data": {"train_ds": {"packed_sequence": True}}, unsupported: True})
+        with pytest.raises(ValueError, match="packed_sequence is not supported"):
+            MegatronGPTSFTModel._setup_packed_sequence_attention(cfg)
+
+
+@pytest.mark.unit
+def test_packed_sequence_attention_mask_reaches_forward(sft_jsonl_file, tmp_path, monkeypatch):
+    packed_dataset = GPTSFTPackedDataset(
+        sft_jsonl_file, CharTokenizer(), packed_dir=str(tmp_path / "packed"), **_dataset_kwargs(48)
+    )
+    batch = packed_dataset.collate_fn([packed_dataset[i] for i in range(4)])
+    # non-tensor entries are dropped by MegatronGPTSFTModel.fwd_bwd_step
+    batch = {k: v for k, v in batch.items() if isinstance(v, torch.Tensor)}
+
+    cfg = OmegaConf.create({"data": {"train_ds": {"packed_sequence": True}}})
+    MegatronGPTSFTModel._setup_packed_sequence_attention(cfg)
+
+    # run the forward step of the model on CPU without model parallelism
+    parallel_state = SimpleNamespace(get_pipeline_model_parallel_world_size=lambda: 1)
+    monkeypatch.setattr(megatron_gpt_model, "parallel_state", parallel_state, raising=False)
+    monkeypatch.setattr(torch.Tensor, "cuda", lambda tensor, non_blocking=False: tensor)
+    model = SimpleNamespace(
+        cfg=cfg,
+        get_attention_mask_from_fusion=cfg.get_attention_mask_from_fusion,
+        mcore_gpt=False,
+        use_loss_mask=False,
+    )
+    forward_kwargs = {}
+
+    def forward(**kwargs):
+        forward_kwargs.update(kwargs)
+        return torch.zeros(1)
+
+    fwd_output_and_loss_func = MegatronGPTModel.get_forward_output_and_loss_func(model)
+    fwd_output_and_loss_func(iter([batch]), forward)
+
+    assert torch.equal(forward_kwargs["attention_mask"], batch["attention_mask"])
+    assert torch.equal(forward_kwargs["position_ids"], batch["position_ids"])
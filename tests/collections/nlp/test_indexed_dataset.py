@@ -0,0 +1,98 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mmap
+
+import numpy as np
+import pytest
+import torch
+
+from nemo.collections.nlp.data.language_modeling.megatron import indexed_dataset
+
+
+def _build(prefix, impl, documents):
+    builder = indexed_dataset.make_builder(indexed_dataset.data_file_path(prefix), impl=impl, vocab_size=100)
+    for document in documents:
+        for sentence in document:
+            builder.add_item(torch.IntTensor(sentence))
+        builder.end_document()
+    builder.finalize(indexed_dataset.index_file_path(prefix))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("impl", ["mmap", "lazy"])
+def test_merge_file(tmp_path, impl):
+    """Merging shards gives the same dataset as writing all documents with a single builder."""
+    rng = np.random.RandomState(0)
+    documents = [
+        [rng.randint(0, 100, size=rng.randint(1, 10)).tolist() for _ in range(rng.randint(1, 4))] for _ in range(20)
+    ]
+    _build(str(tmp_path / "full"), impl, documents)
+    for shard_idx, shard in enumerate([documents[:7], documents[7:8], documents[8:]]):
+        _build(str(tmp_path / f"shard_{shard_idx}"), impl, shard)
+
+    builder = indexed_dataset.make_builder(str(tmp_path / "merged.bin"), impl=impl, vocab_size=100)
+    for shard_idx in range(3):
+        builder.merge_file_(str(tmp_path / f"shard_{shard_idx}"))
+    builder.finalize(str(tmp_path / "merged.idx"))
+
+    for suffix in [".bin", ".idx"]:
+        with open(str(tmp_path / f"full{suffix}"), "rb") as full, open(str(tmp_path / f"merged{suffix}"), "rb") as f:
+            assert full.read() == f.read()
+
+    merged = indexed_dataset.make_dataset(str(tmp_path / "merged"), impl, skip_warmup=True)
+    assert len(merged.doc_idx) == len(documents) + 1
+    assert [merged[i].tolist() for i in range(len(merged))] == [s for document in documents for s in document]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("delay_data_mmap", [False, True])
+@pytest.mark.parametrize("background", [False, True])
+def test_mmap_prefetch_items(tmp_path, delay_data_mmap, background):
+    rng = np.random.RandomState(0)
+    documents = [[rng.randint(0, 100, size=rng.randint(1, 5000)).tolist()] for _ in range(20)]
+    prefix = str(tmp_path / "data")
+    _build(prefix, "mmap", documents)
+
+    dataset = indexed_dataset.MMapIndexedDataset(prefix, skip_warmup=True, delay_data_mmap=delay_data_mmap)
+    dataset.prefetch_items([3, 1, 2], offsets=[10, 0, 0], lengths=[5, 100, 50], background=background)
+    dataset.prefetch_items([])
+    if background:
+        dataset._prefetch_executor.shutdown(wait=True)
+    stats = dataset.get_io_stats()
+    assert stats['prefetch_calls'] == 1
+    assert stats['prefetch_bytes'] > 0 and stats['prefetch_bytes'] % mmap.PAGESIZE == 0
+    assert stats['background_read_bytes'] == (stats['prefetch_bytes'] if background else 0)
+
+    if delay_data_mmap:
+        dataset.create_data_mmap()
+    assert dataset.get(3, offset=10, length=5).tolist() == documents[3][0][10:15]
+    assert [item.tolist() for item in dataset[1:3]] == [documents[1][0], documents[2][0]]
+    stats = dataset.get_io_stats()
+    assert stats['read_items'] == 3
+    itemsize = np.dtype(dataset._index.dtype).itemsize
+    assert stats['read_bytes'] == itemsize * (5 + len(documents[1][0]) + len(documents[2][0]))
+    dataset.reset_io_stats()
+    assert not any(dataset.get_io_stats().values())
+
+
+@pytest.mark.unit
+def test_merge_byte_ranges():
+    page = mmap.PAGESIZE
+    starts, lengths = indexed_dataset._merge_byte_ranges(
+        [2 * page + 10, 0, 100, 4 * page + 1], [2 * page + 20, 10, page + 100, 4 * page + 2]
+    )
+    # pages 0 to 2 are merged since they are adjacent, page 3 is not read
+    assert starts.tolist() == [0, 4 * page]
+    assert lengths.tolist() == [3 * page, page]
@@ -13,6 +13,8 @@
 # limitations under the License.
 
 
+import argparse
+import glob
 import os
 
 import numpy as np
@@ -20,7 +22,13 @@ import pytest
 import torch
 from numpy.testing import assert_array_equal
 from omegaconf import OmegaConf
-from scripts.nlp_language_modeling.build_knn_map_index import build_map, dedup
+from scripts.nlp_language_modeling.build_knn_map_index import (
+    build_map,
+    dedup,
+    get_pending_ranges,
+    get_progress_file,
+    prepare_resumable_output,
+)
 
 from nemo.collections.nlp.data.language_modeling.megatron.indexed_retrieval_dataset import (
     KNNIndex,
@@ -440,6 +448,82 @@ class TestRetrievalIndexFiles:
                 os.remove(index_files[i])
             os.remove(merged_file)
 
+    @pytest.mark.unit
+    def test_knn_index_allocate(self, tmp_path):
+        index_file = str(tmp_path / 'knn.idx')
+        K = 8
+        KNNIndex.allocate(index_file, K, 300, offset=100)
+        assert KNNIndex._read_header(index_file) == (K, 300, 100)
+        assert os.path.getsize(index_file) == KNNIndex._HDR_SIZE + 300 * K * 8
+
+        # blocks are written in place by separate writers, as done by the shards of build_knn_map_index.py
+        blocks = {0: np.random.randint(0, 100, (100, K)), 2: np.random.randint(0, 100, (100, K))}
+        for block, block_map in blocks.items():
+            knn_map, chunk_start_id = KNNIndex.open_map(index_file)
+            assert knn_map.shape == (300, K)
+            assert chunk_start_id == 100
+            knn_map[block * 100 : (block + 1) * 100] = block_map
+            knn_map.flush()
+            del knn_map
+
+        f = KNNIndex(index_file)
+        assert f.K == K
+        assert f.len == 300
+        assert f.chunk_start_id == 100
+        assert f.chunk_end_id == 400
+        assert np.array_equal(f.knn_map[:100], blocks[0])
+        assert np.array_equal(f.knn_map[100:200], np.zeros((100, K), dtype=np.int64))
+        assert np.array_equal(f.knn_map[200:], blocks[2])
+        assert np.array_equal(f.get_KNN_chunk_ids(105), blocks[0][5])
+        assert np.array_equal(f.get_KNN_chunk_ids(399), blocks[2][99])
+        with pytest.raises(ValueError):
+            f.get_KNN_chunk_ids(400)
+        del f
+
+    @pytest.mark.unit
+    def test_knn_map_resume(self, tmp_path):
+        output_file = str(tmp_path / 'knn.idx')
+        K = 4
+        total_chunks = 1000
+        block_size = 100
+        manifest = {'K': K, 'total_chunks': total_chunks, 'knn_block_size': block_size}
+        args = argparse.Namespace(output_file=output_file, shard_id=0)
+        prepare_resumable_output(args, total_chunks, manifest)
+        assert KNNIndex._read_header(output_file) == (K, total_chunks, 0)
+
+        ranges, shard_range = get_pending_ranges(output_file, total_chunks, block_size, 2, 1)
+        assert ranges == [(b, b + block_size) for b in range(500, 1000, block_size)]
+        assert shard_range == (500, 1000)
+
+        # shard 1 finished blocks 5 and 7, and was preempted while recording block 8
+        knn_map, _ = KNNIndex.open_map(output_file)
+        finished = np.random.randint(0, 100, (block_size, K))
+        knn_map[500:600] = finished
+        knn_map.flush()
+        del knn_map
+        with open(get_progress_file(output_file, 1), 'w') as f:
+            f.write('5\n7\n8')
+        with open(get_progress_file(output_file, 0), 'w') as f:
+            f.write('0\n1\n')
+
+        # a restart with the same settings keeps the output and only returns the unfinished blocks
+        prepare_resumable_output(args, total_chunks, manifest)
+        ranges, shard_range = get_pending_ranges(output_file, total_chunks, block_size, 2, 1)
+        assert ranges == [(600, 700), (800, 900), (900, 1000)]
+        assert shard_range == (500, 1000)
+        ranges, shard_range = get_pending_ranges(output_file, total_chunks, block_size, 2, 0)
+        assert ranges == [(b, b + block_size) for b in range(200, 500, block_size)]
+        assert shard_range == (0, 500)
+        f = KNNIndex(output_file)
+        assert np.array_equal(f.knn_map[500:600], finished)
+        del f
+
+        # shards without blocks have nothing to do
+        assert get_pending_ranges(output_file, total_chunks, block_size, 20, 15) == ([], (0, 0))
+
+        with pytest.raises(ValueError):
+            prepare_resumable_output(args, total_chunks, dict(manifest, K=K + 1))
+
     @pytest.mark.unit
     @pytest.mark.skipif(not HAVE_MEGATRON_CORE, reason="megatron-core is not installed")
     def test_retro_dataset(self):
@@ -483,9 +567,8 @@ class TestRetrievalIndexFiles:
         _filename += '_{}ns'.format(num_samples)
         _filename += '_{}sl'.format(seq_len)
         _filename += '_{}s'.format(seed)
-        doc_idx_filename = _filename + '_doc_idx.npy'
-        sample_idx_filename = _filename + '_sample_idx.npy'
-        shuffle_idx_filename = _filename + '_shuffle_idx.npy'
+        # index mapping files end with a digest of the data and settings
+        index_mapping_files = _filename + '_*_idx.npy'
 
         try:
             builder = MMapRetrievalIndexedDatasetBuilder(data_bin_file, chunk_size, pad_id, False)
@@ -537,9 +620,8 @@ class TestRetrievalIndexFiles:
             os.remove(db_bin_file)
             os.remove(db_index_file)
             os.remove(map_index_file)
-            os.remove(doc_idx_filename)
-            os.remove(sample_idx_filename)
-            os.remove(shuffle_idx_filename)
+            for index_mapping_file in glob.glob(index_mapping_files):
+                os.remove(index_mapping_file)
 
         # test the case that
         # training data and retrieval data are the same
@@ -590,9 +672,8 @@ class TestRetrievalIndexFiles:
             os.remove(db_bin_file)
             os.remove(db_index_file)
             os.remove(map_index_file)
-            os.remove(doc_idx_filename)
-            os.remove(sample_idx_filename)
-            os.remove(shuffle_idx_filename)
+            for index_mapping_file in glob.glob(index_mapping_files):
+                os.remove(index_mapping_file)
 
     @pytest.mark.unit
     @pytest.mark.skipif(not HAVE_MEGATRON_CORE, reason="megatron-core is not installed")
@@ -637,9 +718,8 @@ class TestRetrievalIndexFiles:
         _filename += '_{}ns'.format(num_samples)
         _filename += '_{}sl'.format(seq_len)
         _filename += '_{}s'.format(seed)
-        doc_idx_filename = _filename + '_doc_idx.npy'
-        sample_idx_filename = _filename + '_sample_idx.npy'
-        shuffle_idx_filename = _filename + '_shuffle_idx.npy'
+        # index mapping files end with a digest of the data and settings
+        index_mapping_files = _filename + '_*_idx.npy'
 
         try:
             builder = MMapRetrievalIndexedDatasetBuilder(data_bin_file, chunk_size, pad_id, False, stride=32)
@@ -691,9 +771,8 @@ class TestRetrievalIndexFiles:
             os.remove(db_bin_file)
             os.remove(db_index_file)
             os.remove(map_index_file)
-            os.remove(doc_idx_filename)
-            os.remove(sample_idx_filename)
-            os.remove(shuffle_idx_filename)
+            for index_mapping_file in glob.glob(index_mapping_files):
+                os.remove(index_mapping_file)
 
         # test the case that
         # training data and retrieval data are the same
@@ -744,9 +823,8 @@ class TestRetrievalIndexFiles:
             os.remove(db_bin_file)
             os.remove(db_index_file)
             os.remove(map_index_file)
-            os.remove(doc_idx_filename)
-            os.remove(sample_idx_filename)
-            os.remove(shuffle_idx_filename)
+            for index_mapping_file in glob.glob(index_mapping_files):
+                os.remove(index_mapping_file)
 
     @pytest.mark.unit
     @pytest.mark.skipif(not HAVE_MEGATRON_CORE, reason="megatron-core is not installed")
@@ -16,6 +16,7 @@ import csv
 import json
 import os
 
+import numpy as np
 import pytest
 
 from nemo.collections.nlp.data.language_modeling import text_memmap_dataset
@@ -131,3 +132,38 @@ def test_mem_map_dataset_index_mapping_dir(
         text_memmap_dataset.JSONLMemMapDataset(dataset_paths=[jsonl_file], header_lines=0)
         assert os.path.isfile(f"{jsonl_file}.idx.npy")
         assert os.path.isfile(f"{jsonl_file}.idx.info")
+
+
+@pytest.mark.parametrize("ending", ["", "\n", "\n\n\n"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_build_index_files_chunked(tmp_path, ending, chunk_size):
+    """Test that chunked index building matches a single pass over the file."""
+    file_path = str(tmp_path / "data.txt")
+    with open(file_path, mode="w") as file:
+        file.write("\n".join(["a" * i for i in range(1, 20)]) + ending)
+
+    text_memmap_dataset.build_index_files([file_path], newline_int=10, workers=2, chunk_size=chunk_size)
+    midx = np.load(f"{file_path}.idx.npy")
+    expected_midx = text_memmap_dataset._build_index_from_memdata(file_path, newline_int=10)
+    assert np.array_equal(midx, expected_midx)
+
+    indexed_dataset = text_memmap_dataset.TextMemMapDataset(dataset_paths=[file_path], workers=2)
+    assert [indexed_dataset[i] for i in range(len(indexed_dataset))] == ["a" * i for i in range(1, 20)]
+
+
+def _count_words(text):
+    return len(text.split())
+
+
+def test_build_index_files_token_counts(jsonl_file, csv_file):
+    """Test that token counts are added to existing index files."""
+    text_memmap_dataset.CSVMemMapDataset(dataset_paths=[csv_file], header_lines=1)
+    assert not os.path.isfile(f"{csv_file}.idx.tokens.npy")
+
+    text_memmap_dataset.build_index_files([jsonl_file, csv_file], newline_int=10, token_count_fn=_count_words)
+    assert os.path.isfile(f"{csv_file}.idx.tokens.npy")
+
+    indexed_dataset = text_memmap_dataset.CSVMemMapDataset(dataset_paths=[csv_file], header_lines=1)
+    assert indexed_dataset.load_token_counts().tolist() == [1, 1, 1]
+    indexed_dataset = text_memmap_dataset.JSONLMemMapDataset(dataset_paths=[jsonl_file])
+    assert indexed_dataset.load_token_counts().tolist() == [4, 4, 4]
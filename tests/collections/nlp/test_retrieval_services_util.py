@@ -0,0 +1,184 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from nemo.collections.nlp.modules.common.megatron.retrieval_services.util import (
+    LRUCache,
+    MicroBatcher,
+    normalize_query,
+)
+
+
+class RecordingBatchFn:
+    """ Batch function which records its calls and can block until released """
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, items):
+        self.calls.append(list(items))
+        self.started.set()
+        self.release.wait()
+        return [item * 10 for item in items]
+
+
+def _call_async(batcher, items):
+    results = {}
+
+    def run():
+        results['output'] = batcher(items)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, results
+
+
+@pytest.mark.unit
+def test_normalize_query():
+    assert normalize_query("  the quick\tbrown\n\nfox ") == "the quick brown fox"
+    assert normalize_query("the quick brown fox") == "the quick brown fox"
+    assert normalize_query("") == ""
+
+
+@pytest.mark.unit
+def test_lru_cache_eviction_order():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    # reading 'a' makes 'b' the least recently used entry
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+    # overwriting an entry also marks it as recently used
+    cache.put('a', 4)
+    cache.put('d', 5)
+    assert cache.get('c') is None
+    assert cache.get('a') == 4
+    assert cache.get('missing', default=-1) == -1
+
+
+@pytest.mark.unit
+def test_lru_cache_disabled_and_clear():
+    cache = LRUCache(max_size=0)
+    cache.put('a', 1)
+    assert len(cache) == 0
+    assert cache.get('a') is None
+
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    generation = cache.generation
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.generation == generation + 1
+
+
+@pytest.mark.unit
+def test_micro_batcher_flushes_full_batch():
+    batch_fn = RecordingBatchFn()
+    # the batch is started as soon as it is full, long before max_wait_time
+    batcher = MicroBatcher(batch_fn, max_batch_size=3, max_wait_time=60.0)
+    start = time.monotonic()
+    assert batcher([1, 2, 3]) == [10, 20, 30]
+    assert time.monotonic() - start < 30.0
+    assert batch_fn.calls == [[1, 2, 3]]
+    assert batcher([]) == []
+
+
+@pytest.mark.unit
+def test_micro_batcher_flushes_on_timeout():
+    batch_fn = RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=10, max_wait_time=0.5)
+    first, first_results = _call_async(batcher, [1])
+    time.sleep(0.1)
+    second, second_results = _call_async(batcher, [2, 3])
+
+    first.join(10.0)
+    second.join(10.0)
+    # both calls arrived before the batch timed out
+    assert batch_fn.calls == [[1, 2, 3]]
+    assert first_results['output'] == [10]
+    assert second_results['output'] == [20, 30]
+
+
+@pytest.mark.unit
+def test_micro_batcher_routes_results_to_callers():
+    batch_fn = RecordingBatchFn()
+    batcher = MicroBatcher(batch_fn, max_batch_size=4)
+    batch_fn.release.clear()
+    first, first_results = _call_async(batcher, [0])
+    batch_fn.started.wait(10.0)
+
+    # these calls queue up while the first batch is running
+    threads = [_call_async(batcher, items) for items in [[1, 2], [3], [4, 5], [6]]]
+    deadline = time.monotonic() + 10.0
+    while len(batcher._queue) < len(threads):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    batch_fn.release.set()
+
+    first.join(10.0)
+    for thread, _ in threads:
+        thread.join(10.0)
+    assert first_results['output'] == [0]
+    assert [results['output'] for _, results in threads] == [[10, 20], [30], [40, 50], [60]]
+    # the queued calls are merged in order, up to max_batch_size items per batch
+    assert batch_fn.calls[0] == [0]
+    assert sorted(item for call in batch_fn.calls[1:] for item in call) == [1, 2, 3, 4, 5, 6]
+    assert all(len(call) <= 4 for call in batch_fn.calls)
+
+
+@pytest.mark.unit
+def test_micro_batcher_propagates_errors():
+    def failing_batch_fn(items):
+        raise RuntimeError("batch failed")
+
+    batcher = MicroBatcher(failing_batch_fn)
+    with pytest.raises(RuntimeError, match="batch failed"):
+        batcher([1, 2])
+
+
+@pytest.mark.unit
+def test_sentence_bert_resource_encodes_original_text():
+    pytest.importorskip("sentence_transformers")
+    from nemo.collections.nlp.modules.common.megatron.retrieval_services.bert_service import SentenceBertResource
+
+    class FakeBertModel:
+        def get_sentence_embedding_dimension(self):
+            return 1
+
+    encoded = []
+
+    def encoder(sentences):
+        encoded.extend(sentences)
+        return [np.array([float(len(sentence))]) for sentence in sentences]
+
+    resource = SentenceBertResource(FakeBertModel(), None, None, 4, encoder=encoder, cache=LRUCache(max_size=10))
+    emb = resource.get_emb(["a  b", "a b", "c"])
+    # queries with the same normalized text share the embedding of the first one, encoded as written
+    assert encoded == ["a  b", "c"]
+    assert emb.tolist() == [[4.0], [4.0], [1.0]]
+    resource.get_emb(["  a b  "])
+    assert encoded == ["a  b", "c"]
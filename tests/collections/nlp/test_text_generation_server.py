@@ -0,0 +1,215 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import pytest
+
+from nemo.collections.nlp.modules.common import text_generation_server
+from nemo.collections.nlp.modules.common.text_generation_server import (
+    GenerationRequest,
+    GenerationScheduler,
+    MegatronGenerate,
+    generate_batch,
+)
+
+
+def _params(**kwargs):
+    params = dict(
+        tokens_to_generate=8,
+        all_probs=False,
+        temperature=1.0,
+        add_BOS=False,
+        top_k=0,
+        top_p=0.9,
+        greedy=False,
+        repetition_penalty=1.2,
+        end_strings=['<|endoftext|>'],
+        min_tokens_to_generate=0,
+        neighbors=None,
+    )
+    params.update(kwargs)
+    return params
+
+
+class FakeGenerate:
+    """ Stands in for generate, records the prompts of every call and can block or fail on demand """
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(
+        self,
+        model,
+        sentences,
+        tokens_to_generate,
+        all_probs,
+        temperature,
+        add_BOS,
+        top_k,
+        top_p,
+        greedy,
+        repetition_penalty,
+        end_strings,
+        min_tokens_to_generate,
+        **kwargs,
+    ):
+        self.calls.append({'sentences': list(sentences), 'temperature': temperature})
+        self.started.set()
+        self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return {
+            'sentences': [sentence + ' out' for sentence in sentences],
+            'tokens': [[sentence] for sentence in sentences],
+            'logprob': [[0.5] for _ in sentences],
+            'full_logprob': None,
+            'token_ids': [[i] for i in range(len(sentences))],
+            'offsets': [[0] for _ in sentences],
+        }
+
+
+@pytest.fixture
+def fake_generate(monkeypatch):
+    fake = FakeGenerate()
+    monkeypatch.setattr(text_generation_server, 'generate', fake)
+    monkeypatch.setattr(MegatronGenerate, 'send_do_generate', staticmethod(lambda: None))
+    yield fake
+    fake.release.set()
+
+
+def _submit_async(scheduler, generation_request):
+    results = {}
+
+    def run():
+        try:
+            results['output'] = scheduler.submit(generation_request)
+        except Exception as e:
+            results['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, results
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the scheduler"
+        time.sleep(0.01)
+
+
+@pytest.mark.unit
+def test_generate_batch_splits_output(fake_generate):
+    requests = [
+        GenerationRequest(['a', 'b'], _params(temperature=0.5)),
+        GenerationRequest(['c'], _params(temperature=2.0)),
+    ]
+    outputs = generate_batch(None, None, requests)
+
+    assert fake_generate.calls == [{'sentences': ['a', 'b', 'c'], 'temperature': [0.5, 0.5, 2.0]}]
+    assert outputs[0] == {
+        'sentences': ['a out', 'b out'],
+        'tokens': [['a'], ['b']],
+        'logprob': [[0.5], [0.5]],
+        'token_ids': [[0], [1]],
+        'offsets': [[0], [0]],
+    }
+    assert outputs[1] == {
+        'sentences': ['c out'],
+        'tokens': [['c']],
+        'logprob': [[0.5]],
+        'token_ids': [[2]],
+        'offsets': [[0]],
+    }
+
+
+@pytest.mark.unit
+def test_scheduler_merges_requests_with_same_batch_key(fake_generate):
+    scheduler = GenerationScheduler(None)
+    fake_generate.release.clear()
+    first, first_results = _submit_async(scheduler, GenerationRequest(['a'], _params()))
+    fake_generate.started.wait(10.0)
+
+    threads = []
+    for i, generation_request in enumerate(
+        [
+            GenerationRequest(['b'], _params(temperature=0.5)),
+            GenerationRequest(['c'], _params(top_k=3)),
+            GenerationRequest(['d'], _params(tokens_to_generate=16)),
+        ]
+    ):
+        threads.append(_submit_async(scheduler, generation_request))
+        _wait_for(lambda: len(scheduler.queue) == i + 1)
+    fake_generate.release.set()
+
+    for thread, _ in [(first, first_results)] + threads:
+        thread.join(10.0)
+    assert [call['sentences'] for call in fake_generate.calls] == [['a'], ['b', 'c'], ['d']]
+    assert [results['output']['sentences'] for _, results in threads] == [['b out'], ['c out'], ['d out']]
+    assert first_results['output']['sentences'] == ['a out']
+
+
+@pytest.mark.unit
+def test_scheduler_respects_max_batch_size(fake_generate):
+    scheduler = GenerationScheduler(None, max_batch_size=3)
+    fake_generate.release.clear()
+    first, _ = _submit_async(scheduler, GenerationRequest(['a'], _params()))
+    fake_generate.started.wait(10.0)
+
+    threads = []
+    for i, sentences in enumerate([['b', 'c'], ['d', 'e'], ['f']]):
+        threads.append(_submit_async(scheduler, GenerationRequest(sentences, _params())))
+        _wait_for(lambda: len(scheduler.queue) == i + 1)
+    fake_generate.release.set()
+
+    for thread, _ in [(first, None)] + threads:
+        thread.join(10.0)
+    assert [call['sentences'] for call in fake_generate.calls] == [['a'], ['b', 'c', 'f'], ['d', 'e']]
+    assert [results['output']['sentences'] for _, results in threads] == [
+        ['b out', 'c out'],
+        ['d out', 'e out'],
+        ['f out'],
+    ]
+
+
+@pytest.mark.unit
+def test_scheduler_batch_timeout_waits_for_late_requests(fake_generate):
+    scheduler = GenerationScheduler(None, max_batch_size=2, batch_timeout=10.0)
+    first, first_results = _submit_async(scheduler, GenerationRequest(['a'], _params()))
+    time.sleep(0.1)
+    second, second_results = _submit_async(scheduler, GenerationRequest(['b'], _params()))
+
+    first.join(10.0)
+    second.join(10.0)
+    assert [call['sentences'] for call in fake_generate.calls] == [['a', 'b']]
+    assert first_results['output']['sentences'] == ['a out']
+    assert second_results['output']['sentences'] == ['b out']
+
+
+@pytest.mark.unit
+def test_scheduler_propagates_errors_to_batch(fake_generate):
+    fake_generate.error = RuntimeError("generation failed")
+    scheduler = GenerationScheduler(None, max_batch_size=2, batch_timeout=10.0)
+    threads = [_submit_async(scheduler, GenerationRequest([sentence], _params())) for sentence in ['a', 'b']]
+
+    for thread, _ in threads:
+        thread.join(10.0)
+    assert len(fake_generate.calls) == 1
+    assert all(results['error'] is fake_generate.error for _, results in threads)
@@ -0,0 +1,71 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import torch
+import torch.nn.functional as F
+
+from nemo.collections.nlp.modules.common.text_generation_utils import repetition_penalty, top_k_logits
+
+
+def _reference_top_k_logits(logits, top_k, top_p, filter_value=-float('Inf')):
+    """Filtering of a single row, with a full sort for top-p"""
+    logits = logits.clone()
+    if top_k > 0:
+        logits[logits < torch.topk(logits, top_k)[0][-1]] = filter_value
+    if top_p > 0.0:
+        sorted_logits, sorted_indices = torch.sort(logits, descending=True)
+        cumulative_probs = torch.cumsum(F.softmax(sorted_logits, dim=-1), dim=-1)
+        sorted_indices_to_remove = cumulative_probs > top_p
+        sorted_indices_to_remove[1:] = sorted_indices_to_remove[:-1].clone()
+        sorted_indices_to_remove[0] = False
+        logits[sorted_indices[sorted_indices_to_remove]] = filter_value
+    return logits
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("top_k", [0, 1, 5, [0, 3, 7, 1, 50, 0]])
+@pytest.mark.parametrize("top_p", [0.0, 0.5, 0.9, [0.0, 0.3, 1.0, 0.9, 0.6, 0.95]])
+def test_top_k_logits(top_k, top_p):
+    torch.manual_seed(0)
+    logits = torch.randn(6, 50) * 3
+    started = torch.tensor([True, True, False, True, True, True])
+    per_row_top_k = top_k if isinstance(top_k, list) else [top_k] * 6
+    per_row_top_p = top_p if isinstance(top_p, list) else [top_p] * 6
+    top_k = torch.tensor(top_k) if isinstance(top_k, list) else top_k
+    top_p = torch.tensor(top_p) if isinstance(top_p, list) else top_p
+
+    filtered = top_k_logits(logits.clone(), top_k=top_k, top_p=top_p, started=started)
+    for i in range(6):
+        expected = _reference_top_k_logits(logits[i], per_row_top_k[i], per_row_top_p[i])
+        assert torch.equal(filtered[i], expected if started[i] else logits[i])
+
+
+@pytest.mark.unit
+def test_repetition_penalty():
+    torch.manual_seed(0)
+    logits = torch.randn(3, 20)
+    used_tokens = torch.randint(0, 20, (3, 15))
+    token_counts = torch.zeros(3, 20, dtype=torch.int32).scatter_add_(
+        1, used_tokens, torch.ones_like(used_tokens, dtype=torch.int32)
+    )
+    expected = repetition_penalty(logits, 1.2, used_tokens)
+    assert torch.allclose(repetition_penalty(logits, 1.2, token_counts=token_counts), expected)
+    assert torch.equal(repetition_penalty(logits, 1.0, token_counts=token_counts), logits)
+
+    penalties = torch.tensor([1.0, 1.2, 2.0])
+    penalized = repetition_penalty(logits, penalties, token_counts=token_counts)
+    assert torch.allclose(penalized, repetition_penalty(logits, penalties, used_tokens))
+    for i, penalty in enumerate(penalties.tolist()):
+        assert torch.allclose(penalized[i], repetition_penalty(logits, penalty, used_tokens)[i])
@@ -0,0 +1,149 @@
+# Copyright (c) 2023, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+
+from nemo.collections.common.tokenizers.text_to_speech.tts_tokenizers import EnglishCharsTokenizer
+from nemo.collections.tts.data.text_to_speech_dataset import TarredTextToSpeechDataset, TextToSpeechDataset
+from nemo.collections.tts.data.vocoder_dataset import TarredVocoderDataset, VocoderDataset
+from nemo.collections.tts.parts.preprocessing.features import EnergyFeaturizer, MelSpectrogramFeaturizer
+from nemo.collections.tts.parts.utils.tarred_dataset_utils import write_tarred_metadata, write_tarred_shard
+
+
+class TestTarredDatasets:
+    def setup_class(self):
+        self.sample_rate = 8000
+        self.hop_length = 128
+        self.num_entries = 6
+
+    def _create_datasets(self, tmp_path):
+        audio_dir = tmp_path / "audio"
+        feature_dir = tmp_path / "features"
+        audio_dir.mkdir()
+        rng = np.random.RandomState(0)
+        entries = []
+        for i in range(self.num_entries):
+            duration = 0.2 + 0.05 * i
+            audio_filename = f"audio_{i}.wav"
+            audio = rng.uniform(-0.5, 0.5, size=int(duration * self.sample_rate))
+            sf.write(audio_dir / audio_filename, audio, self.sample_rate)
+            entries.append(
+                {"audio_filepath": audio_filename, "text": f"text {i}", "duration": duration, "speaker": f"{i % 2}"}
+            )
+
+        manifest_path = tmp_path / "manifest.json"
+        with open(manifest_path, "w", encoding="utf-8") as manifest_f:
+            for entry in entries:
+                manifest_f.write(json.dumps(entry) + "\n")
+
+        mel_featurizer = MelSpectrogramFeaturizer(
+            sample_rate=self.sample_rate, win_length=512, hop_length=self.hop_length, mel_dim=20, highfreq=4000
+        )
+        energy_featurizer = EnergyFeaturizer(spec_featurizer=mel_featurizer)
+        featurizers = {"mel": mel_featurizer, "energy": energy_featurizer}
+        for entry in entries:
+            for featurizer in featurizers.values():
+                featurizer.save(manifest_entry=entry, audio_dir=audio_dir, feature_dir=feature_dir)
+
+        tar_dir = tmp_path / "tarred"
+        tar_dir.mkdir()
+        shards = [
+            write_tarred_shard(
+                entries=entries[shard_id::2],
+                audio_dir=audio_dir,
+                output_dir=tar_dir,
+                shard_id=shard_id,
+                featurizers=list(featurizers.values()),
+                feature_dir=feature_dir,
+            )
+            for shard_id in range(2)
+        ]
+        write_tarred_metadata(output_dir=tar_dir, shards=shards)
+
+        speaker_path = tmp_path / "speakers.json"
+        with open(speaker_path, "w", encoding="utf-8") as speaker_f:
+            json.dump({"0": 0, "1": 1}, speaker_f)
+
+        dataset_meta = {
+            "dataset": {"manifest_path": manifest_path, "audio_dir": audio_dir, "feature_dir": feature_dir}
+        }
+        tarred_dataset_meta = {"dataset": {"metadata_path": str(tar_dir / "metadata.json")}}
+        return dataset_meta, tarred_dataset_meta, featurizers, speaker_path
+
+    @staticmethod
+    def _assert_batches_equal(batch, expected_batch):
+        assert batch.keys() == expected_batch.keys()
+        for key, value in expected_batch.items():
+            if isinstance(value, torch.Tensor):
+                torch.testing.assert_close(batch[key], value)
+            else:
+                assert batch[key] == value
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_tarred_text_to_speech_dataset(self, tmp_path):
+        dataset_meta, tarred_dataset_meta, featurizers, speaker_path = self._create_datasets(tmp_path)
+        dataset_args = dict(
+            sample_rate=self.sample_rate,
+            text_tokenizer=EnglishCharsTokenizer(),
+            speaker_path=speaker_path,
+            featurizers=featurizers,
+            align_prior_hop_length=self.hop_length,
+        )
+        dataset = TextToSpeechDataset(dataset_meta=dataset_meta, **dataset_args)
+        tarred_dataset = TarredTextToSpeechDataset(dataset_meta=tarred_dataset_meta, shuffle_n=4, **dataset_args)
+
+        examples = sorted(tarred_dataset, key=lambda example: str(example["audio_filepath"]))
+        assert len(tarred_dataset) == len(examples) == self.num_entries
+
+        batch = tarred_dataset.collate_fn(examples)
+        expected_batch = dataset.collate_fn([dataset[i] for i in range(len(dataset))])
+        self._assert_batches_equal(batch, expected_batch)
+        assert {"mel_spec", "energy", "speaker_id", "align_prior_matrix"} <= batch.keys()
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_tarred_vocoder_dataset(self, tmp_path):
+        dataset_meta, tarred_dataset_meta, _, _ = self._create_datasets(tmp_path)
+        del dataset_meta["dataset"]["feature_dir"]
+        dataset = VocoderDataset(dataset_meta=dataset_meta, sample_rate=self.sample_rate, trunc_duration=0.3)
+        tarred_dataset = TarredVocoderDataset(
+            dataset_meta=tarred_dataset_meta, sample_rate=self.sample_rate, trunc_duration=0.3, shuffle_n=4
+        )
+
+        examples = sorted(tarred_dataset, key=lambda example: str(example["audio_filepath"]))
+        assert len(tarred_dataset) == len(examples) == self.num_entries
+
+        batch = tarred_dataset.collate_fn(examples)
+        expected_batch = dataset.collate_fn([dataset[i] for i in range(len(dataset))])
+        self._assert_batches_equal(batch, expected_batch)
+
+        tarred_dataset = TarredVocoderDataset(
+            dataset_meta=tarred_dataset_meta, sample_rate=self.sample_rate, n_samples=1024
+        )
+        batch = tarred_dataset.collate_fn(list(tarred_dataset))
+        assert batch["audio"].shape == (self.num_entries, 1024)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_tarred_dataset_rejects_zero_weights(self, tmp_path):
+        _, tarred_dataset_meta, _, _ = self._create_datasets(tmp_path)
+        tarred_dataset_meta["dataset"]["sample_weight"] = 0.0
+        with pytest.raises(ValueError):
+            TarredVocoderDataset(dataset_meta=tarred_dataset_meta, sample_rate=self.sample_rate)
@@ -406,3 +406,51 @@ class TestIpaG2p:
 
         phonemes = g2p(input_text)
         assert phonemes == expected_output
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_compiled_phoneme_dict(self, tmp_path):
+        compiled_path = str(tmp_path / "test_dict_en.npz")
+        IpaG2p.compile_phoneme_dict(self.PHONEME_DICT_PATH_EN, compiled_path)
+
+        g2p_file = self._create_g2p()
+        g2p_compiled = self._create_g2p(phoneme_dict=compiled_path)
+        assert g2p_compiled.phoneme_dict == g2p_file.phoneme_dict
+        assert g2p_compiled.symbols == g2p_file.symbols
+
+        input_text = "Hello world, NVIDIA's lead."
+        assert g2p_compiled(input_text) == g2p_file(input_text)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_forward_call_with_word_cache(self):
+        input_text = "Hello world, hello NVIDIA's airports! Hello Kitty."
+        g2p_uncached = IpaG2p(self.PHONEME_DICT_PATH_EN, locale="en-US", word_cache_size=0)
+        g2p = IpaG2p(self.PHONEME_DICT_PATH_EN, locale="en-US", word_cache_size=3)
+
+        expected_output = g2p_uncached(input_text)
+        assert g2p(input_text) == expected_output
+        assert g2p(input_text) == expected_output
+        assert len(g2p._word_cache) == 3
+
+        # phoneme_probability is applied to cached words as well
+        g2p_uncached.phoneme_probability = g2p.phoneme_probability = 0.5
+        g2p_uncached._rng.seed(1234)
+        g2p._rng.seed(1234)
+        for _ in range(5):
+            assert g2p(input_text) == g2p_uncached(input_text)
+
+        # replacing the dictionary invalidates cached words
+        g2p.phoneme_probability = None
+        g2p.replace_dict({"HELLO": [list("hɛˈloʊ")]})
+        assert g2p("Hello") == list("hɛˈloʊ")
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_forward_call_batch(self):
+        input_texts = ["Hello world.", "Hello Kitty!", ""]
+        g2p = self._create_g2p()
+
+        phonemes = g2p(input_texts)
+        assert phonemes == [g2p(input_text) for input_text in input_texts]
+        assert phonemes[0] == [char for char in "həˈɫoʊ ˈwɝɫd."]
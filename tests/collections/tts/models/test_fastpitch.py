@@ -61,3 +61,23 @@ def test_inference(pretrained_model, language_specific_text_example):
     _ = model.generate_spectrogram(
         tokens=parsed_text, speaker=speaker_id, reference_spec=reference_spec, reference_spec_lens=reference_spec_lens
     )
+
+
+@pytest.mark.nightly
+@pytest.mark.run_only_on('GPU')
+def test_batched_inference(pretrained_model, language_specific_text_example):
+    model, language_id = pretrained_model
+    if getattr(model.fastpitch, 'speaker_encoder', None) is not None:
+        pytest.skip("Models with a speaker encoder are covered by test_inference")
+    speaker_id = 0 if getattr(model.fastpitch, 'speaker_emb', None) is not None else None
+
+    text = language_specific_text_example[language_id]
+    texts = [text, text[: len(text) // 2], text]
+    tokens = model.parse_batch(texts)
+    spects = model.generate_spectrograms(tokens, max_batch_size=2, speaker=speaker_id)
+
+    assert len(spects) == len(texts)
+    # the longest texts are not padded in their batch, so they have the same spectrogram as when generated alone
+    expected = model.generate_spectrogram(tokens=model.parse(text), speaker=speaker_id).squeeze(0)
+    for i in [0, 2]:
+        torch.testing.assert_close(spects[i], expected, atol=1e-3, rtol=1e-3)
@@ -18,6 +18,7 @@ audios. In general, each test for a single model is ~3.5 seconds on an NVIDIA RT
 """
 
 import pytest
+import torch
 
 from nemo.collections.tts.models import HifiGanModel
 
@@ -38,3 +39,15 @@ def pretrained_model(request, get_language_id_from_pretrained_model_name):
 def test_inference(pretrained_model, mel_spec_example):
     model, _ = pretrained_model
     _ = model.convert_spectrogram_to_audio(spec=mel_spec_example)
+
+
+@pytest.mark.nightly
+@pytest.mark.run_only_on('GPU')
+def test_batched_inference(pretrained_model, mel_spec_example):
+    model, _ = pretrained_model
+    specs = [mel_spec_example[0], mel_spec_example[0, :, : mel_spec_example.shape[-1] // 2]]
+    audio = model.convert_spectrograms_to_audio(specs, max_batch_size=2)
+
+    expected = model.convert_spectrogram_to_audio(spec=mel_spec_example)[0]
+    torch.testing.assert_close(audio[0], expected, atol=1e-4, rtol=1e-4)
+    assert audio[1].shape[-1] * 2 == expected.shape[-1]
@@ -12,10 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import librosa
 import numpy as np
 import pytest
 
 from nemo.collections.tts.parts.preprocessing.audio_trimming import (
+    EnergyAudioTrimmer,
+    get_frame_power,
     get_start_and_end_of_speech_frames,
     pad_sample_indices,
 )
@@ -49,6 +52,51 @@ class TestAudioTrimming:
         assert start_frame == 0
         assert end_frame == 0
 
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_get_start_and_end_of_speech_frames_boundaries(self):
+        is_speech = np.array([True, True, False, True, True])
+
+        start_frame, end_frame = get_start_and_end_of_speech_frames(is_speech=is_speech, speech_frame_threshold=2)
+
+        assert start_frame == 0
+        assert end_frame == 5
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_get_start_and_end_of_speech_frames_invalid_threshold(self):
+        is_speech = np.array([True, True, False, True, True])
+
+        with pytest.raises(ValueError):
+            get_start_and_end_of_speech_frames(is_speech=is_speech, speech_frame_threshold=0)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_get_frame_power(self):
+        audio = np.random.uniform(low=-0.5, high=0.5, size=[10000]).astype(np.float32)
+
+        frame_power = get_frame_power(audio=audio, frame_length=1024, hop_length=256)
+
+        expected_power = librosa.feature.rms(y=audio, frame_length=1024, hop_length=256)[0] ** 2
+        np.testing.assert_allclose(frame_power, expected_power, rtol=1e-5)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_energy_audio_trimmer(self):
+        sample_rate = 8000
+        audio = np.zeros([4 * sample_rate], dtype=np.float32)
+        audio[sample_rate : 3 * sample_rate] = np.random.uniform(low=-0.5, high=0.5, size=[2 * sample_rate])
+        audio_trimmer = EnergyAudioTrimmer(
+            db_threshold=50, speech_frame_threshold=2, trim_win_length=512, trim_hop_length=128, pad_seconds=0.0
+        )
+
+        trimmed_audio, start_sample, end_sample = audio_trimmer.trim_audio(audio=audio, sample_rate=sample_rate)
+
+        # Centered frames overlapping with the speech are detected as speech
+        assert sample_rate - 256 <= start_sample < sample_rate
+        assert 3 * sample_rate < end_sample <= 3 * sample_rate + 256 + 128
+        assert trimmed_audio.shape[0] == end_sample - start_sample
+
     @pytest.mark.run_only_on('CPU')
     @pytest.mark.unit
     def test_pad_sample_indices(self):
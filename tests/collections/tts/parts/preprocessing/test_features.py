@@ -25,7 +25,10 @@ import torch
 from nemo.collections.tts.parts.preprocessing.features import (
     EnergyFeaturizer,
     MelSpectrogramFeaturizer,
+    PackedFeatureWriter,
     PitchFeaturizer,
+    compute_all_features,
+    finalize_packed_features,
 )
 
 
@@ -89,8 +92,11 @@ class TestTTSFeatures:
 
     @pytest.mark.run_only_on('CPU')
     @pytest.mark.unit
-    def test_compute_pitch(self):
-        pitch_featurizer = PitchFeaturizer(hop_length=self.hop_len, sample_rate=self.sample_rate)
+    @pytest.mark.parametrize("pitch_estimator", ["pyin", "yin"])
+    def test_compute_pitch(self, pitch_estimator):
+        pitch_featurizer = PitchFeaturizer(
+            hop_length=self.hop_len, sample_rate=self.sample_rate, pitch_estimator=pitch_estimator
+        )
 
         with self._create_test_dir() as test_dir:
             pitch, voiced, voiced_prob = pitch_featurizer.compute_pitch(
@@ -181,3 +187,69 @@ class TestTTSFeatures:
         assert len(energy.shape) == 1
         assert energy.shape[0] == self.spec_len
         assert energy.dtype == torch.float32
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_compute_all_features(self):
+        mel_featurizer = MelSpectrogramFeaturizer(
+            mel_dim=self.spec_dim, hop_length=self.hop_len, sample_rate=self.sample_rate
+        )
+        energy_featurizer = EnergyFeaturizer(spec_featurizer=mel_featurizer)
+        pitch_featurizer = PitchFeaturizer(hop_length=self.hop_len, sample_rate=self.sample_rate)
+        featurizers = [mel_featurizer, energy_featurizer, pitch_featurizer]
+
+        with self._create_test_dir() as test_dir:
+            feature_dict = compute_all_features(
+                featurizers=featurizers, manifest_entry=self.manifest_entry, audio_dir=test_dir
+            )
+            energy = energy_featurizer.compute_energy(manifest_entry=self.manifest_entry, audio_dir=test_dir)
+            pitch, _, _ = pitch_featurizer.compute_pitch(manifest_entry=self.manifest_entry, audio_dir=test_dir)
+
+        assert set(feature_dict.keys()) == {"mel_spec", "energy", "pitch", "voiced_mask"}
+        torch.testing.assert_close(feature_dict["energy"], energy)
+        torch.testing.assert_close(feature_dict["pitch"], pitch)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_collate_mel_spectrogram(self):
+        mel_featurizer = MelSpectrogramFeaturizer(
+            mel_dim=self.spec_dim, hop_length=self.hop_len, sample_rate=self.sample_rate
+        )
+        # spectrograms with more frames than mel bins
+        train_batch = [{"mel_spec": torch.rand([self.spec_dim, spec_len])} for spec_len in [120, 90]]
+
+        feature_dict = mel_featurizer.collate_fn(train_batch)
+
+        mel_spec = feature_dict["mel_spec"]
+        assert mel_spec.shape == (2, self.spec_dim, 120)
+        assert torch.equal(mel_spec[0], train_batch[0]["mel_spec"])
+        assert torch.equal(mel_spec[1, :, :90], train_batch[1]["mel_spec"])
+        assert not mel_spec[1, :, 90:].any()
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_save_and_load_packed_features(self):
+        pitch_featurizer = PitchFeaturizer(hop_length=self.hop_len, sample_rate=self.sample_rate)
+        manifest_entries = [{"audio_filepath": f"speaker{i}/{self.audio_filename}"} for i in range(3)]
+        feature_dicts = [
+            {"pitch": torch.rand([self.spec_len]), "voiced_mask": torch.rand([self.spec_len]) > 0.5}
+            for _ in manifest_entries
+        ]
+
+        with self._create_test_dir() as test_dir:
+            feature_dir = test_dir / "feature"
+            for shard_id, shard_entries in enumerate([[0, 1], [], [2]]):
+                writer = PackedFeatureWriter(feature_dir=feature_dir, shard_id=shard_id)
+                for i in shard_entries:
+                    writer.add(manifest_entry=manifest_entries[i], audio_dir=test_dir, feature_dict=feature_dicts[i])
+                writer.close()
+            finalize_packed_features(feature_dir=feature_dir, feature_names=["pitch", "voiced_mask"], num_shards=3)
+
+            assert not list(feature_dir.glob("*/*.pt"))
+            for manifest_entry, expected_dict in zip(manifest_entries, feature_dicts):
+                pitch_dict = pitch_featurizer.load(
+                    manifest_entry=manifest_entry, audio_dir=test_dir, feature_dir=feature_dir
+                )
+                assert set(pitch_dict.keys()) == {"pitch", "voiced_mask"}
+                assert torch.equal(pitch_dict["pitch"], expected_dict["pitch"])
+                assert torch.equal(pitch_dict["voiced_mask"], expected_dict["voiced_mask"])
@@ -0,0 +1,101 @@
+# Copyright (c) 2023, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import librosa
+import numpy as np
+import pytest
+import torch
+
+from nemo.collections.tts.parts.preprocessing.pitch_estimation import compare_pitch, yin_pitch_batch
+
+
+class TestPitchEstimation:
+    def setup_class(self):
+        self.sample_rate = 16000
+        self.frame_length = 1024
+        self.hop_length = 256
+        self.fmin = 65.0
+        self.fmax = 1000.0
+
+    def _create_audio(self, freq, audio_len):
+        # harmonic tone with silence at the start and the end
+        t = np.arange(audio_len) / self.sample_rate
+        audio = sum(np.sin(2 * np.pi * k * freq * t) / k for k in range(1, 4))
+        audio[: audio_len // 4] = 0.0
+        audio[-audio_len // 4 :] = 0.0
+        return (0.3 * audio).astype(np.float32)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_yin_pitch_batch_against_pyin(self):
+        audios = [self._create_audio(freq=110.0, audio_len=16000), self._create_audio(freq=261.6, audio_len=12000)]
+        audio_len = torch.tensor([len(audio) for audio in audios])
+        audio = torch.zeros(len(audios), int(audio_len.max()))
+        for i, wav in enumerate(audios):
+            audio[i, : len(wav)] = torch.from_numpy(wav)
+
+        pitch, voiced_mask, voiced_prob, pitch_len = yin_pitch_batch(
+            audio=audio,
+            audio_len=audio_len,
+            sample_rate=self.sample_rate,
+            fmin=self.fmin,
+            fmax=self.fmax,
+            frame_length=self.frame_length,
+            hop_length=self.hop_length,
+        )
+
+        assert pitch.shape == voiced_mask.shape == voiced_prob.shape == (2, pitch_len.max())
+        assert voiced_mask.dtype == torch.bool
+        for i, wav in enumerate(audios):
+            ref_pitch, ref_voiced_mask, ref_voiced_prob = librosa.pyin(
+                wav,
+                fmin=self.fmin,
+                fmax=self.fmax,
+                frame_length=self.frame_length,
+                hop_length=self.hop_length,
+                sr=self.sample_rate,
+                fill_na=0.0,
+            )
+            num_frames = pitch_len[i]
+            assert num_frames == len(ref_pitch)
+            metrics = compare_pitch(
+                pitch[i, :num_frames],
+                voiced_mask[i, :num_frames],
+                torch.from_numpy(ref_pitch),
+                torch.from_numpy(ref_voiced_mask),
+            )
+            assert metrics["voicing_accuracy"] > 0.9
+            assert metrics["gross_pitch_error"] == 0.0
+            assert metrics["median_cents_error"] < 10.0
+            assert np.corrcoef(voiced_prob[i, :num_frames].numpy(), ref_voiced_prob)[0, 1] > 0.9
+            # padding frames are unvoiced
+            assert not voiced_mask[i, num_frames:].any()
+            assert (pitch[i, num_frames:] == 0).all()
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_yin_pitch_batch_padding(self):
+        short_audio = torch.from_numpy(self._create_audio(freq=150.0, audio_len=6000))
+        long_audio = torch.from_numpy(self._create_audio(freq=300.0, audio_len=9000))
+        audio = torch.zeros(2, 9000)
+        audio[0, :6000] = short_audio
+        audio[1] = long_audio
+
+        kwargs = dict(sample_rate=self.sample_rate, fmin=self.fmin, fmax=self.fmax, frame_length=self.frame_length)
+        batch_outputs = yin_pitch_batch(audio=audio, audio_len=torch.tensor([6000, 9000]), **kwargs)
+        single_outputs = yin_pitch_batch(audio=short_audio.unsqueeze(0), audio_len=torch.tensor([6000]), **kwargs)
+
+        num_frames = single_outputs[3][0]
+        for batch_output, single_output in zip(batch_outputs[:3], single_outputs[:3]):
+            torch.testing.assert_close(batch_output[0, :num_frames], single_output[0])
@@ -0,0 +1,131 @@
+# Copyright (c) 2023, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from nemo.collections.tts.parts.utils.tarred_dataset_utils import (
+    TarredSampleStream,
+    write_tarred_metadata,
+    write_tarred_shard,
+)
+
+
+class TestTarredDatasetUtils:
+    def setup_class(self):
+        self.sample_rate = 8000
+        self.num_entries = 6
+
+    def _create_tarred_dataset(self, tmp_path):
+        audio_dir = tmp_path / "audio"
+        audio_dir.mkdir()
+        entries = []
+        for i in range(self.num_entries):
+            duration = 0.1 * (i + 1)
+            audio_filename = f"audio_{i}.wav"
+            sf.write(audio_dir / audio_filename, np.zeros(int(duration * self.sample_rate)), self.sample_rate)
+            entries.append(
+                {"audio_filepath": audio_filename, "text": f"text {i}", "duration": duration, "speaker": f"{i % 2}"}
+            )
+
+        output_dir = tmp_path / "tarred"
+        output_dir.mkdir()
+        shards = [
+            write_tarred_shard(entries=entries[:3], audio_dir=audio_dir, output_dir=output_dir, shard_id=0),
+            write_tarred_shard(entries=entries[3:], audio_dir=audio_dir, output_dir=output_dir, shard_id=1),
+        ]
+        write_tarred_metadata(output_dir=output_dir, shards=shards)
+        return {"dataset": {"metadata_path": str(output_dir / "metadata.json")}}
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_tarred_sample_stream(self, tmp_path):
+        dataset_meta = self._create_tarred_dataset(tmp_path)
+
+        stream = TarredSampleStream(dataset_meta=dataset_meta, shuffle_n=4)
+        samples = list(stream)
+
+        assert len(stream) == self.num_entries
+        assert sorted(sample.manifest_entry["text"] for sample in samples) == [
+            f"text {i}" for i in range(self.num_entries)
+        ]
+        for sample in samples:
+            assert sample.dataset_name == "dataset"
+            assert sample.manifest_entry["audio_filepath"].startswith("audio_")
+            assert sample.audio_bytes[:4] == b"RIFF"
+            assert sample.features == {}
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_tarred_sample_stream_filter_and_scatter(self, tmp_path):
+        dataset_meta = self._create_tarred_dataset(tmp_path)
+
+        stream = TarredSampleStream(dataset_meta=dataset_meta, min_duration=0.15, max_duration=0.45)
+        assert len(stream) == 3
+        assert sorted(sample.manifest_entry["text"] for sample in stream) == ["text 1", "text 2", "text 3"]
+
+        rank_texts = []
+        for global_rank in range(2):
+            stream = TarredSampleStream(dataset_meta=dataset_meta, global_rank=global_rank, world_size=2)
+            assert len(stream) == 3
+            rank_texts.append({sample.manifest_entry["text"] for sample in stream})
+        assert rank_texts == [{"text 0", "text 1", "text 2"}, {"text 3", "text 4", "text 5"}]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_tarred_sample_stream_weighted(self, tmp_path):
+        dataset_meta = self._create_tarred_dataset(tmp_path)
+
+        stream = TarredSampleStream(dataset_meta=dataset_meta, speaker_weights={"0": 0.0, "1": 2.0})
+        stream.num_weighted_samples = 10
+        samples = list(stream)
+
+        assert len(stream) == 10
+        assert len(samples) == 10
+        assert all(sample.manifest_entry["speaker"] == "1" for sample in samples)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_tarred_sample_stream_weighted_scatter(self, tmp_path):
+        dataset_meta = self._create_tarred_dataset(tmp_path)
+        dataset_meta["silent"] = {**dataset_meta["dataset"], "sample_weight": 0.0}
+
+        # ranks 0 and 1 get the shards of "dataset", ranks 2 and 3 the shards of "silent"
+        for global_rank in range(2):
+            stream = TarredSampleStream(dataset_meta=dataset_meta, global_rank=global_rank, world_size=4)
+            stream.num_weighted_samples = 5
+            samples = list(stream)
+            assert len(samples) == 5
+            assert all(sample.dataset_name == "dataset" for sample in samples)
+
+        stream = TarredSampleStream(dataset_meta=dataset_meta, global_rank=2, world_size=4)
+        assert {sample.dataset_name for sample in stream} == {"silent"}
+        stream.num_weighted_samples = 5
+        with pytest.raises(ValueError, match="sample weight 0"):
+            list(stream)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_tarred_sample_stream_invalid_weights(self, tmp_path):
+        dataset_meta = self._create_tarred_dataset(tmp_path)
+
+        with pytest.raises(ValueError):
+            TarredSampleStream(dataset_meta=dataset_meta, speaker_weights={"0": 0.0, "1": 0.0})
+        with pytest.raises(ValueError):
+            TarredSampleStream(dataset_meta=dataset_meta, speaker_weights={"0": -1.0, "1": 1.0})
+
+        dataset_meta["dataset"]["sample_weight"] = 0.0
+        with pytest.raises(ValueError):
+            TarredSampleStream(dataset_meta=dataset_meta)
@@ -19,6 +19,8 @@ import pytest
 import torch
 
 from nemo.collections.tts.parts.utils.tts_dataset_utils import (
+    BatchedBetaBinomialPrior,
+    beta_binomial_prior_distribution,
     filter_dataset_by_duration,
     get_abs_rel_paths,
     get_audio_filepaths,
@@ -153,6 +155,20 @@ class TestTTSDatasetUtils:
 
         torch.testing.assert_close(stacked_tensor, expected_output)
 
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_stack_tensors_pad_value(self):
+        tensors = [torch.tensor([3, 4], dtype=torch.int32), torch.tensor([5], dtype=torch.int32)]
+        masks = [torch.tensor([True, True]), torch.tensor([True])]
+        expected_output = torch.tensor([[3, 4, 9], [5, 9, 9]], dtype=torch.int32)
+        expected_mask = torch.tensor([[True, True, False], [True, False, False]])
+
+        stacked_tensor = stack_tensors(tensors=tensors, max_lens=[3], pad_value=9)
+        stacked_mask = stack_tensors(tensors=masks, max_lens=[3])
+
+        assert torch.equal(stacked_tensor, expected_output)
+        assert torch.equal(stacked_mask, expected_mask)
+
     @pytest.mark.run_only_on('CPU')
     @pytest.mark.unit
     def test_filter_dataset_by_duration(self):
@@ -176,3 +192,30 @@ class TestTTSDatasetUtils:
         assert filtered_entries[1]["duration"] == 5.0
         assert total_hours == (135.6 / 3600.0)
         assert filtered_hours == (15.0 / 3600.0)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    @pytest.mark.parametrize("scaling_factor", [1.0, 0.5])
+    def test_batched_beta_binomial_prior(self, scaling_factor):
+        phoneme_counts = torch.tensor([5, 1, 37, 12])
+        mel_counts = torch.tensor([40, 7, 300, 25])
+        prior_generator = BatchedBetaBinomialPrior(scaling_factor=scaling_factor)
+
+        # second call reuses the cached table for smaller lengths
+        for _ in range(2):
+            priors = prior_generator(phoneme_counts=phoneme_counts, mel_counts=mel_counts)
+
+            assert priors.shape == (len(phoneme_counts), mel_counts.max(), phoneme_counts.max())
+            assert priors.dtype == torch.float32
+            # every mel frame has a distribution over the phonemes
+            mel_mask = torch.arange(priors.shape[1]) < mel_counts[:, None]
+            torch.testing.assert_close(priors.sum(dim=2), mel_mask.float())
+            for i, (phoneme_count, mel_count) in enumerate(zip(phoneme_counts.tolist(), mel_counts.tolist())):
+                expected_prior = beta_binomial_prior_distribution(
+                    phoneme_count=phoneme_count, mel_count=mel_count, scaling_factor=scaling_factor
+                )
+                # the reference is computed in single precision
+                np.testing.assert_allclose(priors[i, :mel_count, :phoneme_count].numpy(), expected_prior, atol=1e-3)
+                assert priors[i, mel_count:].sum() == 0
+                assert priors[i, :, phoneme_count:].sum() == 0
+            phoneme_counts, mel_counts = phoneme_counts[:2], mel_counts[:2]
@@ -15,7 +15,15 @@
 import pytest
 import torch
 
-from nemo.collections.tts.parts.utils.helpers import regulate_len, sort_tensor, unsort_tensor
+from nemo.collections.tts.modules import hifigan_modules, univnet_modules
+from nemo.collections.tts.parts.utils.helpers import (
+    get_length_buckets,
+    get_vocoder_receptive_field,
+    regulate_len,
+    sort_tensor,
+    unsort_tensor,
+    vocode_in_chunks,
+)
 
 
 def sample_duration_input(max_length=64, group_size=2, batch_size=3):
@@ -51,3 +59,55 @@ def test_regulate_len():
     # make sure all round-ups are <= group_size
     diff = lens_out - durs_in.sum(dim=1)
     assert torch.max(diff) < group_size
+
+
+@pytest.mark.unit
+def test_get_length_buckets():
+    lengths = [5, 30, 12, 30, 1, 7, 20]
+    batches = get_length_buckets(lengths, max_batch_size=3)
+    assert batches == [[1, 3, 6], [2, 5, 0], [4]]
+
+    batches = get_length_buckets(lengths, max_batch_size=3, max_batch_length=50)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert [lengths[i] for i in batch] == sorted((lengths[i] for i in batch), reverse=True)
+        assert len(batch) == 1 or len(batch) * lengths[batch[0]] <= 50
+    assert batches == [[1], [3], [6, 2], [5, 0, 4]]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("vocoder", ["hifigan", "univnet"])
+def test_vocode_in_chunks(vocoder):
+    torch.manual_seed(0)
+    spec = torch.randn(2, 80, 150)
+    if vocoder == "hifigan":
+        generator = hifigan_modules.Generator(
+            resblock=1,
+            upsample_rates=[8, 8, 2, 2],
+            upsample_kernel_sizes=[16, 16, 4, 4],
+            upsample_initial_channel=32,
+            resblock_kernel_sizes=[3, 7, 11],
+            resblock_dilation_sizes=[[1, 3, 5]] * 3,
+        ).eval()
+        inputs = [spec]
+        vocode_func = lambda x: generator(x=x[0]).squeeze(1)
+    else:
+        generator = univnet_modules.Generator(
+            noise_dim=16,
+            channel_size=8,
+            dilations=[1, 3, 9, 27],
+            strides=[8, 8, 4],
+            lrelu_slope=0.2,
+            kpnet_conv_size=3,
+        ).eval()
+        inputs = [spec, torch.randn(2, 16, 150)]
+        vocode_func = lambda x: generator(x=x[0], noise=x[1]).squeeze(1)
+
+    receptive_field = get_vocoder_receptive_field(vocode_func, [x.shape[1] for x in inputs])
+    assert 0 < receptive_field[0] < 64 and 0 < receptive_field[1] < 64
+
+    with torch.no_grad():
+        expected = vocode_func(inputs)
+        chunks = list(vocode_in_chunks(vocode_func, inputs, chunk_size=32, receptive_field=receptive_field))
+    assert [chunk.shape[-1] for chunk in chunks] == [32 * 256] * 4 + [22 * 256]
+    torch.testing.assert_close(torch.cat(chunks, dim=-1), expected, atol=1e-6, rtol=1e-5)
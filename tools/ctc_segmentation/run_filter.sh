@@ -20,6 +20,7 @@ INPUT_AUDIO_DIR="" # Path to original directory with audio files
 MANIFEST=""
 BATCH_SIZE=4 # batch size for ASR transcribe
 NUM_JOBS=-2 # The maximum number of concurrently running jobs, `-2` - all CPUs but one are used
+LOGPROBS_DIR="" # Path to log probabilities cached during segmentation (OUTPUT_DIR/logprobs), reused instead of transcribing segments
 
 # Thresholds for filtering
 CER_THRESHOLD=30
@@ -49,23 +50,28 @@ if [[ -z $MODEL_NAME_OR_PATH ]] || [[ -z $INPUT_AUDIO_DIR ]] || [[ -z $MANIFEST
   exit 1
 fi
 
-echo "--- Adding transcripts to ${MANIFEST} using ${MODEL_NAME_OR_PATH} ---"
-if [[ ${MODEL_NAME_OR_PATH,,} == *".nemo" ]]; then
-  ARG_MODEL="model_path";
+if [[ -z $LOGPROBS_DIR ]]; then
+  echo "--- Adding transcripts to ${MANIFEST} using ${MODEL_NAME_OR_PATH} ---"
+  if [[ ${MODEL_NAME_OR_PATH,,} == *".nemo" ]]; then
+    ARG_MODEL="model_path";
+  else
+    ARG_MODEL="pretrained_name";
+  fi
+
+  OUT_MANIFEST="$(dirname ${MANIFEST})"
+  OUT_MANIFEST=$OUT_MANIFEST/manifest_transcribed.json
+  # Add transcripts to the manifest file, ASR model predictions will be stored under "pred_text" field
+  python ${SCRIPTS_DIR}/../../../examples/asr/transcribe_speech.py \
+  $ARG_MODEL=$MODEL_NAME_OR_PATH \
+  dataset_manifest=$MANIFEST \
+  output_filename=${OUT_MANIFEST} \
+  batch_size=${BATCH_SIZE} \
+  num_workers=0 || exit
 else
-  ARG_MODEL="pretrained_name";
+  echo "--- Using log probabilities cached at ${LOGPROBS_DIR} for transcripts ---"
+  OUT_MANIFEST=$MANIFEST
 fi
 
-OUT_MANIFEST="$(dirname ${MANIFEST})"
-OUT_MANIFEST=$OUT_MANIFEST/manifest_transcribed.json
-# Add transcripts to the manifest file, ASR model predictions will be stored under "pred_text" field
-python ${SCRIPTS_DIR}/../../../examples/asr/transcribe_speech.py \
-$ARG_MODEL=$MODEL_NAME_OR_PATH \
-dataset_manifest=$MANIFEST \
-output_filename=${OUT_MANIFEST} \
-batch_size=${BATCH_SIZE} \
-num_workers=0 || exit
-
 echo "--- Calculating metrics and filtering out samples based on thresholds ---"
 echo "CER_THRESHOLD = ${CER_THRESHOLD}"
 echo "WER_THRESHOLD = ${WER_THRESHOLD}"
@@ -81,5 +87,7 @@ python ${SCRIPTS_DIR}/get_metrics_and_filter.py \
 --max_edge_cer=${CER_EDGE_THRESHOLD} \
 --min_duration=${MIN_DURATION} \
 --max_duration=${MAX_DURATION} \
---edge_len=${EDGE_LEN}
+--edge_len=${EDGE_LEN} \
+--num_jobs=${NUM_JOBS} \
+--logprobs_dir=${LOGPROBS_DIR}
 
@@ -92,6 +92,7 @@ python $SCRIPTS_DIR/prepare_data.py \
 # STEP #2
 # Run CTC-segmentation. One might want to perform alignment with various window sizes
 # Note, if the alignment with the initial window size isn't found, the window size will be double to re-attempt alignment
+# ASR log probabilities are cached at $OUTPUT_DIR/logprobs during the first run and reused for other window sizes
 echo "SEGMENTATION STEP..."
 for WINDOW in 8000 12000
 do
@@ -0,0 +1,329 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+NeMo-native CTC segmentation engine.
+
+Implements the windowed trellis of CTC-Segmentation (https://arxiv.org/abs/2007.09127) without the
+`ctc_segmentation` package. The trellis is filled one ground truth column at a time for a whole batch of files.
+Within a column the recursion
+
+    table[t, c] = max(table[t - 1, c] + stay[t], switch[t])
+
+is a max-plus scan that has the closed form ``A + cummax(switch - A)`` with ``A = cumsum(stay)``, so every column
+is a handful of vectorized NumPy operations instead of a per-frame loop. Only the positions where the running
+maximum changes (one bit per frame) are kept for backtracking, which is 32x smaller than the float table used by
+the reference implementation.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# value used by the reference implementation for impossible transitions
+MAX_PROB = -10000000000.0
+
+
+@dataclass
+class SegmentationConfig:
+    """
+    Parameters of the CTC segmentation, attribute names follow ``ctc_segmentation.CtcSegmentationParameters``
+
+    Args:
+        char_list: ASR vocabulary, blank symbol at position ``blank``
+        blank: index of the blank symbol in ``char_list``
+        index_duration: duration of one CTC output frame, in seconds
+        min_window_size: initial window size (in CTC frames), doubled if the alignment is not found
+        max_window_size: maximum window size (in CTC frames)
+        score_min_mean_over_L: number of frames for the min mean confidence score of a segment
+        excluded_characters: characters ignored during text preparation (char-based models only)
+        self_transition: symbol logged for the frames that stay in the same state
+        space: symbol used to separate utterances during text preparation
+        start_of_ground_truth: symbol prepended to the ground truth during text preparation
+    """
+
+    char_list: List[str] = field(default_factory=list)
+    blank: int = 0
+    index_duration: float = 0.025
+    min_window_size: int = 8000
+    max_window_size: int = 100000
+    score_min_mean_over_L: int = 30
+    excluded_characters: str = ""
+    self_transition: str = "ε"
+    space: str = "·"
+    start_of_ground_truth: str = "#"
+
+    @property
+    def index_duration_in_seconds(self) -> float:
+        return self.index_duration
+
+
+def prepare_text(config: SegmentationConfig, text: List[str]) -> Tuple[np.ndarray, List[int]]:
+    """
+    Creates the ground truth matrix for char-based models, equivalent to ``ctc_segmentation.prepare_text``.
+
+    Utterances are separated by ``config.space`` that is mapped to the ``config.blank`` symbol of the vocabulary.
+
+    Args:
+        config: segmentation config, ``config.blank`` should point to the utterance separator symbol
+        text: list of utterances
+
+    Returns:
+        ground truth matrix of shape [number of characters, max token length] and utterance start indices
+    """
+    ground_truth = config.start_of_ground_truth
+    utt_begin_indices = []
+    for utt in text:
+        if not ground_truth.endswith(config.space):
+            ground_truth += config.space
+        utt_begin_indices.append(len(ground_truth) - 1)
+        for char in utt:
+            if char in config.char_list and char not in config.excluded_characters:
+                ground_truth += char
+    if not ground_truth.endswith(config.space):
+        ground_truth += config.space
+    utt_begin_indices.append(len(ground_truth) - 1)
+
+    blank = config.char_list[config.blank]
+    char_to_index = {}
+    for idx, char in enumerate(config.char_list):
+        char_to_index.setdefault(char, idx)
+    max_char_len = max(len(char) for char in config.char_list)
+    ground_truth_mat = np.full([len(ground_truth), max_char_len], -1, dtype=np.int64)
+    for i in range(len(ground_truth)):
+        for s in range(min(max_char_len, i + 1)):
+            span = ground_truth[i - s : i + 1].replace(config.space, blank)
+            if span in char_to_index:
+                ground_truth_mat[i, s] = char_to_index[span]
+    return ground_truth_mat, utt_begin_indices
+
+
+@dataclass
+class _TrellisState:
+    """Backtracking information of a single file produced by `_fill_trellis`"""
+
+    offsets: np.ndarray
+    records: List[np.ndarray]
+    choices: List[np.ndarray]
+    window: int
+
+
+def _fill_trellis(
+    log_probs: Sequence[np.ndarray], ground_truth: Sequence[np.ndarray], window_size: int, blank: int
+) -> List[_TrellisState]:
+    """
+    Fills the windowed trellis for a batch of files.
+
+    Args:
+        log_probs: log probabilities per file, shape [T, vocabulary size], blank at position ``blank``
+        ground_truth: ground truth matrices per file, shape [C, S]
+        window_size: number of frames of the window around the expected position of every ground truth column
+        blank: index of the blank symbol
+
+    Returns:
+        per file backtracking state
+    """
+    batch_size = len(log_probs)
+    lengths = np.array([lp.shape[0] for lp in log_probs], dtype=np.int64)
+    num_cols = np.array([gt.shape[0] for gt in ground_truth], dtype=np.int64)
+    windows = np.minimum(window_size, lengths)
+    max_window = int(windows.max())
+    max_cols = int(num_cols.max())
+    max_span = max(gt.shape[1] for gt in ground_truth)
+
+    flat_log_probs = np.concatenate(log_probs).astype(np.float64)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    gt_padded = np.full([batch_size, max_cols, max_span], -1, dtype=np.int64)
+    for b, gt in enumerate(ground_truth):
+        gt_padded[b, : gt.shape[0], : gt.shape[1]] = gt
+
+    # the window moves forward at most `max_step` frames per column and is never further than
+    # `(C - 1 - c) * max_step` frames from the end, so that the last column always covers the last frame
+    slack = lengths - windows
+    max_step = np.ceil(slack / np.maximum(num_cols - 1, 1)).astype(np.int64) + 1
+
+    frames = np.arange(max_window)
+    in_window = frames[None, :] < windows[:, None]
+    states = [_TrellisState(np.zeros(n, dtype=np.int64), [], [], int(w)) for n, w in zip(num_cols, windows)]
+
+    # scores and window offsets of the last `max_span` columns, most recent first
+    history = []
+    for c in range(max_cols):
+        if c == 0:
+            offset = np.zeros(batch_size, dtype=np.int64)
+        else:
+            prev_scores, prev_offset = history[0]
+            target = prev_offset + np.argmax(prev_scores, axis=1) - windows // 2
+            offset = np.clip(target, prev_offset, prev_offset + max_step)
+            offset = np.maximum(offset, slack - (num_cols - 1 - c) * max_step)
+            offset = np.clip(offset, 0, slack)
+
+        rows = starts[:, None] + np.minimum(offset[:, None] + frames[None, :], lengths[:, None] - 1)
+        tokens = gt_padded[:, c, :]
+        token_log_probs = flat_log_probs[rows[:, :, None], np.maximum(tokens, 0)[:, None, :]]
+        token_log_probs[np.broadcast_to(tokens[:, None, :] == -1, token_log_probs.shape)] = -np.inf
+        max_token_log_probs = token_log_probs.max(axis=2)
+
+        stay = np.maximum(flat_log_probs[rows, blank], max_token_log_probs)
+        stay[:, 0] = 0.0
+        stay[~in_window] = 0.0
+
+        if c == 0:
+            switch = np.full([batch_size, max_window], -np.inf)
+            switch[:, 0] = 0.0
+            choice = np.zeros([batch_size, max_window], dtype=np.int64)
+        else:
+            candidates = np.full([max_span, batch_size, max_window], -np.inf)
+            for s, (src_scores, src_offset) in enumerate(history):
+                src_index = frames[None, :] + (offset - src_offset - 1)[:, None]
+                valid = (src_index >= 0) & (src_index < windows[:, None])
+                src = np.take_along_axis(src_scores, np.clip(src_index, 0, max_window - 1), axis=1)
+                src[~valid] = -np.inf
+                candidates[s] = src + token_log_probs[:, :, s]
+            choice = np.argmax(candidates, axis=0)
+            switch = np.max(candidates, axis=0)
+        switch[~in_window] = -np.inf
+
+        cum_stay = np.cumsum(stay, axis=1)
+        gain = switch - cum_stay
+        best_gain = np.maximum.accumulate(gain, axis=1)
+        scores = cum_stay + best_gain
+        scores[~in_window] = -np.inf
+        # frames where the best path enters the column, the best path for any later frame of the column
+        # enters it at the last record before that frame
+        prev_best = np.concatenate([np.full([batch_size, 1], -np.inf), best_gain[:, :-1]], axis=1)
+        records = gain > prev_best
+
+        for b in np.flatnonzero(c < num_cols):
+            window = states[b].window
+            states[b].offsets[c] = offset[b]
+            states[b].records.append(np.packbits(records[b, :window]))
+            if max_span > 1:
+                states[b].choices.append(np.packbits(choice[b, :window, None] == np.arange(1, max_span), axis=0))
+
+        history.insert(0, (scores, offset))
+        del history[max_span:]
+
+    return states
+
+
+def _backtrack(
+    state: _TrellisState, log_probs: np.ndarray, ground_truth: np.ndarray, config: SegmentationConfig
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Finds the best path through the trellis filled by `_fill_trellis`.
+
+    Raises:
+        IndexError if the path leaves the window, i.e. the window size is too small
+    """
+    num_frames = log_probs.shape[0]
+    timings = np.zeros([ground_truth.shape[0]])
+    frame_cols = np.zeros(num_frames, dtype=np.int64)
+    switch_spans = np.full(num_frames, -1, dtype=np.int64)
+
+    c, g = ground_truth.shape[0] - 1, num_frames - 1
+    while True:
+        t = g - state.offsets[c]
+        if t < 0 or t >= state.window:
+            raise IndexError(f"frame {g} is outside of the window of column {c}")
+        candidates = np.flatnonzero(np.unpackbits(state.records[c], count=state.window)[: t + 1])
+        if len(candidates) == 0:
+            raise IndexError(f"column {c} is not reachable at frame {g}")
+        k = candidates[-1]
+        enter = state.offsets[c] + k
+        frame_cols[enter : g + 1] = c
+        if c == 0:
+            break
+
+        s = 0
+        if state.choices:
+            spans = np.unpackbits(state.choices[c], axis=0, count=state.window)[k]
+            s = int(np.argmax(spans)) + 1 if spans.any() else 0
+        switch_spans[enter] = s
+        timings[c - s : c + 1] = enter * config.index_duration_in_seconds
+        g = enter - 1
+        c -= 1 + s
+        if g < 0:
+            raise IndexError("the start of the audio is reached before the start of the text")
+
+    tokens = ground_truth[frame_cols]
+    token_log_probs = log_probs[np.arange(num_frames)[:, None], np.maximum(tokens, 0)]
+    token_log_probs = np.where(tokens == -1, MAX_PROB, token_log_probs)
+    max_token_log_probs = np.maximum(token_log_probs.max(axis=1), MAX_PROB)
+    switched = switch_spans >= 0
+    char_probs = np.where(switched, max_token_log_probs, np.maximum(log_probs[:, config.blank], max_token_log_probs))
+    char_probs[0] = 0.0
+
+    state_list = [config.self_transition] * num_frames
+    for frame in np.flatnonzero(switched):
+        state_list[frame] = config.char_list[ground_truth[frame_cols[frame], switch_spans[frame]]]
+    state_list[0] = ""
+    return timings, char_probs, state_list
+
+
+def ctc_segmentation_batch(
+    config: SegmentationConfig, log_probs: Sequence[np.ndarray], ground_truth: Sequence[np.ndarray]
+) -> List[Optional[Tuple[np.ndarray, np.ndarray, List[str]]]]:
+    """
+    Aligns a batch of files, drop-in replacement for ``ctc_segmentation.ctc_segmentation`` applied to every file.
+
+    Files for which no alignment is found are re-aligned with a doubled window size until
+    ``config.max_window_size`` is reached.
+
+    Args:
+        config: segmentation config
+        log_probs: log probabilities per file, shape [T, vocabulary size]
+        ground_truth: ground truth matrices per file, see `prepare_text`
+
+    Returns:
+        (timings, char_probs, state_list) per file, None if the alignment failed
+    """
+    results = [None] * len(log_probs)
+    pending = [i for i in range(len(log_probs)) if len(ground_truth[i]) > 0 and len(log_probs[i]) > 0]
+    window_size = config.min_window_size
+    while pending:
+        states = _fill_trellis(
+            [log_probs[i] for i in pending], [ground_truth[i] for i in pending], window_size, config.blank
+        )
+        failed = []
+        for i, state in zip(pending, states):
+            try:
+                results[i] = _backtrack(state, log_probs[i], ground_truth[i], config)
+            except IndexError as e:
+                logging.debug(f"Backtracking failed: {e}")
+                if state.window < log_probs[i].shape[0]:
+                    failed.append(i)
+                else:
+                    logging.error("Alignment not found for the full-length window. Check data and character list!")
+
+        window_size *= 2
+        if failed and window_size >= config.max_window_size:
+            logging.error("Maximum window size reached. Check data and character list!")
+            break
+        if failed:
+            logging.warning(f"Increasing the window size to {window_size} for {len(failed)} file(s)")
+        pending = failed
+    return results
+
+
+def ctc_segmentation(
+    config: SegmentationConfig, log_probs: np.ndarray, ground_truth: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Single file version of `ctc_segmentation_batch`, raises ValueError if the alignment is not found"""
+    result = ctc_segmentation_batch(config, [log_probs], [ground_truth])[0]
+    if result is None:
+        raise ValueError("Alignment not found, the window size might be too small")
+    return result
@@ -113,6 +113,9 @@ def process_alignment(alignment_file: str, manifest: str, clips_dir: str, args):
                         "score": round(score, 2),
                         "start_abs": float(np.mean(np.abs(segment[:num_samples]))),
                         "end_abs": float(np.mean(np.abs(segment[-num_samples:]))),
+                        "source_audio": audio_file,
+                        "source_start": st,
+                        "source_end": end,
                     }
                     json.dump(info, f, ensure_ascii=False)
                     f.write("\n")
@@ -14,10 +14,12 @@
 
 import argparse
 import json
+import math
 import os
 from glob import glob
 
 import editdistance
+import numpy as np
 from joblib import Parallel, delayed
 from tqdm import tqdm
 
@@ -57,15 +59,52 @@ parser.add_argument(
     action="store_true",
     help="Set to True to perform only filtering (when transcripts" "are already available)",
 )
+parser.add_argument(
+    "--logprobs_dir",
+    type=str,
+    default=None,
+    help="Path to the log probabilities cached by run_ctc_segmentation.py. If provided, `pred_text` missing from "
+    "the manifest is computed with greedy decoding of the cached log probabilities instead of a new ASR pass",
+)
+
+
+def _greedy_transcript(line: dict, logprobs_dir: str, vocabulary: list, bpe_model: bool, index_duration: float):
+    """
+    Decodes the segment of the cached log probabilities of the original audio that corresponds to the manifest line.
+
+    Args:
+        line - line of manifest.json (dict) with `source_audio`, `source_start` and `source_end` fields
+            added by cut_audio.py
+        logprobs_dir - path to the log probabilities cached by run_ctc_segmentation.py, blank at position 0
+        vocabulary - ASR vocabulary, blank at position 0
+        bpe_model - whether the ASR model uses BPE
+        index_duration - duration of one CTC output frame, in seconds
+
+    Returns:
+        predicted text
+    """
+    log_probs_file = os.path.join(logprobs_dir, os.path.basename(line["source_audio"]).replace(".wav", ".npy"))
+    log_probs = np.load(log_probs_file, mmap_mode="r")
+    start = int(line["source_start"] / index_duration)
+    end = int(math.ceil(line["source_end"] / index_duration))
+    ids = np.argmax(log_probs[start:end], axis=1)
+    # merge repeated tokens and remove blanks
+    ids = ids[np.insert(ids[1:] != ids[:-1], 0, True)]
+    text = "".join(vocabulary[i] for i in ids if i != 0)
+    if bpe_model:
+        text = text.replace("▁", " ")
+    return " ".join(text.split())
 
 
-def _calculate(line: dict, edge_len: int):
+def _calculate(line: dict, edge_len: int, logprobs_dir: str = None, logprobs_info: dict = None):
     """
     Calculates metrics for every entry on manifest.json.
 
     Args:
         line - line of manifest.json (dict)
         edge_len - number of characters for edge Character Error Rate (CER) calculations
+        logprobs_dir - path to the cached log probabilities to compute `pred_text` if it's missing
+        logprobs_info - content of `vocabulary.json` saved with the cached log probabilities
 
     Returns:
         line - line of manifest.json (dict) with the following metrics added:
@@ -78,6 +117,9 @@ def _calculate(line: dict, edge_len: int):
     """
     eps = 1e-9
 
+    if "pred_text" not in line and logprobs_dir is not None:
+        line["pred_text"] = _greedy_transcript(line, logprobs_dir, **logprobs_info)
+
     text = line["text"].split()
     pred_text = line["pred_text"].split()
 
@@ -99,8 +141,19 @@ def get_metrics(manifest, manifest_out):
     with open(manifest, "r") as f:
         lines = f.readlines()
 
+    logprobs_info = None
+    if args.logprobs_dir:
+        with open(os.path.join(args.logprobs_dir, "vocabulary.json"), "r") as f:
+            logprobs_info = json.load(f)
+
     lines = Parallel(n_jobs=args.num_jobs)(
-        delayed(_calculate)(json.loads(line), edge_len=args.edge_len) for line in tqdm(lines)
+        delayed(_calculate)(
+            json.loads(line),
+            edge_len=args.edge_len,
+            logprobs_dir=args.logprobs_dir or None,
+            logprobs_info=logprobs_info,
+        )
+        for line in tqdm(lines)
     )
     with open(manifest_out, "w") as f_out:
         for line in lines:
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import argparse
+import json
 import logging
 import os
 import sys
@@ -24,7 +25,7 @@ import scipy.io.wavfile as wav
 import torch
 from joblib import Parallel, delayed
 from tqdm import tqdm
-from utils import get_segments
+from utils import get_segments_batch
 
 import nemo.collections.asr as nemo_asr
 
@@ -50,6 +51,21 @@ parser.add_argument(
     type=int,
     help="The maximum number of concurrently running jobs, `-2` - all CPUs but one are used",
 )
+parser.add_argument("--batch_size", type=int, default=1, help="Batch size for ASR model log probabilities inference")
+parser.add_argument(
+    "--segmentation_batch_size",
+    type=int,
+    default=8,
+    help="Number of audio files aligned together by a single segmentation job",
+)
+parser.add_argument(
+    "--logprobs_dir",
+    type=str,
+    default=None,
+    help="Path to directory to cache ASR log probabilities, `output_dir/logprobs` by default. Cached log "
+    "probabilities are reused by subsequent runs with other window sizes and by get_metrics_and_filter.py. "
+    "Remove the directory when switching to another ASR model.",
+)
 
 logger = logging.getLogger("ctc_segmentation")  # use module name
 
@@ -105,14 +121,20 @@ if __name__ == "__main__":
         audio_paths = [Path(data)]
         data_dir = Path(os.path.dirname(data))
 
+    logprobs_dir = args.logprobs_dir or os.path.join(args.output_dir, "logprobs")
+    os.makedirs(logprobs_dir, exist_ok=True)
+
     all_log_probs = []
     all_transcript_file = []
     all_segment_file = []
     all_wav_paths = []
+    all_num_frames = []
+    all_sample_rates = []
     segments_dir = os.path.join(args.output_dir, "segments")
     os.makedirs(segments_dir, exist_ok=True)
 
     index_duration = None
+    to_transcribe = []
     for path_audio in audio_paths:
         logging.info(f"Processing {path_audio.name}...")
         transcript_file = os.path.join(data_dir, path_audio.name.replace(".wav", ".txt"))
@@ -123,7 +145,7 @@ if __name__ == "__main__":
             logging.info(f"{transcript_file} not found. Skipping {path_audio.name}")
             continue
         try:
-            sample_rate, signal = wav.read(path_audio)
+            sample_rate, signal = wav.read(path_audio, mmap=True)
             if len(signal) == 0:
                 logging.error(f"Skipping {path_audio.name}")
                 continue
@@ -136,24 +158,41 @@ if __name__ == "__main__":
             logging.debug(f"len(signal): {len(signal)}, sr: {sample_rate}")
             logging.debug(f"Duration: {original_duration}s, file_name: {path_audio}")
 
-            log_probs = asr_model.transcribe(paths2audio_files=[str(path_audio)], batch_size=1, logprobs=True)[0]
-            # move blank values to the first column (ctc-package compatibility)
-            blank_col = log_probs[:, -1].reshape((log_probs.shape[0], 1))
-            log_probs = np.concatenate((blank_col, log_probs[:, :-1]), axis=1)
+            log_probs_file = os.path.join(logprobs_dir, path_audio.name.replace(".wav", ".npy"))
+            if not os.path.exists(log_probs_file):
+                to_transcribe.append((path_audio, log_probs_file))
 
-            all_log_probs.append(log_probs)
+            all_log_probs.append(log_probs_file)
             all_segment_file.append(str(segment_file))
             all_transcript_file.append(str(transcript_file))
             all_wav_paths.append(path_audio)
-
-            if index_duration is None:
-                index_duration = len(signal) / log_probs.shape[0] / sample_rate
+            all_num_frames.append(len(signal))
+            all_sample_rates.append(sample_rate)
 
         except Exception as e:
             logging.error(e)
             logging.error(f"Skipping {path_audio.name}")
             continue
 
+    # log probabilities are computed in batches and cached, so that segmentation with other window sizes
+    # and filtering can reuse them
+    for batch_start in range(0, len(to_transcribe), args.batch_size):
+        batch = to_transcribe[batch_start : batch_start + args.batch_size]
+        batch_log_probs = asr_model.transcribe(
+            paths2audio_files=[str(path_audio) for path_audio, _ in batch], batch_size=len(batch), logprobs=True
+        )
+        for (path_audio, log_probs_file), log_probs in zip(batch, batch_log_probs):
+            # move blank values to the first column (ctc-package compatibility)
+            blank_col = log_probs[:, -1].reshape((log_probs.shape[0], 1))
+            log_probs = np.concatenate((blank_col, log_probs[:, :-1]), axis=1)
+            np.save(log_probs_file, log_probs)
+
+    if len(all_log_probs) > 0:
+        num_frames = np.load(all_log_probs[0], mmap_mode="r").shape[0]
+        index_duration = all_num_frames[0] / num_frames / all_sample_rates[0]
+        with open(os.path.join(logprobs_dir, "vocabulary.json"), "w") as f:
+            json.dump({"vocabulary": vocabulary, "bpe_model": bpe_model, "index_duration": index_duration}, f)
+
     asr_model_type = type(asr_model)
     del asr_model
     torch.cuda.empty_cache()
@@ -161,12 +200,17 @@ if __name__ == "__main__":
     if len(all_log_probs) > 0:
         start_time = time.time()
 
-        normalized_lines = Parallel(n_jobs=args.num_jobs)(
-            delayed(get_segments)(
-                all_log_probs[i],
-                all_wav_paths[i],
-                all_transcript_file[i],
-                all_segment_file[i],
+        # files of similar length are aligned together to reduce padding in the batched trellis
+        order = np.argsort(all_num_frames)
+        batches = [
+            order[i : i + args.segmentation_batch_size] for i in range(0, len(order), args.segmentation_batch_size)
+        ]
+        Parallel(n_jobs=args.num_jobs)(
+            delayed(get_segments_batch)(
+                [all_log_probs[i] for i in batch],
+                [all_wav_paths[i] for i in batch],
+                [all_transcript_file[i] for i in batch],
+                [all_segment_file[i] for i in batch],
                 vocabulary,
                 tokenizer,
                 bpe_model,
@@ -175,7 +219,7 @@ if __name__ == "__main__":
                 log_file=log_file,
                 debug=args.debug,
             )
-            for i in tqdm(range(len(all_log_probs)))
+            for batch in tqdm(batches)
         )
 
         total_time = time.time() - start_time
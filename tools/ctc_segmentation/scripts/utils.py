@@ -20,13 +20,48 @@ import sys
 from pathlib import PosixPath
 from typing import List, Tuple, Union
 
-import ctc_segmentation as cs
 import numpy as np
+from ctc_trellis import SegmentationConfig, ctc_segmentation_batch, prepare_text
 from tqdm import tqdm
 
 from nemo.collections.common.tokenizers.sentencepiece_tokenizer import SentencePieceTokenizer
 
 
+def _read_transcripts(transcript_file: str) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Reads the processed transcript and the corresponding original (`_with_punct.txt`) and
+    normalized (`_with_punct_normalized.txt`) transcripts
+    """
+    with open(transcript_file, "r") as f:
+        text = f.readlines()
+        text = [t.strip() for t in text if t.strip()]
+
+    # add corresponding original text without pre-processing
+    transcript_file_no_preprocessing = transcript_file.replace(".txt", "_with_punct.txt")
+    if not os.path.exists(transcript_file_no_preprocessing):
+        raise ValueError(f"{transcript_file_no_preprocessing} not found.")
+
+    with open(transcript_file_no_preprocessing, "r") as f:
+        text_no_preprocessing = f.readlines()
+        text_no_preprocessing = [t.strip() for t in text_no_preprocessing if t.strip()]
+
+    # add corresponding normalized original text
+    transcript_file_normalized = transcript_file.replace(".txt", "_with_punct_normalized.txt")
+    if not os.path.exists(transcript_file_normalized):
+        raise ValueError(f"{transcript_file_normalized} not found.")
+
+    with open(transcript_file_normalized, "r") as f:
+        text_normalized = f.readlines()
+        text_normalized = [t.strip() for t in text_normalized if t.strip()]
+
+    if len(text_no_preprocessing) != len(text):
+        raise ValueError(f"{transcript_file} and {transcript_file_no_preprocessing} do not match")
+
+    if len(text_normalized) != len(text):
+        raise ValueError(f"{transcript_file} and {transcript_file_normalized} do not match")
+    return text, text_no_preprocessing, text_normalized
+
+
 def get_segments(
     log_probs: np.ndarray,
     path_wav: Union[PosixPath, str],
@@ -55,81 +90,114 @@ def get_segments(
         window_size: the length of each utterance (in terms of frames of the CTC outputs) fits into that window.
         index_duration: corresponding time duration of one CTC output index (in seconds)
     """
+    get_segments_batch(
+        [log_probs],
+        [path_wav],
+        [transcript_file],
+        [output_file],
+        vocabulary,
+        tokenizer,
+        bpe_model,
+        index_duration,
+        window_size=window_size,
+        log_file=log_file,
+        debug=debug,
+    )
+
+
+def get_segments_batch(
+    log_probs: List[Union[np.ndarray, str]],
+    path_wav: List[Union[PosixPath, str]],
+    transcript_file: List[Union[PosixPath, str]],
+    output_file: List[str],
+    vocabulary: List[str],
+    tokenizer: SentencePieceTokenizer,
+    bpe_model: bool,
+    index_duration: float,
+    window_size: int = 8000,
+    log_file: str = "log.log",
+    debug: bool = False,
+) -> None:
+    """
+    Segments a batch of audio files with a single pass of the batched trellis (see ctc_trellis.py)
+    and saves segments timings to a file per audio
+
+    Args:
+        log_probs: Log probabilities (or paths to the cached .npy log probabilities) for every audio file,
+            see `get_segments`
+        path_wav: paths to the audio .wav files
+        transcript_file: paths to the transcripts
+        output_file: paths to the files to save timings for segments
+        vocabulary: vocabulary used to train the ASR model, blank at position 0
+        tokenizer: ASR model tokenizer (for BPE models, None for char-based models)
+        bpe_model: Indicates whether the model uses BPE
+        index_duration: corresponding time duration of one CTC output index (in seconds)
+        window_size: the length of each utterance (in terms of frames of the CTC outputs) fits into that window.
+    """
     level = "DEBUG" if debug else "INFO"
     file_handler = logging.FileHandler(filename=log_file)
     stdout_handler = logging.StreamHandler(sys.stdout)
     handlers = [file_handler, stdout_handler]
     logging.basicConfig(handlers=handlers, level=level)
 
-    try:
-        with open(transcript_file, "r") as f:
-            text = f.readlines()
-            text = [t.strip() for t in text if t.strip()]
-
-        # add corresponding original text without pre-processing
-        transcript_file_no_preprocessing = transcript_file.replace(".txt", "_with_punct.txt")
-        if not os.path.exists(transcript_file_no_preprocessing):
-            raise ValueError(f"{transcript_file_no_preprocessing} not found.")
-
-        with open(transcript_file_no_preprocessing, "r") as f:
-            text_no_preprocessing = f.readlines()
-            text_no_preprocessing = [t.strip() for t in text_no_preprocessing if t.strip()]
-
-        # add corresponding normalized original text
-        transcript_file_normalized = transcript_file.replace(".txt", "_with_punct_normalized.txt")
-        if not os.path.exists(transcript_file_normalized):
-            raise ValueError(f"{transcript_file_normalized} not found.")
-
-        with open(transcript_file_normalized, "r") as f:
-            text_normalized = f.readlines()
-            text_normalized = [t.strip() for t in text_normalized if t.strip()]
-
-        if len(text_no_preprocessing) != len(text):
-            raise ValueError(f"{transcript_file} and {transcript_file_no_preprocessing} do not match")
-
-        if len(text_normalized) != len(text):
-            raise ValueError(f"{transcript_file} and {transcript_file_normalized} do not match")
-
-        config = cs.CtcSegmentationParameters()
-        config.char_list = vocabulary
-        config.min_window_size = window_size
-        config.index_duration = index_duration
-
-        if bpe_model:
-            ground_truth_mat, utt_begin_indices = _prepare_tokenized_text_for_bpe_model(text, tokenizer, vocabulary, 0)
-        else:
-            config.excluded_characters = ".,-?!:»«;'›‹()"
-            config.blank = vocabulary.index(" ")
-            ground_truth_mat, utt_begin_indices = cs.prepare_text(config, text)
-
-        _print(ground_truth_mat, config.char_list)
-
-        # set this after text prepare_text()
-        config.blank = 0
-        logging.debug(f"Syncing {transcript_file}")
-        logging.debug(
-            f"Audio length {os.path.basename(path_wav)}: {log_probs.shape[0]}. "
-            f"Text length {os.path.basename(transcript_file)}: {len(ground_truth_mat)}"
-        )
-
-        timings, char_probs, char_list = cs.ctc_segmentation(config, log_probs, ground_truth_mat)
-        _print(ground_truth_mat, vocabulary)
-        segments = determine_utterance_segments(config, utt_begin_indices, char_probs, timings, text, char_list)
-
-        write_output(output_file, path_wav, segments, text, text_no_preprocessing, text_normalized)
-
-        # Also writes labels in audacity format
-        output_file_audacity = output_file[:-4] + "_audacity.txt"
-        write_labels_for_audacity(output_file_audacity, segments, text_no_preprocessing)
-        logging.info(f"Label file for Audacity written to {output_file_audacity}.")
-
-        for i, (word, segment) in enumerate(zip(text, segments)):
-            if i < 5:
-                logging.debug(f"{segment[0]:.2f} {segment[1]:.2f} {segment[2]:3.4f} {word}")
-        logging.info(f"segmentation of {transcript_file} complete.")
-
-    except Exception as e:
-        logging.info(f"{e} -- segmentation of {transcript_file} failed")
+    config = SegmentationConfig(char_list=vocabulary, min_window_size=window_size, index_duration=index_duration)
+    if not bpe_model:
+        config.excluded_characters = ".,-?!:»«;'›‹()"
+
+    batch = []
+    for i in range(len(transcript_file)):
+        try:
+            text, text_no_preprocessing, text_normalized = _read_transcripts(str(transcript_file[i]))
+            if bpe_model:
+                ground_truth_mat, utt_begin_indices = _prepare_tokenized_text_for_bpe_model(
+                    text, tokenizer, vocabulary, 0
+                )
+            else:
+                config.blank = vocabulary.index(" ")
+                ground_truth_mat, utt_begin_indices = prepare_text(config, text)
+                # set this after prepare_text()
+                config.blank = 0
+            _print(ground_truth_mat, config.char_list)
+
+            lp = log_probs[i]
+            if isinstance(lp, (str, PosixPath)):
+                lp = np.load(lp)
+            logging.debug(f"Syncing {transcript_file[i]}")
+            logging.debug(
+                f"Audio length {os.path.basename(path_wav[i])}: {lp.shape[0]}. "
+                f"Text length {os.path.basename(transcript_file[i])}: {len(ground_truth_mat)}"
+            )
+            batch.append((i, lp, ground_truth_mat, utt_begin_indices, text, text_no_preprocessing, text_normalized))
+        except Exception as e:
+            logging.info(f"{e} -- segmentation of {transcript_file[i]} failed")
+
+    if len(batch) == 0:
+        return
+
+    alignments = ctc_segmentation_batch(config, [x[1] for x in batch], [x[2] for x in batch])
+    for (i, _, _, utt_begin_indices, text, text_no_preprocessing, text_normalized), alignment in zip(
+        batch, alignments
+    ):
+        try:
+            if alignment is None:
+                raise ValueError("alignment not found")
+            timings, char_probs, char_list = alignment
+            segments = determine_utterance_segments(config, utt_begin_indices, char_probs, timings, text, char_list)
+
+            write_output(output_file[i], path_wav[i], segments, text, text_no_preprocessing, text_normalized)
+
+            # Also writes labels in audacity format
+            output_file_audacity = output_file[i][:-4] + "_audacity.txt"
+            write_labels_for_audacity(output_file_audacity, segments, text_no_preprocessing)
+            logging.info(f"Label file for Audacity written to {output_file_audacity}.")
+
+            for j, (word, segment) in enumerate(zip(text, segments)):
+                if j < 5:
+                    logging.debug(f"{segment[0]:.2f} {segment[1]:.2f} {segment[2]:3.4f} {word}")
+            logging.info(f"segmentation of {transcript_file[i]} complete.")
+
+        except Exception as e:
+            logging.info(f"{e} -- segmentation of {transcript_file[i]} failed")
 
 
 def _prepare_tokenized_text_for_bpe_model(text: List[str], tokenizer, vocabulary: List[str], blank_idx: int = 0):
@@ -215,7 +283,7 @@ def determine_utterance_segments(config, utt_begin_indices, char_probs, timings,
     Adapted from https://github.com/lumaku/ctc-segmentation
 
     Args:
-        config: an instance of CtcSegmentationParameters
+        config: an instance of SegmentationConfig
         utt_begin_indices: list of time indices of utterance start
         char_probs:  character positioned probabilities obtained from backtracking
         timings: mapping of time indices to seconds
@@ -0,0 +1,213 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from scripts import ctc_trellis
+from scripts.ctc_trellis import (
+    SegmentationConfig,
+    _backtrack,
+    _fill_trellis,
+    ctc_segmentation,
+    ctc_segmentation_batch,
+    prepare_text,
+)
+
+
+def _config(char_list=("·", "a", "b", "c"), **kwargs):
+    return SegmentationConfig(char_list=list(char_list), blank=0, index_duration=0.1, **kwargs)
+
+
+def _peaked_log_probs(num_frames, vocabulary_size, peaks):
+    """Log probabilities where blank wins every frame except the frames in `peaks`, a dict frame -> token"""
+    probs = np.full([num_frames, vocabulary_size], 0.01)
+    probs[:, 0] = 0.99
+    for frame, token in peaks.items():
+        probs[frame] = 0.01
+        probs[frame, token] = 0.99
+    return np.log(probs)
+
+
+def _best_path_score(log_probs, ground_truth, blank):
+    """Score of the best path through the full (unwindowed) trellis, computed frame by frame"""
+    num_frames, num_cols = log_probs.shape[0], ground_truth.shape[0]
+    table = np.full([num_frames, num_cols], -np.inf)
+    table[0, 0] = 0.0
+    for t in range(1, num_frames):
+        for c in range(num_cols):
+            tokens = [token for token in ground_truth[c] if token != -1]
+            stay = max([log_probs[t, blank]] + [log_probs[t, token] for token in tokens])
+            table[t, c] = table[t - 1, c] + stay
+            for s, token in enumerate(ground_truth[c]):
+                if token != -1 and c - 1 - s >= 0:
+                    table[t, c] = max(table[t, c], table[t - 1, c - 1 - s] + log_probs[t, token])
+    return table[-1, -1]
+
+
+@pytest.mark.unit
+def test_prepare_text():
+    config = _config()
+    ground_truth, utt_begin_indices = prepare_text(config, ["ab", "c"])
+    # "#·ab·c·", the start of ground truth symbol is not in the vocabulary
+    assert ground_truth.tolist() == [[-1], [0], [1], [2], [0], [3], [0]]
+    assert utt_begin_indices == [1, 4, 6]
+
+
+@pytest.mark.unit
+def test_prepare_text_multi_char_tokens():
+    config = _config(char_list=("·", "a", "b", "ab"), excluded_characters="c")
+    ground_truth, utt_begin_indices = prepare_text(config, ["abc"])
+    # "#·ab·", the token "ab" ends at the column of "b" and spans two columns
+    assert ground_truth.tolist() == [[-1, -1], [0, -1], [1, -1], [2, 3], [0, -1]]
+    assert utt_begin_indices == [1, 4]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("num_frames", [7, 12, 40])
+def test_fill_trellis_matches_full_trellis(num_frames):
+    config = _config()
+    ground_truth, _ = prepare_text(config, ["ab", "c"])
+    log_probs = np.log(np.random.RandomState(num_frames).dirichlet(np.ones(4), size=num_frames))
+
+    state = _fill_trellis([log_probs], [ground_truth], num_frames, config.blank)[0]
+    assert state.window == num_frames
+    assert state.offsets.tolist() == [0] * ground_truth.shape[0]
+
+    # char_probs holds the log probability of every frame of the best path
+    _, char_probs, _ = _backtrack(state, log_probs, ground_truth, config)
+    assert char_probs.sum() == pytest.approx(_best_path_score(log_probs, ground_truth, config.blank))
+
+
+@pytest.mark.unit
+def test_fill_trellis_window_offsets():
+    config = _config()
+    ground_truth, _ = prepare_text(config, ["ab", "c"])
+    log_probs = _peaked_log_probs(60, 4, {20: 1, 35: 2, 50: 3})
+
+    states = _fill_trellis([log_probs, log_probs[:5]], [ground_truth, ground_truth], 16, config.blank)
+    assert [state.window for state in states] == [16, 5]
+    offsets = states[0].offsets
+    # the window follows the alignment and the last column covers the last frame
+    assert np.all(np.diff(offsets) >= 0)
+    assert offsets[0] == 0 and offsets[-1] == 60 - 16
+    assert states[1].offsets.tolist() == [0] * ground_truth.shape[0]
+
+
+@pytest.mark.unit
+def test_backtrack_known_alignment():
+    config = _config()
+    ground_truth, _ = prepare_text(config, ["ab", "c"])
+    log_probs = _peaked_log_probs(30, 4, {5: 1, 10: 2, 20: 3})
+
+    state = _fill_trellis([log_probs], [ground_truth], 30, config.blank)[0]
+    timings, char_probs, state_list = _backtrack(state, log_probs, ground_truth, config)
+
+    assert timings.shape == (7,)
+    assert timings[[2, 3, 5]] == pytest.approx([0.5, 1.0, 2.0])
+    assert np.all(np.diff(timings) >= 0)
+    assert [state_list[frame] for frame in [5, 10, 20]] == ["a", "b", "c"]
+    assert state_list[0] == ""
+    assert set(state_list[1:]) == {config.self_transition, "·", "a", "b", "c"}
+    assert char_probs[0] == 0.0
+    assert char_probs[1:] == pytest.approx(np.log(0.99))
+
+
+@pytest.mark.unit
+def test_backtrack_multi_char_token():
+    config = _config(char_list=("·", "a", "b", "ab"))
+    ground_truth, _ = prepare_text(config, ["ab"])
+    log_probs = _peaked_log_probs(12, 4, {6: 3})
+
+    timings, _, state_list = ctc_segmentation(config, log_probs, ground_truth)
+    # both characters of "ab" start at the frame of the token
+    assert timings[[2, 3]] == pytest.approx([0.6, 0.6])
+    assert state_list[6] == "ab"
+    assert "a" not in state_list and "b" not in state_list
+
+
+@pytest.mark.unit
+def test_backtrack_raises_outside_window():
+    config = _config()
+    ground_truth, _ = prepare_text(config, ["ab", "c"])
+    log_probs = np.log(np.random.RandomState(0).dirichlet(np.ones(4), size=40))
+
+    state = _fill_trellis([log_probs], [ground_truth], 1, config.blank)[0]
+    with pytest.raises(IndexError):
+        _backtrack(state, log_probs, ground_truth, config)
+
+
+@pytest.mark.unit
+def test_ctc_segmentation_batch_matches_single_files():
+    config = _config(min_window_size=16)
+    texts = [["ab", "c"], ["cab"], ["a", "b", "c"]]
+    ground_truth = [prepare_text(config, text)[0] for text in texts]
+    rng = np.random.RandomState(0)
+    log_probs = [np.log(rng.dirichlet(np.ones(4), size=num_frames)) for num_frames in [30, 45, 20]]
+
+    results = ctc_segmentation_batch(config, log_probs, ground_truth)
+    for result, lp, gt in zip(results, log_probs, ground_truth):
+        timings, char_probs, state_list = ctc_segmentation(config, lp, gt)
+        np.testing.assert_array_equal(result[0], timings)
+        np.testing.assert_array_equal(result[1], char_probs)
+        assert result[2] == state_list
+
+
+@pytest.mark.unit
+def test_ctc_segmentation_batch_doubles_window(monkeypatch):
+    config = _config(min_window_size=1, max_window_size=1000)
+    ground_truth, _ = prepare_text(config, ["ab", "c"])
+    log_probs = _peaked_log_probs(40, 4, {10: 1, 20: 2, 30: 3})
+
+    calls = []
+    fill_trellis = ctc_trellis._fill_trellis
+
+    def recording_fill_trellis(log_probs, ground_truth, window_size, blank):
+        calls.append((window_size, len(log_probs)))
+        return fill_trellis(log_probs, ground_truth, window_size, blank)
+
+    monkeypatch.setattr(ctc_trellis, "_fill_trellis", recording_fill_trellis)
+    # aligned files leave the batch, only the files that failed are re-aligned with a doubled window
+    results = ctc_segmentation_batch(config, [log_probs, log_probs[:8]], [ground_truth, ground_truth[:3]])
+    assert calls[0] == (1, 2)
+    assert [window_size for window_size, _ in calls] == [2 ** i for i in range(len(calls))]
+    assert calls[-1][1] == 1
+    assert all(result is not None for result in results)
+    # the long file is aligned with the first window size that works
+    state = fill_trellis([log_probs], [ground_truth], calls[-1][0], config.blank)[0]
+    np.testing.assert_array_equal(results[0][0], _backtrack(state, log_probs, ground_truth, config)[0])
+    with pytest.raises(IndexError):
+        state = fill_trellis([log_probs], [ground_truth], calls[-2][0], config.blank)[0]
+        _backtrack(state, log_probs, ground_truth, config)
+
+
+@pytest.mark.unit
+def test_ctc_segmentation_alignment_not_found():
+    config = _config(min_window_size=4)
+    ground_truth, _ = prepare_text(config, ["ab", "c"])
+    # fewer frames than ground truth columns, no window size can align the file
+    log_probs = np.log(np.random.RandomState(0).dirichlet(np.ones(4), size=5))
+
+    assert ctc_segmentation_batch(config, [log_probs, log_probs[:0]], [ground_truth, ground_truth]) == [None, None]
+    with pytest.raises(ValueError):
+        ctc_segmentation(config, log_probs, ground_truth)
+
+
+@pytest.mark.unit
+def test_ctc_segmentation_max_window_size_reached():
+    config = _config(min_window_size=1, max_window_size=2)
+    ground_truth, _ = prepare_text(config, ["ab", "c"])
+    log_probs = _peaked_log_probs(40, 4, {10: 1, 20: 2, 30: 3})
+
+    assert ctc_segmentation_batch(config, [log_probs], [ground_truth]) == [None]